@@ -41,6 +41,21 @@ MAX_PROFILE_LIMIT = int(os.getenv('MAX_PROFILE_LIMIT','8142'))           # (8 *
 # DEFAULT_CACHE_TIMEOUT determines the
 DEFAULT_CACHE_TIMEOUT = int(os.getenv('DEFAULT_CACHE_TIMEOUT','43200'))  # 12 hours in seconds
 
+# RESOLVER_CACHE_TTL sets how long (in seconds) resolved profiles are cached, per name and zonefile hash
+RESOLVER_CACHE_TTL = int(os.getenv('RESOLVER_CACHE_TTL', '300'))
+
+# RESOLVER_CACHE_STALE_TTL sets how long (in seconds) an expired profile can still be served while it is refreshed
+RESOLVER_CACHE_STALE_TTL = int(os.getenv('RESOLVER_CACHE_STALE_TTL', '3600'))
+
+# RESOLVER_CACHE_SIZE sets the max number of resolved profiles (and of proof checks) to cache
+RESOLVER_CACHE_SIZE = int(os.getenv('RESOLVER_CACHE_SIZE', '10000'))
+
+# PROOF_CACHE_TTL sets how long (in seconds) the result of checking a social proof is cached
+PROOF_CACHE_TTL = int(os.getenv('PROOF_CACHE_TTL', '600'))
+
+# PROOF_CHECK_WORKERS sets the number of threads checking social proofs
+PROOF_CHECK_WORKERS = int(os.getenv('PROOF_CHECK_WORKERS', '16'))
+
 # DEBUG increases logging verbosity
 DEBUG = str2bool(os.getenv('DEBUG','False'))
 
@@ -59,6 +74,12 @@ MONGODB_URI = os.getenv('MONGODB_URI', "mongodb://localhost")
 # BASE_API_URL sets the blockstack api connection string
 BASE_API_URL = os.getenv('BASE_API_URL', "http://localhost:6270")
 
+# BASE_API_POOL_SIZE sets the max number of pooled connections to BASE_API_URL
+BASE_API_POOL_SIZE = int(os.getenv('BASE_API_POOL_SIZE', '32'))
+
+# RESPONSE_CACHE_SIZE sets the max number of proxied GET responses cached in-process
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '10000'))
+
 # PUBLIC_NODE_URL controls the what hostname is returned to clients
 PUBLIC_NODE_URL = os.getenv('PUBLIC_NODE_URL', 'https://core.example.org')
 
@@ -68,6 +89,12 @@ SEARCH_NODE_URL = os.getenv('SEARCH_NODE_URL', 'https://search.example.org')
 # SEARCH_DEFAULT_LIMIT sets the number of returns per call
 SEARCH_DEFAULT_LIMIT = int(os.getenv('SEARCH_DEFAULT_LIMIT', '50'))
 
+# SEARCH_INDEX_REFRESH_INTERVAL sets how often (in seconds) the search server checks for a re-built search index
+SEARCH_INDEX_REFRESH_INTERVAL = int(os.getenv('SEARCH_INDEX_REFRESH_INTERVAL', '60'))
+
+# SEARCH_RESULT_CACHE_SIZE sets the max number of search queries whose results are cached
+SEARCH_RESULT_CACHE_SIZE = int(os.getenv('SEARCH_RESULT_CACHE_SIZE', '10000'))
+
 # For the resolver endpoint
 NAMES_FILENAME = "names.json"
 NEW_NAMES_FILENAME = 'new_names.json'
@@ -81,4 +108,7 @@ SEARCH_BLOCKCHAIN_DATA_FILE = "/var/blockstack-search/blockchain_data.json"
 SEARCH_PROFILE_DATA_FILE = "/var/blockstack-search/profile_data.json"
 SEARCH_LAST_INDEX_DATA_FILE = "/var/blockstack-search/last_indexed.json"
 SEARCH_LOCKFILE = "/var/blockstack-search/indexer_lockfile.json"
+SEARCH_CRAWLER_DB = "/var/blockstack-search/profile_crawl.db"
+SEARCH_CRAWLER_WORKERS = int(os.getenv('SEARCH_CRAWLER_WORKERS', '16'))
+SEARCH_CRAWLER_HOST_LIMIT = int(os.getenv('SEARCH_CRAWLER_HOST_LIMIT', '4'))
 SEARCH_SUPPORTED_PROOFS = ['twitter', 'facebook', 'github', 'domain']
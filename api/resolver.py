@@ -33,19 +33,24 @@ from flask import Blueprint
 from flask_crossdomain import crossdomain
 
 from time import time
+from multiprocessing.pool import ThreadPool
 
 from blockstack_proofs import profile_to_proofs, profile_v3_to_proofs
 
 import blockstack_client.profile
+import blockstack_client.proxy
 import blockstack_client.subdomains
 
 from blockstack_client.schemas import OP_NAME_PATTERN, OP_NAMESPACE_PATTERN
 
 from api.utils import cache_control
+from api.response_cache import ResponseCache
 
 from .config import DEBUG
 from .config import DEFAULT_HOST, DEFAULT_CACHE_TIMEOUT
 from .config import NAMES_FILE
+from .config import RESOLVER_CACHE_TTL, RESOLVER_CACHE_STALE_TTL, RESOLVER_CACHE_SIZE
+from .config import PROOF_CACHE_TTL, PROOF_CHECK_WORKERS
 
 import requests
 requests.packages.urllib3.disable_warnings()
@@ -60,6 +65,15 @@ if DEBUG:
 else:
     log.setLevel(level=logging.INFO)
 
+# resolved profiles, by (name, zonefile hash)
+profile_cache = ResponseCache(RESOLVER_CACHE_SIZE)
+
+# results of checking social proofs, by proof URL
+proof_cache = ResponseCache(RESOLVER_CACHE_SIZE)
+
+# social proofs are checked concurrently by this pool
+proof_pool = ThreadPool(PROOF_CHECK_WORKERS)
+
 # copied and patched from proofs.py
 def site_data_to_fixed_proof_url(account, zonefile):
     service = account['service']
@@ -97,10 +111,28 @@ def fetch_proofs(profile, username, address, profile_ver=2, zonefile = None):
             and 'proofUrl' not in account):
             site_data_to_fixed_proof_url(account, zonefile)
 
-    if profile_ver == 3:
-        proofs = profile_v3_to_proofs(profile, username, address = address)
-    else:
-        proofs = profile_to_proofs(profile, username, address = address)
+    # check each account's proof on its own, so they can be checked
+    # concurrently and their results cached by proof URL
+    def check_account_proof(account):
+        account_profile = dict(profile)
+        account_profile['account'] = [account]
+
+        def check_proof():
+            if profile_ver == 3:
+                return profile_v3_to_proofs(account_profile, username, address = address)
+            else:
+                return profile_to_proofs(account_profile, username, address = address)
+
+        if not isinstance(account, dict) or 'proofUrl' not in account:
+            return check_proof()
+
+        cache_key = (account.get('service'), account.get('identifier'), account['proofUrl'],
+                     username, address, profile_ver)
+        return proof_cache.get(cache_key, PROOF_CACHE_TTL, check_proof)
+
+    proofs = []
+    for account_proofs in proof_pool.map(check_account_proof, profile['account']):
+        proofs += account_proofs
 
     return proofs
 
@@ -172,13 +204,35 @@ def get_profile(fqa):
         Return cached entries, if possible.
     """
 
-    profile_expired_grace = False
-
     fqa = fqa.lower()
 
+    # resolved profiles are cached by the name's current zonefile hash
+    name_record = None
+    try:
+        name_record = blockstack_client.proxy.get_name_record(fqa)
+    except Exception as e:
+        log.exception(e)
+
+    if not name_record or 'error' in name_record or not name_record.get('value_hash'):
+        return resolve_profile(fqa)
+
+    return profile_cache.get(
+        (fqa, name_record['value_hash']), RESOLVER_CACHE_TTL,
+        lambda: resolve_profile(fqa, name_record = name_record),
+        cacheable = lambda data: 'error' not in data,
+        stale_ttl = RESOLVER_CACHE_STALE_TTL)
+
+def resolve_profile(fqa, name_record = None):
+    """ Given a fully-qualified username (username.namespace)
+        get the data associated with that fqu, and check its proofs.
+    """
+
+    profile_expired_grace = False
+
     try:
         res = blockstack_client.profile.get_profile(
-            fqa, use_legacy = True, include_name_record = True)
+            fqa, use_legacy = True, include_name_record = True,
+            name_record = name_record)
         if 'error' in res:
             log.error('Error from profile.get_profile: {}'.format(res['error']))
             if "no user record hash defined" in res['error']:
@@ -242,14 +296,14 @@ def get_users(username):
 
     profile = get_profile(fqa)
 
-    reply[username] = profile
     if 'error' in profile:
-        status_code = 200
-        if 'status_code' in profile:
-            status_code = profile['status_code']
-            del profile['status_code']
+        # the profile is shared with concurrent requests and the cache; don't modify it
+        profile = dict(profile)
+        status_code = profile.pop('status_code', 200)
+        reply[username] = profile
         return jsonify(reply), status_code
     else:
+        reply[username] = profile
         return jsonify(reply), 200
 
 @resolver.route('/v2/users/<username>', methods=['GET'], strict_slashes=False)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack Core
+    ~~~~~
+
+    copyright: (c) 2014-2017 by Blockstack Inc.
+    copyright: (c) 2017 by Blockstack.org
+
+This file is part of Blockstack Core.
+
+    Blockstack Core is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack Core is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Blockstack Core. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import time
+import threading
+
+from collections import OrderedDict
+
+
+class InflightFetch(object):
+    """ an upstream fetch that other requests for the same key can wait on
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache(object):
+    """ in-process cache of upstream responses, with per-entry TTLs.
+
+        Concurrent misses on the same key are coalesced: the first
+        request fetches from upstream, and the others wait for its result.
+        Entries can be served stale for a while after they expire, while
+        they are refreshed in the background (stale-while-revalidate).
+        Keeps hit/miss counts and upstream latency stats.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.upstream_errors = 0
+        self.upstream_time = 0.0
+        self.upstream_max_time = 0.0
+
+
+    def lookup(self, key, now):
+        """ get an entry that is fresh or still servable stale, as
+            (fresh_until, stale_until, value).  Call with the lock held.
+        """
+
+        entry = self.entries.get(key, None)
+        if entry is None:
+            return None
+
+        fresh_until, stale_until, value = entry
+        if stale_until <= now:
+            del self.entries[key]
+            return None
+
+        return entry
+
+
+    def store(self, key, value, ttl, stale_ttl, now):
+        """ store an entry.  Call with the lock held.
+        """
+
+        if key in self.entries:
+            del self.entries[key]
+
+        self.entries[key] = (now + ttl, now + ttl + stale_ttl, value)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+    def fetch(self, key, inflight, ttl, stale_ttl, fetch, cacheable):
+        """ fetch a value from upstream on behalf of everyone waiting on
+            @inflight, and cache it.
+        """
+
+        start = time.time()
+        try:
+            inflight.value = fetch()
+        except Exception as e:
+            inflight.error = e
+
+        elapsed = time.time() - start
+
+        with self.lock:
+            del self.inflight[key]
+
+            self.upstream_calls += 1
+            self.upstream_time += elapsed
+            self.upstream_max_time = max(self.upstream_max_time, elapsed)
+
+            if inflight.error is not None:
+                self.upstream_errors += 1
+
+            elif ttl > 0 and (cacheable is None or cacheable(inflight.value)):
+                self.store(key, inflight.value, ttl, stale_ttl, time.time())
+
+        inflight.done.set()
+
+
+    def get(self, key, ttl, fetch, cacheable=None, stale_ttl=0):
+        """ get the value for key, calling fetch() to get it from upstream on
+            a miss.  The value is cached for ttl seconds if cacheable(value)
+            is True (or cacheable is None).  For stale_ttl seconds after
+            that, the stale value is served while it is refreshed in the
+            background.
+            Exceptions raised by fetch() are raised to every waiting caller.
+        """
+
+        now = time.time()
+        leader = False
+        refresh = False
+
+        with self.lock:
+            entry = self.lookup(key, now)
+            if entry is not None:
+                fresh_until, stale_until, value = entry
+                if now < fresh_until:
+                    self.hits += 1
+                    return value
+
+                self.stale_hits += 1
+                if key not in self.inflight:
+                    inflight = InflightFetch()
+                    self.inflight[key] = inflight
+                    refresh = True
+
+            else:
+                inflight = self.inflight.get(key, None)
+                if inflight is None:
+                    inflight = InflightFetch()
+                    self.inflight[key] = inflight
+                    self.misses += 1
+                    leader = True
+
+                else:
+                    self.coalesced += 1
+
+        if entry is not None:
+            if refresh:
+                t = threading.Thread(target=self.fetch, args=(key, inflight, ttl, stale_ttl, fetch, cacheable))
+                t.daemon = True
+                t.start()
+
+            return value
+
+        if leader:
+            self.fetch(key, inflight, ttl, stale_ttl, fetch, cacheable)
+        else:
+            inflight.done.wait()
+
+        if inflight.error is not None:
+            raise inflight.error
+
+        return inflight.value
+
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+    def get_stats(self):
+        """ get hit-ratio and upstream latency stats
+        """
+
+        with self.lock:
+            served_from_cache = self.hits + self.stale_hits + self.coalesced
+            requests = served_from_cache + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_ratio': float(served_from_cache) / requests if requests > 0 else 0.0,
+                'upstream_calls': self.upstream_calls,
+                'upstream_errors': self.upstream_errors,
+                'upstream_avg_time': self.upstream_time / self.upstream_calls if self.upstream_calls > 0 else 0.0,
+                'upstream_max_time': self.upstream_max_time,
+            }
@@ -40,6 +40,8 @@ from .db import proofs_cache
 
 from api.config import SEARCH_SUPPORTED_PROOFS
 
+from .utils import get_json
+
 
 def flush_collection():
 
@@ -103,191 +105,152 @@ def get_proofs(username, profile):
     return proofs
 
 
-def create_twitter_index():
-
-    counter = 0
-
-    for entry in namespace.find(no_cursor_timeout=True):
-
-        profile = json.loads(entry['profile'])
-
-        if 'twitter' in profile:
-
-            try:
-                twitter_handle = profile['twitter']
-            except:
-                continue
-
-            if 'proof' not in twitter_handle:
-                continue
-
-            proofs = get_proofs(entry['username'], profile)
+# proof indexes: service -> (index collection, indexed field)
+PROOF_INDEXES = {
+    'twitter': (twitter_index, 'twitter_handle'),
+    'facebook': (facebook_index, 'facebook_username'),
+    'github': (github_index, 'github_username'),
+    'domain': (domain_index, 'domain_url'),
+}
 
-            for proof in proofs:
-                if 'service' in proof and proof['service'] == 'twitter':
-                    if proof['valid']:
-                        #print proof
-                        new_entry = {}
-                        new_entry['username'] = entry['username']
-                        new_entry['twitter_handle'] = proof['identifier'].lower()
-                        new_entry['profile'] = profile
+TEST_DOMAIN_VERIFICATIONS = ['muneeb', 'blockstack', 'ryan']
 
-                        check_entry = twitter_index.find_one({"username": entry['username']})
 
-                        if check_entry is not None:
-                            print "already in index"
-                        else:
-                            print new_entry
-                            twitter_index.save(new_entry)
+def get_domain_proof_entry(username, profile):
+    """ get the domain index entry for a profile, if it has a valid domain proof
+    """
 
-                            counter += 1
-                            print counter
+    if username not in TEST_DOMAIN_VERIFICATIONS:
+        return None
 
+    if 'website' not in profile:
+        return None
 
-def create_facebook__index():
+    try:
+        website_url = profile['website']
+    except:
+        return None
 
-    counter = 0
+    domain = website_url.lstrip('https')
+    domain = domain.lstrip('://')
+    domain = domain.lstrip('www')
+    domain = domain.lstrip('.')
 
-    for entry in namespace.find(no_cursor_timeout=True):
+    proof_txt = get_proof_from_txt_record(domain)
 
-        profile = json.loads(entry['profile'])
+    if not contains_valid_proof_statement(proof_txt, username):
+        return None
 
-        if 'facebook' in profile:
+    new_entry = {}
+    new_entry['username'] = username
+    new_entry['domain_url'] = domain
+    new_entry['profile'] = profile
+    return new_entry
 
-            try:
-                facebook_username = profile['facebook']
-            except:
-                continue
 
-            if 'proof' not in facebook_username:
-                continue
+def get_profile_proof_entries(username, profile, services=SEARCH_SUPPORTED_PROOFS):
+    """ get the proof index entries for a profile, as a list of
+        (service, entry), with at most one entry per service
+    """
 
-            proofs = get_proofs(entry['username'], profile)
+    entries = []
+    proofs = None
 
-            for proof in proofs:
-                if 'service' in proof and proof['service'] == 'facebook':
-                    if proof['valid']:
-                        #print proof
-                        new_entry = {}
-                        new_entry['username'] = entry['username']
-                        new_entry['facebook_username'] = proof['identifier'].lower()
-                        new_entry['profile'] = profile
+    # github and domain proofs are only indexed for profiles with a valid btc address
+    has_btc_address = (get_btc_address(profile) is not None)
 
-                        check_entry = facebook_index.find_one({"username": entry['username']})
+    for service in ['twitter', 'facebook', 'github']:
 
-                        if check_entry is not None:
-                            print "already in index"
-                        else:
-                            print new_entry
-                            facebook_index.save(new_entry)
+        if service not in services or service not in profile:
+            continue
 
-                            counter += 1
-                            print counter
+        if service == 'github' and not has_btc_address:
+            continue
 
+        try:
+            account = profile[service]
+        except:
+            continue
 
-def create_github_proofs_index():
+        if 'proof' not in account:
+            continue
 
-    counter = 0
+        if proofs is None:
+            proofs = get_proofs(username, profile)
 
-    for entry in namespace.find(no_cursor_timeout=True):
+        index, field = PROOF_INDEXES[service]
 
-        profile = json.loads(entry['profile'])
+        for proof in proofs:
+            if 'service' in proof and proof['service'] == service:
+                if proof['valid']:
+                    new_entry = {}
+                    new_entry['username'] = username
+                    new_entry[field] = proof['identifier'].lower()
+                    new_entry['profile'] = profile
 
-        btc_address = get_btc_address(profile)
+                    entries.append((service, new_entry))
+                    break
 
-        # if no valid btc address, ignore
-        if btc_address is None:
-            continue
+    if 'domain' in services and has_btc_address:
+        new_entry = get_domain_proof_entry(username, profile)
+        if new_entry is not None:
+            entries.append(('domain', new_entry))
 
-        if 'github' in profile:
+    return entries
 
-            try:
-                github_username = profile['github']
-            except:
-                continue
 
-            if 'proof' not in github_username:
-                continue
+def save_proof_entry(service, entry):
+    """ add a proof entry to its index, unless the username is already indexed
+    """
 
-            proofs = get_proofs(entry['username'], profile)
+    index, field = PROOF_INDEXES[service]
+    index.update({"username": entry['username']}, {"$setOnInsert": entry}, upsert=True)
 
-            for proof in proofs:
-                if 'service' in proof and proof['service'] == 'github':
-                    if proof['valid']:
-                        #print proof
-                        new_entry = {}
-                        new_entry['username'] = entry['username']
-                        new_entry['github_username'] = proof['identifier'].lower()
-                        new_entry['profile'] = profile
 
-                        check_entry = github_index.find_one({"username": entry['username']})
+def index_profile_proofs(username, profile, services=SEARCH_SUPPORTED_PROOFS):
+    """ index the valid proofs of a profile
+        Returns the number of proofs indexed
+    """
 
-                        if check_entry is not None:
-                            print "already in index"
-                        else:
-                            print new_entry
-                            github_index.save(new_entry)
+    entries = get_profile_proof_entries(username, profile, services=services)
 
-                            counter += 1
-                            print counter
+    for (service, entry) in entries:
+        save_proof_entry(service, entry)
 
+    return len(entries)
 
-def create_domain_proofs_index():
 
-    TEST_DOMAIN_VERIFICATIONS = ['muneeb', 'blockstack', 'ryan']
+def create_proofs_index(services=SEARCH_SUPPORTED_PROOFS):
+    """ index the proofs of the given services in a single pass over the namespace
+    """
 
     counter = 0
 
     for entry in namespace.find(no_cursor_timeout=True):
 
-        if entry['username'] not in TEST_DOMAIN_VERIFICATIONS:
+        profile = get_json(entry['profile'])
+        if not isinstance(profile, dict):
             continue
 
-        profile = json.loads(entry['profile'])
+        counter += index_profile_proofs(entry['username'], profile, services=services)
 
-        btc_address = get_btc_address(profile)
+    print "Indexed {} proofs".format(counter)
 
-        # if no valid btc address, ignore
-        if btc_address is None:
-            continue
 
-        if 'website' in profile:
-
-            try:
-                website_url = profile['website']
-            except:
-                continue
-
-            print website_url
-
-            domain = website_url.lstrip('https')
-            domain = domain.lstrip('://')
-            domain = domain.lstrip('www')
-            domain = domain.lstrip('.')
-
-            print domain
-
-            proof_txt = get_proof_from_txt_record(domain)
+def create_twitter_index():
+    create_proofs_index(['twitter'])
 
-            validProof = contains_valid_proof_statement(proof_txt, entry['username'])
 
-            if validProof:
+def create_facebook__index():
+    create_proofs_index(['facebook'])
 
-                new_entry = {}
-                new_entry['username'] = entry['username']
-                new_entry['domain_url'] = domain
-                new_entry['profile'] = profile
 
-                check_entry = domain_index.find_one({"username": entry['username']})
+def create_github_proofs_index():
+    create_proofs_index(['github'])
 
-                if check_entry is not None:
-                    print "already in index"
-                else:
-                    print new_entry
-                    domain_index.save(new_entry)
 
-                    counter += 1
-                    print counter
+def create_domain_proofs_index():
+    create_proofs_index(['domain'])
 
 
 def validProofQuery(query):
@@ -365,11 +328,14 @@ if __name__ == "__main__":
     elif(option == '--optimize'):
         optimize_db()
 
+    elif(option == '--create_all'):
+        create_proofs_index()
+
     elif(option == '--create_twitter'):
-        create_twitter_proofs_index()
+        create_twitter_index()
 
     elif(option == '--create_facebook'):
-        create_facebook_proofs_index()
+        create_facebook__index()
 
     elif(option == '--create_github'):
         create_github_proofs_index()
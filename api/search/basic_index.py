@@ -23,14 +23,19 @@ This file is part of Blockstack.
     along with Blockstack. If not, see <http://www.gnu.org/licenses/>.
 """
 
+import os
 import sys
 import json
+import resource
 import requests
 
+from time import time
+
 from .utils import validUsername, get_mongo_client
-from .utils import get_json, config_log, pretty_print
+from .utils import get_json, config_log, pretty_print, iter_json_array
 
 from api.config import SEARCH_BLOCKCHAIN_DATA_FILE, SEARCH_PROFILE_DATA_FILE
+from api.config import SEARCH_CRAWLER_DB
 
 from .db import namespace, profile_data
 from .db import search_profiles
@@ -41,6 +46,12 @@ from .db import people_cache, twitter_cache, username_cache
 
 log = config_log(__name__)
 
+# max number of entries per search cache document
+SEARCH_CACHE_SEGMENT_SIZE = 10000
+
+# number of search profiles to insert at a time
+SEARCH_PROFILES_BATCH_SIZE = 1000
+
 def clean_profile_entries(profile):
     p_out = {}
     for k,v in profile.items():
@@ -53,19 +64,38 @@ def clean_profile_entries(profile):
             profile['_'+k[1:]] = v
             del profile[k]
 
+def iter_profile_data():
+    """ iterate over the crawled profiles as {'fqu': ..., 'profile': ...}.
+        Streams them from the crawler DB if there is one, or else from
+        the profile data file.
+    """
+
+    if os.path.exists(SEARCH_CRAWLER_DB):
+        from .crawler import crawler_db_open, crawler_db_iter_profiles
+
+        con = crawler_db_open(SEARCH_CRAWLER_DB)
+        try:
+            for (name, profile) in crawler_db_iter_profiles(con):
+                yield {'fqu': name, 'profile': profile}
+        finally:
+            con.close()
+
+    else:
+        with open(SEARCH_PROFILE_DATA_FILE, 'r') as fin:
+            for entry in iter_json_array(fin):
+                yield entry
+
+
 def fetch_profile_data_from_file():
     """ takes profile data from file and saves in the profile_data DB
     """
 
-    with open(SEARCH_PROFILE_DATA_FILE, 'r') as fin:
-        profiles = json.load(fin)
-
     counter = 0
 
     log.debug("-" * 5)
     log.debug("Fetching profile data from file")
 
-    for entry in profiles:
+    for entry in iter_profile_data():
         new_entry = {}
         new_entry['key'] = entry['fqu']
         new_entry['value'] = entry['profile']
@@ -150,21 +180,73 @@ def optimize_db():
     log.debug("Optimized DB")
 
 
-def create_search_index():
+class SearchCacheWriter(object):
+    """ writes the values of a search cache (e.g. people names) as a series
+        of documents with at most SEARCH_CACHE_SEGMENT_SIZE values each, so
+        the cache never has to be held in memory as a whole.
+        Values are deduped within a segment; readers dedup across segments.
+    """
+
+    def __init__(self, collection, field, segment_size=SEARCH_CACHE_SEGMENT_SIZE):
+        self.collection = collection
+        self.field = field
+        self.segment_size = segment_size
+        self.values = []
+        self.seen = set()
+        self.count = 0
+
+    def add(self, value):
+
+        if value in self.seen:
+            return
+
+        self.values.append(value)
+        self.seen.add(value)
+
+        if len(self.values) >= self.segment_size:
+            self.flush()
+
+    def flush(self):
+
+        if len(self.values) == 0:
+            return
+
+        self.collection.save({self.field: self.values})
+        self.count += len(self.values)
+
+        self.values = []
+        self.seen = set()
+
+
+def create_search_index(index_proofs=False):
     """ takes people names from blockchain and writes deduped names in a 'cache'
+
+        This is a single streaming pass over the namespace: the search
+        profiles and the name/twitter/username caches are written out in
+        bounded batches as we go.  If index_proofs is True, the
+        twitter/facebook/github/domain proof indexes are built in the same pass.
     """
 
+    if index_proofs:
+        from .attributes_index import index_profile_proofs
+        from .attributes_index import optimize_db as optimize_proofs_db
+
+    start = time()
+
     # create people name cache
     counter = 0
+    num_proofs = 0
+
+    people_names = SearchCacheWriter(people_cache, 'name')
+    twitter_handles = SearchCacheWriter(twitter_cache, 'twitter_handle')
+    usernames = SearchCacheWriter(username_cache, 'username')
 
-    people_names = []
-    twitter_handles = []
-    usernames = []
+    search_profiles_batch = []
 
     log.debug("-" * 5)
     log.debug("Creating search index")
 
-    for user in namespace.find():
+    for user in namespace.find(no_cursor_timeout=True):
         # the profile/info to be inserted
         search_profile = {}
 
@@ -173,15 +255,17 @@ def create_search_index():
         if(counter % 1000 == 0):
             log.debug("Processed entries: %s" % counter)
 
+        profile = get_json(user['profile'])
+
+        if index_proofs and isinstance(profile, dict):
+            num_proofs += index_profile_proofs(user['username'], profile)
+
         if validUsername(user['username']):
             pass
         else:
             # print "ignoring: " + user['username']
             continue
 
-        profile = get_json(user['profile'])
-
-
         hasBazaarId=False
         # search for openbazaar id in the profile
         if 'account' in profile:
@@ -203,7 +287,7 @@ def create_search_index():
                 name = name['formatted'].lower()
             except:
                 name = name.lower()
-            people_names.append(name)
+            people_names.add(name)
             search_profile['name'] = name
 
         else:
@@ -220,37 +304,41 @@ def create_search_index():
                 except:
                     continue
 
-            twitter_handles.append(twitter_handle)
+            twitter_handles.add(twitter_handle)
             search_profile['twitter_handle'] = twitter_handle
 
         else:
             search_profile['twitter_handle'] = None
 
         search_profile['username'] = user['username']
-        usernames.append(user['username'])
+        usernames.add(user['username'])
 
         search_profile['profile'] = profile
-        search_profiles.save(search_profile)
+        search_profiles_batch.append(search_profile)
+
+        if len(search_profiles_batch) >= SEARCH_PROFILES_BATCH_SIZE:
+            search_profiles.insert(search_profiles_batch)
+            search_profiles_batch = []
 
+    if len(search_profiles_batch) > 0:
+        search_profiles.insert(search_profiles_batch)
 
-    # dedup names
-    people_names = list(set(people_names))
-    people_names = {'name': people_names}
+    # save the remaining (deduped) cache segments to mongodb
+    people_names.flush()
+    twitter_handles.flush()
+    usernames.flush()
 
-    twitter_handles = list(set(twitter_handles))
-    twitter_handles = {'twitter_handle': twitter_handles}
+    optimize_db()
 
-    usernames = list(set(usernames))
-    usernames = {'username': usernames}
+    if index_proofs:
+        optimize_proofs_db()
 
-    # save final dedup results to mongodb (using it as a cache)
-    people_cache.save(people_names)
-    twitter_cache.save(twitter_handles)
-    username_cache.save(usernames)
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
 
-    optimize_db()
+    log.info('Created name/twitter/username search index over {} entries in {} seconds ({} proofs, peak RSS {} KB)'.format(
+             counter, time() - start, num_proofs, peak_rss))
 
-    log.debug('Created name/twitter/username search index')
 
 if __name__ == "__main__":
 
@@ -271,7 +359,7 @@ if __name__ == "__main__":
 
     elif(option == '--create_index'):
         # Step 3
-        create_search_index()
+        create_search_index(index_proofs='--proofs' in sys.argv[2:])
 
     elif(option == '--optimize'):
         optimize_db()
@@ -280,7 +368,7 @@ if __name__ == "__main__":
         flush_db()
         fetch_profile_data_from_file()
         fetch_namespace_from_file()
-        create_search_index()
+        create_search_index(index_proofs='--proofs' in sys.argv[2:])
 
     else:
         print "Usage error"
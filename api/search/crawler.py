@@ -0,0 +1,366 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Search
+    ~~~~~
+
+    copyright: (c) 2014-2017 by Blockstack Inc.
+    copyright: (c) 2017 by Blockstack.org
+
+This file is part of Search.
+
+    Search is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Search is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Search. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" concurrent, incremental profile crawler for the search index
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import urlparse
+import Queue
+
+from api.config import (
+    SEARCH_CRAWLER_DB, SEARCH_CRAWLER_WORKERS, SEARCH_CRAWLER_HOST_LIMIT,
+    SEARCH_PROFILE_DATA_FILE)
+
+from .utils import config_log, iter_json_array
+
+log = config_log(__name__)
+
+# how many crawled profiles to write to the checkpoint DB per transaction
+CRAWLER_COMMIT_BATCH_SIZE = 100
+
+CRAWLER_DB_SQL = """
+CREATE TABLE IF NOT EXISTS profiles( name TEXT NOT NULL,
+                                     zonefile_hash TEXT NOT NULL,
+                                     profile TEXT NOT NULL,
+                                     fetched_at INTEGER NOT NULL,
+                                     PRIMARY KEY(name) );
+"""
+
+
+def crawler_db_open(path, seed_path=None):
+    """ open (and create, if need be) the crawler checkpoint DB.
+        If the DB is created and @seed_path names an existing profile
+        data file, the DB starts out with the profiles in that file.
+    """
+
+    con = sqlite3.connect(path, isolation_level=None, timeout=2**30)
+    con.text_factory = str
+
+    con.execute("BEGIN EXCLUSIVE;")
+    try:
+        exists = con.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'profiles';").fetchone()
+        con.execute(CRAWLER_DB_SQL)
+
+        if exists is None and seed_path is not None and os.path.exists(seed_path):
+            count = crawler_db_seed_profiles(con, seed_path)
+            log.debug("Seeded crawler DB {} with {} profiles from {}".format(path, count, seed_path))
+
+        con.execute("END;")
+
+    except:
+        con.execute("ROLLBACK;")
+        con.close()
+        raise
+
+    return con
+
+
+def crawler_db_seed_profiles(con, path):
+    """ load the profiles in the profile data file at @path into the
+        crawler DB, in the caller's transaction.  The zonefile hashes
+        they came from are not known, so each of these profiles is
+        fetched again the next time its name is crawled.
+        Returns the number of profiles loaded.
+    """
+
+    now = int(time.time())
+    counter = [0]
+
+    def rows(fin):
+        for entry in iter_json_array(fin):
+            counter[0] += 1
+            yield (entry['fqu'], '', json.dumps(entry['profile']), now)
+
+    with open(path, 'r') as fin:
+        con.executemany("INSERT OR REPLACE INTO profiles (name, zonefile_hash, profile, fetched_at) VALUES (?,?,?,?);", rows(fin))
+
+    return counter[0]
+
+
+def crawler_db_get_zonefile_hashes(con):
+    """ get the zonefile hash of each crawled profile, as {name: zonefile_hash}
+    """
+
+    ret = {}
+    for (name, zonefile_hash) in con.execute("SELECT name, zonefile_hash FROM profiles;"):
+        ret[name] = zonefile_hash
+
+    return ret
+
+
+def crawler_db_put_profiles(con, profiles):
+    """ store a batch of crawled profiles, given as (name, zonefile_hash, profile)
+    """
+
+    now = int(time.time())
+    rows = [(name, zonefile_hash, json.dumps(profile), now)
+            for (name, zonefile_hash, profile) in profiles]
+
+    con.execute("BEGIN;")
+    con.executemany("INSERT OR REPLACE INTO profiles (name, zonefile_hash, profile, fetched_at) VALUES (?,?,?,?);", rows)
+    con.execute("END;")
+
+
+def crawler_db_iter_profiles(con):
+    """ iterate over the crawled profiles, as (name, profile)
+    """
+
+    for (name, profile_json) in con.execute("SELECT name, profile FROM profiles;"):
+        yield name, json.loads(profile_json)
+
+
+def crawler_db_dump_profiles(con, path, names=None):
+    """ write the crawled profiles to @path in the SEARCH_PROFILE_DATA_FILE
+        format (a JSON list of {'fqu': ..., 'profile': ...}), streaming them
+        from the DB.  If @names is given, only write those names.
+        Returns the number of profiles written.
+    """
+
+    count = 0
+    tmp_path = path + '.tmp'
+
+    with open(tmp_path, 'w') as fout:
+        fout.write('[')
+
+        for (name, profile_json) in con.execute("SELECT name, profile FROM profiles ORDER BY name;"):
+            if names is not None and name not in names:
+                continue
+
+            if count > 0:
+                fout.write(', ')
+
+            fout.write('{{"fqu": {}, "profile": {}}}'.format(json.dumps(name), profile_json))
+            count += 1
+
+        fout.write(']')
+
+    os.rename(tmp_path, path)
+    return count
+
+
+def get_name_record(name):
+    """ look up the current name record of a name
+        Returns None if the name could not be looked up
+    """
+
+    from blockstack_client import proxy
+
+    name_record = proxy.get_name_record(name)
+    if name_record is None or 'error' in name_record:
+        return None
+
+    return name_record
+
+
+def fetch_name_profile(name, zonefile_hash, storage_host_slot, name_record=None):
+    """ fetch the profile of a name.  The profile's storage host is looked up
+        from the zonefile, and the profile is fetched while holding a slot
+        for that host.  @name_record is the name's record, if the caller
+        already looked it up.
+        Returns the profile on success
+        Returns None on error
+    """
+
+    from blockstack_client.zonefile import get_name_zonefile
+    from blockstack_client.profile import get_profile
+    from blockstack_client import user as user_db
+
+    zonefile_resp = get_name_zonefile(name, name_record=name_record, include_name_record=True, allow_legacy=True)
+    if zonefile_resp is None or 'error' in zonefile_resp:
+        return None
+
+    zonefile = zonefile_resp['zonefile']
+    name_record = zonefile_resp['name_record']
+
+    storage_host = None
+    try:
+        if user_db.is_user_zonefile(zonefile):
+            urls = user_db.user_zonefile_urls(zonefile)
+            if urls:
+                storage_host = urlparse.urlparse(urls[0]).netloc
+    except Exception as e:
+        pass
+
+    with storage_host_slot(storage_host):
+        profile_resp = get_profile(name, user_zonefile=zonefile, name_record=name_record, use_legacy=True)
+
+    if 'error' in profile_resp:
+        return None
+
+    return profile_resp['profile']
+
+
+class ProfileCrawler(object):
+    """ crawl profiles with a bounded pool of worker threads, while letting
+        at most @host_limit requests at a time go to any one storage host.
+
+        Crawled profiles are checkpointed to a sqlite DB along with the
+        zonefile hash they came from, so a profile is only fetched again
+        once its name's zonefile changes.  A new DB starts out with the
+        profiles in @seed_path, so that dumping the DB does not drop the
+        names that were indexed before it existed.
+    """
+
+    def __init__(self, db_path=SEARCH_CRAWLER_DB, num_workers=SEARCH_CRAWLER_WORKERS,
+                 host_limit=SEARCH_CRAWLER_HOST_LIMIT, seed_path=SEARCH_PROFILE_DATA_FILE,
+                 get_name_record=get_name_record, fetch_profile=fetch_name_profile):
+
+        self.db_path = db_path
+        self.num_workers = num_workers
+        self.host_limit = host_limit
+        self.seed_path = seed_path
+        self.get_name_record = get_name_record
+        self.fetch_profile = fetch_profile
+
+        self.host_slots = {}
+        self.host_slots_lock = threading.Lock()
+
+
+    def storage_host_slot(self, host):
+        """ get the semaphore that limits concurrent requests to a storage host
+        """
+
+        with self.host_slots_lock:
+            if host not in self.host_slots:
+                # profiles with no known host are not limited beyond the pool size
+                limit = self.host_limit if host is not None else self.num_workers
+                self.host_slots[host] = threading.BoundedSemaphore(limit)
+
+            return self.host_slots[host]
+
+
+    def crawl_worker(self, work_queue, result_queue, crawled_hashes):
+        """ fetch profiles for names in the work queue until it's empty
+        """
+
+        while True:
+            try:
+                name, zonefile_hash = work_queue.get_nowait()
+            except Queue.Empty:
+                return
+
+            name_record = None
+            try:
+                if zonefile_hash is None:
+                    name_record = self.get_name_record(name)
+                    if name_record is not None:
+                        zonefile_hash = name_record.get('value_hash', None)
+
+                if zonefile_hash is None:
+                    result_queue.put(('failed', name, None, None))
+
+                elif crawled_hashes.get(name, None) == zonefile_hash:
+                    result_queue.put(('skipped', name, zonefile_hash, None))
+
+                else:
+                    profile = self.fetch_profile(name, zonefile_hash, self.storage_host_slot, name_record=name_record)
+                    if profile is None:
+                        result_queue.put(('failed', name, zonefile_hash, None))
+                    else:
+                        result_queue.put(('fetched', name, zonefile_hash, profile))
+
+            except Exception as e:
+                log.exception(e)
+                result_queue.put(('failed', name, zonefile_hash, None))
+
+
+    def crawl(self, names, zonefile_hashes=None, status_cb=None):
+        """ crawl the profiles of the given names.
+            @zonefile_hashes optionally maps names to their known zonefile hashes.
+            @status_cb(num_done, num_total) is called as names are processed.
+
+            Returns {'fetched': ..., 'skipped': ..., 'failed': ..., 'time': ...,
+                     'crawled': set of names with an up-to-date profile}
+        """
+
+        if zonefile_hashes is None:
+            zonefile_hashes = {}
+
+        con = crawler_db_open(self.db_path, seed_path=self.seed_path)
+        crawled_hashes = crawler_db_get_zonefile_hashes(con)
+
+        work_queue = Queue.Queue()
+        result_queue = Queue.Queue()
+
+        for name in names:
+            work_queue.put((name, zonefile_hashes.get(name, None)))
+
+        start = time.time()
+        workers = []
+        for i in xrange(min(self.num_workers, len(names))):
+            t = threading.Thread(target=self.crawl_worker, args=(work_queue, result_queue, crawled_hashes))
+            t.daemon = True
+            t.start()
+            workers.append(t)
+
+        stats = {'fetched': 0, 'skipped': 0, 'failed': 0, 'crawled': set()}
+        batch = []
+
+        for i in xrange(len(names)):
+            status, name, zonefile_hash, profile = result_queue.get()
+            stats[status] += 1
+
+            if status != 'failed':
+                stats['crawled'].add(name)
+
+            if status == 'fetched':
+                batch.append((name, zonefile_hash, profile))
+
+            if len(batch) >= CRAWLER_COMMIT_BATCH_SIZE:
+                crawler_db_put_profiles(con, batch)
+                batch = []
+
+            if status_cb is not None:
+                status_cb(i + 1, len(names))
+
+        if len(batch) > 0:
+            crawler_db_put_profiles(con, batch)
+
+        for t in workers:
+            t.join()
+
+        con.close()
+
+        stats['time'] = time.time() - start
+        log.debug("Crawled {} names in {} seconds: {} fetched, {} skipped, {} failed".format(
+                  len(names), stats['time'], stats['fetched'], stats['skipped'], stats['failed']))
+
+        return stats
+
+
+    def dump_profiles(self, path, names=None):
+        """ write the crawled profiles to the profile data file
+        """
+
+        con = crawler_db_open(self.db_path, seed_path=self.seed_path)
+        try:
+            return crawler_db_dump_profiles(con, path, names=names)
+        finally:
+            con.close()
@@ -34,9 +34,9 @@ from api.config import (
 
 from .utils import validUsername
 from .utils import get_json, config_log
+from .crawler import ProfileCrawler
 
 from blockstack_client import proxy, subdomains
-from blockstack_client.profile import get_profile
 from api.utils import profile_log
 import logging
 
@@ -64,6 +64,10 @@ def print_status_bar(filled, total):
     sys.stdout.write(out)
     sys.stdout.flush()
 
+def print_crawl_status(filled, total):
+    if filled % 100 == 0 or filled == total:
+        print_status_bar(filled, total)
+
 def update_profiles():
     if not os.path.exists(SEARCH_LAST_INDEX_DATA_FILE):
         return {'error' : 'No last index, you need to rebuild the whole index.'}
@@ -89,9 +93,7 @@ def update_profiles():
         return {'status' : True, 'message' : 'No new blocks since last indexing'}
 
     subdomaindb = subdomains.SubdomainDB()
-    subdomain_names = [ name for name in
-                        subdomaindb.get_all_subdomains(above_seq = last_subdomain_seq)
-                        if name not in existing_names ]
+    subdomain_names = subdomaindb.get_all_subdomains(above_seq = last_subdomain_seq)
     last_subdomain_seq = subdomaindb.get_last_index()
 
     # aaron: note, sometimes it may take a little while for
@@ -103,37 +105,17 @@ def update_profiles():
     names_updated = [ zf_info['name'] for zf_info in zonefiles_updated
                       if 'name' in zf_info ]
     names_updated += subdomain_names
-    names_to_insert = set([ name for name in names_updated if name not in existing_names ])
+    names_updated = list(set(names_updated))
 
-    updated_profiles = {}
-    actually_updated_names = set()
+    # the crawler only re-fetches profiles whose zonefiles changed
     print "Updating {} entries...".format(len(names_updated))
-    for ix, name in enumerate(names_to_insert):
-        print_status_bar(ix+1, len(names_to_insert))
-        profile_entry = {}
-        profile_entry['fqu'] = name
-        try:
-            profile_resp = get_profile(name, use_legacy = True)
-            profile_entry['profile'] = profile_resp['profile']
-            updated_profiles[name] = (profile_entry)
-            actually_updated_names.add(name)
-        except KeyboardInterrupt as e:
-            raise e
-        except:
-            import traceback as tb; tb.print_exc()
+    crawler = ProfileCrawler()
+    crawl_stats = crawler.crawl(names_updated, status_cb = print_crawl_status)
 
-    names_updated = actually_updated_names
-
-    if len(names_updated) == 0:
+    if crawl_stats['fetched'] == 0:
         return {'status' : True, 'message' : 'No new profiles'}
 
-    with open(SEARCH_PROFILE_DATA_FILE, 'r') as fin:
-        all_profiles = json.load(fin)
-    existing_names = list(existing_names)
-
-    for name_to_add in names_updated:
-        all_profiles.append(updated_profiles[name_to_add])
-        existing_names.append(name_to_add)
+    existing_names.update(crawl_stats['crawled'])
 
     if not obtain_lockfile():
         return {'error' : 'Could not obtain lockfile, abandoning my update.'}
@@ -143,15 +125,16 @@ def update_profiles():
         return {'error' : 'Full re-index written during our update. Abandoning'}
 
     with open(SEARCH_BLOCKCHAIN_DATA_FILE, 'w') as fout:
-        json.dump(existing_names, fout)
-    with open(SEARCH_PROFILE_DATA_FILE, 'w') as fout:
-        json.dump(all_profiles, fout)
+        json.dump(list(existing_names), fout)
+
+    crawler.dump_profiles(SEARCH_PROFILE_DATA_FILE, names = existing_names)
+
     with open(SEARCH_LAST_INDEX_DATA_FILE, 'w') as fout:
         search_indexer_info['last_block_height'] = new_block_height
         search_indexer_info['last_subdomain_seq'] = last_subdomain_seq
         json.dump(search_indexer_info, fout)
 
-    return {'status' : True, 'message' : 'Indexed {} profiles'.format(len(names_updated))}
+    return {'status' : True, 'message' : 'Indexed {} profiles'.format(crawl_stats['fetched'])}
 
 def fetch_profiles(max_to_fetch = None, just_test_set = False):
     """
@@ -168,8 +151,6 @@ def fetch_profiles(max_to_fetch = None, just_test_set = False):
     info_resp = proxy.getinfo()
     last_block_processed = info_resp['last_block_processed']
 
-    all_profiles = []
-
     if max_to_fetch == None:
         max_to_fetch = len(all_names)
 
@@ -177,22 +158,11 @@ def fetch_profiles(max_to_fetch = None, just_test_set = False):
         from api.tests.search_tests import SEARCH_TEST_USERS
         all_names = ["{}.id".format(u) for u in SEARCH_TEST_USERS]
 
-    for ix, fqu in enumerate(all_names):
-        if ix % 100 == 0:
-            print_status_bar(ix, max_to_fetch)
-        if ix >= max_to_fetch:
-            break
-
-        resp = {}
-        resp['fqu'] = fqu
+    all_names = all_names[:max_to_fetch]
 
-        try:
-            resp['profile'] = get_profile(fqu, use_legacy = True)['profile']
-            all_profiles.append(resp)
-        except KeyboardInterrupt as e:
-            raise e
-        except:
-            pass
+    # profiles whose zonefiles did not change since the last crawl are not re-fetched
+    crawler = ProfileCrawler()
+    crawler.crawl(all_names, status_cb = print_crawl_status)
 
     attempts = 0
     while not obtain_lockfile():
@@ -205,8 +175,7 @@ def fetch_profiles(max_to_fetch = None, just_test_set = False):
     subdomaindb = subdomains.SubdomainDB()
     last_subdomain_seq = subdomaindb.get_last_index()
 
-    with open(SEARCH_PROFILE_DATA_FILE, 'w') as fout:
-        json.dump(all_profiles, fout)
+    crawler.dump_profiles(SEARCH_PROFILE_DATA_FILE, names = set(all_names))
     with open(SEARCH_LAST_INDEX_DATA_FILE, 'w') as fout:
         search_index_data = {
             'last_block_height' : last_block_processed,
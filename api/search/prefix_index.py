@@ -0,0 +1,252 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Search
+    ~~~~~
+
+    copyright: (c) 2014-2017 by Blockstack Inc.
+    copyright: (c) 2017 by Blockstack.org
+
+This file is part of Search.
+
+    Search is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Search is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Search. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" in-memory word-prefix index for name/twitter/username search
+"""
+
+import sys
+import threading
+
+from array import array
+from bisect import bisect_left
+from time import time
+
+from .utils import config_log
+
+log = config_log(__name__)
+
+
+def prefix_upper_bound(prefix):
+    """ smallest string that sorts after every string starting with prefix
+    """
+
+    last = prefix[-1]
+
+    if isinstance(prefix, unicode):
+        if ord(last) == sys.maxunicode:
+            return prefix + last
+
+        return prefix[:-1] + unichr(ord(last) + 1)
+    else:
+        if last == '\xff':
+            return prefix + '\xff'
+
+        return prefix[:-1] + chr(ord(last) + 1)
+
+
+def words_match_query(target_words, query_words):
+    """ return True if every query_word is a prefix of some target_word
+    """
+
+    for query_word in query_words:
+
+        found = False
+        for target_word in target_words:
+            if target_word.startswith(query_word):
+                found = True
+                break
+
+        if not found:
+            return False
+
+    return True
+
+
+class PrefixIndex(object):
+    """ word-prefix index over a list of strings.
+
+        Every string is split into words (on ' ', like substring_search).
+        The distinct words are kept in a sorted array, and each word maps
+        to the (sorted) positions of the strings that contain it.  A query
+        word is a prefix, so the words it matches form a contiguous range
+        of the sorted array, which we find with bisect.
+    """
+
+    def __init__(self, strings):
+
+        self.strings = list(strings)
+
+        postings = {}
+
+        for i, s in enumerate(self.strings):
+            for word in set(s.split(' ')):
+                if word not in postings:
+                    postings[word] = array('l')
+
+                postings[word].append(i)
+
+        self.words = sorted(postings.keys())
+        self.postings = [postings[w] for w in self.words]
+
+
+    def __len__(self):
+        return len(self.strings)
+
+
+    def prefix_range(self, prefix):
+        """ get the [start, end) range of words that start with prefix
+        """
+
+        start = bisect_left(self.words, prefix)
+        end = bisect_left(self.words, prefix_upper_bound(prefix), lo=start)
+        return start, end
+
+
+    def prefix_count(self, prefix):
+        """ upper bound on the number of strings with a word starting with prefix
+        """
+
+        start, end = self.prefix_range(prefix)
+        return sum(len(self.postings[i]) for i in xrange(start, end))
+
+
+    def prefix_matches(self, prefix):
+        """ sorted positions of the strings with a word starting with prefix
+        """
+
+        start, end = self.prefix_range(prefix)
+
+        if end - start == 1:
+            return self.postings[start]
+
+        matches = set()
+        for i in xrange(start, end):
+            matches.update(self.postings[i])
+
+        return sorted(matches)
+
+
+    def search(self, query, limit_results):
+        """ find the strings in which every word of the query is a prefix
+            of some word.  Returns the same strings, in the same order, as
+            substring_search(query, strings, limit_results).
+        """
+
+        query_words = [w for w in query.split(' ') if len(w) > 0]
+
+        if len(query_words) == 0:
+            # an empty query word is a prefix of everything
+            return self.strings[:limit_results]
+
+        # start from the most selective query word, and check the
+        # remaining query words against the candidate strings directly
+        counts = [(self.prefix_count(w), w) for w in set(query_words)]
+        counts.sort()
+
+        if counts[0][0] == 0:
+            return []
+
+        candidates = self.prefix_matches(counts[0][1])
+        others = [w for (c, w) in counts[1:]]
+
+        results = []
+
+        for i in candidates:
+
+            s = self.strings[i]
+
+            if len(others) > 0 and not words_match_query(s.split(' '), others):
+                continue
+
+            results.append(s)
+
+            if len(results) == limit_results:
+                break
+
+        return results
+
+
+class CachedPrefixIndex(object):
+    """ prefix index over a search_cache collection (e.g. people_cache),
+        rebuilt only when the indexer has rewritten the collection.
+    """
+
+    def __init__(self, collection, field, refresh_interval=0):
+        self.collection = collection
+        self.field = field
+        self.refresh_interval = refresh_interval
+        self.index = None
+        self.doc_ids = None
+        self.version = 0
+        self.last_check = 0
+        self.lock = threading.Lock()
+
+
+    def get_doc_ids(self):
+        """ the indexer flushes and re-saves the cache on every refresh,
+            so the cache document ids identify the index version.
+        """
+
+        return [d['_id'] for d in self.collection.find({}, {'_id': 1})]
+
+
+    def get_index(self):
+        """ get the current prefix index, rebuilding it if the cache changed
+        """
+
+        if self.index is not None and time() - self.last_check < self.refresh_interval:
+            return self.index
+
+        doc_ids = self.get_doc_ids()
+
+        with self.lock:
+
+            self.last_check = time()
+
+            if self.index is not None and doc_ids == self.doc_ids:
+                return self.index
+
+            start = time()
+
+            # the cache may be written in several segments, which can
+            # repeat each other's entries
+            strings = []
+            seen = set()
+            for i in self.collection.find():
+                for s in i[self.field]:
+                    if s not in seen:
+                        strings.append(s)
+                        seen.add(s)
+
+            self.index = PrefixIndex(strings)
+            self.doc_ids = doc_ids
+            self.version += 1
+
+            log.debug("Built {} prefix index over {} entries in {} seconds".format(
+                      self.field, len(self.index), time() - start))
+
+            return self.index
+
+
+    def get_version(self):
+        """ get the version of the current index (bumped on each rebuild)
+        """
+
+        self.get_index()
+        return self.version
+
+
+    def search(self, query, limit_results):
+        return self.get_index().search(query, limit_results)
@@ -37,7 +37,9 @@ from api.utils import cache_control
 
 from .substring_search import search_people_by_name, search_people_by_twitter
 from .substring_search import search_people_by_username, search_people_by_bio
-from .substring_search import fetch_profiles
+from .substring_search import fetch_profiles, dedup_search_results
+from .substring_search import normalize_query, get_search_index_version
+from .substring_search import search_result_cache
 
 from .attributes_index import search_proofs, validProofQuery
 
@@ -128,6 +130,14 @@ def search_by_name():
 
     else:
 
+        query = normalize_query(query)
+        cache_key = (query, new_limit)
+        index_version = get_search_index_version()
+
+        cached_results = search_result_cache.get(cache_key, index_version)
+        if cached_results is not None:
+            return jsonify({'results': cached_results})
+
         threads = []
 
         t1 = QueryThread(query, 'username_search', new_limit)
@@ -153,9 +163,10 @@ def search_by_name():
         results_people += results_username + results_twitter
 
         # dedup all results before sending out
-        from substring_search import dedup_search_results
         results_people = dedup_search_results(results_people)
 
+        search_result_cache.put(cache_key, index_version, results_people[:new_limit])
+
     results = {}
     results['results'] = results_people[:new_limit]
 
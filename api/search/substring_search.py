@@ -30,14 +30,32 @@ This file is part of Search.
 import os
 import sys
 import json
+import threading
+
+from collections import OrderedDict
 
 
 from api.search.db import search_db, search_profiles
 from api.search.db import search_cache
+from api.search.db import people_cache, twitter_cache, username_cache
+from api.search.prefix_index import CachedPrefixIndex
 
 from api.config import SEARCH_DEFAULT_LIMIT as DEFAULT_LIMIT
+from api.config import SEARCH_INDEX_REFRESH_INTERVAL, SEARCH_RESULT_CACHE_SIZE
 from .utils import get_json,pretty_print
 
+# in-memory prefix indexes over the search cache
+people_index = CachedPrefixIndex(people_cache, 'name', SEARCH_INDEX_REFRESH_INTERVAL)
+twitter_index = CachedPrefixIndex(twitter_cache, 'twitter_handle', SEARCH_INDEX_REFRESH_INTERVAL)
+username_index = CachedPrefixIndex(username_cache, 'username', SEARCH_INDEX_REFRESH_INTERVAL)
+
+# search_profiles field to look up for each search type
+SEARCH_TYPE_FIELDS = {
+    'name': 'name',
+    'twitter': 'twitter_handle',
+    'username': 'username',
+}
+
 def anyword_substring_search_inner(query_word, target_words):
     """ return True if ANY target_word matches a query_word
     """
@@ -121,17 +139,7 @@ def search_people_by_name(query, limit_results=DEFAULT_LIMIT):
 
     query = query.lower()
 
-    people_names = []
-
-    # using mongodb as a cache, load data in people_names
-
-
-    
-    for i in search_cache.people_cache.find():
-        people_names += i['name']
-        
-          
-    results = substring_search(query, people_names, limit_results)
+    results = people_index.search(query, limit_results)
 
     return order_search_results(query, results)
 
@@ -140,16 +148,7 @@ def search_people_by_twitter(query, limit_results=DEFAULT_LIMIT):
 
     query = query.lower()
 
-    twitter_handles = []
-    
-    
-    
-    # using mongodb as a cache, load data
-    for i in search_cache.twitter_cache.find():
-        twitter_handles += i['twitter_handle']
-
-       
-    results = substring_search(query, twitter_handles, limit_results)
+    results = twitter_index.search(query, limit_results)
 
     return results
 
@@ -158,13 +157,7 @@ def search_people_by_username(query, limit_results=DEFAULT_LIMIT):
 
     query = query.lower()
 
-    usernames = []
-
-    # using mongodb as a cache, load data
-    for i in search_cache.username_cache.find():
-        usernames += i['username']
-
-    results = substring_search(query, usernames, limit_results)
+    results = username_index.search(query, limit_results)
 
     return results
 
@@ -211,30 +204,37 @@ def search_people_by_bio(query, limit_results=DEFAULT_LIMIT,
 
 
 def fetch_profiles(search_results, search_type="name"):
+    """ look up the profiles for the search results with a single query,
+        and return them in the order of the search results
+    """
 
-    results = []
+    field = SEARCH_TYPE_FIELDS[search_type]
 
-    for search_result in search_results:
+    if len(search_results) == 0:
+        return []
+
+    profiles = {}
+
+    for result in search_profiles.find({field: {"$in": list(search_results)}}):
 
-        if search_type == 'name':
-            response = search_profiles.find({"name": search_result})
+        key = result.get(field)
 
-        elif search_type == 'twitter':
-            response = search_profiles.find({"twitter_handle": search_result})
+        try:
+            del result['name']
+            del result['twitter_handle']
+            del result['_id']
+        except:
+            pass
 
-        elif search_type == 'username':
-            response = search_profiles.find({"username": search_result})
+        if key not in profiles:
+            profiles[key] = []
 
-        for result in response:
+        profiles[key].append(result)
 
-            try:
-                del result['name']
-                del result['twitter_handle']
-                del result['_id']
-            except:
-                pass
+    results = []
 
-            results.append(result)
+    for search_result in search_results:
+        results += profiles.get(search_result, [])
 
     return results
 
@@ -295,6 +295,68 @@ def order_search_results(query, search_results):
     return results_names + results_third
 
 
+def get_search_index_version():
+    """ version of the name/twitter/username indexes; changes whenever
+        any of them is rebuilt
+    """
+
+    return (people_index.get_version(), twitter_index.get_version(),
+            username_index.get_version())
+
+
+def normalize_query(query):
+    """ normalize a query for use as a result cache key
+    """
+
+    return ' '.join(query.lower().split())
+
+
+class SearchResultCache(object):
+    """ LRU cache of search results by (normalized query, limit).
+        Results are only valid for the search index version they were
+        computed from, so the whole cache is dropped when the index is rebuilt.
+    """
+
+    def __init__(self, max_size=SEARCH_RESULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.version = None
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    def get(self, key, version):
+
+        with self.lock:
+
+            if version != self.version or key not in self.results:
+                return None
+
+            # move to the most-recently-used end
+            results = self.results.pop(key)
+            self.results[key] = results
+            return results
+
+
+    def put(self, key, version, results):
+
+        with self.lock:
+
+            if version != self.version:
+                self.results.clear()
+                self.version = version
+
+            if key in self.results:
+                del self.results[key]
+
+            self.results[key] = results
+
+            while len(self.results) > self.max_size:
+                self.results.popitem(last=False)
+
+
+search_result_cache = SearchResultCache()
+
+
 def dedup_search_results(search_results):
     """ dedup results
     """
@@ -97,6 +97,72 @@ def get_json(data):
     return data
 
 
+def iter_json_array(fin, read_size=1024 * 1024):
+    """ iterate over the values of the JSON array in the file fin,
+        decoding one value at a time instead of loading the whole array
+    """
+
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r'\s*')
+
+    buf = ''
+    pos = 0
+    eof = False
+
+    # what comes next: '[', the first value or ']', a value, or ',' or ']'
+    state = 'start'
+
+    while True:
+
+        pos = whitespace.match(buf, pos).end()
+
+        if pos < len(buf):
+            c = buf[pos]
+
+            if state == 'start':
+                if c != '[':
+                    raise ValueError("Not a JSON array")
+
+                pos += 1
+                state = 'first'
+                continue
+
+            if state == 'separator' or (state == 'first' and c == ']'):
+                if c == ']':
+                    return
+
+                if c != ',':
+                    raise ValueError("Expected ',' or ']' in JSON array")
+
+                pos += 1
+                state = 'value'
+                continue
+
+            # a number at the end of the buffer may be cut off (even at a
+            # '.' or 'e'), so only take a value once we see what ends it
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+                if (end < len(buf) and buf[end] in ' \t\r\n,]') or eof:
+                    yield value
+                    pos = end
+                    state = 'separator'
+                    continue
+
+            except ValueError:
+                if eof:
+                    raise
+
+        elif eof:
+            raise ValueError("Unterminated JSON array")
+
+        data = fin.read(read_size)
+        if len(data) == 0:
+            eof = True
+
+        buf = buf[pos:] + data
+        pos = 0
+
+
 def validUsername(username):
 
     a = re.compile("^[a-z0-9_]{1,60}$")
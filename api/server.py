@@ -38,7 +38,9 @@ from flask_crossdomain import crossdomain
 
 from .parameters import parameters_required
 from .utils import get_api_calls, cache_control
+from .response_cache import ResponseCache
 from .config import PUBLIC_NODE, PUBLIC_NODE_URL, BASE_API_URL, DEFAULT_CACHE_TIMEOUT
+from .config import BASE_API_POOL_SIZE, RESPONSE_CACHE_SIZE
 from .config import SEARCH_NODE_URL, SEARCH_API_ENDPOINT_ENABLED
 
 # hack around absolute paths
@@ -80,18 +82,33 @@ def default_cache_off(response):
         response.headers['Cache-Control'] = 'no-cache'
     return response
 
-def forwarded_get(url, params = None):
+# pooled, keep-alive connections to the API backend
+upstream = requests.Session()
+upstream.mount('http://', requests.adapters.HTTPAdapter(pool_connections = 1, pool_maxsize = BASE_API_POOL_SIZE))
+upstream.mount('https://', requests.adapters.HTTPAdapter(pool_connections = 1, pool_maxsize = BASE_API_POOL_SIZE))
+
+# cache of proxied GET responses
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE)
+
+def upstream_get(url, params = None):
+    """ GET from the API backend.
+        Returns (response data, status code)
+    """
     if params:
-        resp = requests.get(url, params = params)
+        resp = upstream.get(url, params = params)
     else:
-        resp = requests.get(url)
+        resp = upstream.get(url)
 
     try:
         log.debug("{} => {}".format(resp.url, resp.status_code))
-        return jsonify(resp.json()), resp.status_code
+        return resp.json(), resp.status_code
     except:
         log.error("Bad response from API URL: {} \n {}".format(resp.url, resp.text))
-        return jsonify({'error': 'Not found'}), resp.status_code
+        return {'error': 'Not found'}, resp.status_code
+
+def forwarded_get(url, params = None):
+    data, status_code = upstream_get(url, params = params)
+    return jsonify(data), status_code
 
 @app.route('/v1/search', methods=['GET'])
 @parameters_required(parameters=['query'])
@@ -127,6 +144,43 @@ SPECIFIED = {
     1 : 'public, max-age=30',
     2 : 'public, max-age=300' }
 
+DEFAULT_SPECIFIED = 'public, max-age={:d}'.format(30*60)
+
+MAX_AGE = re.compile(r'max-age=(\d+)')
+
+def get_cache_control(path):
+    """ get the Cache-Control header for a proxied GET path, or None
+    """
+    for ix, matcher in enumerate(CACHE_SPECIFIC):
+        if matcher.match('/' + path):
+            return SPECIFIED.get(ix, None)
+
+    return DEFAULT_SPECIFIED
+
+def get_cache_ttl(path):
+    """ get how long to cache a proxied GET path's response in-process.
+        Only the paths in CACHE_SPECIFIC are cached, for their max-age;
+        everything else is always fetched from the API backend.
+    """
+    for ix, matcher in enumerate(CACHE_SPECIFIC):
+        if matcher.match('/' + path):
+            match = MAX_AGE.search(SPECIFIED.get(ix, ''))
+            if match is None:
+                return 0
+
+            return int(match.group(1))
+
+    return 0
+
+def is_cacheable_response(upstream_resp):
+    """ only cache successful responses """
+    data, status_code = upstream_resp
+    return 200 <= status_code < 300
+
+@app.route('/v1/gateway/stats', methods=['GET'])
+@crossdomain(origin='*')
+def gateway_stats():
+    return jsonify(response_cache.get_stats())
 
 @app.route('/<path:path>', methods=['GET'])
 @crossdomain(origin='*')
@@ -134,16 +188,22 @@ def catch_all_get(path):
     API_URL = BASE_API_URL + '/' + path
     params = dict(request.args)
 
-    inner_resp = forwarded_get(API_URL, params = params)
-    resp = make_response(inner_resp)
+    # serve the responses of the paths in CACHE_SPECIFIC from the cache for as
+    # long as we tell clients to cache them.  Concurrent misses for the same
+    # request share one upstream call.
+    cache_control_header = get_cache_control(path)
+    cache_key = (path, tuple(sorted((k, tuple(v)) for (k, v) in request.args.lists())))
 
-    for ix, matcher in enumerate(CACHE_SPECIFIC):
-        if matcher.match('/' + path):
-            if ix in SPECIFIED:
-                resp.headers['Cache-Control'] = SPECIFIED[ix]
-            return resp
+    data, status_code = response_cache.get(
+        cache_key, get_cache_ttl(path),
+        lambda: upstream_get(API_URL, params = params),
+        cacheable = is_cacheable_response)
+
+    resp = make_response(jsonify(data), status_code)
+
+    if cache_control_header is not None:
+        resp.headers['Cache-Control'] = cache_control_header
 
-    resp.headers['Cache-Control'] = 'public, max-age={:d}'.format(30*60)
     return resp
 
 @app.route('/<path:path>', methods=['POST'])
@@ -1550,6 +1550,11 @@ class BlockstackdRPC(SimpleXMLRPCServer):
         zonefile_dir = conf.get("zonefiles", None)
         saved = []
 
+        to_store = []               # zone files to store, in order
+        to_store_hashes = []        # corresponding zone file hashes
+        min_block_heights = {}      # map zone file hash to the minimum block height at which it occurs
+        zonefile_infos = {}         # map zone file hash to (name, txid, data), for pushing to other peers
+
         for zonefile_data in zonefile_datas:
 
             # decode
@@ -1557,12 +1562,12 @@ class BlockstackdRPC(SimpleXMLRPCServer):
                 zonefile_data = base64.b64decode( zonefile_data )
             except:
                 log.debug("Invalid base64 zonefile")
-                saved.append(0)
+                to_store_hashes.append(None)
                 continue
 
             if len(zonefile_data) > RPC_MAX_ZONEFILE_LEN:
                 log.debug("Zonefile too long")
-                saved.append(0)
+                to_store_hashes.append(None)
                 continue
             
             # is this zone file already discovered?
@@ -1571,34 +1576,54 @@ class BlockstackdRPC(SimpleXMLRPCServer):
             if not zfinfos:
                 # nope
                 log.debug("Unknown zonefile hash {}".format(zonefile_hash))
-                saved.append(0)
+                to_store_hashes.append(None)
                 continue
+
+            to_store.append(str(zonefile_data))
+            to_store_hashes.append(zonefile_hash)
+            min_block_heights[zonefile_hash] = min([zfi['block_height'] for zfi in zfinfos])
+            zonefile_infos[zonefile_hash] = (zfinfos[0]['name'], zfinfos[0]['txid'], str(zonefile_data))
             
-            # keep this zone file
-            rc = store_atlas_zonefile_data( str(zonefile_data), zonefile_dir )
+        # keep these zone files
+        stored_hashes = store_atlas_zonefiles_data( to_store, zonefile_dir )
+
+        # mark them as present in one go, so we don't ask anyone else for them
+        new_hashes = atlasdb_set_zonefiles_present(stored_hashes, True, path=conf['atlasdb_path'])
+
+        if self.subdomain_index and len(new_hashes) > 0:
+            # got new zonefiles
+            # let the subdomain indexer know, along with giving it the minimum block heights
+            log.debug("Enqueue {} zone files for subdomain processing".format(len(new_hashes)))
+            self.subdomain_index.enqueue_zonefiles([(zonefile_hash, min_block_heights[zonefile_hash]) for zonefile_hash in new_hashes])
+
+        # send new zone files along to peers who don't have them.
+        # don't hold up the caller if the push queue is full; just drop them.
+        for zonefile_hash in new_hashes:
+            if not ATLAS_ZONEFILE_PUSH:
+                break
+
+            name, txid, zonefile_data = zonefile_infos[zonefile_hash]
+            rc = atlas_zonefile_push_enqueue(zonefile_hash, name, txid, zonefile_data, timeout=0, path=conf['atlasdb_path'])
             if not rc:
+                # peers will still find it in our inventory and fetch it
+                log.error("Failed to enqueue {} for pushing to peers".format(zonefile_hash))
+
+        for zonefile_hash in to_store_hashes:
+            if zonefile_hash is None:
+                saved.append(0)
+
+            elif zonefile_hash not in stored_hashes:
                 log.error("Failed to store zonefile {}".format(zonefile_hash))
                 saved.append(0)
-                continue
-             
-            # mark this zone file as present, so we don't ask anyone else for it
-            was_present = atlasdb_set_zonefile_present(zonefile_hash, True, path=conf['atlasdb_path'])
-            if was_present:
+
+            elif zonefile_hash not in new_hashes:
                 # we already got this zone file
                 log.debug("Already have zonefile {}".format(zonefile_hash))
                 saved.append(1)
-                continue
-
-            if self.subdomain_index:
-                # got new zonefile
-                # let the subdomain indexer know, along with giving it the minimum block height
-                min_block_height = min([zfi['block_height'] for zfi in zfinfos])
-
-                log.debug("Enqueue {} from {} for subdomain processing".format(zonefile_hash, min_block_height))
-                self.subdomain_index.enqueue_zonefile(zonefile_hash, min_block_height)
 
-            log.debug("Stored new zonefile {}".format(zonefile_hash))
-            saved.append(1)
+            else:
+                log.debug("Stored new zonefile {}".format(zonefile_hash))
+                saved.append(1)
 
         log.debug("Saved {} zonefile(s)".format(sum(saved)))
         log.debug("Reply: {}".format({'saved': saved}))
@@ -2107,7 +2132,7 @@ def index_blockchain(server_state, expected_snapshots=GENESIS_SNAPSHOT):
         if subdomain_last_block < SUBDOMAINS_FIRST_BLOCK and start_block >= SUBDOMAINS_FIRST_BLOCK and not server_state['subdomains_initialized']:
             # initialize subdomains db
             log.debug("Creating subdomain DB {}".format(blockstack_opts['subdomaindb_path']))
-            server_state['subdomains'].reindex(current_block)
+            server_state['subdomains'].reindex(current_block, worker_pool=server_state['subdomains'].worker_pool)
             server_state['subdomains_initialized'] = True
 
     # bring the db up to the chain tip.
@@ -2165,9 +2190,6 @@ def server_setup(working_dir, port=None):
     # put pid file
     put_pidfile(pid_file, os.getpid())
 
-    # start GC
-    gc_start()
-
     # clear indexing state
     set_indexing(working_dir, False)
 
@@ -2178,8 +2200,12 @@ def server_setup(working_dir, port=None):
     atlas_state = atlas_init(blockstack_opts, db, port=port)
     db.close()
 
-    # set up subdomains state
+    # set up subdomains state.
+    # do this before starting any threads, since it forks its worker processes
     subdomain_state = subdomains_init(blockstack_opts, working_dir, atlas_state)
+
+    # start GC
+    gc_start()
     
     # start atlas node
     if atlas_state:
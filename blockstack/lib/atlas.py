@@ -33,12 +33,15 @@ import hashlib
 import errno
 import socket
 import gc
+import json
+import Queue
 
 import virtualchain
 from nameset.virtualchain_hooks import get_last_block, get_snapshots, get_valid_transaction_window
 
 from .util import url_to_host_port, atlas_inventory_to_string, db_query_execute, db_format_query
 from .storage.auth import get_zonefile_data_hash
+from .queue import queuedb_append, queuedb_count, queuedb_findall, queuedb_removeall
 
 from .client import \
         BlockstackRPCClient, \
@@ -85,6 +88,16 @@ NUM_ZONEFILES = 0      # cache-coherent count of the number of zonefiles present
 ZONEFILE_INV_LOCK = threading.Lock()    # lock to guard the above
 
 MAX_QUEUED_ZONEFILES = 1000     # maximum number of queued zonefiles
+ZONEFILE_PUSH_QUEUE_COND = threading.Condition()    # guards adding to the push queue; notified when zonefiles leave it
+
+PEER_PUSH_ZONEFILE_BATCH_SIZE = 5       # maximum number of zonefiles to send in one put_zonefiles call (the most a peer will accept)
+PEER_PUSH_ZONEFILE_SCAN_SIZE = 100      # maximum number of queued zonefiles to consider in one push pass
+PEER_PUSH_ZONEFILE_CONCURRENCY = 8      # maximum number of peers to push to at once
+PEER_PUSH_ZONEFILE_PEER_INTERVAL = 10   # minimum amount of time (seconds) that must pass between two pushes to the same peer
+
+ATLAS_ZONEFILE_PUSH = True      # whether or not to push new zonefiles to peers that lack them
+if os.environ.get("BLOCKSTACK_ATLAS_ZONEFILE_PUSH") == "0":
+    ATLAS_ZONEFILE_PUSH = False
 
 if os.environ.get("BLOCKSTACK_ATLAS_PEER_LIFETIME") is not None:
     PEER_LIFETIME_INTERVAL = int(os.environ.get("BLOCKSTACK_ATLAS_PEER_LIFETIME"))
@@ -103,6 +116,7 @@ if BLOCKSTACK_TEST:
     PEER_HEALTH_NEIGHBOR_WORK_INTERVAL = 1
     PEER_CRAWL_ZONEFILE_WORK_INTERVAL = 1
     PEER_PUSH_ZONEFILE_WORK_INTERVAL = 1
+    PEER_PUSH_ZONEFILE_PEER_INTERVAL = 1
 
 ATLAS_TEST = False
 if BLOCKSTACK_TEST and os.environ.get("BLOCKSTACK_ATLAS_NETWORK_SIMULATION", None) == "1" and os.environ.get("BLOCKSTACK_ATLAS_NETWORK_SIMULATION_PEER", None) == "1":
@@ -242,13 +256,11 @@ PEER_TABLE = {}        # map peer host:port (NOT url) to peer information
                        # (note that we allow for the possibility of duplicate zonefiles, but this is a rare occurance and we keep track of it in the DB to avoid duplicate transfers)
 
 PEER_QUEUE = []        # list of peers (host:port) to begin talking to, discovered via the Atlas RPC interface
-ZONEFILE_QUEUE = []    # list of {zonefile_hash: zonefile} dicts to push out to other Atlas nodes (i.e. received from clients)
 
 PEER_TABLE_LOCK = threading.Lock()
 PEER_QUEUE_LOCK = threading.Lock()
 PEER_TABLE_LOCK_HOLDER = None
 PEER_TABLE_LOCK_TRACEBACK = None
-ZONEFILE_QUEUE_LOCK = threading.Lock()
 DB_LOCK = threading.Lock()
 
 class AtlasPeerTableLocked(object):
@@ -297,29 +309,6 @@ class AtlasPeerQueueLocked(object):
             return False
 
 
-class AtlasZonefileQueueLocked(object):
-    """
-    context manager for the global atlas zone file queue
-    """
-    def __init__(self, given_zonefile_queue=None):
-        self.given_zonefile_queue = given_zonefile_queue
-
-    def __enter__(self):
-        if self.given_zonefile_queue is not None:
-            return self.given_zonefile_queue
-
-        else:
-            return atlas_zonefile_queue_lock()
-
-    def __exit__(self, ex_type, ex_value, ex_traceback):
-        if self.given_zonefile_queue is not None:
-            return False
-
-        else:
-            atlas_zonefile_queue_unlock()
-            return False
-
-
 class AtlasDBOpen(object):
     """
     context manager for opening the atlas database
@@ -422,24 +411,6 @@ def atlas_peer_queue_unlock():
     PEER_QUEUE_LOCK.release()
 
 
-def atlas_zonefile_queue_lock():
-    """
-    Lock the global zonefile queue
-    return the queue
-    """
-    global ZONEFILE_QUEUE_LOCK
-    ZONEFILE_QUEUE_LOCK.acquire()
-    return ZONEFILE_QUEUE
-
-
-def atlas_zonefile_queue_unlock():
-    """
-    Unlock the global zonefile queue
-    """
-    global ZONEFILE_QUEUE_LOCK
-    ZONEFILE_QUEUE_LOCK.release()
-
-
 def atlas_max_new_peers( max_neighbors ):
     """
     Maximum size of the new peers list
@@ -872,6 +843,62 @@ def atlasdb_set_zonefile_present( zonefile_hash, present, con=None, path=None ):
     return was_present
 
 
+def atlasdb_set_zonefiles_present( zonefile_hashes, present, con=None, path=None ):
+    """
+    Mark a batch of zonefiles as present (i.e. we stored them).
+    Does all of the updates in a single transaction, and
+    keeps our in-RAM zonefile inventory coherent.
+
+    Returns the list of zonefile hashes in @zonefile_hashes that
+    were *not* already present (i.e. the ones that are new to us).
+    """
+    global ZONEFILE_INV, ZONEFILE_INV_LOCK
+
+    if len(zonefile_hashes) == 0:
+        return []
+
+    newly_present = []
+    with AtlasDBOpen(con=con, path=path) as dbcon:
+        if present:
+            present = 1
+        else:
+            present = 0
+
+        sql = "UPDATE zonefiles SET present = ? WHERE zonefile_hash = ?;"
+
+        cur = dbcon.cursor()
+        atlasdb_query_execute( cur, 'BEGIN', () )
+
+        for zonefile_hash in zonefile_hashes:
+            args = (present, zonefile_hash)
+            atlasdb_query_execute( cur, sql, args )
+
+        atlasdb_query_execute( cur, 'END', () )
+        dbcon.commit()
+
+        with ZONEFILE_INV_LOCK:
+            inv_vec = None
+            if ZONEFILE_INV is None:
+                inv_vec = ""
+            else:
+                inv_vec = ZONEFILE_INV[:]
+
+            for zonefile_hash in zonefile_hashes:
+                zfbits = atlasdb_get_zonefile_bits( zonefile_hash, con=dbcon, path=path )
+
+                # did we know about this?
+                was_present = atlas_inventory_test_zonefile_bits( inv_vec, zfbits )
+                if not was_present and zonefile_hash not in newly_present:
+                    newly_present.append(zonefile_hash)
+
+                # keep our inventory vector coherent.
+                inv_vec = atlas_inventory_flip_zonefile_bits( inv_vec, zfbits, present )
+
+            ZONEFILE_INV = inv_vec
+
+    return newly_present
+
+
 def atlasdb_set_zonefile_tried_storage( zonefile_hash, tried_storage, con=None, path=None ):
     """
     Make a note that we tried to get the zonefile from storage
@@ -2522,83 +2549,137 @@ def atlas_zonefile_find_push_peers( zonefile_hash, peer_table=None, zonefile_bit
         for peer_hostport in ptbl.keys():
             zonefile_inv = atlas_peer_get_zonefile_inventory( peer_hostport, peer_table=ptbl )
             res = atlas_inventory_test_zonefile_bits( zonefile_inv, zonefile_bits )
-            if res:
+            if not res:
                 push_peers.append( peer_hostport )
 
     return push_peers
 
 
-def atlas_zonefile_push_enqueue( zonefile_hash, name, txid, zonefile_data, zonefile_queue=None, con=None, path=None ):
+def atlas_zonefile_push_queue_path( atlasdb_path ):
+    """
+    Get the path to the persistent queue of zonefiles to push to other peers
+    """
+    return atlasdb_path + '.queue'
+
+
+def atlas_zonefile_push_enqueue( zonefile_hash, name, txid, zonefile_data, timeout=0, con=None, path=None ):
     """
-    Enqueue the given zonefile into our "push" queue,
+    Enqueue the given zonefile into our persistent "push" queue,
     from which it will be replicated to storage and sent
     out to other peers who don't have it.
 
+    The queue holds at most MAX_QUEUED_ZONEFILES zonefiles.  If it is full,
+    wait up to @timeout seconds for the pusher to make room.
+
     Return True if we enqueued it
     Return False if not
     """
-    res = False
+    assert path, 'Need atlasdb path'
 
     bits = atlasdb_get_zonefile_bits( zonefile_hash, path=path, con=con )
     if len(bits) == 0:
         # invalid hash
-        return
+        return False
 
-    with AtlasZonefileQueueLocked(zonefile_queue) as zfq:
+    queue_path = atlas_zonefile_push_queue_path(path)
+    deadline = time_now() + timeout
 
-        if len(zfq) < MAX_QUEUED_ZONEFILES: 
-            zfdata = {
-                'zonefile_hash': zonefile_hash,
-                'zonefile': zonefile_data,
-                'name': name,
-                'txid': txid
-            }
+    with ZONEFILE_PUSH_QUEUE_COND:
+        if len(queuedb_findall(queue_path, 'push', name=zonefile_hash, limit=1)) > 0:
+            # already queued
+            return True
 
-            zfq.append( zfdata )
-            res = True
-    
-    return res
+        while queuedb_count(queue_path, 'push') >= MAX_QUEUED_ZONEFILES:
+            remaining = deadline - time_now()
+            if remaining <= 0:
+                log.warning("Zonefile push queue is full; not enqueueing {}".format(zonefile_hash))
+                return False
 
+            ZONEFILE_PUSH_QUEUE_COND.wait(remaining)
 
-def atlas_zonefile_push_dequeue( zonefile_queue=None ):
+        zfdata = {
+            'zonefile_hash': zonefile_hash,
+            'zonefile': base64.b64encode(zonefile_data),
+            'name': name,
+            'txid': txid,
+            'queued_at': time_now(),
+        }
+
+        queuedb_append(queue_path, 'push', zonefile_hash, json.dumps(zfdata))
+
+    return True
+
+
+def atlas_zonefile_push_queued( max_count=None, path=None ):
     """
-    Dequeue a zonefile's information to replicate
-    Return None if there are none queued
+    Get the oldest zonefiles in the push queue, in the order they were queued.
+    Each zonefile's information is returned as a dict with 'zonefile_hash', 'zonefile', 'name', 'txid', and 'queued_at'.
+    Return the list of zonefile infos (empty if none are queued)
     """
-    ret = None
-    with AtlasZonefileQueueLocked(zonefile_queue) as zfq:
-        if len(zfq) > 0:
-            ret = zfq.pop(0)
+    assert path, 'Need atlasdb path'
+
+    queue_path = atlas_zonefile_push_queue_path(path)
+    ret = []
+
+    rows = queuedb_findall(queue_path, 'push', limit=max_count)
+    for row in rows:
+        zfinfo = json.loads(row['data'])
+        zfinfo['zonefile'] = base64.b64decode(zfinfo['zonefile'])
+        ret.append(zfinfo)
 
     return ret
 
 
-def atlas_zonefile_push( my_hostport, peer_hostport, zonefile_data, timeout=None, peer_table=None ):
+def atlas_zonefile_push_dequeue( zonefile_hashes, path=None ):
     """
-    Push the given zonefile to the given peer
-    Return True on success
-    Return False on failure
+    Remove the given zonefiles from the push queue
+    """
+    assert path, 'Need atlasdb path'
+
+    queue_path = atlas_zonefile_push_queue_path(path)
+    with ZONEFILE_PUSH_QUEUE_COND:
+        queuedb_removeall(queue_path, [{'queue_id': 'push', 'name': zfhash} for zfhash in zonefile_hashes])
+        ZONEFILE_PUSH_QUEUE_COND.notify_all()
+
+    return True
+
+
+def atlas_zonefile_push_queue_size( path=None ):
+    """
+    How many zonefiles are waiting to be pushed?
+    """
+    assert path, 'Need atlasdb path'
+    return queuedb_count(atlas_zonefile_push_queue_path(path), 'push')
+
+
+def atlas_zonefiles_push( my_hostport, peer_hostport, zonefile_datas, timeout=None, peer_table=None ):
+    """
+    Push the given zonefiles to the given peer in a single put_zonefiles call.
+    Return the list of zonefile hashes the peer saved (empty on failure)
     """
     if timeout is None:
         timeout = atlas_push_zonefiles_timeout()
    
-    zonefile_hash = get_zonefile_data_hash(zonefile_data)
-    zonefile_data_b64 = base64.b64encode( zonefile_data )
+    zonefile_hashes = [get_zonefile_data_hash(zonefile_data) for zonefile_data in zonefile_datas]
+    zonefile_datas_b64 = [base64.b64encode( zonefile_data ) for zonefile_data in zonefile_datas]
 
     host, port = url_to_host_port( peer_hostport )
     RPC = get_rpc_client_class()
     rpc = RPC( host, port, timeout=timeout, src=my_hostport )
 
     status = False
+    saved = []
 
     assert not atlas_peer_table_is_locked_by_me()
 
     try:
-        push_info = blockstack_put_zonefiles( peer_hostport, [zonefile_data_b64], timeout=timeout, my_hostport=my_hostport, proxy=rpc )
+        push_info = blockstack_put_zonefiles( peer_hostport, zonefile_datas_b64, timeout=timeout, my_hostport=my_hostport, proxy=rpc )
         if 'error' not in push_info:
-            if push_info['saved'] == 1:
-                # woo!
-                saved = True
+            status = True
+            for (zfhash, was_saved) in zip(zonefile_hashes, push_info['saved']):
+                if was_saved == 1:
+                    # woo!
+                    saved.append(zfhash)
 
     except (socket.timeout, socket.gaierror, socket.herror, socket.error), se:
         atlas_log_socket_error( "put_zonefiles(%s)" % peer_hostport, peer_hostport, se)
@@ -2609,12 +2690,22 @@ def atlas_zonefile_push( my_hostport, peer_hostport, zonefile_data, timeout=None
 
     except Exception, e:
         log.exception(e)
-        log.error("Failed to push zonefile %s to %s" % (zonefile_hash, peer_hostport))
+        log.error("Failed to push zonefiles %s to %s" % (",".join(zonefile_hashes), peer_hostport))
 
     with AtlasPeerTableLocked(peer_table) as ptbl:
         atlas_peer_update_health( peer_hostport, status, peer_table=ptbl )
 
-    return status
+    return saved
+
+
+def atlas_zonefile_push( my_hostport, peer_hostport, zonefile_data, timeout=None, peer_table=None ):
+    """
+    Push the given zonefile to the given peer
+    Return True on success
+    Return False on failure
+    """
+    saved = atlas_zonefiles_push( my_hostport, peer_hostport, [zonefile_data], timeout=timeout, peer_table=peer_table )
+    return len(saved) > 0
     
 
 class AtlasPeerCrawler( threading.Thread ):
@@ -3218,67 +3309,99 @@ class AtlasZonefileCrawler( threading.Thread ):
         self.zonefile_dir = zonefile_dir
         self.last_storage_reset = time_now()
         self.atlasdb_path = path
+        self.store_zonefile_cb = None
+        self.store_zonefiles_cb = None
+
+        # catch-up throughput statistics
+        self.num_stored = 0
+        self.store_time = 0.0
         
     def set_store_zonefile_callback(self, cb):
         self.store_zonefile_cb = cb
 
 
-    def set_zonefile_present(self, zfhash, block_height, con=None, path=None):
+    def set_store_zonefiles_callback(self, cb):
         """
-        Set a zonefile as present, and if it was previously absent, inform the storage listener
+        Set the batch version of the store-zonefile callback.
+        @cb takes a list of (zonefile hash, block height) pairs.
         """
-        was_present = atlasdb_set_zonefile_present( zfhash, True, con=con, path=path )
+        self.store_zonefiles_cb = cb
 
-        # tell anyone who cares that we got this zone file, if it was new 
-        if not was_present and self.store_zonefile_cb:
-            self.store_zonefile_cb(zfhash, block_height)
 
-
-    def store_zonefile_data( self, fetched_zfhash, zonefile_data, min_block_height, peer_hostport, con, path ):
+    def set_zonefiles_present(self, zfhashes, block_heights, con=None, path=None):
         """
-        Store the fetched zonefile (as a serialized string) to storage and cache it locally.
-        Update internal state to mark it present
-        Return True on success
-        Return False on error
+        Set a batch of zonefiles as present in one atlas db transaction.
+        For the ones that were previously absent, inform the storage listener.
+        @block_heights maps each zonefile hash to its minimum block height.
         """
-        rc = add_atlas_zonefile_data( zonefile_data, self.zonefile_dir )
-        if not rc:
-            log.error("%s: Failed to store zonefile %s" % (self.hostport, fetched_zfhash))
+        new_zfhashes = atlasdb_set_zonefiles_present( zfhashes, True, con=con, path=path )
+        if len(new_zfhashes) == 0:
+            return
 
-        else:
-            # stored! remember it
-            log.debug("%s: got %s from %s" % (self.hostport, fetched_zfhash, peer_hostport))
-
-            # update internal state
-            self.set_zonefile_present(fetched_zfhash, min_block_height, con=con, path=path)
+        # tell anyone who cares that we got these zone files
+        if self.store_zonefiles_cb:
+            self.store_zonefiles_cb([(zfhash, block_heights[zfhash]) for zfhash in new_zfhashes])
 
-        return rc
+        elif self.store_zonefile_cb:
+            for zfhash in new_zfhashes:
+                self.store_zonefile_cb(zfhash, block_heights[zfhash])
 
 
     def store_zonefiles( self, zonefile_names, zonefiles, zonefile_txids, zonefile_block_heights, peer_zonefile_hashes, peer_hostport, path, con=None ):
         """
-        Store a list of RPC-fetched zonefiles (but only ones in peer_zonefile_hashes) from the given peer_hostport
+        Store a list of RPC-fetched zonefiles (but only ones in peer_zonefile_hashes) from the given peer_hostport.
+        The zone files are written and synced as a group, and then marked present
+        (and handed to the storage listener) as a single batch.
         Return the list of zonefile hashes stored.
         """
         ret = []
+        zonefile_datas = []
 
-        with AtlasDBOpen(con=con, path=path) as dbcon:
+        t1 = time_now()
+        for fetched_zfhash, zonefile_txt in zonefiles.items():
+           
+            if fetched_zfhash not in peer_zonefile_hashes or fetched_zfhash not in zonefile_block_heights:
+                # unsolicited
+                log.warn("%s: Unsolicited zonefile %s" % (self.hostport, fetched_zfhash))
+                continue
 
-            for fetched_zfhash, zonefile_txt in zonefiles.items():
-               
-                if fetched_zfhash not in peer_zonefile_hashes or fetched_zfhash not in zonefile_block_heights:
-                    # unsolicited
-                    log.warn("%s: Unsolicited zonefile %s" % (self.hostport, fetched_zfhash))
-                    continue
+            zonefile_datas.append( zonefile_txt )
+
+        if len(zonefile_datas) == 0:
+            return ret
+
+        stored_zfhashes = store_atlas_zonefiles_data( zonefile_datas, self.zonefile_dir )
+        for fetched_zfhash in zonefiles.keys():
+            if fetched_zfhash in stored_zfhashes:
+                log.debug("%s: got %s from %s" % (self.hostport, fetched_zfhash, peer_hostport))
+
+                # don't ask for it again
+                ret.append( fetched_zfhash )
 
-                rc = self.store_zonefile_data( fetched_zfhash, zonefile_txt, min(zonefile_block_heights[fetched_zfhash]), peer_hostport, dbcon, path )
-                if rc:
-                    # don't ask for it again
-                    ret.append( fetched_zfhash )
+            elif fetched_zfhash in zonefile_block_heights:
+                log.error("%s: Failed to store zonefile %s" % (self.hostport, fetched_zfhash))
+
+        # update internal state
+        min_block_heights = dict([(zfhash, min(zonefile_block_heights[zfhash])) for zfhash in ret])
+        self.set_zonefiles_present( ret, min_block_heights, con=con, path=path )
+
+        t2 = time_now()
+        self.num_stored += len(ret)
+        self.store_time += t2 - t1
 
         return ret
 
 
+    def get_store_rate(self):
+        """
+        Get the average number of zonefiles stored per second of storage time
+        """
+        if self.store_time <= 0:
+            return 0.0
+
+        return self.num_stored / self.store_time
+
+
     def find_zonefile_origins( self, missing_zfinfo, peer_hostports ):
         """
         Find out which peers can serve which zonefiles
@@ -3336,6 +3459,7 @@ class AtlasZonefileCrawler( threading.Thread ):
         zonefile_origins = self.find_zonefile_origins( missing_zfinfo, peer_hostports )
 
         # filter out the ones that are already cached
+        cached_zfhashes = []
         for i in xrange(0, len(zonefile_hashes)):
             # is this zonefile already cached?
             zfhash = zonefile_hashes[i]
@@ -3343,14 +3467,18 @@ class AtlasZonefileCrawler( threading.Thread ):
             if present:
                 log.debug("%s: zonefile %s already cached.  Marking present" % (self.hostport, zfhash))
                 zonefile_hashes[i] = None
+                cached_zfhashes.append(zfhash)
 
-                # mark it as present
-                self.set_zonefile_present(zfhash, min(zonefile_block_heights[zfhash]), path=path)
+        # mark them as present
+        if len(cached_zfhashes) > 0:
+            self.set_zonefiles_present(cached_zfhashes, dict([(zfh, min(zonefile_block_heights[zfh])) for zfh in cached_zfhashes]), path=path)
 
         zonefile_hashes = filter( lambda zfh: zfh is not None, zonefile_hashes )
 
         if len(zonefile_hashes) > 0:
             log.debug("%s: missing %s unique zonefiles" % (self.hostport, len(zonefile_hashes)))
+
+        t_start = time_now()
         
         while len(zonefile_hashes) > 0 and self.running:
 
@@ -3421,7 +3549,9 @@ class AtlasZonefileCrawler( threading.Thread ):
                 zonefile_hashes.remove(zfhash)
 
         if len(zonefile_hashes) > 0 or num_fetched > 0:
-            log.debug("%s: fetched %s zonefiles" % (self.hostport, num_fetched))
+            t_end = time_now()
+            rate = num_fetched / (t_end - t_start) if t_end > t_start else 0.0
+            log.debug("%s: fetched %s zonefiles (%.2f zonefiles/sec; %.2f zonefiles/sec stored overall)" % (self.hostport, num_fetched, rate, self.get_store_rate()))
 
         return num_fetched
 
@@ -3456,11 +3586,16 @@ class AtlasZonefileCrawler( threading.Thread ):
 
 class AtlasZonefilePusher(threading.Thread):
     """
-    Continuously drain the queue of zonefiles
+    Continuously drain the persistent queue of zonefiles
     we can push, by sending them off to 
     known peers who need them.
 
-    CURRENTLY DEACTIVATED
+    Each pass sends each peer at most one batch of up to
+    PEER_PUSH_ZONEFILE_BATCH_SIZE zonefiles, and pushes to up to
+    PEER_PUSH_ZONEFILE_CONCURRENCY peers at once.  A peer is sent
+    at most one batch every PEER_PUSH_ZONEFILE_PEER_INTERVAL seconds.
+    A zonefile stays queued (across restarts) until every peer that
+    needed it has been sent it.
     """
     def __init__(self, host, port, path, zonefile_dir):
         threading.Thread.__init__(self)
@@ -3470,12 +3605,137 @@ class AtlasZonefilePusher(threading.Thread):
         self.hostport = "%s:%s" % (host, port)
         self.atlasdb_path = path
         self.push_timeout = None
+        self.running = False
 
+        self.push_state = {}    # map zonefile hash to {'bits': [...], 'tried': set([peers sent it]), 'peers': [peers that still need it, as of the last pass]}
+        self.last_push = {}     # map peer hostport to the last time we pushed to it
 
-    def step( self, peer_table=None, zonefile_queue=None, path=None ):
+        # propagation latency statistics
+        self.num_propagated = 0
+        self.total_propagation_time = 0.0
+        self.max_propagation_time = 0.0
+
+
+    def find_push_work( self, zfinfos, peer_table=None, path=None ):
+        """
+        Figure out which queued zonefiles each peer needs.
+        The peers are taken from the current peer table on each pass, so
+        peers that join after a zonefile was queued get it too.
+        Zonefiles we have not seen before are stored locally first.
+        Return {'peers': {peer hostport: [zfinfo]}, 'done': [zonefile hashes that need no more pushing]}
+        """
+        peer_work = {}
+        done = []
+        pending = []
+
+        for zfinfo in zfinfos:
+            zfhash = zfinfo['zonefile_hash']
+
+            if zfhash not in self.push_state:
+                zfbits = atlasdb_get_zonefile_bits( zfhash, path=path )
+                if len(zfbits) == 0:
+                    # not recognized 
+                    done.append(zfhash)
+                    continue
+
+                # it's a valid zonefile.  store it.
+                rc = add_atlas_zonefile_data( str(zfinfo['zonefile']), self.zonefile_dir )
+                if not rc:
+                    log.error("Failed to replicate zonefile %s to external storage" % zfhash)
+
+                self.push_state[zfhash] = {'bits': zfbits, 'tried': set()}
+
+            pending.append(zfinfo)
+
+        # see if we can send these somewhere
+        with AtlasPeerTableLocked(peer_table) as ptbl:
+            for zfinfo in pending:
+                zfhash = zfinfo['zonefile_hash']
+                zfstate = self.push_state[zfhash]
+                zfstate['peers'] = [peer_hostport for peer_hostport in atlas_zonefile_find_push_peers( zfhash, peer_table=ptbl, zonefile_bits=zfstate['bits'] ) \
+                                    if peer_hostport not in zfstate['tried']]
+
+        for zfinfo in pending:
+            zfhash = zfinfo['zonefile_hash']
+            peers = self.push_state[zfhash]['peers']
+            if len(peers) == 0:
+                # everyone has it, or has been sent it
+                log.debug("%s: All peers have zonefile %s" % (self.hostport, zfhash))
+                done.append(zfhash)
+                continue
+
+            for peer_hostport in peers:
+                if peer_hostport not in peer_work:
+                    peer_work[peer_hostport] = []
+
+                peer_work[peer_hostport].append(zfinfo)
+
+        return {'peers': peer_work, 'done': done}
+
+
+    def push_batches( self, batches, peer_table=None ):
+        """
+        Send each (peer hostport, [zfinfo]) batch to its peer, concurrently.
+        Return a dict mapping each peer hostport to the list of zonefile hashes it saved
+        """
+        work = Queue.Queue()
+        results = {}
+        results_lock = threading.Lock()
+
+        for (peer_hostport, zfinfos) in batches:
+            work.put((peer_hostport, zfinfos))
+
+        def _push_worker():
+            while True:
+                try:
+                    peer_hostport, zfinfos = work.get_nowait()
+                except Queue.Empty:
+                    return
+
+                log.debug("%s: Push %s zonefile(s) to %s" % (self.hostport, len(zfinfos), peer_hostport))
+                saved = atlas_zonefiles_push( self.hostport, peer_hostport, [str(zfinfo['zonefile']) for zfinfo in zfinfos], timeout=self.push_timeout, peer_table=peer_table )
+
+                with results_lock:
+                    results[peer_hostport] = saved
+
+        workers = [threading.Thread(target=_push_worker) for _ in xrange(0, min(PEER_PUSH_ZONEFILE_CONCURRENCY, len(batches)))]
+        for w in workers:
+            w.start()
+
+        for w in workers:
+            w.join()
+
+        return results
+
+
+    def record_propagation( self, zfinfo ):
+        """
+        Remember how long it took to propagate a zonefile to all peers that needed it
+        """
+        latency = max(0.0, time_now() - zfinfo.get('queued_at', time_now()))
+        self.num_propagated += 1
+        self.total_propagation_time += latency
+        self.max_propagation_time = max(self.max_propagation_time, latency)
+
+        log.debug("%s: propagated zonefile %s in %.3f seconds" % (self.hostport, zfinfo['zonefile_hash'], latency))
+
+
+    def get_propagation_stats( self ):
+        """
+        Get zonefile propagation latency statistics
+        """
+        avg = 0.0
+        if self.num_propagated > 0:
+            avg = self.total_propagation_time / self.num_propagated
+
+        return {'count': self.num_propagated, 'avg': avg, 'max': self.max_propagation_time}
+
+
+    def step( self, peer_table=None, path=None ):
         """
         Run one step of this algorithm.
-        Push the zonefile to all the peers that need it.
+        Push the queued zonefiles to all the peers that need them,
+        subject to the per-peer rate limit.
         Return the number of peers we sent to
         """
         if path is None:
@@ -3487,44 +3747,52 @@ class AtlasZonefilePusher(threading.Thread):
         if self.push_timeout is None:
             self.push_timeout = atlas_push_zonefiles_timeout()
 
-        zfinfo = atlas_zonefile_push_dequeue( zonefile_queue=zonefile_queue )
-        if zfinfo is None:
+        zfinfos = atlas_zonefile_push_queued( max_count=PEER_PUSH_ZONEFILE_SCAN_SIZE, path=path )
+        if len(zfinfos) == 0:
             return 0
 
-        zfhash = zfinfo['zonefile_hash']
-        zfdata_txt = zfinfo['zonefile']
-        name = zfinfo['name']
-        txid = zfinfo['txid']
+        res = self.find_push_work( zfinfos, peer_table=peer_table, path=path )
+        peer_work = res['peers']
+        done = res['done']
 
-        zfbits = atlasdb_get_zonefile_bits( zfhash, path=path )
-        if len(zfbits) == 0:
-            # not recognized 
-            return 0
+        # only push to peers we haven't pushed to recently
+        now = time_now()
+        batches = []
+        for peer_hostport in peer_work.keys():
+            if self.last_push.get(peer_hostport, 0) + PEER_PUSH_ZONEFILE_PEER_INTERVAL > now:
+                continue
 
-        # it's a valid zonefile.  store it.
-        rc = add_atlas_zonefile_data( str(zfdata_txt), self.zonefile_dir )
-        if not rc:
-            log.error("Failed to replicate zonefile %s to external storage" % zonefile_hash)
+            batches.append((peer_hostport, peer_work[peer_hostport][:PEER_PUSH_ZONEFILE_BATCH_SIZE]))
 
-        peers = None
-        
-        # see if we can send this somewhere
-        with AtlasPeerTableLocked(peer_table) as ptbl:
-            peers = atlas_zonefile_find_push_peers( zfhash, peer_table=ptbl, zonefile_bits=zfbits )
+        # push it off
+        results = self.push_batches( batches, peer_table=peer_table )
 
-        if len(peers) == 0:
-            # everyone has it
-            log.debug("%s: All peers have zonefile %s" % (self.hostport, zfhash))
-            return 0
+        for (peer_hostport, batch) in batches:
+            self.last_push[peer_hostport] = time_now()
+            saved = results.get(peer_hostport, [])
 
-        # push it off
-        ret = 0
-        for peer in peers:
-            log.debug("%s: Push to %s" % (self.hostport, peer))
-            atlas_zonefile_push( self.hostport, peer, zfdata_txt, timeout=self.push_timeout )
-            ret += 1
+            for zfinfo in batch:
+                zfhash = zfinfo['zonefile_hash']
+                zfstate = self.push_state[zfhash]
 
-        return ret
+                # one attempt per peer
+                zfstate['tried'].add(peer_hostport)
+
+                if zfhash in saved:
+                    atlas_peer_set_zonefile_status( peer_hostport, zfhash, True, zonefile_bits=zfstate['bits'], peer_table=peer_table )
+
+                if len([p for p in zfstate['peers'] if p not in zfstate['tried']]) == 0 and zfhash not in done:
+                    self.record_propagation( zfinfo )
+                    done.append(zfhash)
+
+        done = list(set(done))
+        if len(done) > 0:
+            atlas_zonefile_push_dequeue( done, path=path )
+            for zfhash in done:
+                if zfhash in self.push_state:
+                    del self.push_state[zfhash]
+
+        return len(batches)
 
     
     def run(self):
@@ -3534,10 +3802,15 @@ class AtlasZonefilePusher(threading.Thread):
             num_pushed = self.step( path=self.atlasdb_path )
             t2 = time_now()
             if num_pushed == 0 and t2 - t1 < PEER_PUSH_ZONEFILE_WORK_INTERVAL:
-                
-                deadline = time_now() + PEER_PUSH_ZONEFILE_WORK_INTERVAL - (t2 - t1)
+
+                if atlas_zonefile_push_queue_size( path=self.atlasdb_path ) > 0:
+                    # waiting on the per-peer rate limit
+                    deadline = time_now() + 1.0
+                else:
+                    deadline = time_now() + PEER_PUSH_ZONEFILE_WORK_INTERVAL - (t2 - t1)
+
                 while time_now() < deadline and self.running:
-                    time_sleep( self.my_hostport, self.__class__.__name__, 1.0 )
+                    time_sleep( self.hostport, self.__class__.__name__, 1.0 )
                 
                 if not self.running:
                     break
@@ -3556,7 +3829,13 @@ def atlas_node_init(my_hostname, my_portnum, atlasdb_path, zonefile_dir, working
     atlas_state['peer_crawler'] = AtlasPeerCrawler(my_hostname, my_portnum, atlasdb_path, working_dir)
     atlas_state['health_checker'] = AtlasHealthChecker(my_hostname, my_portnum, atlasdb_path)
     atlas_state['zonefile_crawler'] = AtlasZonefileCrawler(my_hostname, my_portnum, atlasdb_path, zonefile_dir)
-    # atlas_state['zonefile_pusher'] = AtlasZonefilePusher(my_hostname, my_portnum, atlasdb_path, zonefile_dir)
+
+    # The pusher used to be disabled because it never did anything useful:
+    # atlas_zonefile_find_push_peers() picked the peers that already had the
+    # zonefile, atlas_zonefile_push() always reported failure, and nothing
+    # enqueued zonefiles.  Those are fixed, so run it unless told not to.
+    if ATLAS_ZONEFILE_PUSH:
+        atlas_state['zonefile_pusher'] = AtlasZonefilePusher(my_hostname, my_portnum, atlasdb_path, zonefile_dir)
 
     return atlas_state
 
@@ -3576,6 +3855,9 @@ def atlas_node_add_callback(atlas_state, callback_name, callback):
     if callback_name == 'store_zonefile':
         atlas_state['zonefile_crawler'].set_store_zonefile_callback(callback)
 
+    elif callback_name == 'store_zonefiles':
+        atlas_state['zonefile_crawler'].set_store_zonefiles_callback(callback)
+
     else:
         raise ValueError("Unrecognized callback {}".format(callback_name))
 
@@ -1073,6 +1073,7 @@ def default_blockstack_opts( working_dir, config_file=None ):
    atlas_hostname = RPC_SERVER_IP
    atlas_port = RPC_SERVER_PORT
    subdomaindb_path = os.path.join( os.path.dirname(config_file), "subdomains.db" )
+   subdomain_workers = 1
 
    if parser.has_section('blockstack'):
 
@@ -1143,6 +1144,9 @@ def default_blockstack_opts( working_dir, config_file=None ):
       if parser.has_option('blockstack', 'subdomaindb_path'):
          subdomaindb_path = parser.get('blockstack', 'subdomaindb_path')
 
+      if parser.has_option('blockstack', 'subdomain_workers'):
+         subdomain_workers = int(parser.get('blockstack', 'subdomain_workers'))
+
 
    if os.path.exists( announce_path ):
        # load announcement list
@@ -1187,6 +1191,7 @@ def default_blockstack_opts( working_dir, config_file=None ):
        'atlas_port': atlas_port,
        'zonefiles': zonefile_dir,
        'subdomaindb_path': subdomaindb_path,
+       'subdomain_workers': subdomain_workers,
    }
 
    # strip Nones
@@ -108,13 +108,15 @@ def queuedb_findall(path, queue_id, name=None, offset=None, limit=None):
     Return the rows on success (empty list if not found)
     Raise on error
     """
-    sql = "SELECT * FROM queue WHERE queue_id = ? ORDER BY rowid ASC"
+    sql = "SELECT * FROM queue WHERE queue_id = ?"
     args = (queue_id,)
     
     if name:
         sql += ' AND name = ?'
         args += (name,)
 
+    sql += ' ORDER BY rowid ASC'
+
     if limit:
         sql += ' LIMIT ?'
         args += (limit,)
@@ -143,6 +145,31 @@ def queuedb_findall(path, queue_id, name=None, offset=None, limit=None):
     return ret
 
 
+def queuedb_count(path, queue_id):
+    """
+    Count the number of entries in a queue.
+    Return the count on success
+    Raise on error
+    """
+    sql = "SELECT COUNT(*) FROM queue WHERE queue_id = ?;"
+    args = (queue_id,)
+
+    db = queuedb_open(path)
+    if db is None:
+        raise Exception("Failed to open %s" % path)
+
+    cur = db.cursor()
+    rows = queuedb_query_execute(cur, sql, args)
+
+    count = 0
+    for row in rows:
+        count = row['COUNT(*)']
+        break
+
+    db.close()
+    return count
+
+
 def queuedb_append(path, queue_id, name, data):
     """
     Append an element to the back of the queue.
@@ -164,6 +191,33 @@ def queuedb_append(path, queue_id, name, data):
     return True
 
 
+def queuedb_append_many(path, queue_id, entries):
+    """
+    Append a batch of elements to the back of the queue,
+    in a single transaction.
+    @entries is a list of (name, data) pairs.
+    Return True on success
+    Raise on error
+    """
+    sql = "INSERT INTO queue VALUES (?,?,?);"
+
+    db = queuedb_open(path)
+    if db is None:
+        raise Exception("Failed to open %s" % path)
+
+    cur = db.cursor()
+    queuedb_query_execute(cur, 'BEGIN', ())
+
+    for (name, data) in entries:
+        args = (name, queue_id, data)
+        queuedb_query_execute(cur, sql, args)
+
+    queuedb_query_execute(cur, 'END', ())
+    db.commit()
+    db.close()
+    return True
+
+
 def queuedb_remove(path, entry, cur=None):
     """
     Remove an element from a queue.
@@ -138,6 +138,58 @@ def is_zonefile_cached( zonefile_hash, zonefile_dir, validate=False):
     return res
 
 
+def _syncfs_func():
+    """
+    Get libc's syncfs(2), if this system has it (Linux does).
+    It syncs a whole filesystem in one call.
+    Return the function, or None
+    """
+    try:
+        import ctypes, ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        return libc.syncfs
+    except (OSError, AttributeError):
+        return None
+
+
+SYNCFS = _syncfs_func()
+
+
+def _fsync_path( path ):
+    """
+    fsync(2) a file or directory by path.
+    Raises on error
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _makedirs_tracked( path, mode, created ):
+    """
+    Make a directory and any missing parents, and add each one
+    we made (and its parent) to the set @created, since their
+    directory entries need to be synced.
+    """
+    missing = []
+    while not os.path.exists(path):
+        missing.append(path)
+        path = os.path.dirname(path)
+
+    for dirpath in reversed(missing):
+        try:
+            os.mkdir(dirpath, mode)
+        except OSError:
+            # someone else made it
+            if not os.path.isdir(dirpath):
+                raise
+
+        created.add(dirpath)
+        created.add(os.path.dirname(dirpath))
+
+
 def store_atlas_zonefile_data( zonefile_data, zonefile_dir ):
     """
     Store a validated zonefile.
@@ -146,29 +198,95 @@ def store_atlas_zonefile_data( zonefile_data, zonefile_dir ):
     Return True on success
     Return False on error
     """
-    if not os.path.exists(zonefile_dir):
-        os.makedirs(zonefile_dir, 0700 )
-
     zonefile_hash = get_zonefile_data_hash( zonefile_data )
-    
-    # only store to the latest supported directory
-    zonefile_path = atlas_zonefile_path( zonefile_dir, zonefile_hash )
-    zonefile_dir_path = os.path.dirname(zonefile_path)
+    return zonefile_hash in store_atlas_zonefiles_data( [zonefile_data], zonefile_dir )
 
-    if not os.path.exists(zonefile_dir_path):
-        os.makedirs(zonefile_dir_path)
 
+def store_atlas_zonefiles_data( zonefile_datas, zonefile_dir ):
+    """
+    Store a batch of validated zonefiles.
+    zonefile_datas is a list of serialized zone files.
+    The caller should first authenticate each zonefile.
+
+    This is a group commit: all zone files are written first, then
+    synced together (with one syncfs(2) for a batch of more than one file
+    where the system has it, or one fsync(2) per file otherwise), and then
+    each directory that gained an entry is synced once, so that the new
+    files survive a crash.  A zone file whose data is synced counts as
+    stored even if its directory could not be synced; that is logged
+    separately.
+
+    Return the list of hashes of the zone files that were stored (in the order given)
+    """
+    written = []
+    touched_dirs = set()
     try:
-        with open( zonefile_path, "w" ) as f:
-            f.write(zonefile_data)
-            f.flush()
-            os.fsync(f.fileno())
-
+        _makedirs_tracked( zonefile_dir, 0700, touched_dirs )
     except Exception, e:
         log.exception(e)
-        return False
-        
-    return True
+        return []
+
+    for zonefile_data in zonefile_datas:
+        zonefile_hash = get_zonefile_data_hash( zonefile_data )
+
+        # only store to the latest supported directory
+        zonefile_path = atlas_zonefile_path( zonefile_dir, zonefile_hash )
+        zonefile_dir_path = os.path.dirname(zonefile_path)
+
+        try:
+            _makedirs_tracked( zonefile_dir_path, 0777, touched_dirs )
+            if not os.path.exists(zonefile_path):
+                # new directory entry
+                touched_dirs.add(zonefile_dir_path)
+
+            with open( zonefile_path, "w" ) as f:
+                f.write(zonefile_data)
+
+        except Exception, e:
+            log.exception(e)
+            log.error("Failed to save zonefile {}".format(zonefile_hash))
+            continue
+
+        written.append((zonefile_hash, zonefile_path))
+
+    if len(written) == 0:
+        return []
+
+    # sync the data.  syncfs(2) flushes everything else on the filesystem too,
+    # so it only pays off for a real batch.
+    stored = []
+    synced = False
+    if SYNCFS is not None and len(written) > 1:
+        fd = os.open(zonefile_dir, os.O_RDONLY)
+        try:
+            synced = (SYNCFS(fd) == 0)
+        finally:
+            os.close(fd)
+
+    if synced:
+        stored = [zonefile_hash for (zonefile_hash, _) in written]
+
+    else:
+        for (zonefile_hash, zonefile_path) in written:
+            try:
+                _fsync_path(zonefile_path)
+            except Exception, e:
+                log.exception(e)
+                log.error("Failed to sync zonefile {}".format(zonefile_hash))
+                continue
+
+            stored.append(zonefile_hash)
+
+    # sync the new directory entries, once per directory.
+    # the data is already synced, so the zone files still count as stored.
+    for dirpath in sorted(touched_dirs, key=len, reverse=True):
+        try:
+            _fsync_path(dirpath)
+        except Exception, e:
+            log.exception(e)
+            log.error("Failed to sync directory {}; its new zone files may not survive a crash".format(dirpath))
+
+    return stored
 
 
 def remove_atlas_zonefile_data( zonefile_hash, zonefile_dir ):
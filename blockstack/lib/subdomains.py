@@ -30,12 +30,24 @@ import jsonschema
 import virtualchain
 import blockstack_zones
 import threading
+import multiprocessing
+import signal
 
 from virtualchain import bitcoin_blockchain
 
 from .config import BLOCKSTACK_TESTNET, BLOCKSTACK_TEST, BLOCKSTACK_DEBUG, SUBDOMAINS_FIRST_BLOCK, get_blockstack_opts, is_atlas_enabled, is_subdomains_enabled, \
         SUBDOMAIN_ADDRESS_VERSION_BYTE, SUBDOMAIN_ADDRESS_MULTISIG_VERSION_BYTE, SUBDOMAIN_ADDRESS_VERSION_BYTES
 
+# process pool work is sent out in chunks of this many zone files or signatures
+SUBDOMAIN_WORKER_CHUNKSIZE = 16
+
+# per-thread long-lived subdomain DB handles (see get_subdomain_db())
+SUBDOMAIN_DB_HANDLES = threading.local()
+
+# subdomain DBs whose tables we have already set up in this process
+SUBDOMAIN_DB_TABLES_CREATED = set()
+SUBDOMAIN_DB_TABLES_LOCK = threading.Lock()
+
 from .atlas import atlasdb_open, atlasdb_get_zonefiles_by_block, atlas_node_add_callback, atlasdb_query_execute, atlasdb_get_zonefiles_by_hash, atlasdb_get_zonefiles_missing_count_by_name
 from .storage import get_atlas_zonefile_data, get_zonefile_data_hash, store_atlas_zonefile_data 
 from .scripts import is_name_valid, is_address_subdomain, is_subdomain
@@ -412,7 +424,7 @@ class SubdomainIndex(object):
     """
     Process zone files as they arrive for subdomain state, and as instructed by an external caller.
     """
-    def __init__(self, subdomain_db_path, blockstack_opts=None):
+    def __init__(self, subdomain_db_path, blockstack_opts=None, worker_pool=None):
 
         if blockstack_opts is None:
             blockstack_opts = get_blockstack_opts()
@@ -427,7 +439,21 @@ class SubdomainIndex(object):
         self.atlasdb_path = blockstack_opts['atlasdb_path']
         self.zonefiles_dir = blockstack_opts['zonefiles']
 
-        log.debug("SubdomainIndex: db={}, atlasdb={}, zonefiles={}".format(subdomain_db_path, self.atlasdb_path, self.zonefiles_dir))
+        # parse zone files and verify signatures in a process pool, if we can.
+        # The pool forks, so it must be created before the caller starts any threads
+        # (a child forked from a threaded process can inherit a lock another thread held).
+        # Callers that already run threads should pass in a pool made beforehand.
+        self.num_workers = blockstack_opts.get('subdomain_workers', 1)
+        self.worker_pool = worker_pool
+        self.own_worker_pool = False
+        if self.worker_pool is None and self.num_workers > 1:
+            self.worker_pool = multiprocessing.Pool(self.num_workers, initializer=subdomain_worker_init)
+            self.own_worker_pool = True
+
+        # map (fqn, parent zonefile index, address) to whether or not the subdomain record at (fqn, parent zonefile index) was signed by address
+        self.signature_cache = {}
+
+        log.debug("SubdomainIndex: db={}, atlasdb={}, zonefiles={}, workers={}".format(subdomain_db_path, self.atlasdb_path, self.zonefiles_dir, self.num_workers))
 
 
     def close(self):
@@ -439,6 +465,12 @@ class SubdomainIndex(object):
             self.subdomain_db = None
             self.subdomain_db_path = None
 
+        if self.worker_pool is not None and self.own_worker_pool:
+            self.worker_pool.close()
+            self.worker_pool.join()
+
+        self.worker_pool = None
+
 
     def get_db(self):
         """
@@ -447,8 +479,80 @@ class SubdomainIndex(object):
         return self.subdomain_db
 
 
-    @classmethod
-    def check_subdomain_transition(cls, existing_subrec, new_subrec):
+    def verify_subdomain_signature(self, subrec, address):
+        """
+        Verify that a subdomain record was signed by the given address.
+        Uses the results of verify_subdomain_signatures() if we have them.
+        """
+        key = (subrec.get_fqn(), subrec.parent_zonefile_index, address)
+        if key in self.signature_cache:
+            return self.signature_cache[key]
+
+        return subrec.verify_signature(address)
+
+
+    def verify_subdomain_signatures(self, cursor, zonefile_subdomain_info):
+        """
+        Given the output of find_zonefile_subdomains, verify each new subdomain record's signature
+        against each address that could have owned its predecessor, in parallel.
+        The results are cached for check_subdomain_transition(), which still decides
+        which transitions are valid (and in which order).
+        """
+        if self.worker_pool is None:
+            return
+
+        # map (fqn, sequence) to the set of addresses that owned it
+        owners = {}
+        for subinfo in zonefile_subdomain_info:
+            if subinfo['subdomains'] is None:
+                continue
+
+            for subrec in subinfo['subdomains']:
+                key = (subrec.get_fqn(), subrec.n)
+                if key not in owners:
+                    owners[key] = set()
+
+                owners[key].add(subrec.address)
+
+        work = []
+        db_owners = {}
+        for subinfo in zonefile_subdomain_info:
+            if subinfo['subdomains'] is None:
+                continue
+
+            for subrec in subinfo['subdomains']:
+                if subrec.n == 0 or subrec.sig is None:
+                    continue
+
+                fqn = subrec.get_fqn()
+                if (fqn, subrec.n - 1) not in db_owners:
+                    db_owners[(fqn, subrec.n - 1)] = self.subdomain_db.get_subdomain_owners_at_sequence(fqn, subrec.n - 1, cur=cursor)
+
+                prev_owners = owners.get((fqn, subrec.n - 1), set()).union(db_owners[(fqn, subrec.n - 1)])
+                plaintext = subrec.get_plaintext_to_sign()
+
+                for address in prev_owners:
+                    key = (fqn, subrec.parent_zonefile_index, address)
+                    if key in self.signature_cache:
+                        continue
+
+                    work.append((key, address, plaintext, subrec.sig))
+
+        if len(work) == 0:
+            return
+
+        log.debug("Verify {} subdomain signature(s) with {} workers".format(len(work), self.num_workers))
+        results = self.worker_pool.map(subdomain_verify_worker, [(address, plaintext, sig) for (_, address, plaintext, sig) in work], SUBDOMAIN_WORKER_CHUNKSIZE)
+
+        for ((key, _, _, _), res) in zip(work, results):
+            if res is None:
+                # failed to verify; let check_subdomain_transition() handle it
+                continue
+
+            self.signature_cache[key] = res
+
+
+    def check_subdomain_transition(self, existing_subrec, new_subrec):
         """
         Given an existing subdomain record and a (newly-discovered) new subdomain record,
         determine if we can use the new subdomain record (i.e. is its signature valid? is it in the right sequence?)
@@ -461,7 +565,7 @@ class SubdomainIndex(object):
         if existing_subrec.n + 1 != new_subrec.n:
             return False
 
-        if not new_subrec.verify_signature(existing_subrec.address):
+        if not self.verify_subdomain_signature(new_subrec, existing_subrec.address):
             log.debug("Invalid signature from {}".format(existing_subrec.address))
             return False
 
@@ -489,12 +593,13 @@ class SubdomainIndex(object):
         return True
 
 
-    def find_zonefile_subdomains(self, block_start, block_end, name=None):
+    def find_zonefile_subdomains(self, block_start, block_end, name=None, skip_indexes=None):
         """
         Find the sequence of subdomain operations over a block range (block_end is excluded).
         Does not check for validity or signature matches; only that they are well-formed.
 
-        Optionally only finds zone file updates for a specific name
+        Optionally only finds zone file updates for a specific name.
+        Optionally skips the zone files at the given zone file indexes (i.e. ones that we have already processed).
 
         Returns {
             'zonefile_info': [{'name':.., 'zonefile_hash':..., 'block_height':..., 'txid':..., 'subdomains': [...] or None}], # in blockchain order
@@ -524,17 +629,26 @@ class SubdomainIndex(object):
        
         log.debug("Found {} zonefile hashes between {} and {} for {}".format(len(subdomain_info), block_start, block_end, '"{}"'.format(name) if name is not None else 'all names'))
 
+        if skip_indexes:
+            subdomain_info = filter(lambda sdinfo: sdinfo['inv_index'] not in skip_indexes, subdomain_info)
+            log.debug("Skipping already-processed zonefiles; {} remaining".format(len(subdomain_info)))
+
+        # find and parse zone file data
+        work = [(sdinfo['name'], sdinfo['zonefile_hash'], sdinfo['block_height'], sdinfo['inv_index'], sdinfo['txid'], self.zonefiles_dir) for sdinfo in subdomain_info]
+        if self.worker_pool is not None and len(work) > 1:
+            decoded = self.worker_pool.map(subdomain_decode_worker, work, SUBDOMAIN_WORKER_CHUNKSIZE)
+        else:
+            decoded = map(subdomain_decode_worker, work)
+
         # extract sequence of subdomain operations for each zone file discovered
         for i, sdinfo in enumerate(subdomain_info):
-            # find and parse zone file data
-            sddata = get_atlas_zonefile_data(sdinfo['zonefile_hash'], self.zonefiles_dir)
-            if sddata is None:
+            if not decoded[i]['present']:
                 # no zone file
                 log.debug("Missing zonefile {} (at {})".format(sdinfo['zonefile_hash'], sdinfo['block_height']))
                 subdomain_info[i]['subdomains'] = None
                 continue
 
-            subdomains = decode_zonefile_subdomains(sdinfo['name'], sddata, sdinfo['block_height'], sdinfo['inv_index'], sdinfo['txid'])
+            subdomains = decoded[i]['subdomains']
             if subdomains is None:
                 # have zone file, but no subdomains
                 subdomains = []
@@ -762,6 +876,9 @@ class SubdomainIndex(object):
 
         db_query_execute(cursor, 'END', ())
         self.subdomain_db.commit()
+
+        # check signatures up-front, in parallel
+        self.verify_subdomain_signatures(cursor, zonefile_subdomain_info)
         
         # at each zone file, find out if its subdomain creates/updates are valid
         for subinfo in zonefile_subdomain_info:
@@ -808,8 +925,16 @@ class SubdomainIndex(object):
                 for subrec in new_fut:
                     self.subdomain_db.update_subdomain_entry(subrec, cur=cursor)
 
+            # we never need to parse this zone file again.
+            # do this in the same transaction as its acceptance results, so if we crash
+            # before they are committed, we parse it and accept its records again.
+            if subinfo['subdomains'] is not None:
+                self.subdomain_db.set_processed_zonefiles([subinfo], cur=cursor)
+
             db_query_execute(cursor, 'END', ())
             self.subdomain_db.commit()
+
+        self.signature_cache = {}
    
 
     def enqueue_zonefile(self, zonefile_hash, block_height):
@@ -824,6 +949,23 @@ class SubdomainIndex(object):
         """
         log.debug("Append {} from {}".format(zonefile_hash, block_height))
         queuedb_append(self.subdomain_queue_path, "zonefiles", zonefile_hash, json.dumps({'zonefile_hash': zonefile_hash, 'block_height': block_height}))
+
+
+    def enqueue_zonefiles(self, zonefile_infos):
+        """
+        Batch version of enqueue_zonefile().  Queues up all of the given zone files in one transaction.
+        zonefile_infos is a list of (zonefile_hash, block_height) pairs.
+
+        This gets called by:
+        * AtlasZonefileCrawler (as it's "store_zonefiles" callback).
+        * rpc_put_zonefiles()
+        """
+        if len(zonefile_infos) == 0:
+            return
+
+        log.debug("Append {} zone files".format(len(zonefile_infos)))
+        entries = [(zonefile_hash, json.dumps({'zonefile_hash': zonefile_hash, 'block_height': block_height})) for (zonefile_hash, block_height) in zonefile_infos]
+        queuedb_append_many(self.subdomain_queue_path, "zonefiles", entries)
          
 
     def index_blockchain(self, block_start, block_end):
@@ -842,10 +984,15 @@ class SubdomainIndex(object):
         """
         Go through the list of zone files we discovered via Atlas, grouped by name and ordered by block height.
         Find all subsequent zone files for this name, and process all subdomain operations contained within them.
+
+        Subsequent zone files that we already parsed are not parsed again; their subdomain records are
+        already in the subdomain DB, and process_subdomains() will replay the affected subdomains' histories
+        from there.
         """
         all_queued_zfinfos = []         # contents of the queue
         subdomain_zonefile_infos = {}   # map subdomain fqn to list of zonefile info bundles, for process_subdomains
         name_blocks = {}                # map domain name to the block at which we should reprocess its subsequent zone files
+        queued_indexes = set()          # zone file indexes of the queued zone files
 
         offset = 0
 
@@ -875,6 +1022,7 @@ class SubdomainIndex(object):
             # find out for each name block height at which its zone file was discovered.
             # this is where we'll begin looking for more subdomain updates.
             for zfi in zfinfos:
+                queued_indexes.add(zfi['inv_index'])
                 if zfi['name'] not in name_blocks:
                     name_blocks[zfi['name']] = block_height
                 else:
@@ -886,8 +1034,11 @@ class SubdomainIndex(object):
 
             log.debug("Finding subdomain updates for {} at block {}".format(name, name_blocks[name]))
             
+            # skip the zone files we already have subdomain records for (but never the ones we just got)
+            processed_indexes = self.subdomain_db.get_processed_zonefile_indexes(name, name_blocks[name]) - queued_indexes
+
             # get the subdomains affected at this block by finding the zonefiles created here.
-            res = self.find_zonefile_subdomains(name_blocks[name], lastblock, name=name)
+            res = self.find_zonefile_subdomains(name_blocks[name], lastblock, name=name, skip_indexes=processed_indexes)
             zonefile_subdomain_info = res['zonefile_info']
             subdomain_index = res['subdomains']
             
@@ -928,10 +1079,11 @@ class SubdomainIndex(object):
 
     
     @classmethod
-    def reindex(cls, lastblock, firstblock=None, opts=None):
+    def reindex(cls, lastblock, firstblock=None, opts=None, worker_pool=None):
         """
         Generate a subdomains db from scratch, using the names db and the atlas db and zone file collection.
-        Best to do this in a one-off command (i.e. *not* in the blockstackd process)
+        Best to do this in a one-off command (i.e. *not* in the blockstackd process).
+        If this is run in a process that has started threads, pass the process pool to use as @worker_pool.
         """
         if opts is None:
             opts = get_blockstack_opts()
@@ -948,17 +1100,21 @@ class SubdomainIndex(object):
         if not os.path.exists(atlasdb_path):
             raise Exception("No Atlas database at {}".format(opts['atlasdb_path']))
         
-        subdomain_indexer = SubdomainIndex(subdomaindb_path, blockstack_opts=opts)
-        subdomain_indexer.subdomain_db.wipe()
+        subdomain_indexer = SubdomainIndex(subdomaindb_path, blockstack_opts=opts, worker_pool=worker_pool)
+        try:
+            subdomain_indexer.subdomain_db.wipe()
 
-        if firstblock is None:
-            start_block = SUBDOMAINS_FIRST_BLOCK
-        else:
-            start_block = firstblock
+            if firstblock is None:
+                start_block = SUBDOMAINS_FIRST_BLOCK
+            else:
+                start_block = firstblock
+
+            for i in range(start_block, lastblock, 100):
+                log.debug("Processing all subdomains in blocks {}-{}...".format(i, i+99))
+                subdomain_indexer.index_blockchain(i, i+100)
 
-        for i in range(start_block, lastblock, 100):
-            log.debug("Processing all subdomains in blocks {}-{}...".format(i, i+99))
-            subdomain_indexer.index_blockchain(i, i+100)
+        finally:
+            subdomain_indexer.close()
 
         log.debug("Finished indexing subdomains in blocks {}-{}".format(start_block, lastblock))
 
@@ -974,10 +1130,19 @@ class SubdomainDB(object):
         self.queue_path = db_path + '.queue'
         self.subdomain_table = "subdomain_records"
         self.blocked_table = "blocked_table"
+        self.processed_table = "processed_zonefiles"
+        self.current_table = "subdomain_current"
         self.zonefiles_dir = zonefiles_dir
+
+        db_exists = os.path.exists(db_path)
         self.conn = sqlite3.connect(db_path, isolation_level=None, timeout=2**30)
         self.conn.row_factory = SubdomainDB.subdomain_row_factory
-        self._create_tables()
+
+        # only need to set up the tables once per process
+        with SUBDOMAIN_DB_TABLES_LOCK:
+            if not db_exists or db_path not in SUBDOMAIN_DB_TABLES_CREATED:
+                self._create_tables()
+                SUBDOMAIN_DB_TABLES_CREATED.add(db_path)
 
 
     @classmethod
@@ -1050,15 +1215,15 @@ class SubdomainDB(object):
         """
         Fetch subdomain names
         """
-        if accepted:
-            accepted_filter = 'WHERE accepted=1'
-        else:
-            accepted_filter = ''
         offset = int(offset)
         count = int(count)
         offset_count = 'LIMIT {} OFFSET {}'.format(count, offset)
-        get_cmd = "SELECT fully_qualified_subdomain FROM {} {} GROUP BY fully_qualified_subdomain ORDER BY fully_qualified_subdomain {};".format(
-            self.subdomain_table, accepted_filter, offset_count)
+        if accepted:
+            get_cmd = "SELECT fully_qualified_subdomain FROM {} ORDER BY fully_qualified_subdomain {};".format(
+                self.current_table, offset_count)
+        else:
+            get_cmd = "SELECT fully_qualified_subdomain FROM {} GROUP BY fully_qualified_subdomain ORDER BY fully_qualified_subdomain {};".format(
+                self.subdomain_table, offset_count)
         cursor = cur
         if cursor is None:
             cursor = self.conn.cursor()
@@ -1078,11 +1243,9 @@ class SubdomainDB(object):
         Fetch subdomain names
         """
         if accepted:
-            accepted_filter = 'WHERE accepted=1'
+            get_cmd = "SELECT COUNT(*) as count FROM {};".format(self.current_table)
         else:
-            accepted_filter = ''
-        get_cmd = "SELECT COUNT(DISTINCT fully_qualified_subdomain) as count FROM {} {};".format(
-            self.subdomain_table, accepted_filter)
+            get_cmd = "SELECT COUNT(DISTINCT fully_qualified_subdomain) as count FROM {};".format(self.subdomain_table)
         cursor = cur
         if cursor is None:
             cursor = self.conn.cursor()
@@ -1102,7 +1265,12 @@ class SubdomainDB(object):
         Given a fully-qualified subdomain, get its (latest) subdomain record.
         Raises SubdomainNotFound if there is no such subdomain
         """
-        get_cmd = "SELECT * FROM {} WHERE fully_qualified_subdomain=? {} ORDER BY sequence DESC, parent_zonefile_index DESC LIMIT 1;".format(self.subdomain_table, 'AND accepted=1' if accepted else '')
+        if accepted:
+            get_cmd = "SELECT r.* FROM {} c JOIN {} r ON r.fully_qualified_subdomain = c.fully_qualified_subdomain AND r.parent_zonefile_index = c.parent_zonefile_index " \
+                      "WHERE c.fully_qualified_subdomain=?;".format(self.current_table, self.subdomain_table)
+        else:
+            get_cmd = "SELECT * FROM {} WHERE fully_qualified_subdomain=? ORDER BY sequence DESC, parent_zonefile_index DESC LIMIT 1;".format(self.subdomain_table)
+
         cursor = None
         if cur is None:
             cursor = self.conn.cursor()
@@ -1169,11 +1337,27 @@ class SubdomainDB(object):
         return self._extract_subdomain(rowdata)
 
 
+    def get_subdomain_owners_at_sequence(self, fqn, sequence, cur=None):
+        """
+        Get the set of addresses that owned any of this subdomain's records (accepted or not) with the given sequence number.
+        No zone files will be loaded.
+        """
+        get_cmd = "SELECT owner FROM {} WHERE fully_qualified_subdomain = ? AND sequence = ?".format(self.subdomain_table)
+        cursor = None
+        if cur is None:
+            cursor = self.conn.cursor()
+        else:
+            cursor = cur
+
+        rows = db_query_execute(cursor, get_cmd, (fqn, sequence))
+        return set([str(rowdata['owner']) for rowdata in rows])
+
+
     def get_subdomains_owned_by_address(self, owner, cur=None):
         """
         Get the list of subdomain names that are owned by a given address.
         """
-        get_cmd = "SELECT fully_qualified_subdomain, MAX(sequence) FROM {} WHERE owner = ? AND accepted=1 GROUP BY fully_qualified_subdomain".format(self.subdomain_table)
+        get_cmd = "SELECT fully_qualified_subdomain FROM {} WHERE owner = ?".format(self.current_table)
 
         cursor = None
         if cur is None:
@@ -1351,13 +1535,43 @@ class SubdomainDB(object):
 
         db_query_execute(cursor, write_cmd, args)
         num_rows_written = cursor.rowcount
+
+        if num_rows_written != 1:
+            raise ValueError("No row written: fqn={} seq={}".format(subdomain_obj.get_fqn(), subdomain_obj.n))
+
+        self.update_current_subdomain(subdomain_obj.get_fqn(), cur=cursor)
         
         if cur is None:
             # not part of a transaction
             self.conn.commit()
 
-        if num_rows_written != 1:
-            raise ValueError("No row written: fqn={} seq={}".format(subdomain_obj.get_fqn(), subdomain_obj.n))
+        return True
+
+
+    def update_current_subdomain(self, fqn, cur=None):
+        """
+        Update the current-state table for this subdomain, so it points to
+        its latest accepted subdomain record (or remove it if it has none).
+        
+        Return True on success
+        Raise exception on error
+        """
+        cursor = None
+        if cur is None:
+            cursor = self.conn.cursor()
+        else:
+            cursor = cur
+
+        delete_cmd = 'DELETE FROM {} WHERE fully_qualified_subdomain = ?;'.format(self.current_table)
+        db_query_execute(cursor, delete_cmd, (fqn,))
+
+        write_cmd = 'INSERT INTO {} (fully_qualified_subdomain, domain, sequence, owner, parent_zonefile_index) ' \
+                    'SELECT fully_qualified_subdomain, domain, sequence, owner, parent_zonefile_index FROM {} ' \
+                    'WHERE fully_qualified_subdomain = ? AND accepted=1 ORDER BY sequence DESC, parent_zonefile_index DESC LIMIT 1;'.format(self.current_table, self.subdomain_table)
+        db_query_execute(cursor, write_cmd, (fqn,))
+
+        if cur is None:
+            self.conn.commit()
 
         return True
 
@@ -1416,12 +1630,63 @@ class SubdomainDB(object):
         return height
 
 
+    def set_processed_zonefiles(self, zonefile_infos, cur=None):
+        """
+        Remember that we have parsed these domain zone files, and stored and accepted all of their subdomain records.
+        This is the per-domain checkpoint of subdomain state:  once a zone file is checkpointed, its
+        subdomain records are in the subdomain table and it never needs to be re-parsed.
+        zonefile_infos is a list of {'name':..., 'zonefile_hash':..., 'inv_index':..., 'block_height':...}
+
+        Return True on success
+        Raise exception on error
+        """
+        write_cmd = 'INSERT OR REPLACE INTO {} VALUES (?,?,?,?)'.format(self.processed_table)
+
+        cursor = None
+        if cur is None:
+            cursor = self.conn.cursor()
+        else:
+            cursor = cur
+
+        for zfinfo in zonefile_infos:
+            args = (zfinfo['name'], zfinfo['inv_index'], zfinfo['zonefile_hash'], zfinfo['block_height'])
+            db_query_execute(cursor, write_cmd, args)
+
+        if cur is None:
+            # not part of a transaction
+            self.conn.commit()
+
+        return True
+
+
+    def get_processed_zonefile_indexes(self, domain, block_height, cur=None):
+        """
+        Get the set of zone file indexes for this domain, at or after the given block height,
+        whose subdomain records have already been parsed and stored.
+        """
+        sql = 'SELECT parent_zonefile_index FROM {} WHERE domain = ? AND block_height >= ?;'.format(self.processed_table)
+        args = (domain, block_height)
+
+        cursor = None
+        if cur is None:
+            cursor = self.conn.cursor()
+        else:
+            cursor = cur
+
+        rows = db_query_execute(cursor, sql, args)
+        ret = set()
+        for rowdata in rows:
+            ret.add(rowdata['parent_zonefile_index'])
+
+        return ret
+
+
     def _drop_tables(self):
         """
         Clear the subdomain db's tables
         """
         drop_cmd = "DROP TABLE IF EXISTS {};"
-        for table in [self.subdomain_table, self.blocked_table]:
+        for table in [self.subdomain_table, self.blocked_table, self.processed_table, self.current_table]:
             cursor = self.conn.cursor()
             db_query_execute(cursor, drop_cmd.format(table), ())
 
@@ -1449,6 +1714,50 @@ class SubdomainDB(object):
         """.format(self.subdomain_table)
         db_query_execute(cursor, create_cmd, ())
 
+        create_cmd = """CREATE TABLE IF NOT EXISTS {} (
+        domain TEXT NOT NULL,
+        parent_zonefile_index INTEGER NOT NULL,
+        parent_zonefile_hash TEXT NOT NULL,
+        block_height INTEGER NOT NULL,
+        PRIMARY KEY(parent_zonefile_index));
+        """.format(self.processed_table)
+        db_query_execute(cursor, create_cmd, ())
+
+        create_cmd = "CREATE INDEX IF NOT EXISTS {}_domain_index ON {} (domain, block_height);".format(self.processed_table, self.processed_table)
+        db_query_execute(cursor, create_cmd, ())
+
+        # secondary indexes for lookups by owner and by domain
+        create_cmd = "CREATE INDEX IF NOT EXISTS {}_owner_index ON {} (owner, accepted);".format(self.subdomain_table, self.subdomain_table)
+        db_query_execute(cursor, create_cmd, ())
+
+        create_cmd = "CREATE INDEX IF NOT EXISTS {}_domain_index ON {} (domain, parent_zonefile_index);".format(self.subdomain_table, self.subdomain_table)
+        db_query_execute(cursor, create_cmd, ())
+
+        # current state of each subdomain (i.e. its latest accepted record)
+        rows = db_query_execute(cursor, "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?;", (self.current_table,))
+        have_current_table = (rows.fetchone() is not None)
+
+        create_cmd = """CREATE TABLE IF NOT EXISTS {} (
+        fully_qualified_subdomain TEXT NOT NULL,
+        domain TEXT NOT NULL,
+        sequence INTEGER NOT NULL,
+        owner TEXT NOT NULL,
+        parent_zonefile_index INTEGER NOT NULL,
+        PRIMARY KEY(fully_qualified_subdomain));
+        """.format(self.current_table)
+        db_query_execute(cursor, create_cmd, ())
+
+        create_cmd = "CREATE INDEX IF NOT EXISTS {}_owner_index ON {} (owner);".format(self.current_table, self.current_table)
+        db_query_execute(cursor, create_cmd, ())
+
+        if not have_current_table:
+            # populate from existing records
+            populate_cmd = 'INSERT OR REPLACE INTO {} (fully_qualified_subdomain, domain, sequence, owner, parent_zonefile_index) ' \
+                           'SELECT r.fully_qualified_subdomain, r.domain, r.sequence, r.owner, r.parent_zonefile_index FROM {} r ' \
+                           'WHERE r.accepted=1 AND r.rowid = (SELECT r2.rowid FROM {} r2 WHERE r2.fully_qualified_subdomain = r.fully_qualified_subdomain AND r2.accepted=1 ' \
+                           'ORDER BY r2.sequence DESC, r2.parent_zonefile_index DESC LIMIT 1);'.format(self.current_table, self.subdomain_table, self.subdomain_table)
+            db_query_execute(cursor, populate_cmd, ())
+
         # set up a queue as well
         queue_con = queuedb_open(self.queue_path)
         queue_con.close()
@@ -1577,6 +1886,52 @@ def decode_zonefile_subdomains(domain, zonefile_txt, block_height, zonefile_inde
 #                   verify pubkey matches owner address.
 ##
 
+def subdomain_worker_init():
+    """
+    Set up a subdomain worker process.
+    Leave signal handling to the parent.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def subdomain_decode_worker(args):
+    """
+    Load and decode a domain zone file's subdomain records.
+    @args is (domain, zonefile_hash, block_height, zonefile_index, txid, zonefiles_dir)
+    Runs in a worker process (or in-process).
+
+    Returns {'present': False} if we don't have the zone file
+    Returns {'present': True, 'subdomains': [...] or None} otherwise (see decode_zonefile_subdomains())
+    """
+    domain, zonefile_hash, block_height, zonefile_index, txid, zonefiles_dir = args
+    zonefile_txt = get_atlas_zonefile_data(zonefile_hash, zonefiles_dir)
+    if zonefile_txt is None:
+        return {'present': False}
+
+    subdomains = decode_zonefile_subdomains(domain, zonefile_txt, block_height, zonefile_index, txid)
+    return {'present': True, 'subdomains': subdomains}
+
+
+def subdomain_verify_worker(args):
+    """
+    Verify a subdomain record signature.
+    @args is (address, plaintext, scriptSigb64)
+    Runs in a worker process.
+
+    Returns True or False
+    Returns None if verification raised an exception
+    """
+    address, plaintext, sig = args
+    try:
+        return verify(virtualchain.address_reencode(address), plaintext, sig)
+    except Exception as e:
+        if BLOCKSTACK_DEBUG:
+            log.exception(e)
+
+        return None
+
+
 def verify(address, plaintext, scriptSigb64):
     """
     Verify that a given plaintext is signed by the given scriptSig, given the address
@@ -1707,6 +2062,22 @@ def is_subdomain_record(rec):
     return (has_parts_entry and has_pk_entry and has_seqn_entry)
 
 
+def get_subdomain_db(db_path, zonefiles_dir):
+    """
+    Get this thread's long-lived handle to a subdomain DB.
+    The handle is opened on first use and kept open for the lifetime of the thread.
+    """
+    dbs = getattr(SUBDOMAIN_DB_HANDLES, 'dbs', None)
+    if dbs is None:
+        dbs = {}
+        SUBDOMAIN_DB_HANDLES.dbs = dbs
+
+    if (db_path, zonefiles_dir) not in dbs:
+        dbs[(db_path, zonefiles_dir)] = SubdomainDB(db_path, zonefiles_dir)
+
+    return dbs[(db_path, zonefiles_dir)]
+
+
 def get_subdomain_info(fqn, db_path=None, atlasdb_path=None, zonefiles_dir=None, check_pending=False, include_did=False):
     """
     Static method for getting the state of a subdomain, given its fully-qualified name.
@@ -1727,7 +2098,7 @@ def get_subdomain_info(fqn, db_path=None, atlasdb_path=None, zonefiles_dir=None,
     if atlasdb_path is None:
         atlasdb_path = opts['atlasdb_path']
 
-    db = SubdomainDB(db_path, zonefiles_dir)
+    db = get_subdomain_db(db_path, zonefiles_dir)
     try:
         subrec = db.get_subdomain_entry(fqn)
     except SubdomainNotFound:
@@ -1762,7 +2133,7 @@ def get_all_subdomains(offset, count, db_path=None, zonefiles_dir=None):
     if zonefiles_dir is None:
         zonefiles_dir = opts['zonefiles']
 
-    db = SubdomainDB(db_path, zonefiles_dir)
+    db = get_subdomain_db(db_path, zonefiles_dir)
     return db.get_all_subdomains(offset, count)
 
 def get_subdomains_count(db_path=None, zonefiles_dir=None):
@@ -1781,7 +2152,7 @@ def get_subdomains_count(db_path=None, zonefiles_dir=None):
     if zonefiles_dir is None:
         zonefiles_dir = opts['zonefiles']
 
-    db = SubdomainDB(db_path, zonefiles_dir)
+    db = get_subdomain_db(db_path, zonefiles_dir)
     return db.get_subdomains_count()
 
 def get_subdomain_DID_info(fqn, db_path=None, zonefiles_dir=None):
@@ -1800,7 +2171,7 @@ def get_subdomain_DID_info(fqn, db_path=None, zonefiles_dir=None):
     if zonefiles_dir is None:
         zonefiles_dir = opts['zonefiles']
 
-    db = SubdomainDB(db_path, zonefiles_dir)
+    db = get_subdomain_db(db_path, zonefiles_dir)
     try:
         subrec = db.get_subdomain_entry(fqn)
     except SubdomainNotFound:
@@ -1833,7 +2204,7 @@ def get_DID_subdomain(did, db_path=None, zonefiles_dir=None, atlasdb_path=None,
     if atlasdb_path is None:
         atlasdb_path = opts['atlasdb_path']
 
-    db = SubdomainDB(db_path, zonefiles_dir)
+    db = get_subdomain_db(db_path, zonefiles_dir)
     try:
         subrec = db.get_DID_subdomain(did)
     except Exception as e:
@@ -1866,7 +2237,7 @@ def get_subdomain_history(fqn, db_path=None, zonefiles_dir=None, json=False):
     if zonefiles_dir is None:
         zonefiles_dir = opts['zonefiles']
 
-    db = SubdomainDB(db_path, zonefiles_dir)
+    db = get_subdomain_db(db_path, zonefiles_dir)
     recs = db.get_subdomain_history(fqn)
 
     if json:
@@ -1898,7 +2269,7 @@ def get_subdomains_owned_by_address(address, db_path=None, zonefiles_dir=None):
     if zonefiles_dir is None:
         zonefiles_dir = opts['zonefiles']
 
-    db = SubdomainDB(db_path, zonefiles_dir)
+    db = get_subdomain_db(db_path, zonefiles_dir)
     return db.get_subdomains_owned_by_address(address)
 
 
@@ -1993,6 +2364,7 @@ def subdomains_init(blockstack_opts, working_dir, atlas_state):
 
     subdomain_state = SubdomainIndex(blockstack_opts['subdomaindb_path'], blockstack_opts=blockstack_opts)
     atlas_node_add_callback(atlas_state, 'store_zonefile', subdomain_state.enqueue_zonefile)
+    atlas_node_add_callback(atlas_state, 'store_zonefiles', subdomain_state.enqueue_zonefiles)
 
     return subdomain_state
 
@@ -5404,10 +5404,13 @@ def delete_datastore_by_type( datastore_type, blockchain_id, datastore_privkey,
     return {'status': True}
 
 
-def datastore_file_get(datastore_type, blockchain_id, datastore_id, path, data_pubkeys, extended=False, force=False, config_path=CONFIG_PATH ):
+def datastore_file_get(datastore_type, blockchain_id, datastore_id, path, data_pubkeys, extended=False, force=False, config_path=CONFIG_PATH, byte_range=None, stream=False ):
     """
     Get a file from a datastore or collection.
-    Return {'status': True, 'data': ...} on success
+    If byte_range is given as (start, end), then only get those bytes (inclusive).
+    If stream is True, then get a reader for the file instead of its data (API server only).
+    Return {'status': True, 'data': ...} on success (and 'size': ..., if byte_range is given)
+    Return {'status': True, 'reader': ..., 'size': ...} on success, if streaming
     Return {'error': ...} on error
     """
     # connect 
@@ -5427,7 +5430,7 @@ def datastore_file_get(datastore_type, blockchain_id, datastore_id, path, data_p
     if datastore['type'] != datastore_type:
         return {'error': '{} is a {}'.format(datastore_id, datastore['type'])}
 
-    res = datastore_getfile( rpc, blockchain_id, datastore, path, data_pubkeys, extended=extended, force=force, config_path=config_path )
+    res = datastore_getfile( rpc, blockchain_id, datastore, path, data_pubkeys, extended=extended, force=force, config_path=config_path, byte_range=byte_range, stream=stream )
     return res
 
 
@@ -5473,7 +5476,7 @@ def datastore_file_put(datastore_type, blockchain_id, datastore_privkey, path, d
     return res
 
 
-def datastore_dir_list(datastore_type, blockchain_id, datastore_id, path, data_pubkeys, extended=False, force=False, config_path=CONFIG_PATH ):
+def datastore_dir_list(datastore_type, blockchain_id, datastore_id, path, data_pubkeys, extended=False, force=False, prefetch=True, config_path=CONFIG_PATH ):
     """
     List a directory in a datastore or collection
     Return {'status': True, 'dir': ...} on success
@@ -5502,11 +5505,11 @@ def datastore_dir_list(datastore_type, blockchain_id, datastore_id, path, data_p
         if path != '/':
             return {'error': 'Invalid argument: collections do not have directories', 'errno': errno.EINVAL}
 
-    res = datastore_listdir( rpc, blockchain_id, datastore, path, data_pubkeys, extended=extended, force=force, config_path=config_path )
+    res = datastore_listdir( rpc, blockchain_id, datastore, path, data_pubkeys, extended=extended, force=force, prefetch=prefetch, config_path=config_path )
     return res
 
 
-def datastore_path_stat(datastore_type, blockchain_id, datastore_id, path, data_pubkeys, extended=False, force=False, config_path=CONFIG_PATH ):
+def datastore_path_stat(datastore_type, blockchain_id, datastore_id, path, data_pubkeys, extended=False, force=False, prefetch=False, config_path=CONFIG_PATH ):
     """
     Stat a path in a datastore or collection
     Return {'status': True, 'inode': ...} on success
@@ -5526,7 +5529,7 @@ def datastore_path_stat(datastore_type, blockchain_id, datastore_id, path, data_
     if datastore['type'] != datastore_type:
         return {'error': '{} is a {}'.format(datastore_id, datastore['type'])}
 
-    res = datastore_stat( rpc, blockchain_id, datastore, path, data_pubkeys, extended=extended, force=force, config_path=config_path )
+    res = datastore_stat( rpc, blockchain_id, datastore, path, data_pubkeys, extended=extended, force=force, prefetch=prefetch, config_path=config_path )
     return res
 
 
@@ -5758,6 +5761,8 @@ def cli_datastore_getfile( args, config_path=CONFIG_PATH, interactive=False ):
     opt: force (str) 'If True, then tolerate stale data faults.'
     opt: device_ids (str) 'If given, a CSV of device IDs owned by the blockchain ID'
     opt: device_pubkeys (str) 'If given, a CSV of device public keys owned by the blockchain ID'
+    opt: byte_range (str) 'If given, only get this range of bytes (as "start-end", inclusive), and also return the file size.'
+    opt: stream (str) 'If True, then return a reader for the file and its size, instead of its data.  Only works in the API server.'
     """
 
     blockchain_id = getattr(args, 'blockchain_id', '')
@@ -5771,6 +5776,8 @@ def cli_datastore_getfile( args, config_path=CONFIG_PATH, interactive=False ):
     extended = False
     force = False
     device_ids = None
+    byte_range = None
+    stream = False
 
     if hasattr(args, 'extended') and args.extended.lower() in ['1', 'true']:
         extended = True
@@ -5778,6 +5785,17 @@ def cli_datastore_getfile( args, config_path=CONFIG_PATH, interactive=False ):
     if hasattr(args, 'force') and args.force.lower() in ['1', 'true']:
         force = True
 
+    if getattr(args, 'stream', None) and args.stream.lower() in ['1', 'true']:
+        stream = True
+
+    if getattr(args, 'byte_range', None):
+        try:
+            start, end = [int(b) for b in str(args.byte_range).split('-')]
+            assert 0 <= start <= end
+            byte_range = (start, end)
+        except (ValueError, AssertionError):
+            return {'error': 'Invalid byte range', 'errno': errno.EINVAL}
+
     # get the list of device IDs to use 
     device_ids = getattr(args, 'device_ids', None)
     if device_ids:
@@ -5798,11 +5816,11 @@ def cli_datastore_getfile( args, config_path=CONFIG_PATH, interactive=False ):
         'public_key': pubkey
     } for (dev_id, pubkey) in zip(device_ids, device_pubkeys)]
 
-    res = datastore_file_get('datastore', blockchain_id, datastore_id, path, data_pubkeys, extended=extended, force=force, config_path=config_path)
+    res = datastore_file_get('datastore', blockchain_id, datastore_id, path, data_pubkeys, extended=extended, force=force, config_path=config_path, byte_range=byte_range, stream=stream)
     if json_is_error(res):
         return res
 
-    if not extended:
+    if not extended and byte_range is None and not stream:
         # just the data
         return res['data']
 
@@ -5820,6 +5838,7 @@ def cli_datastore_listdir(args, config_path=CONFIG_PATH, interactive=False ):
     opt: force (str) 'If True, then tolerate stale data faults.'
     opt: device_ids (str) 'If given, a CSV of device IDs owned by the blockchain ID'
     opt: device_pubkeys (str) 'If given, a CSV of device public keys owned by the blockchain ID'
+    opt: prefetch (str) 'If True (the default), then also fetch the directory's children in the background.'
     """
 
     blockchain_id = getattr(args, 'blockchain_id', '')
@@ -5860,7 +5879,11 @@ def cli_datastore_listdir(args, config_path=CONFIG_PATH, interactive=False ):
         'public_key': pubkey
     } for (dev_id, pubkey) in zip(device_ids, device_pubkeys)]
 
-    res = datastore_dir_list('datastore', blockchain_id, datastore_id, path, data_pubkeys, extended=extended, force=force, config_path=config_path )
+    prefetch = True
+    if getattr(args, 'prefetch', None) is not None and args.prefetch.lower() in ['0', 'false']:
+        prefetch = False
+
+    res = datastore_dir_list('datastore', blockchain_id, datastore_id, path, data_pubkeys, extended=extended, force=force, prefetch=prefetch, config_path=config_path )
     if json_is_error(res):
         return res
 
@@ -5881,6 +5904,7 @@ def cli_datastore_stat(args, config_path=CONFIG_PATH, interactive=False ):
     opt: force (str) 'If True, then tolerate stale inode data.'
     opt: device_ids (str) 'If given, a CSV of device IDs owned by the blockchain ID'
     opt: device_pubkeys (str) 'If given, a CSV of device public keys owned by the blockchain ID'
+    opt: prefetch (str) 'If True and the path is a directory, then also fetch its children in the background.'
     """
 
     blockchain_id = getattr(args, 'blockchain_id', '')
@@ -5924,7 +5948,11 @@ def cli_datastore_stat(args, config_path=CONFIG_PATH, interactive=False ):
         'public_key': pubkey
     } for (dev_id, pubkey) in zip(device_ids, device_pubkeys)]
 
-    res = datastore_path_stat('datastore', blockchain_id, datastore_id, path, data_pubkeys, extended=extended, force=force, config_path=config_path) 
+    prefetch = False
+    if getattr(args, 'prefetch', None) is not None and args.prefetch.lower() in ['1', 'true']:
+        prefetch = True
+
+    res = datastore_path_stat('datastore', blockchain_id, datastore_id, path, data_pubkeys, extended=extended, force=force, prefetch=prefetch, config_path=config_path) 
     if json_is_error(res):
         return res
 
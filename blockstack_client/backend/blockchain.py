@@ -22,6 +22,8 @@
 """
 
 import os
+import time
+import threading
 import virtualchain
 import json
 
@@ -29,7 +31,7 @@ import json
 current_dir = os.path.abspath(os.path.dirname(__file__))
 parent_dir = os.path.abspath(current_dir + "/../")
 
-from ..constants import TX_EXPIRED_INTERVAL, DEFAULT_TX_CONFIRMATIONS_NEEDED, TX_MIN_CONFIRMATIONS
+from ..constants import TX_EXPIRED_INTERVAL, DEFAULT_TX_CONFIRMATIONS_NEEDED, TX_MIN_CONFIRMATIONS, MAX_TX_CONFIRMATIONS
 from ..constants import MAXIMUM_NAMES_PER_ADDRESS
 from ..constants import BLOCKSTACK_TEST, BLOCKSTACK_DRY_RUN
 from ..constants import CONFIG_PATH, BLOCKSTACK_DEBUG
@@ -106,11 +108,218 @@ def get_tx_confirmations(tx_hash, config_path=CONFIG_PATH):
     return resp
 
 
-def is_tx_accepted( tx_hash, num_needed=DEFAULT_TX_CONFIRMATIONS_NEEDED, config_path=CONFIG_PATH ):
+class ConfirmationTracker(object):
+    """
+    Track confirmations for many transactions over one bitcoind connection.
+
+    The tracker learns the chain tip once (see refresh()), and remembers
+    the height of the block each transaction was included in.  After that,
+    a transaction's confirmations are computed from the tip height, without
+    asking bitcoind.  Only transactions that are not yet in a block cost a
+    getrawtransaction, and only the first time they are looked up.  When
+    the tip moves, the tracker learns which of them got mined from the new
+    blocks' transaction lists.
+
+    If the block we last saw as the tip is no longer on the main chain
+    (a reorg), the recorded heights are forgotten and re-learned.
+    Heights of transactions buried deeper than the registrar ever looks
+    are forgotten too.
+    """
+
+    def __init__(self, config_path=CONFIG_PATH, bitcoind_client=None, max_tip_age=10, max_new_blocks=10):
+        self.config_path = config_path
+        self.bitcoind_client = bitcoind_client
+        self.max_tip_age = max_tip_age
+        self.max_new_blocks = max_new_blocks
+
+        self.tip_height = None
+        self.tip_hash = None
+        self.tip_time = 0
+        self.tx_heights = {}      # tx hash --> height of the block that includes it
+        self.unconfirmed = {}     # tx hash --> tip height when we found it not yet in a block
+        self.lock = threading.Lock()
+
+
+    def get_client(self):
+        """
+        Get the bitcoind connection, and connect if need be
+        """
+        if self.bitcoind_client is None:
+            self.bitcoind_client = get_bitcoind_client(config_path=self.config_path)
+
+        return self.bitcoind_client
+
+
+    def reset_client(self):
+        """
+        Drop the bitcoind connection (e.g. after an error), so the next call reconnects
+        """
+        self.bitcoind_client = None
+
+
+    def refresh(self):
+        """
+        Learn the current chain tip, and check for reorgs.
+        Return the tip height on success
+        Return None on error
+        """
+        with self.lock:
+            return self._refresh()
+
+
+    def _refresh(self):
+        try:
+            client = self.get_client()
+            tip_hash = client.getbestblockhash()
+
+            if tip_hash != self.tip_hash:
+                if self.tip_hash is not None and (len(self.tx_heights) > 0 or len(self.unconfirmed) > 0):
+                    # is our old tip still on the main chain?
+                    old_tip = client.getblock(self.tip_hash)
+                    if old_tip is None or old_tip.get('confirmations', -1) < 1:
+                        log.warning("Block {} was reorged out; forgetting {} transactions' heights".format(self.tip_hash, len(self.tx_heights)))
+                        self.tx_heights = {}
+                        self.unconfirmed = {}
+
+                tip = client.getblock(tip_hash)
+                if len(self.unconfirmed) > 0 and not self._find_mined(client, tip, self.tip_hash):
+                    # too many new blocks (or no tx lists); look them up again
+                    self.unconfirmed = {}
+
+                self.tip_height = int(tip['height'])
+                self.tip_hash = tip_hash
+
+                for (tx_hash, height) in self.tx_heights.items():
+                    if self.tip_height - height + 1 > 2 * MAX_TX_CONFIRMATIONS:
+                        del self.tx_heights[tx_hash]
+
+                # and of transactions that stayed out of blocks that long (e.g. dropped from the mempool)
+                for (tx_hash, height) in self.unconfirmed.items():
+                    if self.tip_height - height + 1 > 2 * MAX_TX_CONFIRMATIONS:
+                        del self.unconfirmed[tx_hash]
+
+            self.tip_time = time.time()
+            return self.tip_height
+
+        except Exception as e:
+            if BLOCKSTACK_DEBUG:
+                log.exception(e)
+
+            log.debug("ERROR: failed to query the chain tip")
+            self.reset_client()
+            return None
+
+
+    def _find_mined(self, client, tip, old_tip_hash):
+        """
+        Walk back from the new tip to the old one, and record the heights of
+        the unconfirmed transactions that the new blocks include.
+        Return True if we got back to the old tip
+        Return False if not (too many new blocks, or no transaction lists)
+        """
+        block = tip
+        for i in xrange(0, self.max_new_blocks):
+            if 'tx' not in block:
+                return False
+
+            for tx_hash in block['tx']:
+                if tx_hash in self.unconfirmed:
+                    del self.unconfirmed[tx_hash]
+                    self.tx_heights[tx_hash] = int(block['height'])
+
+            prev_hash = block.get('previousblockhash', None)
+            if prev_hash is None:
+                return False
+
+            if prev_hash == old_tip_hash:
+                return True
+
+            block = client.getblock(prev_hash)
+
+        return False
+
+
+    def get_tx_confirmations(self, tx_hash):
+        """
+        Get the number of confirmations for a transaction.
+        Return None on error (like get_tx_confirmations())
+        """
+        with self.lock:
+            if self.tip_height is None or time.time() - self.tip_time > self.max_tip_age:
+                if self._refresh() is None:
+                    return None
+
+            height = self.tx_heights.get(tx_hash, None)
+            if height is not None:
+                return max(self.tip_height - height + 1, 0)
+
+            if tx_hash in self.unconfirmed:
+                return 0
+
+            try:
+                client = self.get_client()
+
+                # second argument of '1' asks for results in JSON
+                tx_data = client.getrawtransaction(tx_hash, 1)
+                if tx_data is None:
+                    log.debug("No such tx %s" % tx_hash)
+                    return 0
+
+                confirmations = tx_data.get('confirmations', None)
+                if confirmations is None:
+                    if 'txid' not in tx_data:
+                        return None
+
+                    self.unconfirmed[tx_hash] = self.tip_height
+                    return 0
+
+                if confirmations <= 0 or 'blockhash' not in tx_data:
+                    return confirmations
+
+                block = client.getblock(tx_data['blockhash'])
+                height = int(block['height'])
+
+            except Exception as e:
+                log.debug("ERROR: failed to query tx details for %s" % tx_hash)
+                self.reset_client()
+                return None
+
+            if height > self.tip_height:
+                # mined since we last looked at the tip
+                if self._refresh() is None:
+                    return None
+
+            self.tx_heights[tx_hash] = height
+            confirmations = max(self.tip_height - height + 1, 0)
+
+            log.debug("Tx %s has %s confirmations (in block %s)" % (tx_hash, confirmations, height))
+            return confirmations
+
+
+CONFIRMATION_TRACKERS = {}
+CONFIRMATION_TRACKERS_LOCK = threading.Lock()
+
+def get_confirmation_tracker(config_path=CONFIG_PATH):
+    """
+    Get the shared confirmation tracker for this config
+    """
+    with CONFIRMATION_TRACKERS_LOCK:
+        if not CONFIRMATION_TRACKERS.has_key(config_path):
+            CONFIRMATION_TRACKERS[config_path] = ConfirmationTracker(config_path=config_path)
+
+        return CONFIRMATION_TRACKERS[config_path]
+
+
+def is_tx_accepted( tx_hash, num_needed=DEFAULT_TX_CONFIRMATIONS_NEEDED, config_path=CONFIG_PATH, tracker=None ):
     """
     Determine whether or not a transaction was accepted.
+    Use @tracker to get confirmations, if given.
     """
-    tx_confirmations = get_tx_confirmations(tx_hash, config_path=config_path)
+    if tracker is not None:
+        tx_confirmations = tracker.get_tx_confirmations(tx_hash)
+    else:
+        tx_confirmations = get_tx_confirmations(tx_hash, config_path=config_path)
+
     if tx_confirmations >= num_needed:
         return True
 
@@ -153,6 +362,7 @@ def get_utxos(address, config_path=CONFIG_PATH, utxo_client=None, min_confirmati
     """
 
     from ..scripts import tx_get_unspents
+    from ..utxo import is_spendable_utxo
 
     utxo_client, min_confirmations = get_utxo_client_and_min_confirmations(config_path=config_path, utxo_client=utxo_client, min_confirmations=min_confirmations)
 
@@ -165,11 +375,11 @@ def get_utxos(address, config_path=CONFIG_PATH, utxo_client=None, min_confirmati
         data = {'error': 'Failed to get UTXOs for %s' % address}
         return data
    
-    # filter unconfirmed
+    # filter unconfirmed (but let our own unconfirmed change through)
     ret = []
     for utxo in data:
         if 'confirmations' in utxo:
-            if int(utxo['confirmations']) >= utxo_client.min_confirmations:
+            if is_spendable_utxo(utxo, utxo_client.min_confirmations):
                 ret.append(utxo)
 
     return ret
@@ -209,7 +419,7 @@ def broadcast_tx(tx_hex, config_path=CONFIG_PATH, tx_broadcaster=None):
     Return {'error': ...} on failure.
     """
     from ..config import get_tx_broadcaster
-    from ..utxo import broadcast_transaction
+    from ..utxo import broadcast_transaction, UTXO_CACHE
 
     if tx_broadcaster is None:
         tx_broadcaster = get_tx_broadcaster(config_path=config_path)
@@ -243,6 +453,13 @@ def broadcast_tx(tx_hex, config_path=CONFIG_PATH, tx_broadcaster=None):
     resp['status'] = True
     resp['transaction_hash'] = resp.pop('tx_hash')
 
+    # don't re-use the outputs we just spent, even if the UTXO provider hasn't seen this tx yet
+    try:
+        UTXO_CACHE.add_transaction(tx_hex)
+    except Exception as e:
+        log.exception(e)
+        log.warning("Failed to track the outputs of {}".format(resp['transaction_hash']))
+
     return resp
 
 
@@ -273,13 +490,15 @@ def get_balance(address, config_path=CONFIG_PATH, utxo_client=None, min_confirma
 
 def is_address_usable(address, config_path=CONFIG_PATH, utxo_client=None, min_confirmations=None):
     """
-    Check if an address is usable (i.e. it has no unconfirmed transactions).
+    Check if an address is usable (i.e. it has no unconfirmed transactions,
+    besides our own ones whose outputs we can spend already).
 
     Return True if the address has no unconfirmed transactions.
     Return False otherwise.
     """
 
     from ..scripts import tx_get_unspents
+    from ..utxo import is_spendable_utxo
 
     utxo_client, min_confirmations = get_utxo_client_and_min_confirmations(config_path=config_path, utxo_client=utxo_client, min_confirmations=min_confirmations)
     if min_confirmations == 0:
@@ -299,7 +518,7 @@ def is_address_usable(address, config_path=CONFIG_PATH, utxo_client=None, min_co
 
     for unspent in data:
         if 'confirmations' in unspent:
-            if int(unspent['confirmations']) < min_confirmations:
+            if not is_spendable_utxo(unspent, min_confirmations):
                 log.debug("Address {} is not usable: UTXO {},{} has {} confirmations".format(address, unspent['outpoint']['hash'], unspent['outpoint']['index'], unspent['confirmations']))
                 return False
 
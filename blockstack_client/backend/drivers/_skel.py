@@ -268,7 +268,8 @@ def storage_init(conf, **kwargs):
    #        callable to delete a chunk of data via this driver (takes the driver config and chunk ID and returns True/False),
    #        driver_info={a dict of driver-specific information, like API keys},
    #        index_stem="the prefix for all index-related metadata, like "/blockstack/index' or similar",
-   #        compress=True/False
+   #        compress=True/False,
+   #        compress_level=zlib level 0-9 (see parse_compress_level(); defaults to 9)
    # )
    # 
    # index_setup(dvconf, force=force_index)
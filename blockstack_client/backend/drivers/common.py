@@ -74,6 +74,16 @@ INDEX_CACHE_LOCKS = {}
 # map blockchain_id --> manifest URL
 INDEX_MANIFEST_URL_CACHE = {}
 
+# map driver_name --> {bucket ID: IndexPageWriter}
+INDEX_PAGE_WRITERS = {}
+INDEX_PAGE_WRITERS_LOCK = threading.Lock()
+
+# map driver_name --> {fully-qualified bucket name: URL of the last bucket page we stored}
+INDEX_MANIFEST_UPDATES = {}
+
+# this thread's batch of deferred index page uploads (an IndexWriteBatch), and its nesting depth
+INDEX_WRITE_BATCH = threading.local()
+
 # operations in progress
 IN_PROGRESS = {}
 IN_PROGRESS_LOCK = threading.Lock()
@@ -119,6 +129,105 @@ def nonconcurrent(operation_name):
     return decorator
 
 
+class IndexPageWriter(object):
+    """
+    Group commit for one index page.
+
+    Writers change the cached copy of the page, call changed(), and then
+    call flush() to wait for an upload that includes their change.  Only
+    one upload runs at a time; every change made while it is in flight is
+    picked up by the next one.  So N concurrent writers to the same page
+    cause about two uploads, instead of N.
+    """
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.generation = 0
+        self.flushed_generation = 0
+        self.failed_generation = 0
+        self.flushing = False
+
+
+    def is_stored(self):
+        """
+        Has every change to the cached page been stored?
+        """
+        with self.cond:
+            return self.flushed_generation == self.generation
+
+
+    def changed(self):
+        """
+        Note that the cached page changed.
+        Must be called with the page's lock held.
+        Return the generation to pass to flush()
+        """
+        with self.cond:
+            self.generation += 1
+            return self.generation
+
+
+    def flush(self, generation, upload):
+        """
+        Make sure that the page, as of @generation, is stored.
+        @upload is a callable that stores the current cached page,
+        and returns True on success.
+
+        Return True if an upload that started after @generation succeeded
+        Return False if it failed
+        """
+        with self.cond:
+            while True:
+                if self.flushed_generation >= generation:
+                    return True
+
+                if self.failed_generation >= generation:
+                    return False
+
+                if not self.flushing:
+                    break
+
+                self.cond.wait()
+
+            # we upload, on behalf of everyone up to here
+            self.flushing = True
+            target_generation = self.generation
+
+        rc = False
+        try:
+            rc = upload()
+        finally:
+            with self.cond:
+                self.flushing = False
+                if rc:
+                    self.flushed_generation = max(self.flushed_generation, target_generation)
+                else:
+                    self.failed_generation = max(self.failed_generation, target_generation)
+
+                self.cond.notify_all()
+
+        return rc
+
+
+class IndexWriteBatch(object):
+    """
+    Index pages changed in a batch (see index_batch_begin()),
+    which can be shared by several threads (see index_batch_bind()).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pages = {}     # map (driver_name, bucket ID) --> (dvconf, path, generation)
+
+
+    def add(self, dvconf, bucket_id, path, generation):
+        """
+        Note that a page needs to be stored, as of @generation
+        """
+        key = (dvconf['driver_name'], bucket_id)
+        with self.lock:
+            if key not in self.pages or self.pages[key][2] < generation:
+                self.pages[key] = (dvconf, path, generation)
+
+
 def get_logger(name=None):
     """
     Get logger
@@ -152,14 +261,33 @@ def get_logger(name=None):
 log = get_logger('blockstack-backend-drivers-common')
 
 
-def compress_chunk( chunk_buf ):
+# zlib compression level (0-9); drivers can set their own with the 'compress_level' option
+COMPRESS_LEVEL_DEFAULT = 9
+
+
+def compress_chunk( chunk_buf, level=COMPRESS_LEVEL_DEFAULT ):
     """
     compress a chunk of data
     """
-    data = zlib.compress(chunk_buf, 9)
+    data = zlib.compress(chunk_buf, level)
     return data
 
 
+def parse_compress_level( level_str ):
+    """
+    Parse a driver's 'compress_level' option.
+    Return the level on success
+    Return COMPRESS_LEVEL_DEFAULT if it's not a valid zlib level
+    """
+    try:
+        level = int(level_str)
+        assert 0 <= level <= 9
+        return level
+    except (ValueError, AssertionError):
+        log.warn("Invalid compression level '{}'; using {}".format(level_str, COMPRESS_LEVEL_DEFAULT))
+        return COMPRESS_LEVEL_DEFAULT
+
+
 def decompress_chunk( chunk_buf ):
     """
     decompress a chunk of data
@@ -300,12 +428,13 @@ def get_index_bucket_names():
     return ['{:1x}'.format(i) for i in xrange(0, 16)]
 
 
-def driver_config(driver_name, config_path, get_chunk, put_chunk, delete_chunk, driver_info=None, index_stem='index', compress=False):
+def driver_config(driver_name, config_path, get_chunk, put_chunk, delete_chunk, driver_info=None, index_stem='index', compress=False, compress_level=COMPRESS_LEVEL_DEFAULT):
     """
     Set up the driver.
     @get_chunk is a callable that takes (dvconf, path) as an argument and returns data
     @put_chunk is a callable that takes (dvconf, data, path) as arguments and returns a URL
     @delete_chunk is a callable that takes (dvconf, path) as an argument and returns True/False
+    @compress_level is the zlib level to compress data with, if @compress is True
 
     Neither callable should call any of the indexing methods.
 
@@ -319,7 +448,8 @@ def driver_config(driver_name, config_path, get_chunk, put_chunk, delete_chunk,
         'delete_chunk': delete_chunk,
         'index_stem': index_stem,
         'driver_info': driver_info,
-        'compress': compress
+        'compress': compress,
+        'compress_level': compress_level,
     }
 
 
@@ -708,6 +838,39 @@ def index_set_page(dvconf, bucket_id, path, index_page):
     return True  
 
 def index_update_manifest(dvconf, bucket_id, bucket_url):
+    """
+    Point the index manifest at a bucket page's new URL.
+    Concurrent updates are coalesced into as few manifest uploads as possible.
+
+    Return True on success
+    Return False on error
+    """
+    global INDEX_MANIFEST_UPDATES
+
+    driver_name = dvconf['driver_name']
+    index_stem = dvconf['index_stem']
+
+    fq_index_bucket_name = normpath('/' + os.path.join(index_stem.strip('/'), bucket_id))
+    writer = index_page_get_writer(driver_name, 'manifest')
+
+    with index_page_get_lock(driver_name, 'manifest'):
+        if not INDEX_MANIFEST_UPDATES.has_key(driver_name):
+            INDEX_MANIFEST_UPDATES[driver_name] = {}
+
+        INDEX_MANIFEST_UPDATES[driver_name][fq_index_bucket_name] = bucket_url
+        generation = writer.changed()
+
+    return writer.flush(generation, lambda: index_store_manifest(dvconf))
+
+
+def index_store_manifest(dvconf):
+    """
+    Fetch the index manifest, point it at all the bucket page URLs
+    we have stored so far, and store it.
+
+    Return True on success
+    Return False on error
+    """
     driver_name = dvconf['driver_name']
     config_path = dvconf['config_path']
     index_stem = dvconf['index_stem']
@@ -719,16 +882,15 @@ def index_update_manifest(dvconf, bucket_id, bucket_url):
     if index_manifest is None:
         # failed to get index
         log.error("Failed to get index page {}".format(index_manifest_url))
-        return None
+        return False
 
-    fq_index_bucket_name = normpath('/' + os.path.join(index_stem.strip('/'), bucket_id))
+    with index_page_get_lock(driver_name, 'manifest'):
+        index_manifest.update(INDEX_MANIFEST_UPDATES.get(driver_name, {}))
 
-    index_manifest[fq_index_bucket_name] = bucket_url
     index_manifest_data = serialize_index_page(index_manifest)
     index_manifest_url = None
     try:
-        index_path = index_get_manifest_page_path(index_stem)
-        index_manifest_url = dvconf['put_chunk'](dvconf, index_manifest_data, index_path)
+        index_manifest_url = dvconf['put_chunk'](dvconf, index_manifest_data, index_manifest_path)
         assert index_manifest_url
     except Exception as e:
         if DEBUG:
@@ -742,7 +904,7 @@ def index_update_manifest(dvconf, bucket_id, bucket_url):
         # failed 
         return False
 
-    return index_manifest_url
+    return True
 
 
 def index_locks_setup(driver_name):
@@ -772,10 +934,139 @@ def index_page_get_lock(driver_name, bucket_id):
     return INDEX_CACHE_LOCKS[driver_name][bucket_id]
 
 
+def index_page_get_writer(driver_name, bucket_id):
+    """
+    Return the IndexPageWriter for a page
+    """
+    global INDEX_PAGE_WRITERS
+    with INDEX_PAGE_WRITERS_LOCK:
+        if not INDEX_PAGE_WRITERS.has_key(driver_name):
+            INDEX_PAGE_WRITERS[driver_name] = {}
+
+        if not INDEX_PAGE_WRITERS[driver_name].has_key(bucket_id):
+            INDEX_PAGE_WRITERS[driver_name][bucket_id] = IndexPageWriter()
+
+        return INDEX_PAGE_WRITERS[driver_name][bucket_id]
+
+
+def index_flush_page(dvconf, bucket_id, path, generation):
+    """
+    Store the cached index page for @bucket_id, as of @generation
+    (or later).  Concurrent flushes of the same page share uploads.
+
+    If this thread has an index write batch open (or is working for one;
+    see index_batch_bind()), just remember that the page needs to be
+    stored when the batch ends.
+
+    Return True on success
+    Return False on error
+    """
+    driver_name = dvconf['driver_name']
+
+    batch = getattr(INDEX_WRITE_BATCH, 'batch', None)
+    if batch is not None:
+        batch.add(dvconf, bucket_id, path, generation)
+        return True
+
+    def _upload():
+        with index_page_get_lock(driver_name, bucket_id):
+            index_page = dict(index_get_cached_page(driver_name, bucket_id))
+
+        return index_set_page(dvconf, bucket_id, path, index_page)
+
+    return index_page_get_writer(driver_name, bucket_id).flush(generation, _upload)
+
+
+def index_batch_begin():
+    """
+    Start a batch of index updates in this thread.
+    Until the matching index_batch_end(), index_insert() and index_remove()
+    only update the cached index pages; each page that changed is
+    stored once, when the batch ends.
+
+    Batches nest; only the outermost index_batch_end() stores pages.
+    Other threads can join the batch with index_batch_bind().
+    """
+    depth = getattr(INDEX_WRITE_BATCH, 'depth', 0)
+    if depth == 0:
+        INDEX_WRITE_BATCH.batch = IndexWriteBatch()
+
+    INDEX_WRITE_BATCH.depth = depth + 1
+
+
+def index_batch_bind(func):
+    """
+    Wrap @func so that its index updates go to this thread's index write
+    batch, no matter which thread calls it.  Use this to hand work to
+    worker threads inside a batch.  The batch must not end until the
+    wrapped function has returned.
+
+    Return @func if this thread has no batch open.
+    """
+    batch = getattr(INDEX_WRITE_BATCH, 'batch', None)
+    if batch is None:
+        return func
+
+    def inner(*args, **kw):
+        prev_batch = getattr(INDEX_WRITE_BATCH, 'batch', None)
+        INDEX_WRITE_BATCH.batch = batch
+        try:
+            return func(*args, **kw)
+        finally:
+            INDEX_WRITE_BATCH.batch = prev_batch
+
+    return inner
+
+
+def index_batch_end():
+    """
+    End a batch of index updates in this thread, and store the pages
+    that changed in it.  Pages are stored in parallel, so the index
+    manifest updates they cause get coalesced as well.
+
+    Return True if all pages were stored (or this was a nested batch)
+    Return False if not
+    """
+    INDEX_WRITE_BATCH.depth -= 1
+    if INDEX_WRITE_BATCH.depth > 0:
+        return True
+
+    batch = INDEX_WRITE_BATCH.batch
+    INDEX_WRITE_BATCH.batch = None
+
+    with batch.lock:
+        pages = dict(batch.pages)
+
+    results = {}
+
+    def _flush(key):
+        dvconf, path, generation = pages[key]
+        results[key] = index_flush_page(dvconf, key[1], path, generation)
+
+    threads = [threading.Thread(target=_flush, args=(key,)) for key in pages.keys()]
+    for t in threads:
+        t.start()
+
+    for t in threads:
+        t.join()
+
+    failed = [key for key in pages.keys() if not results.get(key, False)]
+    for (driver_name, bucket_id) in failed:
+        log.error("Failed to store index page {} for {}".format(bucket_id, driver_name))
+
+    return len(failed) == 0
+
+
 def index_insert(dvconf, name, url):
     """
     Insert a url into the index.
 
+    The index page is stored before this returns, unless this thread has
+    an index write batch open (see index_batch_begin()).  In that case it
+    is stored when the batch ends, and until then readers may not see
+    the new url.  If the stored page already maps @name to @url, nothing
+    is stored.
+
     Return True on success
     Return False if not.
     """
@@ -794,14 +1085,25 @@ def index_insert(dvconf, name, url):
             if index_page is None:
                 index_page = {}
 
+        writer = index_page_get_writer(driver_name, bucket_id)
+        if index_page.get(name, None) == url and writer.is_stored():
+            # already stored (e.g. we rewrote data whose URL doesn't change)
+            return True
+
         index_page[name] = url
         index_set_cached_page(driver_name, bucket_id, index_page, locked=True)
-        return index_set_page(dvconf, bucket_id, path, index_page)
+        generation = writer.changed()
+
+    return index_flush_page(dvconf, bucket_id, path, generation)
     
 
 def index_remove( dvconf, name ):
     """
     Remove a url from the index.
+
+    Like index_insert(), the index page is stored before this returns,
+    unless this thread has an index write batch open.
+
     Return True on success
     Return False if not.
     """
@@ -827,7 +1129,9 @@ def index_remove( dvconf, name ):
 
         del index_page[name]
         index_set_cached_page(driver_name, bucket_id, index_page, locked=True)
-        return index_set_page(dvconf, bucket_id, path, index_page)
+        generation = index_page_get_writer(driver_name, bucket_id).changed()
+
+    return index_flush_page(dvconf, bucket_id, path, generation)
 
 
 def index_cached_lookup( driver_name, name, index_stem ):
@@ -933,7 +1237,7 @@ def put_indexed_data( dvconf, name, chunk_buf, raw=False, index=True ):
     Return False on error
     """
     if dvconf['compress'] and not raw:
-        compressed_chunk = compress_chunk(chunk_buf)
+        compressed_chunk = compress_chunk(chunk_buf, dvconf.get('compress_level', COMPRESS_LEVEL_DEFAULT))
     else:
         compressed_chunk = chunk_buf
 
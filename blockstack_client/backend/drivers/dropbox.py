@@ -164,6 +164,7 @@ def storage_init(conf, index=False, force_index=False, **kwargs):
     """
     global DROPBOX_TOKEN, DVCONF
     compress = False
+    compress_level = COMPRESS_LEVEL_DEFAULT
     config_path = conf['path']
 
     if os.path.exists( config_path ):
@@ -183,12 +184,15 @@ def storage_init(conf, index=False, force_index=False, **kwargs):
             if parser.has_option('dropbox', 'compress'):
                 compress = (parser.get('dropbox', 'compress').lower() in ['1', 'true', 'yes'])
 
+            if parser.has_option('dropbox', 'compress_level'):
+                compress_level = parse_compress_level(parser.get('dropbox', 'compress_level'))
+
     # need the token 
     if DROPBOX_TOKEN is None:
         log.warn("Config file '{}': section 'dropbox' is missing 'token'.  Write access will be disabled".format(config_path))
 
     # set up driver 
-    DVCONF = driver_config("dropbox", config_path, dropbox_get_chunk, dropbox_put_chunk, dropbox_delete_chunk, driver_info={'dropbox_token': DROPBOX_TOKEN}, index_stem=INDEX_DIRNAME, compress=compress)
+    DVCONF = driver_config("dropbox", config_path, dropbox_get_chunk, dropbox_put_chunk, dropbox_delete_chunk, driver_info={'dropbox_token': DROPBOX_TOKEN}, index_stem=INDEX_DIRNAME, compress=compress, compress_level=compress_level)
     if index:
         # instantiate the index 
         url = index_setup(DVCONF, force=force_index)
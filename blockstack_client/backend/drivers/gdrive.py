@@ -39,6 +39,7 @@ log.setLevel( logging.DEBUG if DEBUG else logging.INFO )
 GDRIVE_FOLDER_NAME = None
 GDRIVE_FOLDER_ID = None
 GDRIVE_COMPRESS = False
+GDRIVE_COMPRESS_LEVEL = COMPRESS_LEVEL_DEFAULT
 GDRIVE_HANDLE = None
 GDRIVE_SETTINGS_PATH = None
 RELOAD_DRIVE = False
@@ -120,7 +121,7 @@ def gdrive_put_chunk( dvconf, chunk_buf, name ):
     """
     global GDRIVE_FOLDER_ID
     if GDRIVE_COMPRESS:
-        compressed_chunk = compress_chunk(chunk_buf)
+        compressed_chunk = compress_chunk(chunk_buf, GDRIVE_COMPRESS_LEVEL)
     else:
         compressed_chunk = chunk_buf
 
@@ -315,7 +316,7 @@ def storage_init(conf, index=False, force_index=False, **kw):
     """
     Initialize google drive storage driver
     """
-    global GDRIVE_FOLDER_NAME, GDRIVE_FOLDER_ID, GDRIVE_COMPRESS, GDRIVE_SETTINGS_PATH, RELOAD_DRIVE, DVCONF
+    global GDRIVE_FOLDER_NAME, GDRIVE_FOLDER_ID, GDRIVE_COMPRESS, GDRIVE_COMPRESS_LEVEL, GDRIVE_SETTINGS_PATH, RELOAD_DRIVE, DVCONF
     
     settings_path = None
     config_path = conf['path']
@@ -353,6 +354,9 @@ def storage_init(conf, index=False, force_index=False, **kw):
             if parser.has_option('gdrive', 'compress'):
                 GDRIVE_COMPRESS = (parser.get('gdrive', 'compress').lower() in ['1', 'true', 'yes'])
 
+            if parser.has_option('gdrive', 'compress_level'):
+                GDRIVE_COMPRESS_LEVEL = parse_compress_level(parser.get('gdrive', 'compress_level'))
+
         else:
             log.error("Config file {}: no 'gdrive' section")
             return False
@@ -382,7 +386,7 @@ def storage_init(conf, index=False, force_index=False, **kw):
     GDRIVE_SETTINGS_PATH = settings_path
 
     # set up driver 
-    DVCONF = driver_config("gdrive", config_path, gdrive_get_chunk, gdrive_put_chunk, gdrive_delete_chunk, index_stem=INDEX_DIRNAME, compress=GDRIVE_COMPRESS)
+    DVCONF = driver_config("gdrive", config_path, gdrive_get_chunk, gdrive_put_chunk, gdrive_delete_chunk, index_stem=INDEX_DIRNAME, compress=GDRIVE_COMPRESS, compress_level=GDRIVE_COMPRESS_LEVEL)
     if index:
         # instantiate the index 
         url = index_setup(DVCONF, force=force_index)
@@ -36,7 +36,8 @@ from common import get_logger, driver_config, DEBUG, \
     index_setup, decompress_chunk, index_make_mutable_url, \
     index_put_mutable_handler, index_put_immutable_handler, \
     index_get_mutable_handler, index_get_immutable_handler, \
-    index_delete_mutable_handler, index_delete_immutable_handler
+    index_delete_mutable_handler, index_delete_immutable_handler, \
+    COMPRESS_LEVEL_DEFAULT, parse_compress_level
 from ConfigParser import SafeConfigParser
 
 log = get_logger("blockstack-storage-driver-ipfs")
@@ -172,6 +173,7 @@ def storage_init(conf, index=False, force_index=False, **kwargs):
     ipfs_server = None
     ipfs_port = None
     ipfs_compress = IPFS_DEFAULT_COMPRESS
+    ipfs_compress_level = COMPRESS_LEVEL_DEFAULT
 
     # path to the CLI's configuration file (where you can stash 
     # driver-specific configuration)
@@ -201,6 +203,9 @@ def storage_init(conf, index=False, force_index=False, **kwargs):
                                     'false'
                                     ).lower() in ['true', '1', 'yes'])
 
+            if parser.has_option('ipfs', 'compress_level'):
+                ipfs_compress_level = parse_compress_level(parser.get('ipfs', 'compress_level'))
+
     if ipfs_server is None:
         log.error("IPFS driver is READ-ONLY: no IPFS server "
                   "configuration found in {}".format(config_path))
@@ -220,6 +225,7 @@ def storage_init(conf, index=False, force_index=False, **kwargs):
                     },
                 index_stem=INDEX_DIRNAME,
                 compress=ipfs_compress,
+                compress_level=ipfs_compress_level,
                 )
 
     if index:
@@ -33,7 +33,8 @@ import time
 
 import onedrivesdk
 from onedrivesdk.helpers import GetAuthCodeServer
-from common import get_driver_settings_dir, DEBUG, get_logger, compress_chunk, decompress_chunk, setup_scratch_space, make_scratch_file
+from common import get_driver_settings_dir, DEBUG, get_logger, compress_chunk, decompress_chunk, setup_scratch_space, make_scratch_file, \
+        COMPRESS_LEVEL_DEFAULT, parse_compress_level
 
 from ConfigParser import SafeConfigParser
 
@@ -48,6 +49,7 @@ ONEDRIVE_FOLDER_NAME = None
 ONEDRIVE_FOLDER_ID = None
 ONEDRIVE_HANDLE = None
 ONEDRIVE_COMPRESS = False
+ONEDRIVE_COMPRESS_LEVEL = COMPRESS_LEVEL_DEFAULT
 RELOAD_DRIVE = False
 DOWNLOAD_SCRATCH_SPACE = None
 
@@ -239,7 +241,7 @@ def put_chunk( drive, name, chunk_buf ):
     assert DOWNLOAD_SCRATCH_SPACE
 
     if ONEDRIVE_COMPRESS:
-        compressed_chunk = compress_chunk(chunk_buf)
+        compressed_chunk = compress_chunk(chunk_buf, ONEDRIVE_COMPRESS_LEVEL)
     else:
         compressed_chunk = chunk_buf
 
@@ -411,7 +413,7 @@ def storage_init(conf, **kw):
     """
     Set up and load storage
     """
-    global ONEDRIVE_FOLDER_NAME, ONEDRIVE_FOLDER_ID, ONEDRIVE_COMPRESS
+    global ONEDRIVE_FOLDER_NAME, ONEDRIVE_FOLDER_ID, ONEDRIVE_COMPRESS, ONEDRIVE_COMPRESS_LEVEL
     global CLIENT_ID, CLIENT_SECRET, REDIRECT_URL, SESSION_SAVE_PATH, RELOAD_DRIVE
     global DOWNLOAD_SCRATCH_SPACE
     
@@ -451,6 +453,9 @@ def storage_init(conf, **kw):
             if parser.has_option('onedrive', 'compress'):
                 ONEDRIVE_COMPRESS = (parser.get('onedrive', 'compress').lower() in ['1', 'true', 'yes'])
 
+            if parser.has_option('onedrive', 'compress_level'):
+                ONEDRIVE_COMPRESS_LEVEL = parse_compress_level(parser.get('onedrive', 'compress_level'))
+
             if parser.has_option('onedrive', 'redirect_uri'):
                 REDIRECT_URL = parser.get('onedrive', 'redirect_uri')
             else:
@@ -34,7 +34,7 @@ from boto.s3.key import Key
 import logging
 logging.getLogger('boto').setLevel(logging.CRITICAL)
 
-from common import get_logger, DEBUG, compress_chunk, decompress_chunk
+from common import get_logger, DEBUG, compress_chunk, decompress_chunk, COMPRESS_LEVEL_DEFAULT, parse_compress_level
 
 log = get_logger("blockstack-storage-driver-s3")
 
@@ -44,6 +44,7 @@ AWS_BUCKET = "blockstack-server-profiles"
 AWS_ACCESS_KEY_ID = None 
 AWS_SECRET_ACCESS_KEY = None
 AWS_COMPRESS = True
+AWS_COMPRESS_LEVEL = COMPRESS_LEVEL_DEFAULT
 
 #-------------------------
 def get_bucket( bucket_name ):
@@ -135,7 +136,7 @@ def write_chunk( chunk_path, chunk_buf ):
     size = None
     try:
         if AWS_COMPRESS:
-            compressed_data = compress_chunk( chunk_buf )
+            compressed_data = compress_chunk( chunk_buf, AWS_COMPRESS_LEVEL )
         else:
             compressed_data = chunk_buf
 
@@ -252,7 +253,7 @@ def storage_init(conf, **kw):
     Return True on success
     Return False on error 
     """
-    global AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_BUCKET, AWS_COMPRESS
+    global AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_BUCKET, AWS_COMPRESS, AWS_COMPRESS_LEVEL
 
     config_path = conf['path']
     if os.path.exists( config_path ):
@@ -278,6 +279,9 @@ def storage_init(conf, **kw):
             
             if parser.has_option('s3', 'compress'):
                 AWS_COMPRESS = (parser.get('s3', 'compress', 'false').lower() in ['true', '1'])
+
+            if parser.has_option('s3', 'compress_level'):
+                AWS_COMPRESS_LEVEL = parse_compress_level(parser.get('s3', 'compress_level'))
             
     # we can't proceed unless we have all three.
     if AWS_BUCKET is None:
@@ -25,6 +25,7 @@ import sys
 import json
 import time
 import random
+import threading
 import keylib
 
 # Hack around absolute paths
@@ -137,6 +138,90 @@ def estimate_input_length( privkey_info ):
     return siglen + outpoint_hash_len + outpoint_index_len + encoding_pad
 
 
+# How many bytes signing adds to a transaction,
+# keyed by (opcode, signature class, number of inputs).
+# Learned by signing the first transaction of each kind.
+SIGNED_SIZE_MODEL = {}
+SIGNED_SIZE_MODEL_LOCK = threading.Lock()
+
+# DER-encoded signatures vary in length by up to three bytes
+# (r and s are each 31 to 33 bytes long)
+SIGNATURE_LEN_SLACK = 3
+
+# A multisig p2sh scriptSig is about 253 bytes long, so its length
+# prefix can grow from one byte to three
+SCRIPTSIG_LEN_SLACK = 2
+
+
+def get_signature_class( privkey_info ):
+    """
+    Classify a private key bundle by the size of the signatures it makes:
+    (scriptsig type, pubkey or redeem script length, signatures per input)
+    Return None if we don't recognize it
+    """
+    if virtualchain.is_singlesig(privkey_info):
+        pubkey_hex = ecdsa_private_key(privkey_info).public_key().to_hex()
+        return ('p2pkh', len(pubkey_hex) / 2, 1)
+
+    if virtualchain.is_multisig(privkey_info) or virtualchain.btc_is_multisig_segwit(privkey_info) or virtualchain.btc_is_singlesig_segwit(privkey_info):
+        m, _ = virtualchain.parse_multisig_redeemscript(privkey_info['redeem_script'])
+        if virtualchain.is_multisig(privkey_info):
+            scriptsig_type = 'p2sh'
+        elif virtualchain.btc_is_multisig_segwit(privkey_info):
+            scriptsig_type = 'p2sh-p2wsh'
+        else:
+            scriptsig_type = 'p2sh-p2wpkh'
+
+        return (scriptsig_type, len(privkey_info['redeem_script']) / 2, m)
+
+    return None
+
+
+def estimate_signed_tx( opcode, unsigned_tx, prev_outputs, privkey_info ):
+    """
+    Get a transaction that is as long as @unsigned_tx will be once
+    @privkey_info signs all of its inputs (@prev_outputs).
+    If we've signed this kind of transaction before, the unsigned tx is
+    padded by the size model.  Otherwise, it gets signed for real, and the
+    size model learns from it.
+
+    Return the (padded or signed) tx on success
+    Raise on error
+    """
+    try:
+        sig_class = get_signature_class(privkey_info)
+    except Exception as e:
+        if BLOCKSTACK_DEBUG:
+            log.exception(e)
+
+        sig_class = None
+
+    model_key = (opcode, sig_class, len(prev_outputs))
+
+    if sig_class is not None:
+        with SIGNED_SIZE_MODEL_LOCK:
+            sig_len = SIGNED_SIZE_MODEL.get(model_key, None)
+
+        if sig_len is not None:
+            return unsigned_tx + '00' * sig_len
+
+    signed_tx = sign_tx( unsigned_tx, prev_outputs, privkey_info )
+
+    if sig_class is not None:
+        # allow for longer signatures next time
+        slack = SIGNATURE_LEN_SLACK * sig_class[2]
+        if sig_class[0] == 'p2sh':
+            slack += SCRIPTSIG_LEN_SLACK
+
+        sig_len = (len(signed_tx) - len(unsigned_tx)) / 2 + slack * len(prev_outputs)
+        log.debug("Signing {} inputs of a {} with a {} key adds {} bytes".format(len(prev_outputs), opcode, sig_class[0], sig_len))
+
+        with SIGNED_SIZE_MODEL_LOCK:
+            SIGNED_SIZE_MODEL[model_key] = max(sig_len, SIGNED_SIZE_MODEL.get(model_key, 0))
+
+    return signed_tx
+
+
 def make_cheapest_nameop( opcode, utxo_client, payment_address, payment_utxos, *tx_args, **tx_kw ):
     """
     Make the cheapest transaction possible.
@@ -876,7 +961,7 @@ def estimate_name_import_tx_fee( fqu, reveal_privkey_info, recipient_address, tx
             unsigned_tx, num_utxos = make_cheapest_name_import( fqu, recipient_address, fake_zonefile_hash, reveal_addr, utxo_client, importer_utxos)
             assert unsigned_tx
         
-            signed_tx = sign_tx( unsigned_tx, importer_utxos[:num_utxos], reveal_privkey_info )
+            signed_tx = estimate_signed_tx( 'NAME_IMPORT', unsigned_tx, importer_utxos[:num_utxos], reveal_privkey_info )
             assert signed_tx
 
         except AssertionError, ae:
@@ -941,7 +1026,7 @@ def estimate_namespace_preorder_tx_fee( namespace_id, cost, payment_privkey_info
             unsigned_tx, num_utxos = make_cheapest_namespace_preorder( namespace_id, payment_address, fake_reveal_address, cost, fake_consensus_hash, utxo_client, payment_utxos)
             assert unsigned_tx
 
-            signed_tx = sign_tx( unsigned_tx, payment_utxos[:num_utxos], payment_privkey_info )
+            signed_tx = estimate_signed_tx( 'NAMESPACE_PREORDER', unsigned_tx, payment_utxos[:num_utxos], payment_privkey_info )
             assert signed_tx
 
         except AssertionError as ae:
@@ -1007,7 +1092,7 @@ def estimate_namespace_reveal_tx_fee( namespace_id, payment_privkey_info, tx_fee
             unsigned_tx, num_utxos = make_cheapest_namespace_reveal( namespace_id, 1, fake_reveal_address, 1, 2, 3, [4,5,6,7,8,9,10,11,12,13,14,15,0,1,2,3], 4, 5, payment_address, utxo_client, payment_utxos)
             assert unsigned_tx
 
-            signed_tx = sign_tx(unsigned_tx, payment_utxos[:num_utxos], payment_privkey_info)
+            signed_tx = estimate_signed_tx('NAMESPACE_REVEAL', unsigned_tx, payment_utxos[:num_utxos], payment_privkey_info)
             assert signed_tx
 
         except AssertionError as ae:
@@ -1068,7 +1153,7 @@ def estimate_namespace_ready_tx_fee( namespace_id, reveal_privkey_info, tx_fee_p
             unsigned_tx, num_utxos = make_cheapest_namespace_ready(namespace_id, reveal_addr, utxo_client, payment_utxos)
             assert unsigned_tx
 
-            signed_tx = sign_tx(unsigned_tx, payment_utxos[:num_utxos], reveal_privkey_info)
+            signed_tx = estimate_signed_tx('NAMESPACE_READY', unsigned_tx, payment_utxos[:num_utxos], reveal_privkey_info)
             assert signed_tx
 
         except AssertionError as ae:
@@ -1129,7 +1214,7 @@ def estimate_announce_tx_fee( sender_privkey_info, tx_fee_per_byte, utxo_client,
             unsigned_tx, num_utxos = make_cheapest_announce(fake_announce_hash, sender_address, utxo_client, payment_utxos)
             assert unsigned_tx
 
-            signed_tx = sign_tx(unsigned_tx, payment_utxos[:num_utxos], sender_privkey_info)
+            signed_tx = estimate_signed_tx('ANNOUNCE', unsigned_tx, payment_utxos[:num_utxos], sender_privkey_info)
             assert signed_tx
 
         except AssertionError as ae:
@@ -31,7 +31,7 @@ import threading
 
 from ..constants import (
     DEFAULT_QUEUE_PATH, PREORDER_MAX_CONFIRMATIONS, CONFIG_PATH, MAX_TX_CONFIRMATIONS)
-from .blockchain import get_block_height, get_tx_confirmations, is_tx_accepted
+from .blockchain import get_block_height, is_tx_accepted, get_confirmation_tracker
 
 QUEUE_SQL = """
 CREATE TABLE entries( fqu STRING NOT NULL,
@@ -54,6 +54,36 @@ log = get_logger()
 
 DB_SERIALIZE_LOCK = threading.Lock()
 
+# pending operations by name, for each queue db we've opened:
+# {path: {fqu: {queue_id: tx_hash}}}.
+# Loaded on first use, and kept in sync by queuedb_insert() and queuedb_remove()
+PENDING_NAMES = {}
+PENDING_NAMES_LOCK = threading.Lock()
+
+# all the queues in a queue db
+QUEUE_IDS = ["preorder", "register", "update", "transfer", "renew", "revoke", "name_import"]
+
+# callbacks to run on each queue insert, as callback(path, queue_id)
+INSERT_LISTENERS = []
+
+def queuedb_add_insert_listener( callback ):
+    """
+    Have callback(path, queue_id) called whenever an entry gets inserted into a queue db
+    """
+    INSERT_LISTENERS.append(callback)
+
+
+def queuedb_remove_insert_listener( callback ):
+    """
+    Stop calling callback on queue inserts.
+    Does nothing if it isn't a listener.
+    """
+    try:
+        INSERT_LISTENERS.remove(callback)
+    except ValueError:
+        pass
+
+
 def queuedb_create( path ):
     """
     Create a sqlite3 db at the given path.
@@ -292,6 +322,17 @@ def queuedb_insert( queue_id, fqu, tx_hash, data_json, path=DEFAULT_QUEUE_PATH )
 
     db.commit()
     db.close()
+
+    with PENDING_NAMES_LOCK:
+        if PENDING_NAMES.has_key(path):
+            PENDING_NAMES[path].setdefault(fqu, {})[queue_id] = tx_hash
+
+    for callback in list(INSERT_LISTENERS):
+        try:
+            callback(path, queue_id)
+        except Exception as e:
+            log.exception(e)
+
     return True
 
 
@@ -313,9 +354,48 @@ def queuedb_remove( queue_id, fqu, tx_hash, path=DEFAULT_QUEUE_PATH ):
 
     db.commit()
     db.close()
+
+    with PENDING_NAMES_LOCK:
+        pending = PENDING_NAMES.get(path, {}).get(fqu, None)
+        if pending is not None and pending.get(queue_id, None) == tx_hash:
+            del pending[queue_id]
+            if len(pending) == 0:
+                del PENDING_NAMES[path][fqu]
+
     return True
 
 
+def queuedb_find_pending( fqu, path=DEFAULT_QUEUE_PATH ):
+    """
+    Find the pending operations on a name, in all queues.
+    Uses an in-RAM index of the queue db, which is loaded
+    on the first call.
+    Return {queue_id: tx_hash} (empty if there are none)
+    Raise on error
+    """
+    with PENDING_NAMES_LOCK:
+        if not PENDING_NAMES.has_key(path):
+            sql = "SELECT fqu, queue_id, tx_hash FROM entries;"
+
+            db = queuedb_open(path)
+            if db is None:
+                raise Exception("Failed to open %s" % path)
+
+            cur = db.cursor()
+            rows = queuedb_query_execute( cur, sql, () )
+
+            pending_names = {}
+            for row in rows:
+                pending_names.setdefault(row['fqu'], {})[row['queue_id']] = row['tx_hash']
+
+            db.commit()
+            db.close()
+
+            PENDING_NAMES[path] = pending_names
+
+        return dict(PENDING_NAMES[path].get(fqu, {}))
+
+
 def in_queue( queue_id, fqu, path=DEFAULT_QUEUE_PATH ):
     """
     Is this name already in the given queue?
@@ -447,11 +527,12 @@ def is_entry_accepted( entry, config_path=CONFIG_PATH ):
     Return True if so.
     Return False on error.
     """
+    tracker = get_confirmation_tracker(config_path)
     if 'confirmations_needed' in entry:
         log.debug('Custom confirmations check on {} with {}'.format(entry['tx_hash'], entry['confirmations_needed']))
-        return is_tx_accepted( entry['tx_hash'], num_needed=entry['confirmations_needed'], config_path=config_path )
+        return is_tx_accepted( entry['tx_hash'], num_needed=entry['confirmations_needed'], config_path=config_path, tracker=tracker )
     else:
-        return is_tx_accepted( entry['tx_hash'], config_path=config_path )
+        return is_tx_accepted( entry['tx_hash'], config_path=config_path, tracker=tracker )
 
 
 def is_preorder_expired( entry, config_path=CONFIG_PATH ):
@@ -459,7 +540,7 @@ def is_preorder_expired( entry, config_path=CONFIG_PATH ):
     Given a preorder entry, determine whether or
     not it is expired
     """
-    tx_confirmations = get_tx_confirmations(entry['tx_hash'], config_path=config_path)
+    tx_confirmations = get_confirmation_tracker(config_path).get_tx_confirmations(entry['tx_hash'])
     if tx_confirmations > PREORDER_MAX_CONFIRMATIONS:
         return True
 
@@ -495,7 +576,7 @@ def get_queue_state(queue_ids=None, limit=None, path=DEFAULT_QUEUE_PATH):
     """
     state = []
     if queue_ids is None:
-        queue_ids = ["preorder", "register", "update", "transfer", "renew", "revoke", "name_import"]
+        queue_ids = QUEUE_IDS
 
     elif type(queue_ids) not in [list]:
         queue_ids = [queue_ids]
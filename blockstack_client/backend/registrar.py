@@ -38,25 +38,32 @@ import tempfile
 import hashlib
 import keylib
 
+from multiprocessing.pool import ThreadPool
+
 import blockstack_zones
 import virtualchain
 from virtualchain.lib.ecdsalib import ecdsa_private_key
 
 from .queue import get_queue_state, in_queue, cleanup_preorder_queue, queue_removeall
-from .queue import queue_find_accepted, queuedb_find
-from .queue import queue_add_error_msg, queue_set_data
+from .queue import queue_find_accepted, queuedb_find, queuedb_find_pending
+from .queue import queue_add_error_msg, queue_set_data, queuedb_add_insert_listener, queuedb_remove_insert_listener
+from .queue import queuedb_findall, extract_entry, is_entry_accepted, is_preorder_expired, QUEUE_IDS
+
+from .blockchain import get_confirmation_tracker
 
 from .nameops import async_preorder, async_register, async_update, async_transfer, async_renew, async_revoke
 
 from ..keys import get_data_privkey_info, is_singlesig_hex
 from ..proxy import is_name_registered, is_zonefile_hash_current, get_default_proxy, get_name_record, get_name_blockchain_record, get_atlas_peers, json_is_error
-from ..zonefile import zonefile_data_replicate
+from ..zonefile import store_name_zonefile_data, zonefile_data_publish
 from ..user import is_user_zonefile
 from ..storage import put_mutable_data, get_zonefile_data_hash
 from ..profile import set_profile_timestamp
 
 from ..constants import CONFIG_PATH, DEFAULT_QUEUE_PATH, BLOCKSTACK_DEBUG, BLOCKSTACK_TEST, TX_MIN_CONFIRMATIONS
-from ..constants import PREORDER_CONFIRMATIONS
+from ..constants import PREORDER_CONFIRMATIONS, REGISTRAR_TIP_CHECK_INTERVAL
+from ..constants import REGISTRAR_REPLICATION_WORKERS, REGISTRAR_REPLICATION_DESTINATION_LIMIT
+from ..constants import REGISTRAR_REPLICATION_ATTEMPTS, REGISTRAR_REPLICATION_BACKOFF
 from ..constants import get_secret
 
 from ..config import get_config
@@ -143,6 +150,69 @@ def registrar_shutdown(config_path=None):
     __registrar_state = None
 
 
+class ReplicationLimits(object):
+    """
+    Per-destination concurrency limits for replication:
+    at most @limit concurrent writes to any one Atlas server or storage driver.
+    """
+    def __init__(self, limit):
+        self.limit = limit
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+
+    def get_semaphore(self, destination):
+        with self.lock:
+            if not self.semaphores.has_key(destination):
+                self.semaphores[destination] = threading.BoundedSemaphore(self.limit)
+
+            return self.semaphores[destination]
+
+
+    def call(self, destinations, func, *args, **kw):
+        """
+        Call func(*args, **kw) while holding a write slot at each destination.
+        Slots are taken in sorted order, so concurrent callers can't deadlock.
+        """
+        semaphores = [self.get_semaphore(d) for d in sorted(set(destinations))]
+        for sem in semaphores:
+            sem.acquire()
+
+        try:
+            return func(*args, **kw)
+        finally:
+            for sem in reversed(semaphores):
+                sem.release()
+
+
+REPLICATION_LIMITS = ReplicationLimits(REGISTRAR_REPLICATION_DESTINATION_LIMIT)
+
+
+def replicate_with_retries(destinations, func, *args, **kw):
+    """
+    Write to the given destinations with func(*args, **kw), which returns True on success.
+    Try up to REGISTRAR_REPLICATION_ATTEMPTS times, with exponential backoff.
+    Return True on success
+    Return False if every attempt failed
+    """
+    delay = REGISTRAR_REPLICATION_BACKOFF
+    for i in xrange(0, REGISTRAR_REPLICATION_ATTEMPTS):
+        if i > 0:
+            time.sleep(delay + random.random() * delay)
+            delay *= 2
+
+        try:
+            if REPLICATION_LIMITS.call(destinations, func, *args, **kw):
+                return True
+
+        except Exception, e:
+            log.exception(e)
+
+        log.debug("Attempt %s of %s to write to %s failed" % (i + 1, REGISTRAR_REPLICATION_ATTEMPTS, ",".join(destinations)))
+
+    return False
+
+
 class RegistrarWorker(threading.Thread):
     """
     Worker thread for waiting for transactions to go through.
@@ -172,13 +242,24 @@ class RegistrarWorker(threading.Thread):
         self.poll_interval = poll_interval
         self.api_port = api_port
         self.running = True
+        self.wakeup = threading.Event()
         self.lockfile_path = None
+
+        # queues with work for the next pass (None means all of them), and
+        # the (queue_id, fqu, tx_hash) entries we've already seen become ready
+        self.work_lock = threading.Lock()
+        self.pending_work = None
+        self.ready_entries = set()
+        self.ready_tip_hash = None
+
         self.required_storage_drivers = storage_drivers_required_write
         if self.required_storage_drivers is None:
             self.required_storage_drivers = storage_drivers.split(",")
         else:
             self.required_storage_drivers = self.required_storage_drivers.split(",")
 
+        queuedb_add_insert_listener(self.queue_inserted)
+
         log.debug("Queue path:      %s" % self.queue_path)
 
         if os.path.exists(self.queue_path):
@@ -501,7 +582,7 @@ class RegistrarWorker(threading.Thread):
         if zonefile_hash is None:
             zonefile_hash = get_zonefile_data_hash( zonefile_data )
 
-        if zonefile_hash not in replicated_zonefiles or BLOCKSTACK_TEST:
+        if (zonefile_hash not in replicated_zonefiles and not name_data.get('replicated_zonefile', False)) or BLOCKSTACK_TEST:
             # NOTE: replicated_zonefiles is static but scoped to this method
             # use it to remember what we've replicated, so we don't needlessly retry
             name_rec = get_name_record( name_data['fqu'], proxy=proxy )
@@ -518,7 +599,7 @@ class RegistrarWorker(threading.Thread):
                 log.error("Zonefile %s has not been confirmed yet (still on %s)" % (zonefile_hash, name_rec['value_hash']))
                 return {'error': 'Zonefile hash not yet replicated'}
 
-            res = zonefile_data_replicate( name_data['fqu'], zonefile_data, name_data['tx_hash'], atlas_servers, config_path=config_path, storage_drivers=storage_drivers )
+            res = cls.replicate_zonefile( name_data['fqu'], zonefile_data, name_data['tx_hash'], atlas_servers, storage_drivers )
             if 'error' in res:
                 log.error("Failed to replicate zonefile %s for %s: %s" % (zonefile_hash, name_data['fqu'], res['error']))
                 return res
@@ -555,14 +636,14 @@ class RegistrarWorker(threading.Thread):
             profile_hash = hashlib.sha256(name_data['fqu'] + zonefile_hash + json.dumps(profile_payload, sort_keys=True)).hexdigest()
 
             # did we replicate this profile for this name and zonefile already?
-            if profile_hash in replicated_profile_hashes:
+            if profile_hash in replicated_profile_hashes or name_data.get('replicated_profile_hash', None) == profile_hash:
                 # already replicated
                 log.debug("Already replicated profile for {}".format(name_data['fqu']))
                 return {'status': True}
 
             profile_payload = set_profile_timestamp(profile_payload)
             
-            rc = put_mutable_data( name_data['fqu'], profile_payload, data_privkey=data_privkey, required=storage_drivers, profile=True, blockchain_id=name_data['fqu'] )
+            rc = replicate_with_retries( ['storage:%s' % d for d in storage_drivers], put_mutable_data, name_data['fqu'], profile_payload, data_privkey=data_privkey, required=storage_drivers, profile=True, blockchain_id=name_data['fqu'] )
             if not rc:
                 log.info("Failed to replicate profile for %s" % (name_data['fqu']))
                 return {'error': 'Failed to store profile'}
@@ -571,6 +652,8 @@ class RegistrarWorker(threading.Thread):
 
                 # don't do this again 
                 replicated_profile_hashes.append(profile_hash)
+                name_data['replicated_profile_hash'] = profile_hash
+                queue_set_data(name_data['type'], name_data['fqu'], name_data, path=queue_path)
                 return {'status': True}
 
         else:
@@ -578,6 +661,45 @@ class RegistrarWorker(threading.Thread):
             return {'status': True}
 
 
+    @classmethod
+    def replicate_zonefile( cls, fqu, zonefile_data, tx_hash, atlas_servers, storage_drivers ):
+        """
+        Replicate a zone file to our storage drivers, and then
+        to all of the given Atlas servers at once.
+        @atlas_servers should be a list of (host, port)
+        Return {'status': True, 'servers': [...]} if at least one Atlas server accepted it
+        Return {'error': ...} on error
+        """
+        def store():
+            rc, data_hash = store_name_zonefile_data( fqu, zonefile_data, tx_hash, storage_drivers=storage_drivers )
+            return rc
+
+        def publish(server):
+            res = zonefile_data_publish( fqu, zonefile_data, [server] )
+            return 'error' not in res
+
+        if not replicate_with_retries( ['storage:%s' % d for d in storage_drivers], store ):
+            log.info('Failed to replicate zonefile for {}'.format(fqu))
+            return {'error': 'Failed to store user zonefile'}
+
+        servers = []
+        def replicate_to(server):
+            if replicate_with_retries( ['atlas:%s:%s' % server], publish, server ):
+                servers.append(server)
+
+        threads = [threading.Thread(target=replicate_to, args=(tuple(server),)) for server in atlas_servers]
+        for t in threads:
+            t.start()
+
+        for t in threads:
+            t.join()
+
+        if len(servers) == 0:
+            return {'error': 'Failed to publish zonefile to all backend providers'}
+
+        return {'status': True, 'servers': servers}
+
+
     @classmethod
     def replicate_names_data( cls, queue_path, updates, wallet_data, storage_drivers, skip=[], config_path=CONFIG_PATH, proxy=None ):
         """
@@ -597,13 +719,34 @@ class RegistrarWorker(threading.Thread):
             log.warn('Failed to get server list: {}'.format(atlas_servers['error']))
             return {'error': 'Failed to get Atlas server list', 'names': [u['fqu'] for u in updates]}
 
+        todo = []
         for update in updates:
             if update['fqu'] in skip:
                 log.debug("Skipping name {}".format(update['fqu']))
                 continue
 
             log.debug("Zone file update on '%s' (%s) is confirmed!  New hash is %s" % (update['fqu'], update['tx_hash'], update.get('zonefile_hash', None)))
-            res = cls.replicate_name_data( update, atlas_servers, wallet_data, storage_drivers, config_path, queue_path, proxy=proxy )
+            todo.append(update)
+
+        if len(todo) == 0:
+            return ret
+
+        def replicate(update):
+            try:
+                return cls.replicate_name_data( update, atlas_servers, wallet_data, storage_drivers, config_path, queue_path, proxy=proxy )
+            except Exception as e:
+                log.exception(e)
+                return {'error': 'Failed to replicate data: {}'.format(e)}
+
+        # replicate several names at once
+        pool = ThreadPool(min(REGISTRAR_REPLICATION_WORKERS, len(todo)))
+        try:
+            results = pool.map(replicate, todo)
+        finally:
+            pool.close()
+            pool.join()
+
+        for update, res in zip(todo, results):
             if 'error' in res:
                 log.error("Failed to replicate zone file and/or profile for %s: %s" % (update['fqu'], res['error']))
                 queue_add_error_msg(update['type'], update['fqu'], res['error'], path=queue_path)
@@ -822,6 +965,119 @@ class RegistrarWorker(threading.Thread):
         Stop this thread
         """
         self.running = False
+        queuedb_remove_insert_listener(self.queue_inserted)
+        self.wakeup.set()
+
+
+    def queue_inserted(self, path, queue_id):
+        """
+        Wake up when something gets queued
+        """
+        if path == self.queue_path:
+            self.add_work([queue_id])
+            self.wakeup.set()
+
+
+    def add_work(self, queue_ids):
+        """
+        Have the next pass work on the given queues (None means all of them)
+        """
+        with self.work_lock:
+            if queue_ids is None:
+                self.pending_work = None
+
+            elif self.pending_work is not None:
+                self.pending_work.update(queue_ids)
+
+
+    def take_work(self):
+        """
+        Get the set of queues to work on in this pass (None means all of them),
+        and start collecting them anew for the next pass
+        """
+        with self.work_lock:
+            work = self.pending_work
+            self.pending_work = set()
+
+        return work
+
+
+    @classmethod
+    def has_work(cls, work, queue_ids):
+        """
+        Does this pass have anything to do in any of the given queues?
+        """
+        return work is None or len(work.intersection(queue_ids)) > 0
+
+
+    def find_new_ready_entries(self):
+        """
+        Find the queues with entries that became ready since we last looked:
+        accepted onto the blockchain, or (for preorders) expired.
+        Return the set of their queue IDs (all of them if we can't tell)
+        """
+        self.ready_tip_hash = get_confirmation_tracker(self.config_path).tip_hash
+
+        ready = set()
+        try:
+            for queue_id in QUEUE_IDS:
+                for rowdata in queuedb_findall(queue_id, path=self.queue_path):
+                    entry = extract_entry(rowdata)
+                    if is_entry_accepted(entry, config_path=self.config_path):
+                        ready.add((queue_id, entry['fqu'], entry['tx_hash']))
+
+                    if queue_id == 'preorder' and is_preorder_expired(entry, config_path=self.config_path):
+                        ready.add(('preorder-expired', entry['fqu'], entry['tx_hash']))
+
+        except Exception as e:
+            log.exception(e)
+            return set(QUEUE_IDS)
+
+        new_entries = ready - self.ready_entries
+        self.ready_entries = ready
+        return set('preorder' if queue_id == 'preorder-expired' else queue_id for (queue_id, _, _) in new_entries)
+
+
+    def wait_for_work(self, timeout, tip_hash):
+        """
+        Sleep until there's something to do:  the chain tip moved off of
+        tip_hash and some entries crossed their confirmation thresholds,
+        an entry got queued, or we were asked to stop.
+        Give up after timeout seconds, and have the next pass look at all queues.
+        Return True if woken up, False on timeout
+        """
+        tracker = get_confirmation_tracker(self.config_path)
+        deadline = time.time() + timeout
+
+        while self.running:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                self.add_work(None)
+                return False
+
+            if self.wakeup.wait(min(remaining, REGISTRAR_TIP_CHECK_INTERVAL)):
+                self.wakeup.clear()
+                if not self.running:
+                    break
+
+                log.debug("Registrar woken up by a new queue entry")
+                return True
+
+            tracker.refresh()
+            if tracker.tip_hash == tip_hash:
+                continue
+
+            tip_hash = tracker.tip_hash
+            new_work = self.find_new_ready_entries()
+            if len(new_work) == 0:
+                log.debug("New block %s (%s), but no queue entries became ready" % (tracker.tip_height, tracker.tip_hash))
+                continue
+
+            log.debug("Registrar woken up by new block %s (%s): work on %s" % (tracker.tip_height, tracker.tip_hash, ", ".join(sorted(new_work))))
+            self.add_work(new_work)
+            return True
+
+        return True
 
 
     @classmethod
@@ -891,10 +1147,22 @@ class RegistrarWorker(threading.Thread):
 
 
     def run(self, once=False):
+        """
+        Thread main: do the registrar's work until asked to stop
+        """
+        try:
+            self.run_worker(once=once)
+        finally:
+            queuedb_remove_insert_listener(self.queue_inserted)
+
+
+    def run_worker(self, once=False):
         """
         Watch the various queues:
         * if we find an accepted preorder, send the accompanying register
         * if we find an accepted update, replicate the accompanying zonefile
+        Each pass only works on the queues that have new work
+        (see wait_for_work()), unless it's a retry or a fallback poll.
         """
         failed = False
         poll_interval = self.poll_interval
@@ -946,9 +1214,32 @@ class RegistrarWorker(threading.Thread):
 
             failed = False
             wallet_data = None
-            proxy = get_default_proxy( config_path=self.config_path )
             failed_names = []
 
+            # learn the chain tip once for this pass; confirmations are computed from it
+            tracker = get_confirmation_tracker(self.config_path)
+            tracker.refresh()
+            tip_hash = tracker.tip_hash
+
+            # work on the queues we were woken up for, and any whose entries
+            # became ready since (so none are marked seen without being worked on)
+            work = self.take_work()
+            if work is None or tip_hash != self.ready_tip_hash:
+                new_work = self.find_new_ready_entries()
+                if work is not None:
+                    work.update(new_work)
+
+            if work is not None and len(work) == 0:
+                log.debug("Registrar has nothing to do")
+                self.wait_for_work(self.poll_interval, tip_hash)
+                if once:
+                    break
+
+                continue
+
+            log.debug("Registrar working on %s" % (", ".join(sorted(work)) if work is not None else "all queues"))
+            proxy = get_default_proxy( config_path=self.config_path )
+
             try:
                 wallet_data = get_wallet( config_path=self.config_path, proxy=proxy )
 
@@ -967,7 +1258,10 @@ class RegistrarWorker(threading.Thread):
                 break
                 poll_interval = 1.0
 
-            if os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_PREORDERS", '0') != '1':
+            if not RegistrarWorker.has_work(work, ['preorder']):
+                log.debug("No new preorders to register")
+
+            elif os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_PREORDERS", '0') != '1':
                 try:
                     # see if we can complete any registrations
                     # clear out any confirmed preorders
@@ -986,7 +1280,10 @@ class RegistrarWorker(threading.Thread):
             else:
                 log.debug("Skipping register_preorders step due to injected fault")
 
-            if os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_UPDATES", '0') != '1':
+            if not RegistrarWorker.has_work(work, ['register']):
+                log.debug("No new registers to set zone files for")
+
+            elif os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_UPDATES", '0') != '1':
                 try:
                     # see if we can put any zonefiles via NAME_UPDATE
                     # clear out any confirmed registers
@@ -1003,7 +1300,10 @@ class RegistrarWorker(threading.Thread):
             else:
                 log.debug("Skipping set_zonefiles step due to injected fault")
 
-            if os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_REGUP_REPLICATION", '0') != '1':
+            if not RegistrarWorker.has_work(work, ['register']):
+                log.debug("No new registers to replicate")
+
+            elif os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_REGUP_REPLICATION", '0') != '1':
                 try:
                     # see if we can replicate any zonefiles and key files for confirmed NAME_REGISTERs with zone file hashes (post F-day 2017)
                     # clear out any confirmed registers
@@ -1021,7 +1321,10 @@ class RegistrarWorker(threading.Thread):
             else:
                 log.debug("Skipping replicate_register_data step due to injected fault")
 
-            if os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_UPDATE_REPLICATION", '0') != '1':
+            if not RegistrarWorker.has_work(work, ['update']):
+                log.debug("No new updates to replicate")
+
+            elif os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_UPDATE_REPLICATION", '0') != '1':
                 try:
                     # see if we can replicate any zonefiles and key files for confirmed NAME_UPDATEs
                     # clear out any confirmed updates
@@ -1039,7 +1342,10 @@ class RegistrarWorker(threading.Thread):
             else:
                 log.debug("Skipping replicate_update_data step due to injected fault")
 
-            if os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_RENEWAL_REPLICATION", '0') != '1':
+            if not RegistrarWorker.has_work(work, ['renew']):
+                log.debug("No new renewals to replicate")
+
+            elif os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_RENEWAL_REPLICATION", '0') != '1':
                 try:
                     # see if we can replicate any zonefiles and key files for confirmed NAME_RENEWs (post F-day 2017)
                     # clear out any confirmed renewals
@@ -1057,7 +1363,10 @@ class RegistrarWorker(threading.Thread):
             else:
                 log.debug("Skipping replicate_renewal_data step due to injected fault")
 
-            if os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_TRANSFER_NAMES", '0') != '1':
+            if not RegistrarWorker.has_work(work, ['register', 'update']):
+                log.debug("No new names to transfer")
+
+            elif os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_TRANSFER_NAMES", '0') != '1':
                 try:
                     # see if we can transfer any names to their new owners
                     # log.debug("transfer all names in {}".format(self.queue_path))
@@ -1074,7 +1383,10 @@ class RegistrarWorker(threading.Thread):
             else:
                 log.debug("Skipping replicate_renewal_data step due to injected fault")
 
-            if os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_IMPORT_REPLICATION", '0') != '1':
+            if not RegistrarWorker.has_work(work, ['name_import']):
+                log.debug("No new name imports to replicate")
+
+            elif os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_IMPORT_REPLICATION", '0') != '1':
                 try:
                     # see if we can replicate any zonefiles for name imports
                     # clear out any confirmed imports
@@ -1092,7 +1404,10 @@ class RegistrarWorker(threading.Thread):
             else:
                 log.debug("Skipping replicate_name_import_data due to injected fault")
 
-            if os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_CLEAR_CONFIRMED", '0') != '1':
+            if not RegistrarWorker.has_work(work, ['preorder', 'transfer', 'revoke', 'renew', 'name_import']):
+                log.debug("No new operations to clear")
+
+            elif os.environ.get("BLOCKSTACK_TEST_REGISTRAR_FAULT_INJECTION_SKIP_CLEAR_CONFIRMED", '0') != '1':
                 try:
                     # see if we can remove any other confirmed operations, besides preorders, registers, and updates
                     # log.debug("clean out other confirmed operations")
@@ -1122,13 +1437,16 @@ class RegistrarWorker(threading.Thread):
                 is_backing_off = False
 
             try:
-                log.debug("Registrar sleeping for %s" % poll_interval)
-                for i in xrange(0, int(poll_interval)):
-                    time.sleep(1)
-
-                    # preemption point
-                    if not self.running:
-                        break
+                # sleep until the next block or queue insert.
+                # entries only cross their confirmation thresholds when blocks arrive.
+                log.debug("Registrar sleeping for up to %s" % poll_interval)
+                if failed:
+                    # retrying; don't wait on a new block
+                    self.wakeup.wait(poll_interval)
+                    self.wakeup.clear()
+                    self.add_work(None)
+                else:
+                    self.wait_for_work(poll_interval, tip_hash)
 
             except:
                 # interrupted
@@ -1193,6 +1511,14 @@ def state():
     return data
 
 
+def pending_operations(fqu):
+    """
+    Get the pending operations on a name, as {queue_id: tx_hash}
+    """
+    state, config_path, proxy = get_registrar_state()
+    return queuedb_find_pending(fqu, path=state.queue_path)
+
+
 # RPC method: backend_set_wallet
 def set_wallet(payment_keypair, owner_keypair, data_keypair, config_path=None, proxy=None):
     """
@@ -0,0 +1,174 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+# Content-defined chunking for large datastore files.
+#
+# A chunked file's idata is a chunk list (see make_chunk_list()), and its
+# chunks are stored as immutable data, named by their hashes.  Chunk
+# boundaries are picked from the data itself (with a gear hash, as in FastCDC),
+# so editing part of a file only changes the chunks around the edit; the
+# rest keep their hashes, and don't need to be stored again.
+#
+# Every writer must pick the same boundaries for the same data, or chunks
+# won't be shared.  Do not change the constants below.
+
+import json
+import struct
+import hashlib
+
+import jsonschema
+
+from .schemas import MUTABLE_DATUM_FILE_CHUNKS_SCHEMA
+
+CHUNK_MIN_SIZE = 64 * 1024
+CHUNK_AVG_SIZE = 256 * 1024
+CHUNK_MAX_SIZE = 1024 * 1024
+
+# boundary masks: harder to hit before CHUNK_AVG_SIZE bytes, and easier after
+# (this keeps chunk sizes close to the average).  They test the high bits of
+# the hash, which depend on the most bytes.
+CHUNK_MASK_SMALL = ((1 << 20) - 1) << 12
+CHUNK_MASK_LARGE = ((1 << 16) - 1) << 16
+
+# gear hash table: one pseudo-random 32-bit value per byte value
+CHUNK_GEAR = [struct.unpack('>I', hashlib.sha256('blockstack-chunk-gear:{}'.format(i)).digest()[:4])[0] for i in xrange(256)]
+
+
+def get_chunk_hash(chunk):
+    """
+    Hash a chunk.  This is the name it is stored under.
+    """
+    return hashlib.sha256(chunk).hexdigest()
+
+
+def find_chunk_boundary(data, start):
+    """
+    Find where the chunk that begins at @start ends.
+    Return the offset just past the chunk's last byte
+    """
+    end = min(start + CHUNK_MAX_SIZE, len(data))
+    if end - start <= CHUNK_MIN_SIZE:
+        return end
+
+    gear = CHUNK_GEAR
+    h = 0
+    i = start + CHUNK_MIN_SIZE
+    avg_end = min(start + CHUNK_AVG_SIZE, end)
+
+    for b in bytearray(buffer(data, i, avg_end - i)):
+        h = ((h << 1) + gear[b]) & 0xffffffff
+        i += 1
+        if not h & CHUNK_MASK_SMALL:
+            return i
+
+    for b in bytearray(buffer(data, i, end - i)):
+        h = ((h << 1) + gear[b]) & 0xffffffff
+        i += 1
+        if not h & CHUNK_MASK_LARGE:
+            return i
+
+    return end
+
+
+def chunk_data(data):
+    """
+    Split data into content-defined chunks.
+    Return the list of chunks
+    """
+    chunks = []
+    start = 0
+    while start < len(data):
+        end = find_chunk_boundary(data, start)
+        chunks.append(data[start:end])
+        start = end
+
+    return chunks
+
+
+def make_chunk_list(chunks):
+    """
+    Make a chunked file's idata from its chunks.
+    Return the serialized chunk list
+    """
+    chunk_list = {
+        'size': sum(len(c) for c in chunks),
+        'chunks': [{'hash': get_chunk_hash(c), 'size': len(c)} for c in chunks],
+    }
+    return json.dumps(chunk_list, sort_keys=True)
+
+
+def parse_chunk_list(chunk_list_str):
+    """
+    Parse and validate a chunked file's idata
+    Return the chunk list on success
+    Return None on error
+    """
+    try:
+        chunk_list = json.loads(chunk_list_str)
+        jsonschema.validate(chunk_list, MUTABLE_DATUM_FILE_CHUNKS_SCHEMA)
+        assert chunk_list['size'] == sum(c['size'] for c in chunk_list['chunks'])
+        return chunk_list
+    except (ValueError, AssertionError, jsonschema.ValidationError):
+        return None
+
+
+def chunk_list_split(chunk_list, data):
+    """
+    Split file data into the chunks given by a chunk list,
+    checking that each one has the listed hash.
+    Return the list of chunks on success
+    Return None if the data does not match the chunk list
+    """
+    if len(data) != chunk_list['size']:
+        return None
+
+    chunks = []
+    offset = 0
+    for chunk_info in chunk_list['chunks']:
+        chunk = data[offset:offset + chunk_info['size']]
+        if get_chunk_hash(chunk) != chunk_info['hash']:
+            return None
+
+        chunks.append(chunk)
+        offset += chunk_info['size']
+
+    return chunks
+
+
+def chunk_list_slice(chunk_list, start, end):
+    """
+    Find the chunks that hold bytes @start through @end (inclusive).
+    Return [(chunk index, offset of its first byte in the file)]
+    """
+    ret = []
+    offset = 0
+    for (i, chunk_info) in enumerate(chunk_list['chunks']):
+        if offset > end:
+            break
+
+        if offset + chunk_info['size'] > start:
+            ret.append((i, offset))
+
+        offset += chunk_info['size']
+
+    return ret
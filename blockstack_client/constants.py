@@ -77,6 +77,13 @@ DEFAULT_DEVICE_ID = '.default'
 DEFAULT_API_HOST = 'localhost'
 DEFAULT_API_PORT = 6270  # API endpoint port
 
+# API endpoint request handling
+API_NUM_WORKERS = int(os.environ.get('BLOCKSTACK_API_NUM_WORKERS', 16))                     # threads handling requests
+API_MAX_QUEUED_REQUESTS = int(os.environ.get('BLOCKSTACK_API_MAX_QUEUED_REQUESTS', 64))     # connections waiting for a thread before we send 503
+API_KEEPALIVE_TIMEOUT = int(os.environ.get('BLOCKSTACK_API_KEEPALIVE_TIMEOUT', 5))          # seconds an idle connection is kept open
+API_IDLE_POLL_INTERVAL = 0.1                                                                  # how often (in seconds) an idle connection checks for waiting connections
+API_RETRY_AFTER = 1                                                                           # Retry-After (seconds) to send with a 503
+
 LOG_NETWORK_PORT = 8333 # port to send log messages on (e.g. to Portal)
 
 # initialize to default settings
@@ -93,6 +100,57 @@ BLOCKSTACK_REQUIRED_STORAGE_DRIVERS_WRITE = 'disk'
 
 BLOCKSTACK_STORAGE_CLASSES = ['read_public', 'read_private', 'write_public', 'write_private', 'read_local', 'write_local']
 
+# number of storage drivers (or URLs) to read from at once, when looking up data.
+# The first valid response wins.  Set to 1 to try them one at a time.
+BLOCKSTACK_STORAGE_READ_HEDGE = int(os.environ.get('BLOCKSTACK_STORAGE_READ_HEDGE', 3))
+
+# max number of threads doing hedged reads at once, across all lookups
+# (enough for every API worker to hedge).  Reads that are still running
+# after their lookup got a result count too.
+BLOCKSTACK_STORAGE_READ_MAX_THREADS = int(os.environ.get('BLOCKSTACK_STORAGE_READ_MAX_THREADS', 64))
+
+# how often (in seconds) the idle registrar asks bitcoind for the chain tip.
+# The registrar only does work when the tip changes or a queue gets a new entry
+# (or every poll_interval seconds, as a fallback).
+REGISTRAR_TIP_CHECK_INTERVAL = float(os.environ.get('BLOCKSTACK_REGISTRAR_TIP_CHECK_INTERVAL', 5))
+
+# registrar replication of zone files and profiles:  how many queue entries to
+# replicate at once, how many concurrent writes to allow to any one Atlas server
+# or storage driver, and how many times to try each write (backing off
+# exponentially from REGISTRAR_REPLICATION_BACKOFF seconds) before waiting for the next pass.
+REGISTRAR_REPLICATION_WORKERS = int(os.environ.get('BLOCKSTACK_REGISTRAR_REPLICATION_WORKERS', 8))
+REGISTRAR_REPLICATION_DESTINATION_LIMIT = int(os.environ.get('BLOCKSTACK_REGISTRAR_REPLICATION_DESTINATION_LIMIT', 4))
+REGISTRAR_REPLICATION_ATTEMPTS = int(os.environ.get('BLOCKSTACK_REGISTRAR_REPLICATION_ATTEMPTS', 3))
+REGISTRAR_REPLICATION_BACKOFF = float(os.environ.get('BLOCKSTACK_REGISTRAR_REPLICATION_BACKOFF', 0.5))
+
+# how long (in seconds) to cache an address's UTXOs, and how long to remember the
+# outputs our own transactions spend and create (in case the UTXO provider is slow
+# to notice them).  The cache is off in the test framework, which mines blocks on demand.
+UTXO_CACHE_TTL = int(os.environ.get('BLOCKSTACK_UTXO_CACHE_TTL', 30 if BLOCKSTACK_TEST is None else 0))
+UTXO_CACHE_SPENT_TTL = int(os.environ.get('BLOCKSTACK_UTXO_CACHE_SPENT_TTL', 3600))
+
+# unconfirmed outputs of our own transactions can be spent right away, as long as
+# the chain of unconfirmed transactions stays within bitcoind's mempool ancestor limit
+UTXO_MAX_UNCONFIRMED_CHAIN = int(os.environ.get('BLOCKSTACK_UTXO_MAX_UNCONFIRMED_CHAIN', 25))
+
+# how many datastore inodes to fetch at once, when prefetching the inodes along a
+# previously-resolved path or the children of a directory that was just listed.
+DATASTORE_PREFETCH_WORKERS = int(os.environ.get('BLOCKSTACK_DATASTORE_PREFETCH_WORKERS', 8))
+
+# most bytes of directory listings the API server keeps in its datastore cache.
+DATASTORE_CACHE_MAX_DIR_BYTES = int(os.environ.get('BLOCKSTACK_DATASTORE_CACHE_MAX_DIR_BYTES', 64 * 1024 * 1024))
+
+# datastore files at least this big are stored as content-defined chunks (0 to never chunk),
+# how many chunks to upload or download at once, and how many stored chunks
+# the API server remembers (so it doesn't upload them again).
+DATASTORE_CHUNKED_FILE_MIN_SIZE = int(os.environ.get('BLOCKSTACK_DATASTORE_CHUNKED_FILE_MIN_SIZE', 0))
+DATASTORE_CHUNK_WORKERS = int(os.environ.get('BLOCKSTACK_DATASTORE_CHUNK_WORKERS', 8))
+DATASTORE_STORED_CHUNKS_MAX = int(os.environ.get('BLOCKSTACK_DATASTORE_STORED_CHUNKS_MAX', 1000000))
+
+# most byte ranges the API server will send of a file in one reply.
+# A request for more gets the whole file.
+DATASTORE_MAX_RANGES = int(os.environ.get('BLOCKSTACK_DATASTORE_MAX_RANGES', 32))
+
 DEFAULT_TIMEOUT = 30  # in secs
 
 """ transaction fee configs
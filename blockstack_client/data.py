@@ -37,17 +37,21 @@ import errno
 import hashlib
 import jsontokens
 import collections
+import heapq
 import threading
 import functools
 import copy
+import re
+import sqlite3
 import jsonschema
 from jsonschema import ValidationError
+from multiprocessing.pool import ThreadPool
 
 import keylib
 from keylib import ECPrivateKey
 
 import virtualchain
-from virtualchain.lib.ecdsalib import sign_raw_data, get_pubkey_hex
+from virtualchain.lib.ecdsalib import sign_raw_data, verify_raw_data, get_pubkey_hex
 
 from .keys import (get_payment_privkey_info, get_owner_privkey_info, HDWallet)
 
@@ -58,13 +62,16 @@ from .proxy import (
 from .storage import hash_zonefile
 from .zonefile import get_name_zonefile, load_name_zonefile, store_name_zonefile
 from .utils import ScatterGather
+from .chunking import chunk_data, make_chunk_list, parse_chunk_list, chunk_list_split, chunk_list_slice
 
 from .logger import get_logger
 from .config import get_config, get_local_device_id
 from .constants import (
     BLOCKSTACK_TEST, BLOCKSTACK_DEBUG, DATASTORE_SIGNING_KEY_INDEX,
     BLOCKSTACK_STORAGE_PROTO_VERSION, DEFAULT_DEVICE_ID,
-    CONFIG_PATH
+    CONFIG_PATH, DATASTORE_PREFETCH_WORKERS, DATASTORE_CACHE_MAX_DIR_BYTES,
+    DATASTORE_CHUNKED_FILE_MIN_SIZE, DATASTORE_CHUNK_WORKERS, DATASTORE_STORED_CHUNKS_MAX,
+    DATASTORE_MAX_RANGES
 )
 
 from .schemas import (
@@ -82,124 +89,219 @@ MUTABLE_DATA_VERSION_LOCK = threading.Lock()
 # not defined on all platforms (looking at you, Mac OS)
 EREMOTEIO = 121
 
-class DataCache(object):
+class TTLCache(object):
     """
-    Write-coherent inode and datastore data cache
+    Bounded cache of values that expire.
+    Lookups and inserts are O(1):  entries are kept in least-recently-used order
+    in an OrderedDict, and the least-recently-used ones are evicted when the cache
+    holds too many entries (or too many bytes).  Expiry is amortized O(log n):
+    deadlines go on a heap, and heap entries for values that were since replaced
+    or evicted are skipped when they reach the top.
+
+    If on_remove is given, it is called as on_remove(key, value) whenever a value
+    is evicted or expires (but not when it is replaced, or the cache is cleared).
+
+    Not thread-safe; callers must lock.
     """
-    def __init__(self, max_headers=1024, max_dirs=1024, max_datastores=1024):
-        self.header_cache = {}
-        self.header_deadlines = {}
-        self.max_headers = max_headers
+    def __init__(self, max_items, max_bytes=None, sizeof=None, clock=time.time, on_remove=None):
+        self.entries = collections.OrderedDict()    # key --> (value, deadline, size)
+        self.deadlines = []                         # heap of (deadline, key)
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof if sizeof is not None else (lambda value: len(json.dumps(value)))
+        self.clock = clock
+        self.on_remove = on_remove
+        self.num_bytes = 0
 
-        self.dir_cache = {}
-        self.dir_deadlines = {}
-        self.dir_children = {}
-        self.max_dirs = max_dirs
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
 
-        self.datastore_cache = {}
-        self.datastore_deadlines = {}
-        self.max_datastores = max_datastores
 
-        self.header_lock = threading.Lock()
-        self.dir_lock = threading.Lock()
-        self.datastore_lock = threading.Lock()
+    def __len__(self):
+        return len(self.entries)
 
 
-    def _put_data(self, lock, cache_obj, deadline_tbl, max_obj, key, value, ttl):
+    def __contains__(self, key):
+        return key in self.entries
+
+
+    def _remove(self, key, replaced=False):
         """
-        Save data to either the header cache or dir cache
+        Remove an entry (its heap entry becomes stale)
         """
-        deadline = int(time.time() + ttl)
+        value, deadline, size = self.entries.pop(key)
+        self.num_bytes -= size
 
-        if lock:
-            lock.acquire()
+        if self.on_remove is not None and not replaced:
+            self.on_remove(key, value)
 
-        cache_obj[key] = {'value': value, 'deadline': deadline}
 
-        if not deadline_tbl.has_key(deadline):
-            deadline_tbl[deadline] = []
+    def _expire(self, now):
+        """
+        Remove all entries whose deadlines have passed
+        """
+        while len(self.deadlines) > 0 and self.deadlines[0][0] <= now:
+            deadline, key = heapq.heappop(self.deadlines)
+            if key in self.entries and self.entries[key][1] == deadline:
+                self._remove(key)
+                self.expirations += 1
 
-        deadline_tbl[deadline].append(key)
+        # don't let stale heap entries pile up if the same keys keep getting replaced
+        if len(self.deadlines) > 2 * len(self.entries) + 64:
+            self.deadlines = [(deadline, key) for (key, (value, deadline, size)) in self.entries.items()]
+            heapq.heapify(self.deadlines)
 
-        if len(cache_obj.keys()) > max_obj:
-            # evict stuff
-            to_evict = []
-            evict_count = 0
-            for deadline in sorted(deadline_tbl.keys()):
-                to_evict.append(deadline)
-                evict_count += len(deadline_tbl[deadline])
-                if len(cache_obj.keys()) - evict_count <= max_obj:
-                    break
 
-            for deadline in to_evict:
-                evicted_keys = deadline_tbl[deadline]
-                del deadline_tbl[deadline]
+    def get(self, key):
+        """
+        Get a value and its deadline
+        Return (None, None) if stale or absent
+        """
+        now = self.clock()
+        self._expire(now)
 
-                for key in evicted_keys:
-                    del cache_obj[key]
+        if key not in self.entries:
+            self.misses += 1
+            return None, None
 
-        if lock:
-            lock.release()
+        # most-recently used goes last
+        entry = self.entries.pop(key)
+        self.entries[key] = entry
+        self.hits += 1
+        return entry[0], entry[1]
 
 
-    def _get_data(self, lock, cache_obj, deadline_tbl, key):
+    def put(self, key, value, ttl):
         """
-        Get data from either the header cache or dir cache
+        Cache a value for ttl seconds, evicting the least-recently-used
+        values if we have too many of them.
         """
-        
-        with lock:
-            if not cache_obj.has_key(key):
-                return None, None
+        now = self.clock()
+        deadline = now + ttl
+        size = self.sizeof(value) if self.max_bytes is not None else 0
 
-            res = cache_obj[key]['value']
-            res_deadline = cache_obj[key]['deadline']
+        if key in self.entries:
+            self._remove(key, replaced=True)
 
-            if time.time() < res_deadline:
-                # fresh 
-                return res, res_deadline
+        self.entries[key] = (value, deadline, size)
+        self.num_bytes += size
+        heapq.heappush(self.deadlines, (deadline, key))
 
-            # expired
-            to_evict = []
-            for deadline in sorted(deadline_tbl.keys()):
-                if time.time() <= deadline:
-                    break
-                
-                to_evict.append(deadline)
+        self._expire(now)
 
-            for deadline in to_evict:
-                evicted_keys = deadline_tbl[deadline]
-                del deadline_tbl[deadline]
+        while len(self.entries) > 0 and (len(self.entries) > self.max_items or (self.max_bytes is not None and self.num_bytes > self.max_bytes)):
+            lru_key = next(iter(self.entries))
+            self._remove(lru_key)
+            self.evictions += 1
 
-                for key in evicted_keys:
-                    del cache_obj[key]
 
-            return None, None
+    def evict(self, key):
+        """
+        Remove a value, if present
+        """
+        if key in self.entries:
+            self._remove(key)
 
 
-    def _evict_data(self, lock, cache_obj, deadline_tbl, key):
+    def clear(self):
         """
-        Remove data from a cache
+        Remove all values
         """
-        with lock:
-            if not cache_obj.has_key(key):
-                return 
+        self.entries.clear()
+        self.deadlines = []
+        self.num_bytes = 0
+
+
+    def get_stats(self):
+        """
+        Get the cache's size and hit, miss, and eviction counts
+        """
+        return {
+            'items': len(self.entries),
+            'bytes': self.num_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
 
-            res = cache_obj[key]['value']
-            res_deadline = cache_obj[key]['deadline']
 
-            del cache_obj[key]
+class DataCache(object):
+    """
+    Write-coherent inode and datastore data cache
+    """
+    def __init__(self, max_headers=1024, max_dirs=1024, max_datastores=1024, max_paths=4096, max_dir_bytes=None):
+        self.header_cache = TTLCache(max_headers)
 
-            if not deadline_tbl.has_key(res_deadline):
-                return
+        # directories' entries in dir_children and dir_listings are dropped along
+        # with them (see _forget_directory())
+        self.dir_cache = TTLCache(max_dirs, max_bytes=max_dir_bytes, on_remove=self._forget_directory)
+        self.dir_children = {}      # child UUID --> parent directory UUID
+        self.dir_listings = {}      # directory UUID --> child UUIDs
+
+        self.datastore_cache = TTLCache(max_datastores)
+
+        # path --> inode UUID and type.  These are only hints:  inode_resolve_path()
+        # uses them to fetch a path's inodes all at once, but still checks each one
+        # against its parent directory's (version-checked) listing.
+        self.path_cache = TTLCache(max_paths)
+
+        self.header_lock = threading.Lock()
+        self.dir_lock = threading.Lock()
+        self.datastore_lock = threading.Lock()
+        self.path_lock = threading.Lock()
+
+
+    def _unmap_children(self, dir_uuid):
+        """
+        Stop mapping a directory's children back to it.
+        Call with dir_lock held.
+        """
+        for child_uuid in self.dir_listings.pop(dir_uuid, []):
+            if self.dir_children.get(child_uuid, None) == dir_uuid:
+                del self.dir_children[child_uuid]
+
+
+    def _forget_directory(self, key, inode_directory):
+        """
+        Called with dir_lock held when a directory leaves dir_cache.
+        Stop mapping its children back to it.  Without that mapping, a write to
+        one of its children can no longer evict its header, so evict that too.
+        """
+        self._unmap_children(inode_directory['uuid'])
+
+        with self.header_lock:
+            self.header_cache.evict(key)
+
+
+    def _put_data(self, lock, cache_obj, key, value, ttl):
+        """
+        Save data to one of the caches
+        """
+        if lock:
+            with lock:
+                return cache_obj.put(key, value, ttl)
 
-            if key not in deadline_tbl[res_deadline]:
-                return 
+        return cache_obj.put(key, value, ttl)
 
-            deadline_tbl[res_deadline].remove(key)
-            if len(deadline_tbl[res_deadline]) == 0:
-                del deadline_tbl[res_deadline]
 
-            return
+    def _get_data(self, lock, cache_obj, key):
+        """
+        Get data from one of the caches
+        Return (value, deadline), or (None, None) if stale or absent
+        """
+        with lock:
+            return cache_obj.get(key)
+
+
+    def _evict_data(self, lock, cache_obj, key):
+        """
+        Remove data from a cache
+        """
+        with lock:
+            return cache_obj.evict(key)
 
 
     def put_inode_header(self, datastore_id, inode_header, ttl):
@@ -207,7 +309,7 @@ class DataCache(object):
         Save an inode header
         """
         log.debug("Cache inode header {}".format(inode_header['uuid']))
-        return self._put_data(self.header_lock, self.header_cache, self.header_deadlines, self.max_headers, '{}:{}'.format(datastore_id, inode_header['uuid']), inode_header, ttl)
+        return self._put_data(self.header_lock, self.header_cache, '{}:{}'.format(datastore_id, inode_header['uuid']), inode_header, ttl)
 
 
     def put_inode_directory(self, datastore_id, inode_directory, ttl):
@@ -216,16 +318,27 @@ class DataCache(object):
         """
         log.debug("Cache directory {} (version {})".format(inode_directory['uuid'], inode_directory['version']))
 
+        key = '{}:{}'.format(datastore_id, inode_directory['uuid'])
         with self.dir_lock:
+            # children of the version we're replacing
+            self._unmap_children(inode_directory['uuid'])
+
             # stash directory
-            self._put_data(None, self.dir_cache, self.dir_deadlines, self.max_dirs, '{}:{}'.format(datastore_id, inode_directory['uuid']), inode_directory, ttl)
+            self._put_data(None, self.dir_cache, key, inode_directory, ttl)
+            if key not in self.dir_cache:
+                # too big to cache, or already expired
+                return
 
             # also, map children UUID back to the parent directory so we can properly evict the parent directory
             # when we add/remove/update a file.
+            child_uuids = []
             for child_name in inode_directory['idata']['children'].keys():
                 child_idata = inode_directory['idata']['children'][child_name]
                 child_uuid = child_idata['uuid']
                 self.dir_children[child_uuid] = inode_directory['uuid']
+                child_uuids.append(child_uuid)
+
+            self.dir_listings[inode_directory['uuid']] = child_uuids
 
 
     def put_datastore_record(self, datastore_id, datastore_rec, ttl):
@@ -233,7 +346,14 @@ class DataCache(object):
         Save a datastore record
         """
         log.debug("Cache datastore {}".format(datastore_id))
-        return self._put_data(self.datastore_lock, self.datastore_cache, self.datastore_deadlines, self.max_datastores, datastore_id, datastore_rec, ttl)
+        return self._put_data(self.datastore_lock, self.datastore_cache, datastore_id, datastore_rec, ttl)
+
+
+    def put_inode_path(self, datastore_id, path, inode_uuid, inode_type, ttl):
+        """
+        Remember which inode a path resolved to
+        """
+        return self._put_data(self.path_lock, self.path_cache, '{}:{}'.format(datastore_id, path), {'uuid': inode_uuid, 'type': inode_type}, ttl)
 
 
     def get_inode_header(self, datastore_id, inode_uuid):
@@ -241,7 +361,7 @@ class DataCache(object):
         Get a cached inode header
         Return None if stale or absent
         """
-        res, deadline = self._get_data(self.header_lock, self.header_cache, self.header_deadlines, '{}:{}'.format(datastore_id, inode_uuid))
+        res, deadline = self._get_data(self.header_lock, self.header_cache, '{}:{}'.format(datastore_id, inode_uuid))
         if res:
             log.debug("Cache HIT header {}, expires at {} (now={})".format(inode_uuid, deadline, time.time()))
 
@@ -256,7 +376,7 @@ class DataCache(object):
         Get a cached directory header
         Return None if stale or absent
         """
-        res, deadline = self._get_data(self.dir_lock, self.dir_cache, self.dir_deadlines, '{}:{}'.format(datastore_id, inode_uuid))
+        res, deadline = self._get_data(self.dir_lock, self.dir_cache, '{}:{}'.format(datastore_id, inode_uuid))
         if res:
             log.debug("Cache HIT directory {}, version {}, expires at {} (now={})".format(inode_uuid, res['version'], deadline, time.time()))
 
@@ -271,7 +391,7 @@ class DataCache(object):
         Get a cached datastore record
         Return None if stale or absent
         """
-        res, deadline = self._get_data(self.datastore_lock, self.datastore_cache, self.datastore_deadlines, datastore_id)
+        res, deadline = self._get_data(self.datastore_lock, self.datastore_cache, datastore_id)
         if res:
             log.debug("Cache HIT datastore {}, expires at {} (now={})".format(datastore_id, deadline, time.time()))
         
@@ -281,25 +401,35 @@ class DataCache(object):
         return res
 
 
+    def get_inode_path(self, datastore_id, path):
+        """
+        Get the inode UUID and type a path last resolved to
+        Return {'uuid': ..., 'type': ...} on success
+        Return None if stale or absent
+        """
+        res, deadline = self._get_data(self.path_lock, self.path_cache, '{}:{}'.format(datastore_id, path))
+        return res
+
+
     def evict_inode_header(self, datastore_id, inode_uuid):
         """
         Evict a given inode header
         """
-        return self._evict_data(self.header_lock, self.header_cache, self.header_deadlines, '{}:{}'.format(datastore_id, inode_uuid))
+        return self._evict_data(self.header_lock, self.header_cache, '{}:{}'.format(datastore_id, inode_uuid))
 
 
     def evict_inode_directory(self, datastore_id, inode_uuid):
         """
         Evict a given directory
         """
-        return self._evict_data(self.dir_lock, self.dir_cache, self.dir_deadlines, '{}:{}'.format(datastore_id, inode_uuid))
+        return self._evict_data(self.dir_lock, self.dir_cache, '{}:{}'.format(datastore_id, inode_uuid))
 
 
     def evict_datastore_record(self, datastore_id):
         """
         Evict a datastore record
         """
-        return self._evict_data(self.datastore_lock, self.datastore_cache, self.datastore_deadlines, datastore_id)
+        return self._evict_data(self.datastore_lock, self.datastore_cache, datastore_id)
 
 
     def evict_inode(self, datastore_id, inode_uuid):
@@ -318,13 +448,8 @@ class DataCache(object):
             self.evict_inode_header(datastore_id, parent_uuid)
             self.evict_inode_directory(datastore_id, parent_uuid)
 
-            to_remove = []
-            for (cuuid, duuid) in self.dir_children.items():
-                if duuid == inode_uuid:
-                    to_remove.append(cuuid)
-
-            for cuuid in to_remove:
-                del self.dir_children[cuuid]
+        with self.dir_lock:
+            self._unmap_children(inode_uuid)
 
     
     def evict_all(self):
@@ -332,19 +457,52 @@ class DataCache(object):
         Clear the entire cache
         """
         with self.header_lock:
-            self.header_cache = {}
-            self.header_deadlines = {}
+            self.header_cache.clear()
 
         with self.dir_lock:
-            self.dir_cache = {}
-            self.dir_deadlines = {}
+            self.dir_cache.clear()
+            self.dir_children.clear()
+            self.dir_listings.clear()
 
         with self.datastore_lock:
-            self.datastore_cache = {}
-            self.datastore_deadliens = {}
+            self.datastore_cache.clear()
 
+        with self.path_lock:
+            self.path_cache.clear()
 
-GLOBAL_CACHE = DataCache()
+
+    def get_stats(self):
+        """
+        Get the size and hit, miss, and eviction counts of each cache
+        """
+        ret = {}
+        for (name, lock, cache_obj) in [('headers', self.header_lock, self.header_cache), ('directories', self.dir_lock, self.dir_cache),
+                                        ('datastores', self.datastore_lock, self.datastore_cache), ('paths', self.path_lock, self.path_cache)]:
+            with lock:
+                ret[name] = cache_obj.get_stats()
+
+        return ret
+
+
+GLOBAL_CACHE = DataCache(max_dir_bytes=DATASTORE_CACHE_MAX_DIR_BYTES)
+
+# chunks of chunked files that we have stored, as '{driver}:{chunk hash}' (see put_file_chunks())
+STORED_CHUNKS = TTLCache(DATASTORE_STORED_CHUNKS_MAX)
+STORED_CHUNKS_LOCK = threading.Lock()
+STORED_CHUNKS_TTL = 7 * 86400
+
+# which chunks each chunked file we stored refers to, kept in the metadata directory (see collect_file_chunks())
+CHUNK_REFS_LOCK = threading.Lock()
+CHUNK_REFS_SQL = """
+CREATE TABLE IF NOT EXISTS chunk_refs( file_id TEXT NOT NULL,
+                                       driver TEXT NOT NULL,
+                                       chunk_hash TEXT NOT NULL,
+                                       PRIMARY KEY(file_id,driver,chunk_hash) );
+CREATE INDEX IF NOT EXISTS chunk_refs_chunk_index ON chunk_refs(driver,chunk_hash);
+"""
+
+# how many bytes of an already-fetched file to stream at once (see FileReader)
+FILE_READER_BLOCK_SIZE = 64 * 1024
 
 
 def serialize_mutable_data_id(data_id):
@@ -1998,11 +2156,18 @@ def delete_datastore(api_client, datastore, datastore_privkey, data_pubkeys, con
 
 
 def get_inode_data(blockchain_id, datastore_id, inode_uuid, inode_type, drivers, data_pubkeys, config_path=CONFIG_PATH, data_privkey=None, force=False, idata=True, proxy=None, file_idata=True, header_info=None, 
-        no_cache=False, cache_ttl=None ):
+        no_cache=False, cache_ttl=None, byte_range=None, stream=False ):
 
     """
     Get an inode from non-local mutable storage.  Verify that it has an
     equal or later version number than the one we have locally.
+
+    If this is a file and @byte_range is given as (start, end), then only get
+    the bytes from start to end (inclusive).  For chunked files, only the
+    chunks that hold them are fetched.
+
+    If this is a file and @stream is True, then don't get a chunked file's data
+    at all; instead, return a FileReader for it (and any other file) as ret['reader'].
     
     This is a server-side method.
 
@@ -2011,9 +2176,11 @@ def get_inode_data(blockchain_id, datastore_id, inode_uuid, inode_type, drivers,
     Return {'status': True, 'inode': inode info, 'version': version, 'drivers': drivers} on success.
     * 'inode' will be raw file data if this is a file.  Otherwise, it will be a structured directory listing
     * ret['inode']['data'] will contain the relevant information for the inode
+    * if this is a file, ret['size'] will be its size
 
     Return {'error': ..., 'errno': ...} on error
     """
+    assert byte_range is None or not stream
    
     global GLOBAL_CACHE
 
@@ -2117,6 +2284,8 @@ def get_inode_data(blockchain_id, datastore_id, inode_uuid, inode_type, drivers,
     inode_info_str = res['data']
     full_inode = copy.deepcopy(inode_header)
     del full_inode['data_hash']
+    file_size = None
+    file_reader = None
 
     if inode_type == MUTABLE_DATUM_DIR_TYPE:
         reader_pubkeys = None
@@ -2141,8 +2310,38 @@ def get_inode_data(blockchain_id, datastore_id, inode_uuid, inode_type, drivers,
         # preserve reader pubkeys 
         full_inode['reader_pubkeys'] = reader_pubkeys
 
+    elif inode_header.get('chunked', False):
+        # chunked file; idata is its chunk list
+        chunk_list = parse_chunk_list(inode_info_str)
+        if chunk_list is None:
+            log.error("Invalid chunk list for {}".format(inode_uuid))
+            return {'error': 'Invalid chunk list', 'errno': errno.EIO}
+
+        file_size = chunk_list['size']
+        if stream:
+            # caller fetches the chunks as it reads them
+            file_reader = FileReader(file_size, chunk_list=chunk_list, blockchain_id=blockchain_id, drivers=drivers_to_try)
+            full_inode['idata'] = ''
+
+        else:
+            start, end = byte_range if byte_range is not None else (0, file_size - 1)
+
+            res = get_file_chunks(blockchain_id, chunk_list, drivers_to_try, start, end)
+            if 'error' in res:
+                log.error("Failed to get chunks of {}: {}".format(inode_uuid, res['error']))
+                return res
+
+            full_inode['idata'] = res['data']
+
     else:
         # raw file (or raw inode request)
+        file_size = len(inode_info_str)
+        if stream:
+            file_reader = FileReader(file_size, data=inode_info_str)
+
+        elif byte_range is not None:
+            inode_info_str = inode_info_str[byte_range[0]:byte_range[1]+1]
+
         full_inode['idata'] = inode_info_str
     
     if not force:
@@ -2153,7 +2352,14 @@ def get_inode_data(blockchain_id, datastore_id, inode_uuid, inode_type, drivers,
     if not no_cache and inode_type == MUTABLE_DATUM_DIR_TYPE:
         GLOBAL_CACHE.put_inode_directory(datastore_id, full_inode, cache_ttl)
 
-    return {'status': True, 'inode': full_inode, 'version':  header_version, 'drivers': drivers_to_try}
+    ret = {'status': True, 'inode': full_inode, 'version':  header_version, 'drivers': drivers_to_try}
+    if full_inode['type'] == MUTABLE_DATUM_FILE_TYPE:
+        ret['size'] = file_size
+
+        if file_reader is not None:
+            ret['reader'] = file_reader
+
+    return ret
 
 
 def get_mutable_data_version( data_id, device_ids, config_path=CONFIG_PATH ):
@@ -2345,9 +2551,10 @@ def get_inode_header(blockchain_id, datastore_id, inode_uuid, drivers, data_pubk
     return {'status': True, 'inode': inode_hdr, 'version': max(inode_hdr_version, inode_version), 'drivers': inode_drivers}
 
 
-def make_inode_header_blob( datastore_id, inode_type, owner, inode_uuid, data_hash, device_ids, readers=[], min_version=None, config_path=CONFIG_PATH, create=False, include_raw=False ):
+def make_inode_header_blob( datastore_id, inode_type, owner, inode_uuid, data_hash, device_ids, readers=[], min_version=None, config_path=CONFIG_PATH, create=False, include_raw=False, chunked=False ):
     """
     Make an inode header structure for storage in mutable data.
+    If @chunked is True, then this is a file whose idata is a chunk list (see chunking.py)
     Return {'status': True, 'header': serialized inode header} on success.  The caller should sign this, and replicate it and the signature.
     Return {'error': ...} on error
     """
@@ -2365,6 +2572,9 @@ def make_inode_header_blob( datastore_id, inode_type, owner, inode_uuid, data_ha
         'proto_version': BLOCKSTACK_STORAGE_PROTO_VERSION,
     }
 
+    if chunked:
+        res['chunked'] = True
+
     jsonschema.validate(res, MUTABLE_DATUM_INODE_HEADER_SCHEMA)
     
     data_id = '{}.{}.hdr'.format(datastore_id, inode_uuid)
@@ -2381,13 +2591,14 @@ def make_inode_header_blob( datastore_id, inode_type, owner, inode_uuid, data_ha
     return ret
 
 
-def make_file_inode_data( datastore_id, owner, inode_uuid, data_payload_hash, device_ids, readers=[], config_path=CONFIG_PATH, min_version=None, create=False ):
+def make_file_inode_data( datastore_id, owner, inode_uuid, data_payload_hash, device_ids, readers=[], config_path=CONFIG_PATH, min_version=None, create=False, chunked=False ):
     """
     Initialize an inode header and hash for file data
+    If @chunked is True, then data_payload_hash is the hash of the file's chunk list.
     Return {'status': True, 'header': serialized inode header} on success.  The caller should sign this, and replicate it and the signature.
     Return {'error': ...} on error
     """
-    header_blob = make_inode_header_blob( datastore_id, MUTABLE_DATUM_FILE_TYPE, owner, inode_uuid, data_payload_hash, device_ids, readers=readers, config_path=config_path, min_version=min_version, create=create )
+    header_blob = make_inode_header_blob( datastore_id, MUTABLE_DATUM_FILE_TYPE, owner, inode_uuid, data_payload_hash, device_ids, readers=readers, config_path=config_path, min_version=min_version, create=create, chunked=chunked )
     if 'error' in header_blob:
         return header_blob
 
@@ -2560,6 +2771,9 @@ def put_inode_data( datastore, header_blob_str, header_blob_sig, idata_str, conf
     # this way, if some services are offline but others are not, this write can partially succeed to readers,
     # and the user can retry the write (from this or another device) to "complete" it.
     log.debug("Store inode {} (version {})".format(inode_uuid, version))
+
+    from backend.drivers.common import index_batch_begin, index_batch_end, index_batch_bind
+
     save_idata = lambda di: put_mutable(idata_fqid, idata_str, None, None, version, raw=True, storage_drivers=[di], storage_drivers_exclusive=True, config_path=config_path, proxy=proxy)
     save_header = lambda dh: put_mutable(header_fqid, header_blob_str, datastore['pubkey'], header_blob_sig, version, storage_drivers=[dh], storage_drivers_exclusive=True, config_path=config_path, proxy=proxy)
 
@@ -2572,8 +2786,8 @@ def put_inode_data( datastore, header_blob_str, header_blob_sig, idata_str, conf
         Return {'error': ...} on failure
         """
         sg = ScatterGather()
-        driver_save_idata = functools.partial(save_idata, driver)
-        driver_save_header = functools.partial(save_header, driver)
+        driver_save_idata = index_batch_bind(functools.partial(save_idata, driver))
+        driver_save_header = index_batch_bind(functools.partial(save_header, driver))
         sg.add_task( "save_idata", driver_save_idata)
         sg.add_task( "save_header", driver_save_header)
 
@@ -2616,12 +2830,23 @@ def put_inode_data( datastore, header_blob_str, header_blob_sig, idata_str, conf
     driver_failed = False
     driver_succeeded = False
 
-    driver_sg = ScatterGather()
-    for dname in drivers:
-        save_inode_data = functools.partial(_save_inode_fastpath, dname)
-        driver_sg.add_task(dname, save_inode_data)
+    # indexed storage drivers store the index pages for the header and idata
+    # together, once both are stored (or at the end of the caller's batch)
+    index_batch_begin()
+    try:
+        driver_sg = ScatterGather()
+        for dname in drivers:
+            save_inode_data = index_batch_bind(functools.partial(_save_inode_fastpath, dname))
+            driver_sg.add_task(dname, save_inode_data)
+
+        driver_sg.run_tasks()
+    finally:
+        index_stored = index_batch_end()
+
+    if not index_stored:
+        log.error("Failed to update storage index for inode {}".format(inode_uuid))
+        driver_failed = True
 
-    driver_sg.run_tasks()
     for dname in drivers:
         result = driver_sg.get_result(dname)
         if 'error' in result:
@@ -2665,6 +2890,388 @@ def put_inode_data( datastore, header_blob_str, header_blob_sig, idata_str, conf
     return res
 
 
+def put_file_chunks( datastore, chunk_list_str, file_data, inode_uuid=None, config_path=CONFIG_PATH ):
+    """
+    Store a chunked file's chunks to each of the datastore's drivers, as immutable
+    data named by their hashes.  Chunks that we already stored to a driver are
+    skipped, so rewriting part of a file only uploads the chunks that changed.
+
+    If @inode_uuid is given, then record that the file refers to its chunks
+    before any are stored, so collect_file_chunks() will not delete them.
+
+    This is a server-side method.
+
+    Return {'status': True, 'uploaded': number of chunk uploads} on success
+    Return {'error': ..., 'errno': ...} on failure
+    """
+    global STORED_CHUNKS
+
+    chunk_list = parse_chunk_list(chunk_list_str)
+    if chunk_list is None:
+        return {'error': 'Invalid chunk list', 'errno': errno.EINVAL}
+
+    chunks = chunk_list_split(chunk_list, file_data)
+    if chunks is None:
+        return {'error': 'File data does not match its chunk list', 'errno': errno.EINVAL}
+
+    # map '{driver}:{chunk hash}' --> (driver, chunk hash, chunk)
+    uploads = {}
+    with CHUNK_REFS_LOCK:
+        if inode_uuid is not None:
+            file_id = '{}.{}'.format(datastore_get_id(datastore['pubkey']), inode_uuid)
+            chunk_refs_add(get_chunk_refs_path(config_path), file_id, datastore['drivers'], [c['hash'] for c in chunk_list['chunks']])
+
+        with STORED_CHUNKS_LOCK:
+            for driver in datastore['drivers']:
+                for (chunk_info, chunk) in zip(chunk_list['chunks'], chunks):
+                    key = '{}:{}'.format(driver, chunk_info['hash'])
+                    if key not in uploads and STORED_CHUNKS.get(key)[0] is None:
+                        uploads[key] = (driver, chunk_info['hash'], chunk)
+
+    log.debug("Store {} new chunk(s) of {} to {}".format(len(uploads), len(chunks), ','.join(datastore['drivers'])))
+
+    def _put_chunk( upload ):
+        driver, chunk_hash, chunk = upload
+        res = storage.put_immutable_data(chunk, None, data_hash=chunk_hash, required=[driver], required_exclusive=True)
+        if res is None:
+            log.error("Failed to store chunk {} to {}".format(chunk_hash, driver))
+            return False
+
+        with STORED_CHUNKS_LOCK:
+            STORED_CHUNKS.put('{}:{}'.format(driver, chunk_hash), True, STORED_CHUNKS_TTL)
+
+        return True
+
+    # indexed storage drivers store each index page the chunks change once, at the end
+    from backend.drivers.common import index_batch_begin, index_batch_end, index_batch_bind
+
+    index_batch_begin()
+    try:
+        results = _prefetch_map(index_batch_bind(_put_chunk), uploads.values(), num_workers=DATASTORE_CHUNK_WORKERS)
+    finally:
+        index_stored = index_batch_end()
+
+    if not all(results):
+        return {'error': 'Failed to store file chunks', 'errno': EREMOTEIO}
+
+    if not index_stored:
+        return {'error': 'Failed to update storage index', 'errno': EREMOTEIO}
+
+    return {'status': True, 'uploaded': len(uploads)}
+
+
+def get_chunk_refs_path( config_path=CONFIG_PATH ):
+    """
+    Get the path to the chunk reference db
+    """
+    conf = get_config(config_path)
+    assert conf
+    return os.path.join(get_metadata_dir(conf, config_path=config_path), 'chunks.db')
+
+
+def chunk_refs_open( path ):
+    """
+    Open the chunk reference db, creating it if need be.
+    It has a (file ID, driver, chunk hash) row for each chunk of each chunked
+    file we stored, where the file ID is '{datastore ID}.{inode UUID}'.
+    """
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+
+    con = sqlite3.connect(path)
+    con.executescript(CHUNK_REFS_SQL)
+    return con
+
+
+def chunk_refs_add( path, file_id, drivers, chunk_hashes ):
+    """
+    Record that a file refers to the given chunks on each of the given drivers.
+    """
+    con = chunk_refs_open(path)
+    try:
+        with con:
+            con.executemany('INSERT OR IGNORE INTO chunk_refs (file_id,driver,chunk_hash) VALUES (?,?,?);',
+                            [(file_id, driver, chunk_hash) for driver in drivers for chunk_hash in set(chunk_hashes)])
+    finally:
+        con.close()
+
+
+def chunk_refs_release( path, file_id, keep_chunks=[] ):
+    """
+    Drop a file's references to its chunks, except for the (driver, chunk hash)
+    pairs in @keep_chunks.
+    Return the list of (driver, chunk hash) that no file refers to any longer.
+    """
+    if not os.path.exists(path):
+        # never stored a chunked file
+        return []
+
+    keep_chunks = set(keep_chunks)
+    con = chunk_refs_open(path)
+    try:
+        with con:
+            rows = con.execute('SELECT driver,chunk_hash FROM chunk_refs WHERE file_id = ?;', (file_id,)).fetchall()
+            released = [(str(driver), str(chunk_hash)) for (driver, chunk_hash) in rows if (driver, chunk_hash) not in keep_chunks]
+            con.executemany('DELETE FROM chunk_refs WHERE file_id = ? AND driver = ? AND chunk_hash = ?;', [(file_id,) + r for r in released])
+
+            return [r for r in released if con.execute('SELECT 1 FROM chunk_refs WHERE driver = ? AND chunk_hash = ? LIMIT 1;', r).fetchone() is None]
+
+    finally:
+        con.close()
+
+
+def collect_file_chunks( datastore, inode_uuids, keep_chunks=[], config_path=CONFIG_PATH ):
+    """
+    Garbage-collect the chunks of files that were overwritten or deleted.
+    Drop each file's references to its chunks (except for the (driver, chunk hash)
+    pairs in @keep_chunks, which its new version refers to), and delete the chunks
+    that no file refers to any longer.
+
+    Only the references recorded by this API server are known, so this assumes
+    that no other API server stores chunks to the same drivers.  A chunk that
+    fails to delete is left in place.
+
+    This is a server-side method.
+
+    Return {'status': True, 'deleted': number of chunk deletions}
+    """
+    global STORED_CHUNKS
+
+    datastore_id = datastore_get_id(datastore['pubkey'])
+    path = get_chunk_refs_path(config_path)
+
+    def _delete_chunk( chunk ):
+        driver, chunk_hash = chunk
+        if not storage.delete_immutable_data(chunk_hash, None, drivers=[driver]):
+            log.error("Failed to delete chunk {} from {}".format(chunk_hash, driver))
+            return False
+
+        return True
+
+    from backend.drivers.common import index_batch_begin, index_batch_end, index_batch_bind
+
+    # hold the lock until they are deleted, so a concurrent put_file_chunks()
+    # re-uploads any of them that it needs
+    with CHUNK_REFS_LOCK:
+        unreferenced = []
+        for inode_uuid in inode_uuids:
+            unreferenced += chunk_refs_release(path, '{}.{}'.format(datastore_id, inode_uuid), keep_chunks=keep_chunks)
+
+        if len(unreferenced) == 0:
+            return {'status': True, 'deleted': 0}
+
+        with STORED_CHUNKS_LOCK:
+            for (driver, chunk_hash) in unreferenced:
+                STORED_CHUNKS.evict('{}:{}'.format(driver, chunk_hash))
+
+        log.debug("Delete {} unreferenced chunk(s) of {}".format(len(unreferenced), ','.join(inode_uuids)))
+
+        index_batch_begin()
+        try:
+            results = _prefetch_map(index_batch_bind(_delete_chunk), unreferenced, num_workers=DATASTORE_CHUNK_WORKERS)
+        finally:
+            index_batch_end()
+
+    return {'status': True, 'deleted': len(filter(None, results))}
+
+
+def stream_file_chunk_ranges( blockchain_id, chunk_list, drivers, ranges ):
+    """
+    Stream the bytes of a chunked file in each of a sorted list of non-overlapping
+    (start, end) (inclusive) ranges, given its chunk list.  Only the chunks that
+    hold them are fetched, each one once (even if it holds more than one range),
+    in order and up to DATASTORE_CHUNK_WORKERS ahead of the caller.  Each one is
+    checked against its hash before any of it is yielded.  This way, no more than
+    DATASTORE_CHUNK_WORKERS chunks are held in memory at once.
+
+    This is a server-side method.
+
+    Yields (index of the range, bytes), a chunk at a time.
+    Raises IOError if a chunk cannot be fetched.
+    """
+    # [(chunk index, offset of its first byte in the file, [indexes of the ranges in it])]
+    slices = []
+    for (range_index, (start, end)) in enumerate(ranges):
+        for (chunk_index, chunk_offset) in chunk_list_slice(chunk_list, start, end):
+            if len(slices) > 0 and slices[-1][0] == chunk_index:
+                slices[-1][2].append(range_index)
+            else:
+                slices.append((chunk_index, chunk_offset, [range_index]))
+
+    if len(slices) == 0:
+        return
+
+    def _get_chunk( chunk_hash ):
+        return storage.get_immutable_data(chunk_hash, fqu=blockchain_id, drivers=drivers)
+
+    pool = ThreadPool(min(DATASTORE_CHUNK_WORKERS, len(slices)))
+    pending = collections.deque()
+    next_slice = 0
+    try:
+        for (chunk_index, chunk_offset, range_indexes) in slices:
+            while next_slice < len(slices) and len(pending) < DATASTORE_CHUNK_WORKERS:
+                chunk_hash = chunk_list['chunks'][slices[next_slice][0]]['hash']
+                pending.append(pool.apply_async(_get_chunk, (chunk_hash,)))
+                next_slice += 1
+
+            chunk = pending.popleft().get()
+            if chunk is None:
+                raise IOError(EREMOTEIO, 'Failed to get file chunk {}'.format(chunk_list['chunks'][chunk_index]['hash']))
+
+            for range_index in range_indexes:
+                start, end = ranges[range_index]
+                yield (range_index, chunk[max(start - chunk_offset, 0):end + 1 - chunk_offset])
+
+    finally:
+        pool.close()
+        pool.join()
+
+
+def stream_file_chunks( blockchain_id, chunk_list, drivers, start, end ):
+    """
+    Stream the bytes from @start to @end (inclusive) of a chunked file, given its
+    chunk list (see stream_file_chunk_ranges()).
+
+    This is a server-side method.
+
+    Yields the bytes, a chunk at a time.
+    Raises IOError if a chunk cannot be fetched.
+    """
+    for (_, data) in stream_file_chunk_ranges(blockchain_id, chunk_list, drivers, [(start, end)]):
+        yield data
+
+
+def get_file_chunks( blockchain_id, chunk_list, drivers, start, end ):
+    """
+    Get the bytes from @start to @end (inclusive) of a chunked file, given its
+    chunk list (see stream_file_chunks()).
+
+    This is a server-side method.
+
+    Return {'status': True, 'data': ...} on success
+    Return {'error': ..., 'errno': ...} on failure
+    """
+    try:
+        data = ''.join(stream_file_chunks(blockchain_id, chunk_list, drivers, start, end))
+    except IOError as ioe:
+        log.error(ioe.strerror)
+        return {'error': 'Failed to get file chunks', 'errno': EREMOTEIO}
+
+    return {'status': True, 'data': data}
+
+
+class FileReader(object):
+    """
+    Reads byte ranges of a file whose inode was fetched with get_inode_data(stream=True).
+    A chunked file is read from storage as it is streamed, a chunk at a time.
+    Any other file was already fetched (and verified) whole, since its hash covers
+    all of it; it is streamed FILE_READER_BLOCK_SIZE bytes at a time.
+    """
+    def __init__(self, size, data=None, chunk_list=None, blockchain_id=None, drivers=None):
+        assert (data is None) != (chunk_list is None)
+        self.size = size
+        self.data = data
+        self.chunk_list = chunk_list
+        self.blockchain_id = blockchain_id
+        self.drivers = drivers
+
+
+    def read_range(self, start, end):
+        """
+        Get an iterator over the bytes from @start to @end (inclusive).
+        It raises IOError if they cannot be fetched.
+        """
+        if self.chunk_list is not None:
+            return stream_file_chunks(self.blockchain_id, self.chunk_list, self.drivers, start, end)
+
+        return self._read_data(start, min(end, self.size - 1))
+
+
+    def read_ranges(self, ranges):
+        """
+        Get an iterator over (index of the range, bytes) for each of a sorted list
+        of non-overlapping (start, end) (inclusive) ranges, in order.  A chunk that
+        holds more than one of them is fetched once.
+        It raises IOError if they cannot be fetched.
+        """
+        if self.chunk_list is not None:
+            return stream_file_chunk_ranges(self.blockchain_id, self.chunk_list, self.drivers, ranges)
+
+        return self._read_data_ranges(ranges)
+
+
+    def _read_data(self, start, end):
+        for offset in xrange(start, end + 1, FILE_READER_BLOCK_SIZE):
+            yield self.data[offset:min(offset + FILE_READER_BLOCK_SIZE, end + 1)]
+
+
+    def _read_data_ranges(self, ranges):
+        for (range_index, (start, end)) in enumerate(ranges):
+            for block in self._read_data(start, min(end, self.size - 1)):
+                yield (range_index, block)
+
+
+def parse_byte_ranges( range_header, size, max_ranges=DATASTORE_MAX_RANGES ):
+    """
+    Get the byte ranges an HTTP Range: header asks for, given the size of the
+    resource.  Ranges are clipped to the resource, and overlapping or adjacent
+    ranges are merged.  A header with more than @max_ranges ranges is ignored,
+    so a request cannot make us send a file in many small pieces.
+
+    Returns a sorted list of (start, end) (inclusive) on success
+    Returns [] if none of the ranges can be satisfied
+    Returns None if there is no header, if we can't parse it, or if it has too many ranges (i.e. send the whole resource)
+    """
+    if range_header is None:
+        return None
+
+    range_header = range_header.strip()
+    if not range_header.startswith('bytes='):
+        return None
+
+    range_specs = range_header[len('bytes='):].split(',')
+    if len(range_specs) > max_ranges:
+        log.debug("Ignoring Range: header with {} ranges".format(len(range_specs)))
+        return None
+
+    ranges = []
+    for range_spec in range_specs:
+        range_match = re.match("^([0-9]*)-([0-9]*)$", range_spec.strip())
+        if not range_match or range_match.groups() == ('', ''):
+            return None
+
+        start, end = range_match.groups()
+        if start == '':
+            # the last N bytes
+            start = max(size - int(end), 0)
+            end = size - 1
+
+        else:
+            start = int(start)
+            if end != '':
+                end = int(end)
+                if end < start:
+                    return None
+
+                end = min(end, size - 1)
+
+            else:
+                end = size - 1
+
+        if start <= end:
+            ranges.append((start, end))
+
+    ranges.sort()
+    merged = []
+    for (start, end) in ranges:
+        if len(merged) > 0 and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
 def make_inode_tombstones( datastore_id, inode_uuid, device_ids ):
     """
     Make inode tombstones.  The caller must sign them to delete the actual data.
@@ -2680,6 +3287,23 @@ def make_inode_tombstones( datastore_id, inode_uuid, device_ids ):
     return header_tombstones + idata_tombstones
 
 
+def get_tombstone_inode_uuids( signed_tombstones ):
+    """
+    Get the UUIDs of the inodes that a list of (valid) inode tombstones delete
+    """
+    inode_uuids = []
+    for ts in signed_tombstones:
+        ts_data = storage.parse_signed_data_tombstone(ts)
+        _, data_id = storage.parse_fq_data_id(ts_data['id'])
+
+        # format of data_id is datastore_id.inode_uuid[.hdr]
+        inode_uuid = data_id.split('.')[1]
+        if inode_uuid not in inode_uuids:
+            inode_uuids.append(inode_uuid)
+
+    return inode_uuids
+
+
 def delete_inode_data( datastore, signed_tombstones, proxy=None, config_path=CONFIG_PATH ):
     """
     Given the list of header and idata tombstones, go and delete the actual data
@@ -2737,12 +3361,40 @@ def delete_inode_data( datastore, signed_tombstones, proxy=None, config_path=CON
         else:
             inode_tombstones[inode_uuid]['idata_tombstones'].append(ts)
    
-    failed_driver = False
-
     # evict 
     for inode_uuid in inode_tombstones.keys():
         GLOBAL_CACHE.evict_inode(datastore_id, inode_uuid)
 
+    # indexed storage drivers store each changed index page once, at the end
+    # (so until then, their indexes can still list the deleted data)
+    from backend.drivers.common import index_batch_begin, index_batch_end
+
+    index_batch_begin()
+    try:
+        res = _delete_inode_tombstones(datastore_id, inode_tombstones, drivers, device_ids, proxy=proxy, config_path=config_path)
+    finally:
+        index_stored = index_batch_end()
+
+    if 'error' not in res and not index_stored:
+        res = {'error': 'Failed to update storage index', 'errno': EREMOTEIO}
+
+    # evict (again) 
+    for inode_uuid in inode_tombstones.keys():
+        GLOBAL_CACHE.evict_inode(datastore_id, inode_uuid)
+
+    return res
+
+
+def _delete_inode_tombstones( datastore_id, inode_tombstones, drivers, device_ids, proxy=None, config_path=CONFIG_PATH ):
+    """
+    Delete inodes' idata, and then their headers, given
+    a map of inode uuid --> {'header_tombstones': [...], 'idata_tombstones': [...]}
+
+    Return {'status': True} on success
+    Return {'error': ...} on error
+    """
+    failed_driver = False
+
     # delete inode idata first
     for inode_uuid in inode_tombstones.keys():
 
@@ -2768,19 +3420,151 @@ def delete_inode_data( datastore, signed_tombstones, proxy=None, config_path=CON
             log.error("Faled to delete idata for {}: {}".format(inode_uuid, res['error']))
             return res
 
-    # evict (again) 
-    for inode_uuid in inode_tombstones.keys():
-        GLOBAL_CACHE.evict_inode(datastore_id, inode_uuid)
-
     return {'status': True}
 
 
 
-def inode_resolve_path( blockchain_id, datastore, path, data_pubkeys, get_idata=True, force=False, config_path=CONFIG_PATH, proxy=None ):
+def _prefetch_map( func, items, num_workers=DATASTORE_PREFETCH_WORKERS ):
+    """
+    Call func on each item, num_workers at a time.
+    Return the list of results
+    """
+    if len(items) == 0:
+        return []
+
+    pool = ThreadPool(min(num_workers, len(items)))
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _inode_is_cached( datastore_id, inode_uuid, inode_type ):
+    """
+    Is this inode's header (and listing, if it's a directory) cached?
+    """
+    global GLOBAL_CACHE
+
+    if GLOBAL_CACHE.get_inode_header(datastore_id, inode_uuid) is None:
+        return False
+
+    if inode_type == MUTABLE_DATUM_DIR_TYPE and GLOBAL_CACHE.get_inode_directory(datastore_id, inode_uuid) is None:
+        return False
+
+    return True
+
+
+def inode_prefetch_path( blockchain_id, datastore, path_parts, data_pubkeys, force=False, config_path=CONFIG_PATH, proxy=None ):
+    """
+    Fetch the inodes along a path that we've resolved before all at once, so
+    inode_resolve_path() can use them instead of fetching them one at a time.
+    Directories get their headers and listings fetched; files just their headers.
+    Stops at the first path component we haven't resolved before.
+
+    This is a server-side method.
+
+    Return {inode UUID: get_inode_data() or get_inode_header() result} for each inode fetched
+    """
+    global GLOBAL_CACHE
+
+    datastore_id = datastore_get_id(datastore['pubkey'])
+    drivers = datastore['drivers']
+
+    to_fetch = [(datastore['root_uuid'], MUTABLE_DATUM_DIR_TYPE)]
+    for i in xrange(0, len(path_parts)):
+        path_ent = GLOBAL_CACHE.get_inode_path(datastore_id, '/' + '/'.join(path_parts[:i+1]))
+        if path_ent is None:
+            break
+
+        to_fetch.append((path_ent['uuid'], path_ent['type']))
+        if path_ent['type'] != MUTABLE_DATUM_DIR_TYPE:
+            break
+
+    to_fetch = [(inode_uuid, inode_type) for (inode_uuid, inode_type) in to_fetch if not _inode_is_cached(datastore_id, inode_uuid, inode_type)]
+    if len(to_fetch) < 2:
+        # nothing to fetch concurrently 
+        return {}
+
+    def _prefetch( inode_info ):
+        inode_uuid, inode_type = inode_info
+        if inode_type == MUTABLE_DATUM_DIR_TYPE:
+            res = get_inode_data(blockchain_id, datastore_id, inode_uuid, inode_type, drivers, data_pubkeys, force=force, config_path=config_path, proxy=proxy)
+        else:
+            res = get_inode_header(blockchain_id, datastore_id, inode_uuid, drivers, data_pubkeys, force=force, config_path=config_path, proxy=proxy)
+
+        if 'error' in res:
+            # will be caught (or not) when we walk the path
+            log.debug("Failed to prefetch inode {}: {}".format(inode_uuid, res['error']))
+
+        return res
+
+    log.debug("Prefetch {} inodes along /{}".format(len(to_fetch), '/'.join(path_parts)))
+    results = _prefetch_map(_prefetch, to_fetch)
+
+    ret = {}
+    for ((inode_uuid, inode_type), res) in zip(to_fetch, results):
+        if 'error' not in res:
+            ret[inode_uuid] = res
+
+    return ret
+
+
+def inode_prefetch_children( blockchain_id, datastore, dir_path, dir_inode, data_pubkeys, force=False, config_path=CONFIG_PATH, proxy=None ):
+    """
+    Fetch all of a directory's children at once, so looking them up next (such as
+    stat-ing each entry in a listing) finds them in the cache.
+    Subdirectories get their headers and listings fetched; files just their headers.
+
+    This is a server-side method.
+
+    Return the number of inodes fetched
+    """
+    global GLOBAL_CACHE
+
+    if proxy is None:
+        proxy = get_default_proxy(config_path)
+
+    conf = get_config(config_path)
+    assert conf
+
+    cache_ttl = int(conf.get('cache_ttl', 3600))
+
+    datastore_id = datastore_get_id(datastore['pubkey'])
+    drivers = datastore['drivers']
+
+    children = dir_inode['idata']['children']
+    prefix = dir_path.rstrip('/') + '/'
+    for (child_name, child_dirent) in children.items():
+        GLOBAL_CACHE.put_inode_path(datastore_id, prefix + child_name, child_dirent['uuid'], child_dirent['type'], cache_ttl)
+
+    to_fetch = [child_dirent for child_dirent in children.values() if not _inode_is_cached(datastore_id, child_dirent['uuid'], child_dirent['type'])]
+
+    def _prefetch( child_dirent ):
+        if child_dirent['type'] == MUTABLE_DATUM_DIR_TYPE:
+            res = get_inode_data(blockchain_id, datastore_id, child_dirent['uuid'], child_dirent['type'], drivers, data_pubkeys, force=force, config_path=config_path, proxy=proxy)
+        else:
+            res = get_inode_header(blockchain_id, datastore_id, child_dirent['uuid'], drivers, data_pubkeys, force=force, config_path=config_path, proxy=proxy)
+
+        if 'error' in res:
+            log.debug("Failed to prefetch inode {}: {}".format(child_dirent['uuid'], res['error']))
+
+        return res
+
+    log.debug("Prefetch {} of {} children of {}".format(len(to_fetch), len(children), dir_path))
+    _prefetch_map(_prefetch, to_fetch)
+    return len(to_fetch)
+
+
+def inode_resolve_path( blockchain_id, datastore, path, data_pubkeys, get_idata=True, force=False, config_path=CONFIG_PATH, proxy=None, byte_range=None, stream=False ):
     """
     Given a fully-qualified data path, the user's datastore record, and a private key,
     go and traverse the directory heirarchy encoded
     in the data path and fetch the data at the leaf.
+    If the leaf is a file and @byte_range is given as (start, end), then only get
+    those bytes of it, and include the file's size in its entry as 'size'.
+    If the leaf is a file and @stream is True, then include a FileReader for it
+    in its entry as 'reader' instead of its data (see get_inode_data()), as well as its size.
 
     This is a server-side method.
 
@@ -2797,6 +3581,8 @@ def inode_resolve_path( blockchain_id, datastore, path, data_pubkeys, get_idata=
     Return {'error': ..., 'errno': ...} on error
     """
 
+    global GLOBAL_CACHE
+
     if proxy is None:
         proxy = get_default_proxy(config_path)
 
@@ -2825,9 +3611,19 @@ def inode_resolve_path( blockchain_id, datastore, path, data_pubkeys, get_idata=
     drivers = datastore['drivers']
     device_ids = datastore['device_ids']
     root_uuid = datastore['root_uuid']
+
+    prefetched = {}
+    if len(path) > 0:
+        # if we've been down this path before, fetch its inodes all at once
+        # (instead of one at a time as we walk it below).  The walk uses what
+        # was fetched directly, since the cache may not hold it (e.g. cache_ttl is 0).
+        prefetched = inode_prefetch_path(blockchain_id, datastore, path_parts, data_pubkeys, force=force, config_path=config_path, proxy=proxy)
    
     # getting only the root?
-    root_inode = get_inode_data(blockchain_id, datastore_id, root_uuid, MUTABLE_DATUM_DIR_TYPE, drivers, data_pubkeys, force=force, config_path=CONFIG_PATH, proxy=proxy)
+    root_inode = prefetched.get(root_uuid, None)
+    if root_inode is None:
+        root_inode = get_inode_data(blockchain_id, datastore_id, root_uuid, MUTABLE_DATUM_DIR_TYPE, drivers, data_pubkeys, force=force, config_path=CONFIG_PATH, proxy=proxy)
+
     if 'error' in root_inode:
         log.error("Failed to get root inode: {}".format(root_inode['error']))
         return {'error': root_inode['error'], 'errno': root_inode['errno']}
@@ -2871,8 +3667,11 @@ def inode_resolve_path( blockchain_id, datastore, path, data_pubkeys, get_idata=
             break
         
         # get child, and only get the idata if it's a directory
-        log.debug("Get {} at '{}'".format(child_uuid, '/' + '/'.join(path_parts[:i+1])))
-        child_entry = get_inode_data(blockchain_id, datastore_id, child_uuid, child_type, drivers, data_pubkeys, force=force, config_path=CONFIG_PATH, proxy=proxy, file_idata=False)
+        child_entry = prefetched.get(child_uuid, None)
+        if child_entry is None:
+            log.debug("Get {} at '{}'".format(child_uuid, '/' + '/'.join(path_parts[:i+1])))
+            child_entry = get_inode_data(blockchain_id, datastore_id, child_uuid, child_type, drivers, data_pubkeys, force=force, config_path=CONFIG_PATH, proxy=proxy, file_idata=False)
+
         if 'error' in child_entry:
             log.error("Failed to get inode {} at {}: {}".format(child_uuid, prefix + name, child_entry['error']))
             return {'error': child_entry['error'], 'errno': child_entry['errno']}
@@ -2905,7 +3704,7 @@ def inode_resolve_path( blockchain_id, datastore, path, data_pubkeys, get_idata=
         # get file data too 
         # NOTE: last_header_info will be the return value from the last call to get_inode_data()
         assert ret.has_key(prefix + name), "BUG: missing {}".format(prefix + name)
-        child_entry = get_inode_data(blockchain_id, datastore_id, child_uuid, child_type, drivers, data_pubkeys, force=force, config_path=CONFIG_PATH, proxy=proxy, header_info=last_header_info )
+        child_entry = get_inode_data(blockchain_id, datastore_id, child_uuid, child_type, drivers, data_pubkeys, force=force, config_path=CONFIG_PATH, proxy=proxy, header_info=last_header_info, byte_range=byte_range, stream=stream )
 
     else:
         # get only inode header.
@@ -2921,10 +3720,23 @@ def inode_resolve_path( blockchain_id, datastore, path, data_pubkeys, get_idata=
         log.error("Failed to get file data for {} at {}: {}".format(child_uuid, prefix + name, child_entry['error']))
         return {'error': child_entry['error'], 'errno': child_entry['errno']}
     
+    if (byte_range is not None or stream) and 'size' in child_entry:
+        ret[prefix + name]['size'] = child_entry['size']
+
+    if 'reader' in child_entry:
+        ret[prefix + name]['reader'] = child_entry['reader']
+
     child_entry = child_entry['inode']
 
     # update ret
     ret[prefix + name]['inode'] = child_entry
+
+    # remember where this path leads, for next time
+    conf = get_config(config_path)
+    cache_ttl = int(conf.get('cache_ttl', 3600))
+    for (ent_path, path_ent) in ret.items():
+        if ent_path != '/':
+            GLOBAL_CACHE.put_inode_path(datastore_id, ent_path, path_ent['uuid'], path_ent['inode']['type'], cache_ttl)
     
     log.debug("Resolved /{}".format(path))
     return ret
@@ -3018,9 +3830,12 @@ def _parse_data_path( data_path ):
     return {'iname': name, 'parent_path': dirpath, 'data_path': path}
 
 
-def inode_path_lookup(blockchain_id, datastore, data_path, data_pubkeys, get_idata=True, force=False, config_path=CONFIG_PATH, proxy=None ):
+def inode_path_lookup(blockchain_id, datastore, data_path, data_pubkeys, get_idata=True, force=False, config_path=CONFIG_PATH, proxy=None, prefetch=False, byte_range=None, stream=False ):
     """
     Look up all the inodes along the given fully-qualified path, verifying them and ensuring that they're fresh along the way.
+    If @prefetch is True and the path is a directory, then start fetching its children in the background.
+    If @byte_range is given as (start, end) and the path is a file, then only get those bytes of it (see inode_resolve_path()).
+    If @stream is True and the path is a file, then get a FileReader for it instead of its data (see inode_resolve_path()).
 
     This is a server-side method.
 
@@ -3039,7 +3854,7 @@ def inode_path_lookup(blockchain_id, datastore, data_path, data_pubkeys, get_ida
     data_path = info['data_path']
 
     # find the parent directory
-    path_info = inode_resolve_path(blockchain_id, datastore, data_path, data_pubkeys, get_idata=get_idata, force=force, config_path=config_path, proxy=proxy )
+    path_info = inode_resolve_path(blockchain_id, datastore, data_path, data_pubkeys, get_idata=get_idata, force=force, config_path=config_path, proxy=proxy, byte_range=byte_range, stream=stream )
     if 'error' in path_info:
         log.error('Failed to resolve {}'.format(dirpath))
         return path_info
@@ -3047,6 +3862,12 @@ def inode_path_lookup(blockchain_id, datastore, data_path, data_pubkeys, get_ida
     assert data_path in path_info.keys(), "Invalid path data, missing {}:\n{}".format(data_path, json.dumps(path_info, indent=4, sort_keys=True))
     inode_info = path_info[data_path]
 
+    if prefetch and inode_info['inode']['type'] == MUTABLE_DATUM_DIR_TYPE:
+        t = threading.Thread(target=inode_prefetch_children, args=(blockchain_id, datastore, data_path, inode_info['inode'], data_pubkeys),
+                             kwargs={'force': force, 'config_path': config_path, 'proxy': proxy})
+        t.daemon = True
+        t.start()
+
     return {'status': True, 'path_info': path_info, 'inode_info': inode_info}
 
 
@@ -3203,6 +4024,33 @@ def datastore_do_inode_operation( datastore, inode_headers, inode_payloads, inod
     assert len(inode_headers) == len(inode_payloads)
     assert len(inode_payloads) == len(inode_signatures)
 
+    # indexed storage drivers store each index page this operation changes once,
+    # when it is done.  Until then, their indexes may not list the new inodes
+    # (or may still list the deleted ones).
+    from backend.drivers.common import index_batch_begin, index_batch_end
+
+    index_batch_begin()
+    try:
+        res = _datastore_do_inode_operation(datastore, inode_headers, inode_payloads, inode_signatures, inode_tombstones, config_path=config_path, proxy=proxy)
+    finally:
+        index_stored = index_batch_end()
+
+    if 'error' not in res and not index_stored:
+        res = {'error': 'Failed to update storage index', 'errno': EREMOTEIO}
+
+    if 'error' not in res and len(inode_tombstones) > 0:
+        # deleted files' chunks that no other file refers to can go too
+        collect_file_chunks(datastore, get_tombstone_inode_uuids(inode_tombstones), config_path=config_path)
+
+    return res
+
+
+def _datastore_do_inode_operation( datastore, inode_headers, inode_payloads, inode_signatures, inode_tombstones, config_path=CONFIG_PATH, proxy=None ):
+    """
+    Put/delete the data for datastore_do_inode_operation()
+    Return {'status': True} on success
+    Return {'error': ...} on error
+    """
     # process tombstones first
     if len(inode_tombstones) > 0:
         res = delete_inode_data( datastore, inode_tombstones, proxy=proxy, config_path=config_path)
@@ -3233,6 +4081,32 @@ def datastore_serialize_and_sign( datastore, data_privkey):
     return {'str': datastore_str, 'sig': datastore_sig}
 
 
+def datastore_verify_and_parse( datastore_str, datastore_sig, datastore_pubkey ):
+    """
+    Given a serialized datastore from datastore_serialize_and_sign(), verify it
+    against the datastore's public key before parsing it.
+    Return {'status': True, 'datastore': datastore} on success
+    Return {'error': ..., 'errno': ...} on failure
+    """
+    if not verify_raw_data(datastore_str, datastore_pubkey, datastore_sig):
+        return {'error': 'Invalid datastore signature', 'errno': errno.EPERM}
+
+    try:
+        datastore = json.loads(datastore_str)
+    except ValueError:
+        return {'error': 'Invalid datastore', 'errno': errno.EINVAL}
+
+    if not isinstance(datastore, dict) or 'pubkey' not in datastore:
+        return {'error': 'Invalid datastore', 'errno': errno.EINVAL}
+
+    if keylib.key_formatting.decompress(datastore['pubkey']) != keylib.key_formatting.decompress(datastore_pubkey):
+        # wrong datastore
+        log.error("{} != {}".format(datastore['pubkey'], datastore_pubkey))
+        return {'error': 'Invalid datastore: wrong pubkey', 'errno': errno.EPERM}
+
+    return {'status': True, 'datastore': datastore}
+
+
 def datastore_mkdir_make_inodes(api_client, datastore, data_path, data_pubkeys, reader_pubkeys=[], parent_dir=None, force=False, config_path=CONFIG_PATH):
     """
     Make a directory at the given path.  The parent directory must exist.
@@ -3543,13 +4417,16 @@ def datastore_rmdir(api_client, datastore, data_path, data_privkey_hex, data_pub
     return {'status': True}
 
 
-def datastore_getfile(api_client, blockchain_id, datastore, data_path, data_pubkeys, extended=False, force=False, config_path=CONFIG_PATH ):
+def datastore_getfile(api_client, blockchain_id, datastore, data_path, data_pubkeys, extended=False, force=False, config_path=CONFIG_PATH, byte_range=None, stream=False ):
     """
     Get a file identified by a path.
+    If @byte_range is given as (start, end), then only get the bytes from start to end (inclusive).
+    If @stream is True, then get a FileReader for the file instead of its data.  Only the API server can do this.
 
     TODO: rework datastore and datastore_id; we need to be sure that we're making inodes to write to this device's datastore and data_pubkeys corresponds to the owner's other devices
 
-    Return {'status': True, 'data': data} on success, if not extended
+    Return {'status': True, 'data': data} on success, if not extended (and {'size': file size} as well, if byte_range is given)
+    Return {'status': True, 'reader': file reader, 'size': file size} on success, if streaming and not extended
     Return {'status': True, 'inode_info': inode and data, 'path_info': path info}
     Return {'error': ..., 'errno': ...} on error
     """
@@ -3562,7 +4439,7 @@ def datastore_getfile(api_client, blockchain_id, datastore, data_path, data_pubk
     
     log.debug("getfile {}:{}".format(datastore_id, data_path))
 
-    file_info = api_client.backend_datastore_lookup(blockchain_id, datastore, 'files', data_path, data_pubkeys, force=force, extended=True, idata=True )
+    file_info = api_client.backend_datastore_lookup(blockchain_id, datastore, 'files', data_path, data_pubkeys, force=force, extended=True, idata=True, byte_range=byte_range, stream=stream )
     if 'error' in file_info:
         log.error("Failed to resolve {}".format(data_path))
         return file_info
@@ -3579,18 +4456,29 @@ def datastore_getfile(api_client, blockchain_id, datastore, data_path, data_pubk
             'path_info': file_info['path_info'],
         }
 
+    elif stream:
+        ret = {
+            'status': True,
+            'reader': file_info['inode_info']['reader'],
+            'size': file_info['inode_info']['size'],
+        }
+
     else:
         ret = {
             'status': True,
             'data': file_info['inode_info']['inode']['idata']
         }
 
+        if byte_range is not None:
+            ret['size'] = file_info['inode_info']['size']
+
     return ret
 
 
-def datastore_listdir(api_client, blockchain_id, datastore, data_path, data_pubkeys, extended=False, force=False, config_path=CONFIG_PATH ):
+def datastore_listdir(api_client, blockchain_id, datastore, data_path, data_pubkeys, extended=False, force=False, prefetch=True, config_path=CONFIG_PATH ):
     """
     Get a file identified by a path.
+    If prefetch is True, the API server also fetches the directory's children in the background.
 
     TODO: rework datastore and datastore_id; we need to be sure that we're making inodes to write to this device's datastore and data_pubkeys corresponds to the owner's other devices
 
@@ -3606,7 +4494,7 @@ def datastore_listdir(api_client, blockchain_id, datastore, data_path, data_pubk
     
     log.debug("listdir {}:{}".format(datastore_id, data_path))
 
-    dir_info = api_client.backend_datastore_lookup(blockchain_id, datastore, 'directories', data_path, data_pubkeys, extended=True, force=force )
+    dir_info = api_client.backend_datastore_lookup(blockchain_id, datastore, 'directories', data_path, data_pubkeys, extended=True, force=force, prefetch=prefetch )
     if 'error' in dir_info:
         log.error("Failed to resolve {}".format(data_path))
         return dir_info
@@ -3638,10 +4526,11 @@ def datastore_listdir(api_client, blockchain_id, datastore, data_path, data_pubk
     return ret
 
 
-def datastore_putfile_make_inodes(api_client, datastore, data_path, file_data_hash, data_pubkeys, readers=[], parent_dir=None, create=False, force=False, config_path=CONFIG_PATH ):
+def datastore_putfile_make_inodes(api_client, datastore, data_path, file_data_hash, data_pubkeys, readers=[], parent_dir=None, create=False, force=False, config_path=CONFIG_PATH, chunked=False ):
     """
     Store a file identified by a path.
     If @create is True, then will only succeed if created.
+    If @chunked is True, then the file's payload will be its chunk list (see chunking.py)
 
     Does not actually upload data, but instead makes new inode blobs for the 
     parent directory and the new file inode.
@@ -3703,7 +4592,7 @@ def datastore_putfile_make_inodes(api_client, datastore, data_path, file_data_ha
     log.debug("Version of {} ({}) will be max({}, {}) = {}".format(data_path, child_uuid, parent_dir_inode['version'], child_dirent['version'], min_version))
 
     # make the new inode info
-    child_file_info = make_file_inode_data( datastore_id, datastore_id, child_uuid, file_data_hash, device_ids, readers=[], config_path=config_path, min_version=min_version, create=create )
+    child_file_info = make_file_inode_data( datastore_id, datastore_id, child_uuid, file_data_hash, device_ids, readers=[], config_path=config_path, min_version=min_version, create=create, chunked=chunked )
     if 'error' in child_file_info:
         log.error("Failed to create file {}: {}".format(data_path, child_file_info['error']))
         return {'error': 'Failed to create file', 'errno': errno.EIO}
@@ -3729,11 +4618,14 @@ def datastore_putfile_make_inodes(api_client, datastore, data_path, file_data_ha
     return ret
 
 
-def datastore_putfile_put_inodes( datastore, data_path, header_blobs, payloads, signatures, tombstones, create=False, exist=False, config_path=CONFIG_PATH, proxy=None ):
+def datastore_putfile_put_inodes( datastore, data_path, header_blobs, payloads, signatures, tombstones, create=False, exist=False, config_path=CONFIG_PATH, proxy=None, file_data=None ):
     """
     Given the header blobs and payloads from datastore_putfile_make_inodes() and client-given signatures and the actual file data,
     go and store them all.
 
+    If the file is chunked, then its payload is its chunk list, and @file_data must be
+    the file's data.  Its chunks will be stored before the inodes are.
+
     TODO: rework datastore and datastore_id; we need to be sure that we're making inodes to write to this device's datastore and data_pubkeys corresponds to the owner's other devices
 
     Order matters:
@@ -3762,16 +4654,41 @@ def datastore_putfile_put_inodes( datastore, data_path, header_blobs, payloads,
         log.debug("Failed to check operation: {}".format(res['error']))
         return res
 
-    return datastore_do_inode_operation( datastore, header_blobs, payloads, signatures, tombstones, config_path=config_path, proxy=proxy )
+    # chunked file?  the inodes are only valid once its chunks are stored
+    # (the header was verified above, so it parses)
+    file_header = data_blob_parse(data_blob_parse(header_blobs[0])['data'])
+    keep_chunks = []
+    if file_header.get('chunked'):
+        if file_data is None:
+            log.error("No data given for chunked file {}".format(data_path))
+            return {'error': 'Missing file data', 'errno': errno.EINVAL}
 
+        res = put_file_chunks( datastore, payloads[0], file_data, inode_uuid=file_header['uuid'], config_path=config_path )
+        if 'error' in res:
+            log.error("Failed to store chunks of {}: {}".format(data_path, res['error']))
+            return res
+
+        keep_chunks = [(driver, chunk_info['hash']) for driver in datastore['drivers'] for chunk_info in parse_chunk_list(payloads[0])['chunks']]
 
-def datastore_putfile(api_client, datastore, data_path, file_data_bin, data_privkey_hex, data_pubkeys, create=False, exist=False, force=False, config_path=CONFIG_PATH):
+    res = datastore_do_inode_operation( datastore, header_blobs, payloads, signatures, tombstones, config_path=config_path, proxy=proxy )
+    if 'error' in res:
+        return res
+
+    # the chunks of the file's old version that no other file refers to can go
+    collect_file_chunks(datastore, [file_header['uuid']], keep_chunks=keep_chunks, config_path=config_path)
+    return res
+
+
+def datastore_putfile(api_client, datastore, data_path, file_data_bin, data_privkey_hex, data_pubkeys, create=False, exist=False, force=False, config_path=CONFIG_PATH, chunked=None):
     """
     Client-side method to store a file.  MEANT FOR TESTING PURPOSES
     * generate the directory inodes
     * sign them
     * replicate them.
 
+    If @chunked is True, store the file as content-defined chunks (see chunking.py).
+    If it is None, then do so if the file is at least DATASTORE_CHUNKED_FILE_MIN_SIZE bytes.
+
     TODO: rework datastore and datastore_id; we need to be sure that we're making inodes to write to this device's datastore and data_pubkeys corresponds to the owner's other devices
 
     Return {'status': True} on success
@@ -3781,10 +4698,17 @@ def datastore_putfile(api_client, datastore, data_path, file_data_bin, data_priv
     datastore_id = datastore_get_id(data_pubkey)
     device_ids = datastore['device_ids']
     drivers = datastore['drivers']
-   
-    file_hash = storage.hash_data_payload(file_data_bin)
 
-    inode_info = datastore_putfile_make_inodes( api_client, datastore, data_path, file_hash, data_pubkeys, create=create, force=force, config_path=config_path )
+    if chunked is None:
+        chunked = DATASTORE_CHUNKED_FILE_MIN_SIZE > 0 and len(file_data_bin) >= DATASTORE_CHUNKED_FILE_MIN_SIZE
+
+    file_payload = file_data_bin
+    if chunked:
+        file_payload = make_chunk_list(chunk_data(file_data_bin))
+
+    file_hash = storage.hash_data_payload(file_payload)
+
+    inode_info = datastore_putfile_make_inodes( api_client, datastore, data_path, file_hash, data_pubkeys, create=create, force=force, config_path=config_path, chunked=chunked )
     if 'error' in inode_info:
         return inode_info
 
@@ -3794,10 +4718,11 @@ def datastore_putfile(api_client, datastore, data_path, file_data_bin, data_priv
         inode_signatures.append( signature )
 
     assert inode_info['payloads'][0] is None
-    inode_info['payloads'][0] = file_data_bin
+    inode_info['payloads'][0] = file_payload
 
     datastore_info = datastore_serialize_and_sign(datastore, data_privkey_hex)
-    res = api_client.backend_datastore_putfile( datastore_info['str'], datastore_info['sig'], data_path, inode_info['inodes'], inode_info['payloads'], inode_signatures, inode_info['tombstones'], create=create, exist=exist )
+    res = api_client.backend_datastore_putfile( datastore_info['str'], datastore_info['sig'], data_path, inode_info['inodes'], inode_info['payloads'], inode_signatures, inode_info['tombstones'], create=create, exist=exist,
+                                                file_data=file_data_bin if chunked else None, datastore_pubkey=data_pubkey )
     if 'error' in res:
         log.debug("Failed to put putfile inodes")
         return res
@@ -3945,7 +4870,7 @@ def datastore_deletefile(api_client, datastore, data_path, data_privkey_hex, dat
     assert len(signed_tombstones) > 0
 
     datastore_info = datastore_serialize_and_sign(datastore, data_privkey_hex)
-    res = api_client.backend_datastore_deletefile( datastore_info['str'], datastore_info['sig'], data_path, inode_info['inodes'], inode_info['payloads'], inode_signatures, signed_tombstones )
+    res = api_client.backend_datastore_deletefile( datastore_info['str'], datastore_info['sig'], data_path, inode_info['inodes'], inode_info['payloads'], inode_signatures, signed_tombstones, datastore_pubkey=data_pubkey )
     if 'error' in res:
         log.debug("Failed to put deletefile inodes")
         return res
@@ -3953,9 +4878,10 @@ def datastore_deletefile(api_client, datastore, data_path, data_privkey_hex, dat
     return {'status': True}
 
 
-def datastore_stat(api_client, blockchain_id, datastore, data_path, data_pubkeys, extended=False, force=False, config_path=CONFIG_PATH):
+def datastore_stat(api_client, blockchain_id, datastore, data_path, data_pubkeys, extended=False, force=False, prefetch=False, config_path=CONFIG_PATH):
     """
     Stat a file or directory.  Get just the inode metadata.
+    If prefetch is True and this is a directory, the API server also fetches its children in the background.
 
     TODO: rework datastore and datastore_id; we need to be sure that we're making inodes to write to this device's datastore and data_pubkeys corresponds to the owner's other devices
 
@@ -3970,7 +4896,7 @@ def datastore_stat(api_client, blockchain_id, datastore, data_path, data_pubkeys
     
     log.debug("stat {}:{}".format(datastore_id, data_path))
 
-    inode_info = api_client.backend_datastore_lookup(blockchain_id, datastore, 'inodes', data_path, data_pubkeys, extended=True, force=force, idata=False )
+    inode_info = api_client.backend_datastore_lookup(blockchain_id, datastore, 'inodes', data_path, data_pubkeys, extended=True, force=force, idata=False, prefetch=prefetch )
     if 'error' in inode_info:
         log.error("Failed to resolve {}".format(data_path))
         return inode_info
@@ -4097,9 +5023,24 @@ def datastore_rmtree_make_inodes(api_client, datastore, data_path, data_pubkeys,
             if d_type == MUTABLE_DATUM_DIR_TYPE:
                 stack.append( stack_ent )
 
+        # fetch the subdirectories we just pushed all at once, instead of one at a time in _search()
+        _prefetch( [dirent_data['uuid'] for dirent_data in dirents.values() if dirent_data['type'] == MUTABLE_DATUM_DIR_TYPE] )
+
         return {'status': True, 'stack': stack, 'num_added': len(dirents)}
 
 
+    def _getinode( dir_inode_uuid ):
+        return api_client.backend_datastore_getinode(None, datastore, dir_inode_uuid, data_pubkeys, idata=True, force=force, extended=True)
+
+
+    def _prefetch( dir_inode_uuids ):
+        """
+        Fetch directories' listings concurrently, for _search() to use
+        """
+        if len(dir_inode_uuids) > 1:
+            prefetched.update( dict(zip(dir_inode_uuids, _prefetch_map(_getinode, dir_inode_uuids))) )
+
+
     def _search( dir_inode_uuid, stack ):
         """
         Search a path for entries to remove.
@@ -4109,7 +5050,10 @@ def datastore_rmtree_make_inodes(api_client, datastore, data_path, data_pubkeys,
         """
         log.debug("Search {}".format(dir_inode_uuid))
         
-        res = api_client.backend_datastore_getinode(None, datastore, dir_inode_uuid, data_pubkeys, idata=True, force=force, extended=True)
+        res = prefetched.pop(dir_inode_uuid, None)
+        if res is None:
+            res = _getinode(dir_inode_uuid)
+
         if 'error' in res:
             return res
         
@@ -4123,6 +5067,7 @@ def datastore_rmtree_make_inodes(api_client, datastore, data_path, data_pubkeys,
 
     
     inode_stack = []
+    prefetched = {}     # directory UUID --> getinode result
     res = _stack_push( dir_inode['idata']['children'], inode_stack )
     inode_stack = res['stack']
 
@@ -30,10 +30,13 @@ import errno
 import time
 import atexit
 import socket
+import select
 import requests
 import random
 import posixpath
 import SocketServer
+import threading
+import Queue
 from SimpleHTTPServer import SimpleHTTPRequestHandler
 import urllib
 import urllib2
@@ -92,7 +95,8 @@ from .constants import (
     BLOCKSTACK_DEBUG, BLOCKSTACK_TEST, RPC_MAX_ZONEFILE_LEN, CONFIG_PATH,
     WALLET_FILENAME, TX_MIN_CONFIRMATIONS, DEFAULT_API_PORT, SERIES_VERSION,
     DEFAULT_SESSION_LIFETIME, FIRST_BLOCK_MAINNET,
-    TX_MAX_FEE, set_secret, get_secret, DEFAULT_TIMEOUT)
+    TX_MAX_FEE, set_secret, get_secret, DEFAULT_TIMEOUT,
+    API_NUM_WORKERS, API_MAX_QUEUED_REQUESTS, API_KEEPALIVE_TIMEOUT, API_IDLE_POLL_INTERVAL, API_RETRY_AFTER)
 from .method_parser import parse_methods
 from .wallet import make_wallet
 import app
@@ -205,6 +209,39 @@ def api_cli_wrapper(method_info, config_path, check_rpc=True, include_kw=False):
 
 JSONRPC_MAX_SIZE = 1024 * 1024
 
+# API routes are grouped by this many leading path segments
+ROUTE_PREFIX_DEPTH = 2
+
+def route_prefix_key(route_path, depth):
+    """
+    Get the first @depth literal path segments matched by a route regex,
+    as a tuple.  Return None if the regex does not start with that many
+    literal segments.
+    """
+    pattern = route_path.lstrip('^')
+
+    literal = ''
+    for c in pattern:
+        if c in '()[]{}.*+?\\|$':
+            break
+
+        literal += c
+
+    # the last segment is only complete if it's followed by a '/' or the end of the path
+    terminated = pattern[len(literal):].startswith('$')
+    segments = literal.split('/')[1:]
+    if not terminated:
+        segments = segments[:-1]
+
+    if len(segments) >= depth:
+        return tuple(segments[:depth])
+
+    if terminated:
+        return tuple(segments)
+
+    return None
+
+
 class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
     '''
     Blockstack RESTful API endpoint.
@@ -218,9 +255,28 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         errno.EEXIST: 409,
     }
 
-    def _send_headers(self, status_code=200, content_type='application/json', more_headers={}):
+    # keep connections open between requests.  Every response must either
+    # have a content-length or close the connection (see _send_headers())
+    protocol_version = 'HTTP/1.1'
+
+    # close idle connections, so they don't hold on to a worker thread
+    # (sooner if other connections are waiting; see wait_for_request())
+    timeout = API_KEEPALIVE_TIMEOUT
+
+    # headers and body are separate writes; don't wait on the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    # compiled route table and local origins, built once (see get_route_table())
+    _route_table = None
+    _route_table_lock = threading.Lock()
+    _local_origins = None
+
+    def _send_headers(self, status_code=200, content_type='application/json', more_headers={}, content_length=None):
         """
-        Generate and reply headers
+        Generate and reply headers.
+        If content_length is not given, the client can't tell where the
+        body ends, so the connection is closed after the reply.  It is also
+        closed if other connections are waiting for a worker thread.
         """
         self.send_response(status_code)
         self.send_header('content-type', content_type)
@@ -228,6 +284,13 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         for (hdr, val) in more_headers.items():
             self.send_header(hdr, val)
 
+        if content_length is not None:
+            self.send_header('content-length', str(content_length))
+
+        if content_length is None or self.server.is_busy():
+            self.send_header('connection', 'close')
+            self.close_connection = 1
+
         self.end_headers()
 
 
@@ -235,8 +298,8 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         """
         Return a JSON-serializable data structure
         """
-        self._send_headers(status_code=status_code)
         json_str = json.dumps(json_payload)
+        self._send_headers(status_code=status_code, content_length=len(json_str))
         self.wfile.write(json_str)
 
     def _read_payload(self, maxlen=None):
@@ -266,6 +329,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
 
         # get the payload
         request_str = self.rfile.read(read_len)
+        self.payload_read = True
         return request_str
 
 
@@ -445,31 +509,31 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
 
     def _route_match( self, method_name, path_info, route_table ):
         """
-        Look up the method to call
+        Look up the method to call in the compiled route table
+        (see get_route_table()).
         Return the route info and its arguments on success:
         Return None on error
         """
         path = path_info['path']
 
-        for route_path, route_info in route_table.items():
-            if method_name not in route_info['routes'].keys():
-                continue
+        method_routes = route_table['routes'].get(method_name, None)
+        if method_routes is None:
+            return None
 
-            grps = re.match(route_path, path)
+        candidates = method_routes.get(tuple(path_info['parts'][:ROUTE_PREFIX_DEPTH]), None)
+        if candidates is None:
+            candidates = route_table['any_prefix'].get(method_name, [])
+
+        for route_match_info in candidates:
+            grps = route_match_info['regex'].match(path)
             if grps is None:
                 continue
 
-            groups = grps.groups()
-            whitelist = route_info['whitelist']
-
-            assert method_name in whitelist.keys()
-            whitelist_info = whitelist[method_name]
-
             return {
-                'route': route_info,
-                'whitelist': whitelist_info,
-                'method': route_info['routes'][method_name],
-                'args': groups,
+                'route': route_match_info['route'],
+                'whitelist': route_match_info['whitelist'],
+                'method': route_match_info['method'],
+                'args': grps.groups(),
             }
 
         return None
@@ -485,6 +549,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         self.send_header('Access-Control-Allow-Headers', 'content-type, authorization, range')
         self.send_header('Access-Control-Expose-Headers', 'content-length, content-range')
         self.send_header('Access-Control-Max-Age', 21600)
+        self.send_header('content-length', '0')
         self.end_headers()
         return
 
@@ -885,27 +950,31 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         'status' can be 'available', 'registered', 'revoked', or 'pending'
         """
         # are there any pending operations on this name
-        internal = self.server.get_internal_proxy()
-        registrar_info = internal.cli_get_registrar_info()
-        if 'error' in registrar_info:
+        try:
+            pending = backend.registrar.pending_operations(name)
+        except Exception as e:
+            if BLOCKSTACK_DEBUG:
+                log.exception(e)
+
             log.error("Failed to connect to backend")
             self._reply_json({'error': 'Failed to connect to backend'}, status_code=500)
             return
 
         # if the name has pending operations, return the pending status
-        for queue_type in registrar_info.keys():
-            for pending_entry in registrar_info[queue_type]:
-                if pending_entry['name'] == name:
-                    # pending
-                    log.debug("{} is pending".format(name))
-                    ret = {
-                        'status': 'pending',
-                        'operation': queue_type,
-                        'txid': pending_entry['tx_hash'],
-                        'confirmations': pending_entry['confirmations'],
-                    }
-                    self._reply_json(ret)
-                    return
+        if len(pending) > 0:
+            # a name being registered is in both the preorder and register queues
+            queue_type = 'register' if 'register' in pending else sorted(pending.keys())[0]
+            confirmations = backend_blockchain.get_tx_confirmations(pending[queue_type], config_path=self.server.config_path)
+
+            log.debug("{} is pending".format(name))
+            ret = {
+                'status': 'pending',
+                'operation': queue_type,
+                'txid': pending[queue_type],
+                'confirmations': confirmations if confirmations is not None else 0,
+            }
+            self._reply_json(ret)
+            return
 
         blockstackd_url = get_blockstackd_url(self.server.config_path)
 
@@ -938,10 +1007,11 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
                     if resolver_target.endswith('/'):
                         resolver_target = resolver_target[:-1]
                     redirect_location = resolver_target + '/v1/names/' + name
+                    redirect_str = json.dumps({'status': 'redirect'})
                     self._send_headers(status_code = 301,
-                                       more_headers = { 'Location': redirect_location })
-                    self.wfile.write(json.dumps({
-                        'status': 'redirect'}))
+                                       more_headers = { 'Location': redirect_location },
+                                       content_length = len(redirect_str))
+                    self.wfile.write(redirect_str)
                     return
             elif 'expired' in name_rec['error'].lower():
                 return self._reply_json({'error': name_rec['error']}, status_code=404)
@@ -1339,7 +1409,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             return self._reply_json({'error': 'Zone file is not serialized properly'}, status_code=401)
 
         if raw:
-            self._send_headers(status_code=200, content_type='application/octet-stream')
+            self._send_headers(status_code=200, content_type='application/octet-stream', content_length=len(zonefile_txt))
             self.wfile.write(zonefile_txt)
             return
 
@@ -1418,8 +1488,9 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             return
 
         if raw:
-            self._send_headers(status_code=200, content_type='application/octet-stream')
-            self.wfile.write(resp['zonefiles'][str(zonefile_hash)])
+            zonefile_txt = resp['zonefiles'][str(zonefile_hash)]
+            self._send_headers(status_code=200, content_type='application/octet-stream', content_length=len(zonefile_txt))
+            self.wfile.write(zonefile_txt)
 
         else:
             # make sure it's valid
@@ -1651,30 +1722,83 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
 
 
     # DEPRECATED
-    def _get_request_range(self):
+    def _get_request_ranges(self, size):
         """
-        Get the request's HTTP Range: header values
-        TODO: does not yet support multi-range
+        Get the byte ranges the request's HTTP Range: header asks for,
+        given the size of the resource (see data.parse_byte_ranges()).
 
-        Returns (start, end), or (None, None)
+        Returns a sorted list of (start, end) (inclusive) on success
+        Returns [] if none of the ranges can be satisfied
+        Returns None if there is no Range: header, or if we can't parse it or it has too many ranges (i.e. send the whole resource)
         """
-        range_header = self.headers.get('range', None)
-        if range_header is None:
-            return (None, None)
-        
-        range_header = range_header.strip()
-        ranges = re.match("^bytes=([0-9]+)-([0-9]+)$", range_header)
-        if not ranges:
-            return (None, None)
+        return data.parse_byte_ranges(self.headers.get('range', None), size)
 
-        start, end = ranges.groups()
-        start = int(start)
-        end = int(end)
 
-        if start >= end:
-            return (None, None)
+    # DEPRECATED
+    def _reply_file_ranges(self, reader, size, ranges):
+        """
+        Stream back a file from its FileReader, or the byte ranges of it
+        from _get_request_ranges().  Data is written as it is read, so chunked
+        files are sent (and verified) a chunk at a time, and a chunk that holds
+        more than one range is fetched once.
+
+        Reply 200 with the file if ranges is None
+        Reply 206 with one range (and a Content-Range: header), or with a
+        multipart/byteranges body of more than one range
+        Reply 416 if no ranges can be satisfied
+        """
+        if ranges is not None and len(ranges) == 0:
+            more_headers = {
+                'content-range': 'bytes */{}'.format(size)
+            }
+            self._send_headers(status_code=416, content_type='application/octet-stream', more_headers=more_headers, content_length=0)
+            return
+
+        # list of (part header, (start, end))
+        parts = None
+        trailer = ''
 
-        return (start, end)
+        if ranges is None:
+            parts = [('', (0, size - 1))]
+            self._send_headers(status_code=200, content_type='application/octet-stream', content_length=size)
+
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            parts = [('', (start, end))]
+            more_headers = {
+                'content-range': 'bytes {}-{}/{}'.format(start, end, size)
+            }
+            self._send_headers(status_code=206, content_type='application/octet-stream', more_headers=more_headers, content_length=end - start + 1)
+
+        else:
+            boundary = os.urandom(16).encode('hex')
+            parts = []
+            for (start, end) in ranges:
+                part_header = '\r\n--{}\r\ncontent-type: application/octet-stream\r\ncontent-range: bytes {}-{}/{}\r\n\r\n'.format(boundary, start, end, size)
+                parts.append((part_header, (start, end)))
+
+            trailer = '\r\n--{}--\r\n'.format(boundary)
+            content_length = sum(len(part_header) + end - start + 1 for (part_header, (start, end)) in parts) + len(trailer)
+            self._send_headers(status_code=206, content_type='multipart/byteranges; boundary={}'.format(boundary), content_length=content_length)
+
+        try:
+            next_part = 0
+            for (part_index, block) in reader.read_ranges([part_range for (_, part_range) in parts]):
+                while next_part <= part_index:
+                    self.wfile.write(parts[next_part][0])
+                    next_part += 1
+
+                self.wfile.write(block)
+
+            for (part_header, _) in parts[next_part:]:
+                self.wfile.write(part_header)
+
+            self.wfile.write(trailer)
+
+        except IOError as ioe:
+            # storage or socket failure; the status is already sent, so all we can do is hang up
+            log.error("Failed to stream file: {}".format(ioe))
+            self.close_connection = 1
 
 
     # DEPRECATED
@@ -1686,15 +1810,21 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         * force (0, 1)
         * idata (0, 1)
         * extended (0, 1)
+        * prefetch (0, 1):  for directories and inodes, fetch a directory's children in the
+          background (directory listings do this unless prefetch=0)
         * device_ids (list)
         * device_pubkeys (list)
         
-        Honors Range: headers for files, if given 
+        Honors Range: headers for files, if given (including multiple ranges, up to
+        DATASTORE_MAX_RANGES of them; a request for more gets the whole file).
+        Files are streamed; chunked files are fetched and verified a chunk at a time.
 
         Reply 200 on succes, with the raw data (as application/octet-stream for files, and as application/json for directories and inodes)
+        Reply 206 with the requested byte range(s) of a file (as multipart/byteranges if there are more than one)
         Reply 401 if no path is given
         Reply 403 on invalid user ID
         Reply 404 if the file/directory/datastore does not exist
+        Reply 416 if none of the Range: header's ranges are in the file
         Reply 500 if we fail to load the datastore record for some other reason than the above
         Reply 503 on failure to load data from storage providers
         """
@@ -1710,6 +1840,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         include_extended = qs.get('extended', '0')
         force = qs.get('force', '0')
         idata = qs.get('idata', '0')
+        prefetch = qs.get('prefetch', None)
 
         # make sure we have device IDs
         device_ids = None
@@ -1756,8 +1887,11 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
 
         if inode_type == 'files':
             if path is not None:
+                # stream the file, unless we're returning extended information
+                stream = '1' if include_extended == '0' else '0'
+
                 log.debug("Will run cli_datastore_getfile()")
-                res = internal.cli_datastore_getfile(blockchain_id, datastore_id, path, include_extended, force, device_ids, app_public_keys, config_path=self.server.config_path)
+                res = internal.cli_datastore_getfile(blockchain_id, datastore_id, path, include_extended, force, device_ids, app_public_keys, None, stream, config_path=self.server.config_path)
 
                 if 'error' not in res:
                     # base64-encode the result, if we're returning extended information
@@ -1776,7 +1910,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         elif inode_type == 'directories':
             if path is not None:
                 log.debug("Will run cli_datastore_listdir()")
-                res = internal.cli_datastore_listdir(blockchain_id, datastore_id, path, include_extended, force, device_ids, app_public_keys, config_path=self.server.config_path)
+                res = internal.cli_datastore_listdir(blockchain_id, datastore_id, path, include_extended, force, device_ids, app_public_keys, prefetch, config_path=self.server.config_path)
             else:
                 log.debug("Will run cli_datastore_getinode()")
                 res = internal.cli_datastore_getinode(blockchain_id, datastore_id, inode_uuid, include_extended, idata, force, device_ids, app_public_keys, config_path=self.server.config_path)
@@ -1785,7 +1919,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             # inodes
             if path is not None:
                 log.debug("Will run cli_datastore_stat()")
-                res = internal.cli_datastore_stat(blockchain_id, datastore_id, path, include_extended, force, device_ids, app_public_keys, config_path=self.server.config_path)
+                res = internal.cli_datastore_stat(blockchain_id, datastore_id, path, include_extended, force, device_ids, app_public_keys, prefetch, config_path=self.server.config_path)
             else:
                 log.debug("Will run cli_datastore_getinode()")
                 res = internal.cli_datastore_getinode(blockchain_id, datastore_id, inode_uuid, include_extended, idata, force, device_ids, app_public_keys, config_path=self.server.config_path)
@@ -1797,31 +1931,14 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
 
         if inode_type == 'files':
 
-            if include_extended == '0':
-                bytes_range = self._get_request_range()
-                if bytes_range == (None, None):
-                    # no bytes range
-                    self._send_headers(status_code=200, content_type='application/octet-stream')
-                    self.wfile.write(res)
+            if include_extended == '0' and 'reader' in res:
+                # honor Range: headers
+                ranges = self._get_request_ranges(res['size'])
+                self._reply_file_ranges(res['reader'], res['size'], ranges)
 
-                else:
-                    # serve back only the parts we want
-                    start, end = bytes_range
-                    res_len = len(res)
-                    if len(res) < start:
-                        res = ""
-                    elif len(res) < end+1:
-                        res = res[start:]
-                    else:
-                        res = res[start:end+1]
-
-                    more_headers = {
-                        'content-length': end+1-start,
-                        'content-range': 'bytes {}-{}/{}'.format(start, end, res_len)
-                    }
-
-                    self._send_headers(status_code=206, content_type='application/octet-stream', more_headers=more_headers)
-                    self.wfile.write(res)
+            elif include_extended == '0':
+                self._send_headers(status_code=200, content_type='application/octet-stream', content_length=len(res))
+                self.wfile.write(res)
 
             else:
                 if BLOCKSTACK_TEST:
@@ -1907,6 +2024,9 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
                     'type': 'string',
                     'pattern': OP_BASE64_PATTERN,
                 },
+                'file_data': {
+                    'type': 'string',
+                },
             },
             'additionalProperties': False,
             'required': [
@@ -1931,20 +2051,11 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         datastore_str = str(inode_info['datastore_str'])
         datastore_sig = str(inode_info['datastore_sig'])
         datastore_pubkey = app.app_get_datastore_pubkey( ses )
-        res = verify_raw_data(datastore_str, datastore_pubkey, datastore_sig)
-        if not res:
-            return self._reply_json({'error': 'Invalid request: invalid datastore signature'}, status_code=401)
-
-        datastore = None
-        try:
-            datastore = json.loads(datastore_str)
-        except ValueError:
-            return self._reply_json({'error': 'Invalid request: invalid datastore'}, status_code=401)
+        res = data.datastore_verify_and_parse(datastore_str, datastore_sig, datastore_pubkey)
+        if 'error' in res:
+            return self._reply_json({'error': 'Invalid request: {}'.format(res['error'])}, status_code=401)
 
-        if keylib.key_formatting.decompress(datastore['pubkey']) != keylib.key_formatting.decompress(datastore_pubkey):
-            # wrong datastore
-            log.error("{} != {}".format(datastore['pubkey'], datastore_pubkey))
-            return self._reply_json({'error': 'Invalid datastore in request: wrong pubkey'}, status_code=401)
+        datastore = res['datastore']
 
         if operation == 'mkdir':
             res = data.datastore_mkdir_put_inodes( datastore, data_path, inode_info['inodes'], inode_info['payloads'], inode_info['signatures'], inode_info['tombstones'], config_path=self.server.config_path )
@@ -1953,14 +2064,19 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             # payloads will be base64-encoded
             payloads_b64 = inode_info['payloads']
             payloads = None
+            file_data = None
             try:
                 payloads = [base64.b64decode(p) for p in payloads_b64]
+                if 'file_data' in inode_info:
+                    # chunked file
+                    file_data = base64.b64decode(inode_info['file_data'])
+
             except:
                 log.error("putfile: Inode payloads must be base64-encoded")
                 return self._reply_json({'error': 'putfile: inode payloads must be base64-encoded'}, status_code=401)
 
             res = data.datastore_putfile_put_inodes( datastore, data_path, inode_info['inodes'], payloads, inode_info['signatures'], inode_info['tombstones'],
-                                                     create=create, exist=exist, config_path=self.server.config_path )
+                                                     create=create, exist=exist, config_path=self.server.config_path, file_data=file_data )
 
         elif operation == 'rmdir':
             res = data.datastore_rmdir_put_inodes( datastore, data_path, inode_info['inodes'], inode_info['payloads'], inode_info['signatures'], inode_info['tombstones'], config_path=self.server.config_path )
@@ -2110,12 +2226,12 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         res = internal.cli_app_get_resource(blockchain_id, app_domain, res_path, pubkey, config_path=self.server.config_path)
         if 'error' in res:
             if res.has_key('errno') and res['errno'] in self.http_errors:
-                return self._send_headers(status_code=self.http_errors[res['errno']], content_type='text/plain')
+                return self._send_headers(status_code=self.http_errors[res['errno']], content_type='text/plain', content_length=0)
 
             else:
                 return self._reply_json({'error': 'Failed to load resource'}, status_code=503)
 
-        self._send_headers(status_code=200, content_type='application/octet-stream')
+        self._send_headers(status_code=200, content_type='application/octet-stream', content_length=len(res['res']))
         self.wfile.write(res['res'])
         return
 
@@ -2722,6 +2838,16 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         return self._reply_json(res)
 
 
+    def GET_datastore_cache_state( self, ses, path_info ):
+        """
+        Handle GET /v1/node/datastore/cache
+        Get the size and hit, miss, and eviction counts of the datastore inode caches
+        Return 200 on success
+        """
+        res = data.GLOBAL_CACHE.get_stats()
+        return self._reply_json(res)
+
+
     def POST_reboot( self, ses, path_info ):
         """
         Reboot the node.
@@ -2811,7 +2937,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         with open(logpath, 'r') as f:
             logdata = f.read()
 
-        self._send_headers(status_code=200, content_type='text/plain')
+        self._send_headers(status_code=200, content_type='text/plain', content_length=len(logdata))
         self.wfile.write(logdata)
 
 
@@ -2856,7 +2982,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         else:
             log.critical(msg)
 
-        self._send_headers(status_code=200, content_type='text/plain')
+        self._send_headers(status_code=200, content_type='text/plain', content_length=0)
         return
 
 
@@ -3273,22 +3399,22 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         Return 401 on invalid command or arguments
         """
         if not BLOCKSTACK_TEST:
-            return self._send_headers(status_code=404, content_type='text/plain')
+            return self._send_headers(status_code=404, content_type='text/plain', content_length=0)
 
         if command == 'envar':
             # set an envar on the qs
             for (key, value) in path_info['qs_values'].items():
                 os.environ[key] = value
 
-            return self._send_headers(status_code=200, content_type='text/plain')
+            return self._send_headers(status_code=200, content_type='text/plain', content_length=0)
 
         elif command == 'clearcache':
             # clear the cache
             # aaron note: there's no implementation of a cache eviction.
-            return self._send_headers(status_code=200, content_type='text/plain')
+            return self._send_headers(status_code=200, content_type='text/plain', content_length=0)
 
         else:
-            return self._send_headers(status_code=401, content_type='text/plain')
+            return self._send_headers(status_code=401, content_type='text/plain', content_length=0)
 
 
     def GET_help(self, session, path_info):
@@ -3296,14 +3422,16 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         Top-level GET request
         """
         template = """<html><header></header><body>Blockstack RESTful API<br><a href="https://github.com/blockstack/blockstack-core/tree/master/api">Documentation</a></body></html>"""
-        self._send_headers(status_code=200, content_type='text/html')
+        self._send_headers(status_code=200, content_type='text/html', content_length=len(template))
         self.wfile.write(template)
         return
 
 
-    def _dispatch(self, method_name):
+    @classmethod
+    def _make_routes(cls):
         """
-        Top-level dispatch method
+        Make the table of API routes:
+        {path regex: {'routes': {HTTP method: handler method}, 'whitelist': {HTTP method: auth info}}}
         """
 
         URLENCODING_CLASS = r'[a-zA-Z0-9\-_.~%]+'
@@ -3314,7 +3442,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         routes = {
             r'^/v1/ping$': {
                 'routes': {
-                    'GET': self.GET_ping,
+                    'GET': cls.GET_ping,
                 },
                 'whitelist': {
                     'GET': {
@@ -3329,7 +3457,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/auth$': {
                 'routes': {
-                    'GET': self.GET_auth,
+                    'GET': cls.GET_auth,
                 },
                 'whitelist': {
                     'GET': {
@@ -3343,7 +3471,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/addresses/({})/({})$'.format(URLENCODING_CLASS, BASE58CHECK_CLASS): {
                 'routes': {
-                    'GET': self.GET_names_owned_by_address,
+                    'GET': cls.GET_names_owned_by_address,
                 },
                 'whitelist': {
                     'GET': {
@@ -3357,7 +3485,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/blockchains/({})/name_count'.format(URLENCODING_CLASS) : {
                 'routes': {
-                    'GET': self.GET_blockchain_num_names
+                    'GET': cls.GET_blockchain_num_names
                 },
                 'whitelist': {
                     'GET': {
@@ -3371,7 +3499,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/blockchains/({})/subdomains_count'.format(URLENCODING_CLASS) : {
                 'routes': {
-                    'GET': self.GET_blockchain_num_subdomains
+                    'GET': cls.GET_blockchain_num_subdomains
                 },
                 'whitelist': {
                     'GET': {
@@ -3385,7 +3513,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/blockchains/({})/operations/([0-9]+)$'.format(URLENCODING_CLASS): {
                 'routes': {
-                    'GET': self.GET_blockchain_ops
+                    'GET': cls.GET_blockchain_ops
                 },
                 'whitelist': {
                     'GET': {
@@ -3399,7 +3527,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/blockchains/({})/names/({})/history$'.format(URLENCODING_CLASS, NAME_CLASS): {
                 'routes': {
-                    'GET': self.GET_blockchain_name_history
+                    'GET': cls.GET_blockchain_name_history
                 },
                 'whitelist': {
                     'GET': {
@@ -3413,7 +3541,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/blockchains/({})/consensus$'.format(URLENCODING_CLASS): {
                 'routes': {
-                    'GET': self.GET_blockchain_consensus,
+                    'GET': cls.GET_blockchain_consensus,
                 },
                 'whitelist': {
                     'GET': {
@@ -3427,7 +3555,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/blockchains/({})/pending$'.format(URLENCODING_CLASS): {
                 'routes': {
-                    'GET': self.GET_blockchain_pending,
+                    'GET': cls.GET_blockchain_pending,
                 },
                 'whitelist': {
                     'GET': {
@@ -3441,7 +3569,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/blockchains/({})/({})/unspent$'.format(URLENCODING_CLASS, BASE58CHECK_CLASS): {
                 'routes': {
-                    'GET': self.GET_blockchain_unspents,
+                    'GET': cls.GET_blockchain_unspents,
                 },
                 'whitelist': {
                     'GET': {
@@ -3455,7 +3583,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/blockchains/({})/txs$'.format(URLENCODING_CLASS): {
                 'routes': {
-                    'POST': self.POST_broadcast_tx,
+                    'POST': cls.POST_broadcast_tx,
                 },
                 'whitelist': {
                     'POST': {
@@ -3469,8 +3597,8 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/names$': {
                 'routes': {
-                    'GET': self.GET_names,
-                    'POST': self.POST_names,    # accepts: name, address, zonefile.  Returns: HTTP 202 with txid
+                    'GET': cls.GET_names,
+                    'POST': cls.POST_names,    # accepts: name, address, zonefile.  Returns: HTTP 202 with txid
                 },
                 'whitelist': {
                     'GET': {
@@ -3491,7 +3619,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/subdomains$': {
                 'routes': {
-                    'GET': self.GET_subdomains
+                    'GET': cls.GET_subdomains
                 },
                 'whitelist': {
                     'GET': {
@@ -3505,8 +3633,8 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/names/({})$'.format(NAME_CLASS): {
                 'routes': {
-                    'GET': self.GET_name_info,
-                    'DELETE': self.DELETE_name,     # revoke
+                    'GET': cls.GET_name_info,
+                    'DELETE': cls.DELETE_name,     # revoke
                 },
                 'whitelist': {
                     'GET': {
@@ -3527,7 +3655,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/names/({})/history$'.format(NAME_CLASS): {
                 'routes': {
-                    'GET': self.GET_name_history,
+                    'GET': cls.GET_name_history,
                 },
                 'whitelist': {
                     'GET': {
@@ -3541,7 +3669,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/names/({})/owner$'.format(NAME_CLASS): {
                 'routes': {
-                    'PUT': self.PUT_name_transfer,     # accepts: recipient address.  Returns: HTTP 202 with txid
+                    'PUT': cls.PUT_name_transfer,     # accepts: recipient address.  Returns: HTTP 202 with txid
                 },
                 'whitelist': {
                     'PUT': {
@@ -3555,7 +3683,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/names/({})/public_key$'.format(NAME_CLASS): {
                 'routes': {
-                    'GET': self.GET_name_public_key,
+                    'GET': cls.GET_name_public_key,
                 },
                 'whitelist': {
                     'GET': {
@@ -3569,7 +3697,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/zonefile$': {
                 'routes': {
-                    'POST' : self.POST_raw_zonefile
+                    'POST' : cls.POST_raw_zonefile
                 },
                 'whitelist': {
                     'POST': {
@@ -3583,8 +3711,8 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/names/({})/zonefile$'.format(NAME_CLASS): {
                 'routes': {
-                    'GET': self.GET_name_zonefile,
-                    'PUT': self.PUT_name_zonefile,
+                    'GET': cls.GET_name_zonefile,
+                    'PUT': cls.PUT_name_zonefile,
                 },
                 'whitelist': {
                     'GET': {
@@ -3605,7 +3733,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/names/({})/zonefile/([0-9a-fA-F]{{40}})$'.format(NAME_CLASS): {
                 'routes': {
-                    'GET': self.GET_name_zonefile_by_hash,     # returns a zonefile
+                    'GET': cls.GET_name_zonefile_by_hash,     # returns a zonefile
                 },
                 'whitelist': {
                     'GET': {
@@ -3619,7 +3747,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/names/({})/zonefile/zonefileHash$'.format(NAME_CLASS): {
                 'routes': {
-                    'PUT': self.PUT_name_zonefile_hash,     # accepts: zonefile hash.  Returns: HTTP 202 with txid
+                    'PUT': cls.PUT_name_zonefile_hash,     # accepts: zonefile hash.  Returns: HTTP 202 with txid
                 },
                 'whitelist': {
                     'PUT': {
@@ -3633,7 +3761,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/namespaces$': {
                 'routes': {
-                    'GET': self.GET_namespaces,
+                    'GET': cls.GET_namespaces,
                 },
                 'whitelist': {
                     'GET': {
@@ -3647,7 +3775,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/namespaces/({})$'.format(NAMESPACE_CLASS): {
                 'routes': {
-                    'GET': self.GET_namespace_info,
+                    'GET': cls.GET_namespace_info,
                 },
                 'whitelist': {
                     'GET': {
@@ -3661,7 +3789,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/namespaces/({})/names$'.format(NAMESPACE_CLASS): {
                 'routes': {
-                    'GET': self.GET_namespace_names,
+                    'GET': cls.GET_namespace_names,
                 },
                 'whitelist': {
                     'GET': {
@@ -3675,7 +3803,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/wallet/payment_address$': {
                 'routes': {
-                    'GET': self.GET_wallet_payment_address,
+                    'GET': cls.GET_wallet_payment_address,
                 },
                 'whitelist': {
                     'GET': {
@@ -3689,7 +3817,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/wallet/owner_address$': {
                 'routes': {
-                    'GET': self.GET_wallet_owner_address,
+                    'GET': cls.GET_wallet_owner_address,
                 },
                 'whitelist': {
                     'GET': {
@@ -3703,7 +3831,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/wallet/data_pubkey$': {
                 'routes': {
-                    'GET': self.GET_wallet_data_pubkey,
+                    'GET': cls.GET_wallet_data_pubkey,
                 },
                 'whitelist': {
                     'GET': {
@@ -3717,7 +3845,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/insight-api/addr/({})/balance$'.format(BASE58CHECK_CLASS): {
                 'routes': {
-                    'GET': self.GET_confirmed_balance_insight,
+                    'GET': cls.GET_confirmed_balance_insight,
                 },
                 'whitelist': {
                     'GET': {
@@ -3731,7 +3859,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/insight-api/addr/({})/unconfirmedBalance$'.format(BASE58CHECK_CLASS): {
                 'routes': {
-                    'GET': self.GET_unconfirmed_balance_insight,
+                    'GET': cls.GET_unconfirmed_balance_insight,
                 },
                 'whitelist': {
                     'GET': {
@@ -3745,8 +3873,8 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/wallet/balance$': {
                 'routes': {
-                    'GET': self.GET_wallet_balance,
-                    'POST': self.POST_wallet_balance,
+                    'GET': cls.GET_wallet_balance,
+                    'POST': cls.POST_wallet_balance,
                 },
                 'whitelist': {
                     'GET': {
@@ -3767,7 +3895,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/wallet/balance/([0-9]{1,3})$': {
                 'routes': {
-                    'GET': self.GET_wallet_balance,
+                    'GET': cls.GET_wallet_balance,
                 },
                 'whitelist': {
                     'GET': {
@@ -3781,7 +3909,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/wallet/password$': {
                 'routes': {
-                    'PUT': self.PUT_wallet_password,
+                    'PUT': cls.PUT_wallet_password,
                 },
                 'whitelist': {
                     'PUT': {
@@ -3795,7 +3923,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/wallet/keys/({})$'.format(URLENCODING_CLASS): {
                 'routes': {
-                    'PUT': self.PUT_wallet_key,
+                    'PUT': cls.PUT_wallet_key,
                 },
                 'whitelist': {
                     'PUT': {
@@ -3809,8 +3937,8 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/wallet/keys$': {
                 'routes': {
-                    'GET': self.GET_wallet_keys,
-                    'PUT': self.PUT_wallet_keys,
+                    'GET': cls.GET_wallet_keys,
+                    'PUT': cls.PUT_wallet_keys,
                 },
                 'whitelist': {
                     'GET': {
@@ -3831,7 +3959,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/node/ping$': {
                 'routes': {
-                    'GET': self.GET_ping,
+                    'GET': cls.GET_ping,
                 },
                 'whitelist': {
                     'GET': {
@@ -3845,7 +3973,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/node/registrar/state$': {
                 'routes': {
-                    'GET': self.GET_registrar_state,
+                    'GET': cls.GET_registrar_state,
                 },
                 'whitelist': {
                     'GET': {
@@ -3857,9 +3985,23 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
                     },
                 },
             },
+            r'^/v1/node/datastore/cache$': {
+                'routes': {
+                    'GET': cls.GET_datastore_cache_state,
+                },
+                'whitelist': {
+                    'GET': {
+                        'name': '',
+                        'desc': 'Get datastore cache statistics',
+                        'auth_session': False,
+                        'auth_pass': True,
+                        'need_data_key': False,
+                    },
+                },
+            },
             r'^/v1/node/reboot$': {
                 'routes': {
-                    'POST': self.POST_reboot,
+                    'POST': cls.POST_reboot,
                 },
                 'whitelist': {
                     'POST': {
@@ -3873,7 +4015,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/node/config$': {
                 'routes': {
-                    'GET': self.GET_node_config,
+                    'GET': cls.GET_node_config,
                 },
                 'whitelist': {
                     'GET': {
@@ -3887,8 +4029,8 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/node/config/({})$'.format(URLENCODING_CLASS): {
                 'routes': {
-                    'POST': self.POST_node_config,
-                    'DELETE': self.DELETE_node_config_section,
+                    'POST': cls.POST_node_config,
+                    'DELETE': cls.DELETE_node_config_section,
                 },
                 'whitelist': {
                     'POST': {
@@ -3909,7 +4051,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/node/config/({})/({})$'.format(URLENCODING_CLASS, URLENCODING_CLASS): {
                 'routes': {
-                    'DELETE': self.DELETE_node_config_field,
+                    'DELETE': cls.DELETE_node_config_field,
                 },
                 'whitelist': {
                     'DELETE': {
@@ -3923,8 +4065,8 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/node/log$': {
                 'routes': {
-                    'GET': self.GET_node_logfile,
-                    'POST': self.POST_node_logmsg,
+                    'GET': cls.GET_node_logfile,
+                    'POST': cls.POST_node_logmsg,
                 },
                 'whitelist': {
                     'GET': {
@@ -3945,8 +4087,8 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/node/drivers/storage/({})$'.format(URLENCODING_CLASS): {
                 'routes': {
-                    'GET': self.GET_node_storage_driver_config,
-                    'POST': self.POST_node_storage_driver_config,
+                    'GET': cls.GET_node_storage_driver_config,
+                    'POST': cls.POST_node_storage_driver_config,
                 },
                 'whitelist': {
                     'POST': {
@@ -3960,7 +4102,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/prices/namespaces/({})$'.format(NAMESPACE_CLASS): {
                 'routes': {
-                    'GET': self.GET_prices_namespace,
+                    'GET': cls.GET_prices_namespace,
                 },
                 'whitelist': {
                     'GET': {
@@ -3975,7 +4117,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             r'^/v1/prices/names/({})$'.format(NAME_CLASS): {
                 'need_data_key': False,
                 'routes': {
-                    'GET': self.GET_prices_name,
+                    'GET': cls.GET_prices_name,
                 },
                 'whitelist': {
                     'GET': {
@@ -3989,7 +4131,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/users/({})$'.format(URLENCODING_CLASS): {
                 'routes': {
-                    'GET': self.GET_user_profile,
+                    'GET': cls.GET_user_profile,
                 },
                 'whitelist': {
                     'GET': {
@@ -4003,8 +4145,8 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/collections$': {
                 'routes': {
-                    'GET': self.GET_collections,
-                    'POST': self.POST_collections,
+                    'GET': cls.GET_collections,
+                    'POST': cls.POST_collections,
                 },
                 'whitelist': {
                     'GET': {
@@ -4025,8 +4167,8 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/collections/({})$'.format(URLENCODING_CLASS): {
                 'routes': {
-                    'GET': self.GET_collection_info,
-                    'POST': self.POST_collection_item,
+                    'GET': cls.GET_collection_info,
+                    'POST': cls.POST_collection_item,
                 },
                 'whitelist': {
                     'GET': {
@@ -4047,7 +4189,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/collections/({})/({})$'.format(URLENCODING_CLASS, URLENCODING_CLASS): {
                 'routes': {
-                    'GET': self.GET_collection_item,
+                    'GET': cls.GET_collection_item,
                 },
                 'whitelist': {
                     'GET': {
@@ -4061,9 +4203,9 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/stores$': {
                 'routes': {
-                    'POST': self.POST_store,
-                    'PUT': self.PUT_store,
-                    'DELETE': self.DELETE_store,
+                    'POST': cls.POST_store,
+                    'PUT': cls.PUT_store,
+                    'DELETE': cls.DELETE_store,
                 },
                 'whitelist': {
                     'POST': {
@@ -4091,7 +4233,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/stores/({})$'.format(URLENCODING_CLASS): {
                 'routes': {
-                    'GET': self.GET_store,
+                    'GET': cls.GET_store,
                 },
                 'whitelist': {
                     'GET': {
@@ -4105,10 +4247,10 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/stores/({})/(files|directories|inodes)$'.format(URLENCODING_CLASS): {
                 'routes': {
-                    'GET': self.GET_store_item,
-                    'POST': self.POST_store_item,
-                    'PUT': self.PUT_store_item,
-                    'DELETE': self.DELETE_store_item,
+                    'GET': cls.GET_store_item,
+                    'POST': cls.POST_store_item,
+                    'PUT': cls.PUT_store_item,
+                    'DELETE': cls.DELETE_store_item,
                 },
                 'whitelist': {
                     'GET': {
@@ -4143,7 +4285,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/resources/({})/({})$'.format(NAME_CLASS, URLENCODING_CLASS): {
                 'routes': {
-                    'GET': self.GET_app_resource,
+                    'GET': cls.GET_app_resource,
                 },
                 'whitelist': {
                     'GET': {
@@ -4158,7 +4300,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             # test interface (only active if BLOCKSTACK_TEST is set)
             r'^/v1/test/({})$'.format(URLENCODING_CLASS): {
                 'routes': {
-                    'POST': self.POST_test,
+                    'POST': cls.POST_test,
                 },
                 'whitelist': {
                     'POST': {
@@ -4172,7 +4314,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/$': {
                 'routes': {
-                    'GET': self.GET_help,
+                    'GET': cls.GET_help,
                 },
                 'whitelist': {
                     'GET': {
@@ -4186,7 +4328,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/v1/.*$': {
                 'routes': {
-                    'OPTIONS': self.OPTIONS_preflight,
+                    'OPTIONS': cls.OPTIONS_preflight,
                 },
                 'whitelist': {
                     'OPTIONS': {
@@ -4200,7 +4342,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             },
             r'^/insight-api/.*$': {
                 'routes': {
-                    'OPTIONS': self.OPTIONS_preflight,
+                    'OPTIONS': cls.OPTIONS_preflight,
                 },
                 'whitelist': {
                     'OPTIONS': {
@@ -4213,19 +4355,99 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
                 }
             },
         }
-        
-        LOCALHOST = []
-        for port in filter(lambda x: x is not None, [DEFAULT_UI_PORT, DEVELOPMENT_UI_PORT, TEST_UI_PORT]):
-            LOCALHOST += [
-                'http://localhost:{}'.format(port),
-                'http://{}:{}'.format(socket.gethostname(), port),
-                'http://127.0.0.1:{}'.format(port),
-                'http://::1:{}'.format(port)
-            ]
+
+        return routes
+
+
+    @classmethod
+    def _compile_routes(cls, routes):
+        """
+        Compile the route table, grouped by HTTP method and by the first
+        ROUTE_PREFIX_DEPTH path segments.  A route whose first segments are
+        not literal text is included in every group.  Within a group, routes
+        are tried in the same order as in the route table.
+
+        Returns {'routes': {HTTP method: {path prefix: [route match info]}},
+                 'any_prefix': {HTTP method: [route match info]},
+                 'paths': [path regexes]}
+        """
+        compiled = []
+        for route_path, route_info in routes.items():
+            route_regex = re.compile(route_path)
+            prefix = route_prefix_key(route_path, ROUTE_PREFIX_DEPTH)
+
+            for method_name, route_method in route_info['routes'].items():
+                if method_name not in route_info['whitelist'].keys():
+                    # can't authorize calls to this method, so don't route them
+                    log.warning("No whitelist entry for {} {}".format(method_name, route_path))
+                    continue
+
+                compiled.append((method_name, prefix, {
+                    'regex': route_regex,
+                    'route': route_info,
+                    'whitelist': route_info['whitelist'][method_name],
+                    'method': route_method,
+                }))
+
+        table = {}
+        any_prefix = {}
+        for (method_name, prefix, route_match_info) in compiled:
+            if prefix is None:
+                any_prefix.setdefault(method_name, []).append(route_match_info)
+
+            table.setdefault(method_name, {}).setdefault(prefix, None)
+
+        for method_name in table.keys():
+            for prefix in table[method_name].keys():
+                table[method_name][prefix] = [route_match_info for (m, p, route_match_info) in compiled
+                                              if m == method_name and (p is None or p == prefix)]
+
+        return {'routes': table, 'any_prefix': any_prefix, 'paths': routes.keys()}
+
+
+    @classmethod
+    def get_route_table(cls):
+        """
+        Get the compiled route table, building it on first use.
+        """
+        if cls._route_table is None:
+            with cls._route_table_lock:
+                if cls._route_table is None:
+                    cls._route_table = cls._compile_routes(cls._make_routes())
+
+        return cls._route_table
+
+
+    @classmethod
+    def get_local_origins(cls):
+        """
+        Get the Origins from which password authentication is allowed.
+        """
+        if cls._local_origins is None:
+            LOCALHOST = []
+            for port in filter(lambda x: x is not None, [DEFAULT_UI_PORT, DEVELOPMENT_UI_PORT, TEST_UI_PORT]):
+                LOCALHOST += [
+                    'http://localhost:{}'.format(port),
+                    'http://{}:{}'.format(socket.gethostname(), port),
+                    'http://127.0.0.1:{}'.format(port),
+                    'http://::1:{}'.format(port)
+                ]
+
+            cls._local_origins = LOCALHOST
+
+        return cls._local_origins
+
+
+    def _dispatch(self, method_name):
+        """
+        Top-level dispatch method
+        """
+        routes = self.get_route_table()
+        LOCALHOST = self.get_local_origins()
 
         path_info = self.get_path_and_qs()
         if 'error' in path_info:
-            self._send_headers(status_code=401, content_type='text/plain')
+            self._send_headers(status_code=401, content_type='text/plain', content_length=0)
             return
 
         qs_values = path_info['qs_values']
@@ -4233,8 +4455,8 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         route_info = self._route_match( method_name, path_info, routes )
         if route_info is None:
             log.debug("Unmatched route: {} '{}'".format(method_name, path_info['path']))
-            print(json.dumps( routes.keys(), sort_keys=True, indent=4 ))
-            self._send_headers(status_code=404, content_type='text/plain')
+            print(json.dumps( routes['paths'], sort_keys=True, indent=4 ))
+            self._send_headers(status_code=404, content_type='text/plain', content_length=0)
             return
 
         route_args = route_info['args']
@@ -4283,7 +4505,7 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         # sanity check: this API only works if we have a data key
         if self.server.master_data_privkey is None and need_data_key:
             log.debug("No master data private key set")
-            self._send_headers(status_code=503, content_type='text/plain')
+            self._send_headers(status_code=503, content_type='text/plain', content_length=0)
             return
 
         if not use_session and not use_password:
@@ -4321,11 +4543,11 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
             if BLOCKSTACK_TEST:
                 log.debug("Session was: {}".format(session))
 
-            return self._send_headers(status_code=403, content_type='text/plain')
+            return self._send_headers(status_code=403, content_type='text/plain', content_length=0)
 
         # good to go!
         try:
-            return route_method( session, path_info, *route_args )
+            return route_method( self, session, path_info, *route_args )
         except Exception as e:
             if BLOCKSTACK_DEBUG:
                 log.exception(e)
@@ -4376,7 +4598,168 @@ class BlockstackAPIEndpointHandler(SimpleHTTPRequestHandler):
         return self._dispatch("PATCH")
 
 
-class BlockstackAPIEndpoint(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    def handle(self):
+        """
+        Handle requests on the connection until it is closed.
+        """
+        self.close_connection = 1
+        self.handle_one_request()
+        while not self.close_connection and self.wait_for_request():
+            self.handle_one_request()
+
+
+    def wait_for_request(self):
+        """
+        Wait for the next request on a keep-alive connection.
+        An idle connection holds on to its worker thread, so give up
+        if other connections are waiting for a worker.
+        Return True if there is a request to read
+        Return False if the connection should be closed
+        """
+        # a pipelined request may already be buffered
+        rbuf = getattr(self.rfile, '_rbuf', None)
+        if rbuf is not None and rbuf.tell() > 0:
+            return True
+
+        deadline = time.time() + self.timeout
+        while True:
+            if self.server.is_busy():
+                log.debug("Closing idle connection from {}:{}; connections are waiting".format(self.client_address[0], self.client_address[1]))
+                return False
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+
+            try:
+                readable, _, _ = select.select([self.connection], [], [], min(remaining, API_IDLE_POLL_INTERVAL))
+            except (select.error, socket.error):
+                return False
+
+            if len(readable) > 0:
+                return True
+
+
+    def handle_one_request(self):
+        """
+        Handle one request on the connection.
+        If the handler didn't read the request body, we can't find where
+        the next request starts, so close the connection.
+        """
+        self.payload_read = False
+        SimpleHTTPRequestHandler.handle_one_request(self)
+
+        if self.close_connection or self.payload_read:
+            return
+
+        try:
+            payload_len = int(self.headers.get('content-length', 0))
+        except ValueError:
+            payload_len = 1
+
+        if payload_len != 0:
+            self.close_connection = 1
+
+
+class BoundedThreadPoolMixIn:
+    """
+    Handle requests with a fixed pool of worker threads, instead of
+    a new thread per connection (like SocketServer.ThreadingMixIn).
+    Connections wait in a bounded queue for a free worker.  If the queue
+    is full, the server is overloaded, and the connection gets a 503
+    with a Retry-After.
+    """
+
+    num_workers = API_NUM_WORKERS
+    max_queued_requests = API_MAX_QUEUED_REQUESTS
+    retry_after = API_RETRY_AFTER
+
+    request_queue = None
+    workers = None
+
+    def start_workers(self):
+        """
+        Start the worker threads
+        """
+        self.request_queue = Queue.Queue(maxsize=self.max_queued_requests)
+        self.workers = []
+
+        for i in xrange(self.num_workers):
+            worker = threading.Thread(target=self.worker_main, name='api-worker-{}'.format(i))
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+
+    def stop_workers(self):
+        """
+        Stop the worker threads once they finish their current requests
+        """
+        if self.workers is None:
+            return
+
+        for worker in self.workers:
+            self.request_queue.put(None)
+
+        self.workers = None
+
+
+    def worker_main(self):
+        """
+        Worker thread: handle queued connections until told to stop
+        """
+        while True:
+            item = self.request_queue.get()
+            if item is None:
+                return
+
+            request, client_address = item
+            try:
+                self.finish_request(request, client_address)
+            except:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+
+    def is_busy(self):
+        """
+        Are connections waiting for a worker?
+        """
+        return self.request_queue is not None and not self.request_queue.empty()
+
+
+    def process_request(self, request, client_address):
+        """
+        Queue a connection for the next free worker,
+        or turn it away if there are too many waiting.
+        """
+        try:
+            self.request_queue.put_nowait((request, client_address))
+        except Queue.Full:
+            log.warning("Too many pending requests ({}); rejecting {}:{}".format(
+                        self.request_queue.qsize(), client_address[0], client_address[1]))
+
+            self.reject_request(request)
+
+
+    def reject_request(self, request):
+        """
+        Reply 503 without reading the request, and close the connection
+        """
+        try:
+            request.sendall('HTTP/1.1 503 Service Unavailable\r\n'
+                            'Retry-After: {}\r\n'
+                            'Access-Control-Allow-Origin: *\r\n'
+                            'Content-Length: 0\r\n'
+                            'Connection: close\r\n\r\n'.format(self.retry_after))
+        except socket.error:
+            pass
+
+        self.shutdown_request(request)
+
+
+class BlockstackAPIEndpoint(BoundedThreadPoolMixIn, SocketServer.TCPServer):
     """
     Lightweight API endpoint to Blockstack server:
     exposes all of the client methods via a RESTful interface,
@@ -4384,6 +4767,9 @@ class BlockstackAPIEndpoint(SocketServer.ThreadingMixIn, SocketServer.TCPServer)
     can access the Blockstack client functionality.
     """
 
+    # let bursts of connections reach the request queue, so they get a 503 instead of a refused connection
+    request_queue_size = API_MAX_QUEUED_REQUESTS
+
     @classmethod
     def is_method(cls, method):
         return bool(callable(method) or getattr(method, '__call__', None))
@@ -4466,13 +4852,15 @@ class BlockstackAPIEndpoint(SocketServer.ThreadingMixIn, SocketServer.TCPServer)
 
             log.debug("Set SO_REUSADDR")
             self.socket.setsockopt( socket.SOL_SOCKET, socket.SO_REUSEADDR, 1 )
-            
-            # we want daemon threads, so we join on abrupt shutdown (applies if multithreaded) 
-            self.daemon_threads = True
 
             self.server_bind()
             self.server_activate()
 
+            # compile the route table before taking requests
+            handler.get_route_table()
+
+            self.start_workers()
+
 
         # proxy method to all wrapped CLI methods
         class InternalProxy(object):
@@ -5035,9 +5423,14 @@ class BlockstackAPIEndpointClient(object):
             return self.get_response(req)
 
 
-    def backend_datastore_lookup(self, blockchain_id, datastore, inode_type, path, data_pubkeys=None, idata=True, force=False, extended=False):
+    def backend_datastore_lookup(self, blockchain_id, datastore, inode_type, path, data_pubkeys=None, idata=True, force=False, extended=False, prefetch=False, byte_range=None, stream=False):
         """
         Look up a path and its inodes
+        If prefetch is True and the path is a directory, the API server will fetch its children in the background.
+        If byte_range is given as (start, end) and the path is a file, only its bytes from start to end (inclusive) are fetched,
+        and the file's size is returned in the inode info as 'size'.  Only the API server can do this.
+        If stream is True and the path is a file, a FileReader for it is returned in the inode info
+        as 'reader' instead of its data (see data.get_inode_data()).  Only the API server can do this.
         Return {'status': True, 'inode_info': ...} on success.
         * If extended is True, then also return 'path_info': ...
 
@@ -5045,9 +5438,12 @@ class BlockstackAPIEndpointClient(object):
         """
         if is_api_server(self.config_dir):
             # directly do the lookup
-            return data.inode_path_lookup(blockchain_id, datastore, path, data_pubkeys, get_idata=idata, force=force, config_path=self.config_path )
+            return data.inode_path_lookup(blockchain_id, datastore, path, data_pubkeys, get_idata=idata, force=force, config_path=self.config_path, prefetch=prefetch, byte_range=byte_range, stream=stream )
 
         else:
+            assert byte_range is None, 'Byte ranges are only supported in the API server'
+            assert not stream, 'Streaming is only supported in the API server'
+
             res = self.check_version()
             if 'error' in res:
                 return res
@@ -5055,8 +5451,8 @@ class BlockstackAPIEndpointClient(object):
             # ask the API server
             headers = self.make_request_headers(need_session=True)
             datastore_id = data.datastore_get_id(datastore['pubkey'])
-            url = 'http://{}:{}/v1/stores/{}/{}?path={}&extended={}&force={}&idata={}'.format(
-                    self.server, self.port, datastore_id, inode_type, urllib.quote(path), '1' if extended else '0', '1' if force else '0', '1' if idata else '0'
+            url = 'http://{}:{}/v1/stores/{}/{}?path={}&extended={}&force={}&idata={}&prefetch={}'.format(
+                    self.server, self.port, datastore_id, inode_type, urllib.quote(path), '1' if extended else '0', '1' if force else '0', '1' if idata else '0', '1' if prefetch else '0'
             )
             if blockchain_id:
                 url += '&blockchain_id={}'.format(urllib.quote(blockchain_id))
@@ -5180,15 +5576,26 @@ class BlockstackAPIEndpointClient(object):
             return self.get_response(req)
 
 
-    def backend_datastore_putfile(self, datastore_str, datastore_sig, path, inodes, payloads, signatures, tombstones, create=False, exist=False ):
+    def backend_datastore_putfile(self, datastore_str, datastore_sig, path, inodes, payloads, signatures, tombstones, create=False, exist=False, file_data=None, datastore_pubkey=None ):
         """
         Send signed inodes, payloads, and tombstones for a putfile.
+        If the file is chunked, then file_data must be its data (its payload is its chunk list).
+        If we are the API server, then datastore_pubkey must be the datastore's public key,
+        so the datastore can be verified.
         Return {'status': True} on success
         Return {'error': ..., 'errno': ...} on failure
         """
         if is_api_server(self.config_dir):
             # file put the data
-            return data.datastore_putfile_put_inodes( datastore, path, inodes, payloads, signatures, tombstones, create=create, exist=exist, config_path=self.config_path )
+            if datastore_pubkey is None:
+                return {'error': 'No datastore public key given', 'errno': errno.EINVAL}
+
+            res = data.datastore_verify_and_parse(datastore_str, datastore_sig, datastore_pubkey)
+            if 'error' in res:
+                return res
+
+            datastore = res['datastore']
+            return data.datastore_putfile_put_inodes( datastore, path, inodes, payloads, signatures, tombstones, create=create, exist=exist, config_path=self.config_path, file_data=file_data )
 
         else:
             res = self.check_version()
@@ -5208,6 +5615,9 @@ class BlockstackAPIEndpointClient(object):
                 'signatures': signatures,
                 'tombstones': tombstones,
             }
+            if file_data is not None:
+                request['file_data'] = base64.b64encode(file_data)
+
             datastore_id = data.datastore_get_id(json.loads(datastore_str)['pubkey'])
             url = 'http://{}:{}/v1/stores/{}/files?path={}&create={}&exist={}'.format(
                     self.server, self.port, datastore_id, urllib.quote(path), '1' if create else '0', '1' if exist else '0',
@@ -5246,15 +5656,25 @@ class BlockstackAPIEndpointClient(object):
             return self.get_response(req)
 
 
-    def backend_datastore_deletefile(self, datastore_str, datastore_sig, path, inodes, payloads, signatures, signed_tombstones ):
+    def backend_datastore_deletefile(self, datastore_str, datastore_sig, path, inodes, payloads, signatures, signed_tombstones, datastore_pubkey=None ):
         """
         Send signed inodes, payloads, and signed_tombstones for a deletefile
+        If we are the API server, then datastore_pubkey must be the datastore's public key,
+        so the datastore can be verified.
         Return {'status': True} on success
         Return {'error': ..., 'errno': ...} on failure
         """
         if is_api_server(self.config_dir):
             # direct deletefile
-            return data.datastore_deletefile_put_inodes( datastore, path, inodes, payloads, signatures, signed_tombstones, config_path=self.config_path, force=force )
+            if datastore_pubkey is None:
+                return {'error': 'No datastore public key given', 'errno': errno.EINVAL}
+
+            res = data.datastore_verify_and_parse(datastore_str, datastore_sig, datastore_pubkey)
+            if 'error' in res:
+                return res
+
+            datastore = res['datastore']
+            return data.datastore_deletefile_put_inodes( datastore, path, inodes, payloads, signatures, signed_tombstones, config_path=self.config_path )
 
         else:
             res = self.check_version()
@@ -5364,6 +5784,7 @@ def local_api_server_stop(srv):
     """
     log.debug("Server shutdown")
     srv.socket.close()
+    srv.stop_workers()
 
     # stop the registrar too
     backend.registrar.registrar_shutdown(srv.config_path)
@@ -558,6 +558,10 @@ MUTABLE_DATUM_SCHEMA_BASE_PROPERTIES = {
         'type': 'integer',
         'minimum': 1,
     },
+    'chunked': {
+        # file idata is a chunk list (optional; files only)
+        'type': 'boolean',
+    },
 }
 
 # header contains hash of payload
@@ -577,7 +581,7 @@ MUTABLE_DATUM_INODE_HEADER_SCHEMA = {
     'type': 'object',
     'properties': MUTABLE_DATUM_SCHEMA_HEADER_PROPERTIES,
     'additionalProperties': False,
-    'required': list(set(MUTABLE_DATUM_SCHEMA_HEADER_PROPERTIES.keys()) - set(['reader_pubkeys']))  # headers only include reader pubkey hashes
+    'required': list(set(MUTABLE_DATUM_SCHEMA_HEADER_PROPERTIES.keys()) - set(['reader_pubkeys', 'chunked']))  # headers only include reader pubkey hashes
 }
 
 MUTABLE_DATUM_DIRENT_SCHEMA = {
@@ -634,6 +638,43 @@ MUTABLE_DATUM_FILE_SCHEMA_PROPERTIES.update({
     'idata': MUTABLE_DATUM_FILE_IDATA_SCHEMA
 })
 
+# idata of a chunked file (chunks are immutable data, named by their sha256)
+MUTABLE_DATUM_FILE_CHUNKS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'size': {
+            'type': 'integer',
+            'minimum': 0,
+        },
+        'chunks': {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {
+                    'hash': {
+                        'type': 'string',
+                        'pattern': r'^([0-9a-f]{64})$',
+                    },
+                    'size': {
+                        'type': 'integer',
+                        'minimum': 1,
+                    },
+                },
+                'additionalProperties': False,
+                'required': [
+                    'hash',
+                    'size',
+                ],
+            },
+        },
+    },
+    'additionalProperties': False,
+    'required': [
+        'size',
+        'chunks',
+    ],
+}
+
 MUTABLE_DATUM_DIR_SCHEMA_PROPERTIES.update({
     'idata': MUTABLE_DATUM_DIR_IDATA_SCHEMA
 })
@@ -642,7 +683,7 @@ MUTABLE_DATUM_INODE_SCHEMA = {
     'type': 'object',
     'properties': MUTABLE_DATUM_SCHEMA_BASE_PROPERTIES,
     'additionalProperties': False,
-    'required': list(set(MUTABLE_DATUM_SCHEMA_BASE_PROPERTIES.keys()) - set(['reader_pubkeys']))    # public keys are loaded at runtime, not stored
+    'required': list(set(MUTABLE_DATUM_SCHEMA_BASE_PROPERTIES.keys()) - set(['reader_pubkeys', 'chunked']))    # public keys are loaded at runtime, not stored
 }
 
 
@@ -650,14 +691,14 @@ MUTABLE_DATUM_FILE_SCHEMA = {
     'type': 'object',
     'properties': MUTABLE_DATUM_FILE_SCHEMA_PROPERTIES,
     'additionalProperties': False,
-    'required': list(set(MUTABLE_DATUM_FILE_SCHEMA_PROPERTIES.keys()) - set(['reader_pubkeys']))    # public keys are loaded at runtime, not stored
+    'required': list(set(MUTABLE_DATUM_FILE_SCHEMA_PROPERTIES.keys()) - set(['reader_pubkeys', 'chunked']))    # public keys are loaded at runtime, not stored
 }
 
 MUTABLE_DATUM_DIR_SCHEMA = {
     'type': 'object',
     'properties': MUTABLE_DATUM_DIR_SCHEMA_PROPERTIES,
     'additionalProperties': False,
-    'required': list(set(MUTABLE_DATUM_DIR_SCHEMA_PROPERTIES.keys()) - set(['reader_pubkeys']))     # public keys are loaded at runtime, not stored
+    'required': list(set(MUTABLE_DATUM_DIR_SCHEMA_PROPERTIES.keys()) - set(['reader_pubkeys', 'chunked']))     # public keys are loaded at runtime, not stored
 }
 
 # replicated datastore
@@ -34,7 +34,7 @@ from virtualchain import tx_extend, tx_sign_input
 
 from .b40 import is_b40, b40_to_bin
 from .constants import MAGIC_BYTES, NAME_OPCODES, LENGTH_MAX_NAME, LENGTH_MAX_NAMESPACE_ID, TX_MIN_CONFIRMATIONS
-from .utxo import get_unspents
+from .utxo import get_unspents, is_spendable_utxo
 from .logger import get_logger
 
 log = get_logger('blockstack-client')
@@ -404,8 +404,8 @@ def tx_get_unspents(address, utxo_client, min_confirmations=None):
         log.exception(ae)
         raise UTXOException()
     
-    # filter minimum confirmations
-    ret = [d for d in data if d.get('confirmations', 0) >= min_confirmations]
+    # filter minimum confirmations (but let our own unconfirmed change through)
+    ret = [d for d in data if is_spendable_utxo(d, min_confirmations)]
     
     # sort on value, largest first 
     ret.sort(lambda x, y: -1 if x['value'] > y['value'] else 0 if x['value'] == y['value'] else 1)
@@ -31,13 +31,16 @@ import urllib
 import urllib2
 import base64
 import time
+import threading
+import Queue
 import jsontokens
 
 import blockstack_zones
 import blockstack_profiles
 
 from .logger import get_logger
-from constants import BLOCKSTACK_TEST, BLOCKSTACK_DEBUG, BLOCKSTACK_STORAGE_CLASSES
+from constants import BLOCKSTACK_TEST, BLOCKSTACK_DEBUG, BLOCKSTACK_STORAGE_CLASSES, BLOCKSTACK_STORAGE_READ_HEDGE, \
+        BLOCKSTACK_STORAGE_READ_MAX_THREADS
 from config import get_config, CONFIG_PATH
 from scripts import hex_hash160
 import schemas
@@ -54,6 +57,9 @@ log = get_logger()
 # global list of registered data handlers
 storage_handlers = []
 
+# slots for hedged read threads (see hedged_read())
+storage_read_threads = threading.BoundedSemaphore(BLOCKSTACK_STORAGE_READ_MAX_THREADS)
+
 
 class UnhandledURLException(Exception):
     def __init__(self, url):
@@ -705,11 +711,107 @@ def configure_storage_driver(driver_name, index=False, force_index=False, config
     return {'error': 'No such driver'}
 
 
+def get_read_handlers(drivers=None):
+    """
+    Get the storage handlers to read from, in the order to try them:
+    all of them, or just the ones named in @drivers.
+    Drivers that read locally go first (see data.prioritize_read_drivers()).
+    """
+    from .data import prioritize_read_drivers
+
+    global storage_handlers
+
+    handlers_to_use = []
+    if drivers is None:
+        handlers_to_use = storage_handlers
+    else:
+        # whitelist of drivers to try
+        for d in drivers:
+            handlers_to_use.extend(
+                h for h in storage_handlers if h.__name__ == d
+            )
+
+    driver_names = prioritize_read_drivers(None, [h.__name__ for h in handlers_to_use])
+    return sorted(handlers_to_use, key=lambda h: driver_names.index(h.__name__))
+
+
+def hedged_read(attempts, read_func, hedge):
+    """
+    Call read_func(attempt) for each attempt, in order, until one of them
+    returns something other than None.  Up to @hedge calls are in flight
+    at once; as soon as one fails, the next attempt starts.
+
+    read_func must verify what it reads, so the first result is a valid one.
+    Calls still in flight once we have a result are abandoned, and no new
+    ones are started.
+
+    The calls run in threads, and at most BLOCKSTACK_STORAGE_READ_MAX_THREADS
+    of them run at once across all lookups.  When none are free, the next
+    attempt is made in the calling thread instead.
+
+    Return the first result on success
+    Return None if all attempts failed
+    """
+    if hedge <= 1 or len(attempts) <= 1:
+        for attempt in attempts:
+            res = read_func(attempt)
+            if res is not None:
+                return res
+
+        return None
+
+    results = Queue.Queue()
+
+    def read_thread(attempt):
+        res = None
+        try:
+            res = read_func(attempt)
+        except Exception as e:
+            log.exception(e)
+        finally:
+            storage_read_threads.release()
+
+        results.put(res)
+
+    attempts = list(attempts)
+    in_flight = 0
+
+    while True:
+        while in_flight < hedge and len(attempts) > 0:
+            if not storage_read_threads.acquire(False):
+                # too many reads in flight already
+                break
+
+            t = threading.Thread(target=read_thread, args=(attempts.pop(0),))
+            t.daemon = True
+            t.start()
+            in_flight += 1
+
+        if in_flight == 0:
+            if len(attempts) == 0:
+                return None
+
+            # no read threads to spare
+            res = read_func(attempts.pop(0))
+
+        else:
+            res = results.get()
+            in_flight -= 1
+
+        if res is not None:
+            if in_flight > 0:
+                log.debug("Abandoning {} slower read(s)".format(in_flight))
+
+            return res
+
+
 def get_immutable_data(data_hash, data_url=None, hash_func=get_data_hash, fqu=None,
-                       data_id=None, zonefile=False, drivers=None):
+                       data_id=None, zonefile=False, drivers=None, hedge=BLOCKSTACK_STORAGE_READ_HEDGE):
     """
     Given the hash of the data, go through the list of
-    immutable data handlers and look it up.
+    immutable data handlers and look it up.  Up to @hedge
+    handlers are queried at once, and the first one to return
+    data with the right hash wins.
 
     Optionally pass the fully-qualified name (@fqu), human-readable data ID (data_id),
     and whether or not this is a zonefile request (zonefile) as hints to the driver.
@@ -723,23 +825,12 @@ def get_immutable_data(data_hash, data_url=None, hash_func=get_data_hash, fqu=No
         log.warn('No storage handlers registered')
         return None
 
-    handlers_to_use = []
-    if drivers is None:
-        handlers_to_use = storage_handlers
-    else:
-        # whitelist of drivers to try
-        for d in drivers:
-            handlers_to_use.extend(
-                h for h in storage_handlers if h.__name__ == d
-            )
+    handlers_to_use = get_read_handlers(drivers)
 
     log.debug('get_immutable {}'.format(data_hash))
 
-    for handler in [data_url] + handlers_to_use:
-        if handler is None:
-            continue
-
-        data, data_dict = None, None
+    def read_immutable(handler):
+        data = None
 
         if handler == data_url:
             # url hint
@@ -752,13 +843,13 @@ def get_immutable_data(data_hash, data_url=None, hash_func=get_data_hash, fqu=No
                 log.exception(e)
                 msg = 'Failed to load profile from "{}"'
                 log.error(msg.format(data_url))
-                continue
+                return None
         else:
             # handler
             if not getattr(handler, 'get_immutable_handler', None):
                 msg = 'No method: {}.get_immutable_handler({})'
                 log.debug(msg.format(handler, data_hash))
-                continue
+                return None
 
             log.debug('Try {} ({})'.format(handler.__name__, data_hash))
             try:
@@ -769,12 +860,12 @@ def get_immutable_data(data_hash, data_url=None, hash_func=get_data_hash, fqu=No
                 log.exception(e)
                 msg = 'Method failed: {}.get_immutable_handler({})'
                 log.debug(msg.format(handler, data_hash))
-                continue
+                return None
 
         if data is None:
             msg = 'No data: {}.get_immutable_handler({})'
-            log.debug(msg.format(handler.__name__, data_hash))
-            continue
+            log.debug(msg.format(getattr(handler, '__name__', handler), data_hash))
+            return None
 
         # validate
         dh = hash_func(data)
@@ -787,12 +878,13 @@ def get_immutable_data(data_hash, data_url=None, hash_func=get_data_hash, fqu=No
                 msg = 'Invalid data hash from {}.get_immutable_handler'
                 log.error(msg.format(handler.__name__))
 
-            continue
+            return None
 
-        log.debug('loaded {} with {}'.format(data_hash, handler.__name__))
+        log.debug('loaded {} with {}'.format(data_hash, getattr(handler, '__name__', handler)))
         return data
 
-    return None
+    attempts = [h for h in [data_url] + handlers_to_use if h is not None]
+    return hedged_read(attempts, read_immutable, hedge)
 
 
 def get_drivers_for_url(url):
@@ -828,11 +920,15 @@ def get_driver_urls( fq_data_id, storage_drivers ):
 
 
 def get_mutable_data(fq_data_id, data_pubkey, urls=None, data_address=None, data_hash=None,
-                     owner_address=None, blockchain_id=None, drivers=None, decode=True, bsk_version=None, return_public_key=False):
+                     owner_address=None, blockchain_id=None, drivers=None, decode=True, bsk_version=None, return_public_key=False,
+                     hedge=BLOCKSTACK_STORAGE_READ_HEDGE):
     """
     Low-level call to get mutable data, given a fully-qualified data name.
+    Up to @hedge URLs are read at once, and the first one to return
+    data that verifies wins.
     
     if decode is False, then data_pubkey, data_address, and owner_address are not needed and raw bytes will be returned.
+    The data can't be verified then, so the URLs are read one at a time, in order.
     if return_public_key is True, and resolution succeeds, then return {'data': ..., 'public_key': ...} instead of the data.
 
     Return:
@@ -851,15 +947,7 @@ def get_mutable_data(fq_data_id, data_pubkey, urls=None, data_address=None, data
     if blockchain_id is not None:
         fqu = blockchain_id
 
-    handlers_to_use = []
-    if drivers is None:
-        handlers_to_use = storage_handlers
-    else:
-        # whitelist of drivers to try
-        for d in drivers:
-            handlers_to_use.extend(
-                h for h in storage_handlers if h.__name__ == d
-            )
+    handlers_to_use = get_read_handlers(drivers)
 
     # ripemd160(sha256(pubkey))
     data_pubkey_hashes = []
@@ -872,6 +960,9 @@ def get_mutable_data(fq_data_id, data_pubkey, urls=None, data_address=None, data
             continue
 
     log.debug('get_mutable_data {} fqu={} bsk_version={}'.format(fq_data_id, fqu, bsk_version))
+
+    # (handler, url) pairs to read from, in order
+    attempts = []
     for storage_handler in handlers_to_use:
         if not getattr(storage_handler, 'get_mutable_handler', None):
             continue
@@ -913,62 +1004,71 @@ def get_mutable_data(fq_data_id, data_pubkey, urls=None, data_address=None, data
                     try_urls.append(url)
 
         for url in try_urls:
-            data_txt, data_res = None, None
+            attempts.append((storage_handler, url))
 
-            log.debug('Try {} ({})'.format(storage_handler.__name__, url))
-            try:
-                data_txt = storage_handler.get_mutable_handler(url, fqu=fqu, data_pubkey=data_pubkey, data_pubkey_hashes=data_pubkey_hashes)
-            except UnhandledURLException as uue:
-                # handler doesn't handle this URL
-                msg = 'Storage handler {} does not handle URLs like {}'
-                log.debug(msg.format(storage_handler.__name__, url))
-                continue
-            except Exception as e:
-                log.exception(e)
-                continue
+    def read_mutable(attempt):
+        storage_handler, url = attempt
+        data_txt, data_res = None, None
 
-            if data_txt is None:
-                # no data
-                msg = 'No data from {} ({})'
-                log.debug(msg.format(storage_handler.__name__, url))
-                continue
+        log.debug('Try {} ({})'.format(storage_handler.__name__, url))
+        try:
+            data_txt = storage_handler.get_mutable_handler(url, fqu=fqu, data_pubkey=data_pubkey, data_pubkey_hashes=data_pubkey_hashes)
+        except UnhandledURLException as uue:
+            # handler doesn't handle this URL
+            msg = 'Storage handler {} does not handle URLs like {}'
+            log.debug(msg.format(storage_handler.__name__, url))
+            return None
+        except Exception as e:
+            log.exception(e)
+            return None
 
-            # parse it, if desired
-            if decode:
-                data_res = None
-                if data_pubkey is not None or data_address is not None or data_hash is not None:
-                    data_res = parse_mutable_data(
-                        data_txt, data_pubkey, public_key_hash=data_address, data_hash=data_hash, bsk_version=bsk_version, return_public_key=return_public_key
-                    )
-
-                if data_res is None and owner_address is not None:
-                    data_res = parse_mutable_data(
-                        data_txt, None, public_key_hash=owner_address, bsk_version=bsk_version, return_public_key=return_public_key
-                    )
-
-                if data_res is None:
-                    msg = 'Unparseable data from "{}"'
-                    log.error(msg.format(url))
-                    continue
+        if data_txt is None:
+            # no data
+            msg = 'No data from {} ({})'
+            log.debug(msg.format(storage_handler.__name__, url))
+            return None
+
+        # parse it, if desired
+        if decode:
+            data_res = None
+            if data_pubkey is not None or data_address is not None or data_hash is not None:
+                data_res = parse_mutable_data(
+                    data_txt, data_pubkey, public_key_hash=data_address, data_hash=data_hash, bsk_version=bsk_version, return_public_key=return_public_key
+                )
+
+            if data_res is None and owner_address is not None:
+                data_res = parse_mutable_data(
+                    data_txt, None, public_key_hash=owner_address, bsk_version=bsk_version, return_public_key=return_public_key
+                )
+
+            if data_res is None:
+                msg = 'Unparseable data from "{}"'
+                log.error(msg.format(url))
+                return None
 
-                msg = 'Loaded "{}" with {}'
-                log.debug(msg.format(url, storage_handler.__name__))
+            msg = 'Loaded "{}" with {}'
+            log.debug(msg.format(url, storage_handler.__name__))
 
-                if BLOCKSTACK_TEST:
-                    log.debug("loaded data: {}".format(data_res))
+            if BLOCKSTACK_TEST:
+                log.debug("loaded data: {}".format(data_res))
 
+        else:
+            if return_public_key:
+                data_res = {'data': data_txt, 'public_key': None}
             else:
-                if return_public_key:
-                    data_res = {'data': data_txt, 'public_key': None}
-                else:
-                    data_res = data_txt
+                data_res = data_txt
 
-                msg = 'Fetched (but did not decode or verify) "{}" with "{}"'
-                log.debug(msg.format(url, storage_handler.__name__))
+            msg = 'Fetched (but did not decode or verify) "{}" with "{}"'
+            log.debug(msg.format(url, storage_handler.__name__))
 
-            return data_res
+        return data_res
 
-    return None
+    if not decode:
+        # the first response would win without being verified;
+        # read the URLs in order of preference instead
+        hedge = 1
+
+    return hedged_read(attempts, read_mutable, hedge)
 
 
 def put_immutable_data(data_text, txid, data_hash=None, required=None, skip=None, required_exclusive=False):
@@ -1163,22 +1263,29 @@ def put_mutable_data(fq_data_id, data_text_or_json, sign=True, raw=False, data_p
     return (successes > 0) and (required_successes >= len(set(required) - set(skip)))
 
 
-def delete_immutable_data(data_hash, txid, privkey=None, signed_data_tombstone=None):
+def delete_immutable_data(data_hash, txid, privkey=None, signed_data_tombstone=None, drivers=None):
     """
     Given the hash of the data, the private key of the user,
     and the txid that deleted the data's hash from the blockchain,
     delete the data from all immutable data stores.
+
+    Data that was never announced in a transaction (txid is None),
+    such as the chunks of a chunked file, is deleted without a tombstone.
+    If drivers is given, then only delete from those drivers.
     """
 
     global storage_handlers
 
     # sanity check
-    if not is_singlesig_hex(privkey):
+    if privkey is not None and not is_singlesig_hex(privkey):
         log.error('Only single-signature data private keys are supported')
         return False
 
-    if signed_data_tombstone is None:
-        assert privkey
+    if signed_data_tombstone is None and txid is not None:
+        if privkey is None:
+            log.error('Need a private key or a signed tombstone to delete {}'.format(data_hash))
+            return False
+
         data_hash = str(data_hash)
         txid = str(txid)
 
@@ -1186,6 +1293,9 @@ def delete_immutable_data(data_hash, txid, privkey=None, signed_data_tombstone=N
         signed_data_tombstone = sign_data_tombstone( ts, privkey )
         
     for handler in storage_handlers:
+        if drivers is not None and handler.__name__ not in drivers:
+            continue
+
         if not getattr(handler, 'delete_immutable_handler', None):
             continue
 
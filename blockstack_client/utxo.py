@@ -21,8 +21,13 @@
     along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
 """
 
+import copy
+import time
+import threading
+
 from ConfigParser import SafeConfigParser
 
+import virtualchain
 from virtualchain import AuthServiceProxy
 
 from backend.utxo.blockstack_core import BlockstackCoreUTXOClient
@@ -50,7 +55,7 @@ from backend.utxo.blockstack_explorer import broadcast_transaction as blockstack
 from backend.utxo.blockstack_utxo import get_unspents as blockstack_utxo_get_unspents
 from backend.utxo.blockstack_utxo import broadcast_transaction as blockstack_utxo_broadcast_transaction
 
-from constants import TX_MIN_CONFIRMATIONS
+from constants import TX_MIN_CONFIRMATIONS, UTXO_CACHE_TTL, UTXO_CACHE_SPENT_TTL, UTXO_MAX_UNCONFIRMED_CHAIN
 
 DEBUG = True
 FIRST_BLOCK_MAINNET = 373601        # well-known value for blockstack-core; doesn't ever change
@@ -414,9 +419,166 @@ def connect_utxo_provider( utxo_opts, min_confirmations=TX_MIN_CONFIRMATIONS ):
        raise Exception("Unrecognized UTXO provider '%s'" % utxo_provider )
 
 
+class UTXOCache(object):
+    """
+    Per-address cache of the UTXOs our providers report, so back-to-back
+    transactions from the same address don't each re-download its UTXO set.
+
+    Also remembers the transactions we send:  the outputs they spend are
+    hidden from the provider's answers (which can lag behind the mempool),
+    and the outputs they create are reported as unconfirmed UTXOs until they
+    get confirmed.  These carry 'unconfirmed_chain_length', the number of
+    our unconfirmed transactions they depend on (including their own), so
+    they can be spent before they are confirmed (see is_spendable_utxo()).
+    """
+    def __init__(self, ttl=UTXO_CACHE_TTL, spent_ttl=UTXO_CACHE_SPENT_TTL):
+        self.ttl = ttl
+        self.spent_ttl = spent_ttl
+        self.unspents = {}      # address --> (time fetched, [utxo])
+        self.spent = {}         # (tx hash, output index) --> time spent
+        self.created = {}       # address --> {(tx hash, output index): (time created, utxo)}
+        self.reported = set()   # (tx hash, output index) of created outputs the provider has reported
+        self.lock = threading.Lock()
+
+
+    def get_unspents(self, address, fetch):
+        """
+        Get an address's UTXOs, calling fetch() to ask the provider
+        if we don't have a fresh copy.
+        """
+        now = time.time()
+        with self.lock:
+            cached = self.unspents.get(address, None)
+
+        if cached is not None and now < cached[0] + self.ttl:
+            utxos = cached[1]
+
+        else:
+            utxos = fetch()
+            if self.ttl > 0:
+                with self.lock:
+                    self.unspents[address] = (now, utxos)
+
+        with self.lock:
+            return self.apply_spends(address, utxos, now)
+
+
+    def apply_spends(self, address, utxos, now):
+        """
+        Remove the outputs we spent from a list of UTXOs, mark the ones
+        we created, and add those the provider doesn't know about yet.
+        Call with the lock held.
+        """
+        for outpoint, spent_at in self.spent.items():
+            if spent_at + self.spent_ttl <= now:
+                del self.spent[outpoint]
+
+        created = self.created.get(address, {})
+        for outpoint, (created_at, utxo) in created.items():
+            if created_at + self.spent_ttl <= now:
+                del created[outpoint]
+                self.reported.discard(outpoint)
+
+        ret = []
+        for utxo in utxos:
+            outpoint = (utxo['outpoint']['hash'], utxo['outpoint']['index'])
+            if self.spent.has_key(outpoint):
+                continue
+
+            utxo = copy.deepcopy(utxo)
+            if created.has_key(outpoint):
+                # provider knows about it now, but it's still ours to spend early.
+                # once it's in a block, it no longer counts towards a mempool chain.
+                self.reported.add(outpoint)
+                if int(utxo.get('confirmations', 0)) > 0:
+                    utxo['unconfirmed_chain_length'] = 0
+                else:
+                    utxo['unconfirmed_chain_length'] = created[outpoint][1]['unconfirmed_chain_length']
+
+            ret.append(utxo)
+
+        for outpoint, (created_at, utxo) in created.items():
+            # (if the provider stopped reporting it, it got spent)
+            if outpoint not in self.reported and not self.spent.has_key(outpoint):
+                ret.append(copy.deepcopy(utxo))
+
+        if len(created) == 0 and self.created.has_key(address):
+            del self.created[address]
+
+        return ret
+
+
+    def add_transaction(self, tx_hex):
+        """
+        Remember a transaction we sent:  its inputs are spent,
+        and its outputs are new (unconfirmed) UTXOs.
+        """
+        txobj = virtualchain.btc_tx_deserialize(tx_hex)
+        tx_hash = virtualchain.btc_tx_get_hash(tx_hex)
+        now = time.time()
+
+        with self.lock:
+            chain_length = 1
+            for inp in txobj['ins']:
+                outpoint = (inp['outpoint']['hash'], inp['outpoint']['index'])
+                self.spent[outpoint] = now
+
+                for created in self.created.values():
+                    if created.has_key(outpoint):
+                        chain_length = max(chain_length, created[outpoint][1]['unconfirmed_chain_length'] + 1)
+
+            for i, out in enumerate(txobj['outs']):
+                address = virtualchain.script_hex_to_address(out['script'])
+                if address is None:
+                    # e.g. an OP_RETURN
+                    continue
+
+                utxo = {
+                    'transaction_hash': tx_hash,
+                    'outpoint': {
+                        'hash': tx_hash,
+                        'index': i,
+                    },
+                    'value': out['value'],
+                    'out_script': out['script'],
+                    'confirmations': 0,
+                    'unconfirmed_chain_length': chain_length,
+                }
+
+                self.created.setdefault(address, {})[(tx_hash, i)] = (now, utxo)
+
+
+    def clear(self):
+        with self.lock:
+            self.unspents.clear()
+            self.spent.clear()
+            self.created.clear()
+            self.reported.clear()
+
+
+UTXO_CACHE = UTXOCache()
+
+
+def is_spendable_utxo(utxo, min_confirmations):
+    """
+    Can we spend a UTXO?  It needs min_confirmations, unless it's an output
+    of our own unconfirmed transactions (see UTXOCache), and spending it
+    keeps the chain of them within bitcoind's mempool limit.
+    """
+    if int(utxo.get('confirmations', 0)) >= min_confirmations:
+        return True
+
+    return utxo.get('unconfirmed_chain_length', UTXO_MAX_UNCONFIRMED_CHAIN) < UTXO_MAX_UNCONFIRMED_CHAIN
+
+# clients for the UTXO providers we support.  Only their answers get cached.
+UTXO_PROVIDER_CLIENTS = (BlockcypherClient, BlockchainInfoClient, BitcoindClient, AuthServiceProxy,
+                         BlockstackCoreUTXOClient, BlockstackExplorerClient, BlockstackUTXOClient)
+
+
 def get_unspents(address, blockchain_client, use_builtin=True):
     """
     Gets the unspent outputs for a given address.
+    Answers from UTXO_CACHE for the UTXO providers we support.
     Returns [{
         "transaction_hash": str,
         'outpoint': {
@@ -429,6 +591,17 @@ def get_unspents(address, blockchain_client, use_builtin=True):
         }]
     on success.
 
+    Raises exception on error
+    """
+    if isinstance(blockchain_client, UTXO_PROVIDER_CLIENTS):
+        return UTXO_CACHE.get_unspents(address, lambda: fetch_unspents(address, blockchain_client))
+
+    return fetch_unspents(address, blockchain_client, use_builtin=use_builtin)
+
+
+def fetch_unspents(address, blockchain_client, use_builtin=True):
+    """
+    Gets the unspent outputs for a given address from the UTXO provider.
     Raises exception on error
     """
     if isinstance(blockchain_client, BlockcypherClient):
@@ -0,0 +1,127 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+
+    Load test for the local API endpoint: many concurrent clients issue
+    GETs against one path, and we report throughput, latency percentiles,
+    and how many requests were turned away with a 503.
+
+    usage: python tools/benchmarks/api_load.py [--clients N] [--requests N] [--close]
+                                               [--api-pass PASS] [http://localhost:6270/v1/ping]
+"""
+
+import time
+import socket
+import httplib
+import urlparse
+import argparse
+import threading
+
+import harness
+
+
+def run_client(url, num_requests, keepalive, headers, results):
+    """
+    Issue num_requests GETs, reusing one connection if keepalive is set.
+    Append (status, latency) to results.  Status is None on socket error.
+    """
+    parsed = urlparse.urlparse(url)
+    path = parsed.path or '/'
+    if parsed.query:
+        path += '?' + parsed.query
+
+    req_headers = dict(headers)
+    if not keepalive:
+        req_headers['Connection'] = 'close'
+
+    conn = None
+    for i in xrange(num_requests):
+        start = time.time()
+        try:
+            if conn is None:
+                conn = httplib.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+
+            conn.request('GET', path, headers=req_headers)
+            resp = conn.getresponse()
+            resp.read()
+            status = resp.status
+
+            if not keepalive or resp.getheader('connection', '').lower() == 'close':
+                conn.close()
+                conn = None
+
+        except (socket.error, httplib.HTTPException):
+            status = None
+            if conn is not None:
+                conn.close()
+                conn = None
+
+        results.append((status, time.time() - start))
+
+    if conn is not None:
+        conn.close()
+
+
+def load_test(url, num_clients, requests_per_client, keepalive=True, api_pass=None):
+    """
+    Run the load test and print a report
+    """
+    headers = {}
+    if api_pass is not None:
+        headers['Authorization'] = 'bearer {}'.format(api_pass)
+
+    results = []
+    clients = [threading.Thread(target=run_client, args=(url, requests_per_client, keepalive, headers, results))
+               for i in xrange(num_clients)]
+
+    start = time.time()
+    for t in clients:
+        t.start()
+
+    for t in clients:
+        t.join()
+
+    elapsed = time.time() - start
+
+    statuses = {}
+    for (status, latency) in results:
+        statuses[status] = statuses.get(status, 0) + 1
+
+    latencies = [latency for (status, latency) in results if status == 200]
+
+    harness.report('url', url, width=13)
+    harness.report('clients', '{} ({})'.format(num_clients, 'keep-alive' if keepalive else 'connection per request'), width=13)
+    harness.report('requests', '{} in {:.2f}s'.format(len(results), elapsed), width=13)
+    harness.report('throughput', '{:.1f} req/s ({:.1f} OK req/s)'.format(len(results) / elapsed, len(latencies) / elapsed), width=13)
+    harness.report('latency (OK)', harness.format_latencies(latencies), width=13)
+    harness.report('statuses', ', '.join('{}: {}'.format(s if s is not None else 'error', c) for (s, c) in sorted(statuses.items())), width=13)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load-test the local Blockstack API endpoint')
+    parser.add_argument('url', nargs='?', default='http://localhost:6270/v1/ping')
+    parser.add_argument('--clients', type=int, default=64, help='number of concurrent clients')
+    parser.add_argument('--requests', type=int, default=100, help='requests per client')
+    parser.add_argument('--close', action='store_true', help='open a new connection for each request')
+    parser.add_argument('--api-pass', default=None, help='API password, for routes that need it')
+
+    args = parser.parse_args()
+    load_test(args.url, args.clients, args.requests, keepalive=not args.close, api_pass=args.api_pass)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+
+
+    Measure how many bytes the API server uploads (and how long it takes)
+    to write a large datastore file, and then to rewrite it after a small
+    edit, as one whole-file datum and as content-defined chunks.  Also
+    measures reading a small byte range of it.  Runs against a stand-in
+    storage driver with a fixed per-request latency and bandwidth.
+
+    usage: python tools/benchmarks/chunked_file.py [file_size_mb]
+"""
+
+import os
+import time
+import threading
+
+import harness
+harness.use_temp_config()
+
+import blockstack_client.data as data
+import blockstack_client.storage as storage
+
+from blockstack_client.chunking import chunk_data, make_chunk_list, parse_chunk_list
+
+REQUEST_LATENCY = 0.05              # seconds per request
+BANDWIDTH = 10 * 1024 * 1024        # bytes per second, per request
+EDIT_SIZE = 100
+
+
+class StandInDriver(object):
+    """
+    Stores immutable data after a fixed latency, plus transfer time.
+    Stands in for storage.put_immutable_data() and storage.get_immutable_data().
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}      # hash --> data
+        self.uploads = 0
+        self.bytes_uploaded = 0
+        self.bytes_downloaded = 0
+
+    def put_immutable_data(self, data_text, txid, data_hash=None, **kw):
+        time.sleep(REQUEST_LATENCY + float(len(data_text)) / BANDWIDTH)
+        with self.lock:
+            self.data[data_hash] = data_text
+            self.uploads += 1
+            self.bytes_uploaded += len(data_text)
+
+        return data_hash
+
+    def get_immutable_data(self, data_hash, **kw):
+        chunk = self.data.get(data_hash)
+        time.sleep(REQUEST_LATENCY + float(len(chunk or '')) / BANDWIDTH)
+        with self.lock:
+            self.bytes_downloaded += len(chunk or '')
+
+        return chunk
+
+    def reset(self):
+        self.uploads = 0
+        self.bytes_uploaded = 0
+        self.bytes_downloaded = 0
+
+
+def put_whole(driver, file_data):
+    driver.put_immutable_data(file_data, None, data_hash=storage.get_data_hash(file_data))
+
+
+def put_chunked(datastore, file_data):
+    res = data.put_file_chunks(datastore, make_chunk_list(chunk_data(file_data)), file_data)
+    assert 'error' not in res, res
+
+
+def run(label, driver, func):
+    driver.reset()
+    elapsed, _ = harness.timed(func)
+    harness.report(label, "{:8.1f}ms, {:4} uploads, {:10} bytes up, {:10} bytes down".format(
+                   1000 * elapsed, driver.uploads, driver.bytes_uploaded, driver.bytes_downloaded))
+
+
+def benchmark(file_size_mb):
+    file_size = int(file_size_mb * 1024 * 1024)
+    driver = StandInDriver()
+    storage.put_immutable_data = driver.put_immutable_data
+    storage.get_immutable_data = driver.get_immutable_data
+
+    datastore = {'drivers': ['standin']}
+    file_data = os.urandom(file_size)
+    offset = file_size / 2
+    edited_data = file_data[:offset] + os.urandom(EDIT_SIZE) + file_data[offset + EDIT_SIZE:]
+
+    print "{} byte file; {}-byte edit; {}ms per request, {} bytes/s".format(file_size, EDIT_SIZE, int(REQUEST_LATENCY * 1000), BANDWIDTH)
+
+    run('whole file: write', driver, lambda: put_whole(driver, file_data))
+    run('whole file: rewrite after edit', driver, lambda: put_whole(driver, edited_data))
+    run('chunked: write', driver, lambda: put_chunked(datastore, file_data))
+    run('chunked: rewrite after edit', driver, lambda: put_chunked(datastore, edited_data))
+
+    chunk_list = parse_chunk_list(make_chunk_list(chunk_data(edited_data)))
+    run('whole file: read 64K', driver, lambda: driver.get_immutable_data(storage.get_data_hash(edited_data)))
+    run('chunked: read 64K', driver, lambda: data.get_file_chunks(None, chunk_list, ['standin'], offset, offset + 65535))
+    run('chunked: read all', driver, lambda: data.get_file_chunks(None, chunk_list, ['standin'], 0, file_size - 1))
+
+
+if __name__ == '__main__':
+    harness.main(benchmark, [('file_size_mb', float, 16)])
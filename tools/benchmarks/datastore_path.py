@@ -0,0 +1,187 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+
+
+    Measure how long the API server takes to resolve deep datastore paths,
+    and to look up every entry of a directory it just listed, against a
+    stand-in storage driver with a fixed read latency.  Compares a cold
+    cache, a cache whose inodes were all evicted by writes (but which still
+    knows where each path leads), a cache too small to hold a path's inodes,
+    and prefetching a listing's children.
+
+    usage: python tools/benchmarks/datastore_path.py [read_latency_ms]
+"""
+
+import time
+import uuid
+
+import harness
+
+# keep the benchmark's inode versions out of the real config directory
+harness.use_temp_config()
+
+import keylib
+
+import blockstack_client.data as data
+import blockstack_client.storage as storage
+
+from blockstack_client.schemas import MUTABLE_DATUM_DIR_TYPE, MUTABLE_DATUM_FILE_TYPE
+from blockstack_client.constants import BLOCKSTACK_STORAGE_PROTO_VERSION
+
+DEPTHS = [2, 4, 8]
+NUM_LISTED_FILES = 32
+
+
+class StandInDriver(object):
+    """
+    Serves inode headers and payloads after a fixed latency.
+    Stands in for data.get_mutable(), which every inode read goes through.
+    """
+    def __init__(self, datastore_id, latency):
+        self.datastore_id = datastore_id
+        self.latency = latency
+        self.data = {}      # data ID --> data
+        self.reads = 0
+
+    def add_inode(self, inode_type, children=None):
+        """
+        Add an inode (with the given directory listing, if it's a directory).
+        Return its UUID
+        """
+        inode_uuid = str(uuid.uuid4())
+        header = {
+            'type': inode_type,
+            'owner': self.datastore_id,
+            'uuid': inode_uuid,
+            'readers': [],
+            'data_hash': '00' * 32,
+            'version': 1,
+            'proto_version': BLOCKSTACK_STORAGE_PROTO_VERSION,
+        }
+
+        if inode_type == MUTABLE_DATUM_DIR_TYPE:
+            idata = data.inode_dir_idata_serialize({'children': children, 'header': dict(header)})
+        else:
+            idata = 'hello world'
+
+        header['data_hash'] = storage.hash_data_payload(idata)
+        self.data['{}.{}.hdr'.format(self.datastore_id, inode_uuid)] = data.data_blob_serialize(header)
+        self.data['{}.{}'.format(self.datastore_id, inode_uuid)] = idata
+        return inode_uuid
+
+    def get_mutable(self, data_id, device_ids, **kw):
+        time.sleep(self.latency)
+        self.reads += 1
+        if data_id not in self.data:
+            return {'error': 'No such data'}
+
+        return {'status': True, 'data': self.data[data_id], 'version': 1, 'drivers': ['standin']}
+
+
+def make_tree(driver, depth):
+    """
+    Make /d1/d2/.../d{depth}, with NUM_LISTED_FILES files in the deepest directory.
+    Return (root UUID, path, {uuid: ...} of every inode)
+    """
+    children = {}
+    for i in xrange(NUM_LISTED_FILES):
+        children['f{}'.format(i)] = {'type': MUTABLE_DATUM_FILE_TYPE, 'uuid': driver.add_inode(MUTABLE_DATUM_FILE_TYPE), 'version': 1}
+
+    uuids = [c['uuid'] for c in children.values()]
+    for i in xrange(depth, 0, -1):
+        dir_uuid = driver.add_inode(MUTABLE_DATUM_DIR_TYPE, children)
+        uuids.append(dir_uuid)
+        children = {'d{}'.format(i): {'type': MUTABLE_DATUM_DIR_TYPE, 'uuid': dir_uuid, 'version': 1}}
+
+    root_uuid = driver.add_inode(MUTABLE_DATUM_DIR_TYPE, children)
+    uuids.append(root_uuid)
+    return root_uuid, '/' + '/'.join('d{}'.format(i) for i in xrange(1, depth + 1)), uuids
+
+
+def timed(driver, func):
+    driver.reads = 0
+    elapsed, _ = harness.timed(func)
+    return (elapsed, driver.reads)
+
+
+def benchmark(latency_ms):
+    latency = latency_ms / 1000.0
+    privkey = keylib.ECPrivateKey()
+    datastore_pubkey = privkey.public_key().to_hex()
+    datastore_id = data.datastore_get_id(datastore_pubkey)
+    data_pubkeys = [{'device_id': 'benchmark', 'public_key': datastore_pubkey}]
+
+    driver = StandInDriver(datastore_id, latency)
+    data.get_mutable = driver.get_mutable
+
+    print "read latency {}ms; {} files in the deepest directory".format(int(latency * 1000), NUM_LISTED_FILES)
+
+    for depth in DEPTHS:
+        root_uuid, path, uuids = make_tree(driver, depth)
+        datastore = {'pubkey': datastore_pubkey, 'drivers': ['standin'], 'device_ids': ['benchmark'], 'root_uuid': root_uuid}
+
+        resolve = lambda: data.inode_resolve_path(None, datastore, path, data_pubkeys, force=True, proxy=object())
+        header = lambda child_uuid: data.get_inode_header(None, datastore_id, child_uuid, ['standin'], data_pubkeys, force=True, proxy=object())
+
+        def stat_all():
+            dir_inode = resolve()[path]['inode']
+            for child_dirent in dir_inode['idata']['children'].values():
+                header(child_dirent['uuid'])
+
+        def prefetch_and_stat_all():
+            dir_inode = resolve()[path]['inode']
+            data.inode_prefetch_children(None, datastore, path, dir_inode, data_pubkeys, force=True, proxy=object())
+            for child_dirent in dir_inode['idata']['children'].values():
+                header(child_dirent['uuid'])
+
+        def evict():
+            # what a write to every inode on the path would do
+            for inode_uuid in uuids:
+                data.GLOBAL_CACHE.evict_inode(datastore_id, inode_uuid)
+
+        results = []
+
+        data.GLOBAL_CACHE.evict_all()
+        results.append(('resolve, cold cache', timed(driver, resolve)))
+
+        evict()
+        results.append(('resolve, after evictions', timed(driver, resolve)))
+
+        # the path is known, but its inodes don't stay in the cache
+        full_cache = data.GLOBAL_CACHE
+        data.GLOBAL_CACHE = data.DataCache(max_headers=1, max_dirs=1)
+        resolve()
+        results.append(('resolve, tiny cache', timed(driver, resolve)))
+        data.GLOBAL_CACHE = full_cache
+
+        data.GLOBAL_CACHE.evict_all()
+        results.append(('list + stat, cold cache', timed(driver, stat_all)))
+
+        data.GLOBAL_CACHE.evict_all()
+        results.append(('list + stat, prefetched', timed(driver, prefetch_and_stat_all)))
+
+        for (label, (elapsed, reads)) in results:
+            harness.report('depth {}, {}'.format(depth, label), "{:8.1f}ms, {:3} reads".format(1000 * elapsed, reads), width=38)
+
+
+if __name__ == '__main__':
+    harness.main(benchmark, [('read_latency_ms', float, 50)])
@@ -0,0 +1,79 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+
+    Measure how long fee estimation spends making its throwaway transactions,
+    with and without the signed-size model, for each key type we sign with.
+
+    usage: python tools/benchmarks/fee_estimate.py [num_estimates]
+"""
+
+import harness
+
+import virtualchain
+
+import blockstack_client.backend.nameops as nameops
+
+from blockstack_client.tx import serialize_tx, sign_tx
+
+
+def make_unsigned_tx(privkey_info, num_inputs):
+    """
+    Make an unsigned tx that spends @num_inputs outputs owned by @privkey_info.
+    Return (unsigned tx, prev outputs)
+    """
+    out_script = virtualchain.make_payment_script(virtualchain.get_privkey_address(privkey_info))
+    inputs = [{'outpoint': {'hash': '{:064x}'.format(i + 1), 'index': 0}, 'script': '', 'sequence': 2**32 - 1} for i in xrange(num_inputs)]
+    outputs = [{'script': virtualchain.make_data_script('69645b' + '00' * 36), 'value': 0},
+               {'script': out_script, 'value': 100000 * num_inputs - 10000}]
+
+    return serialize_tx(inputs, outputs), [{'out_script': out_script, 'value': 100000}] * num_inputs
+
+
+def run(label, num_estimates, privkey_info, num_inputs):
+    unsigned_tx, prev_outputs = make_unsigned_tx(privkey_info, num_inputs)
+
+    signing, signed_tx = harness.timed(lambda: [sign_tx(unsigned_tx, prev_outputs, privkey_info) for i in xrange(num_estimates)][-1])
+
+    nameops.SIGNED_SIZE_MODEL.clear()
+    modeled, modeled_tx = harness.timed(lambda: [nameops.estimate_signed_tx('NAMESPACE_PREORDER', unsigned_tx, prev_outputs, privkey_info) for i in xrange(num_estimates)][-1])
+
+    harness.report('{}, {} input(s)'.format(label, num_inputs), "signing {:8.2f}ms  model {:8.3f}ms  ({:6.1f}x), {} vs {} bytes".format(
+                   1000 * signing / num_estimates, 1000 * modeled / num_estimates, signing / modeled, len(signed_tx) / 2, len(modeled_tx) / 2))
+
+
+def benchmark(num_estimates):
+    keys = [
+        ('p2pkh', virtualchain.BitcoinPrivateKey(compressed=True).to_hex()),
+        ('p2sh 2-of-3', virtualchain.make_multisig_wallet(2, 3)),
+    ]
+
+    if virtualchain.get_features('segwit'):
+        keys.append(('p2sh-p2wpkh', virtualchain.make_segwit_info()))
+        keys.append(('p2sh-p2wsh 2-of-3', virtualchain.make_multisig_segwit_wallet(2, 3)))
+
+    for (label, privkey_info) in keys:
+        for num_inputs in [1, 3]:
+            run(label, num_estimates, privkey_info, num_inputs)
+
+
+if __name__ == '__main__':
+    harness.main(benchmark, [('num_estimates', int, 100)])
@@ -0,0 +1,155 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+
+
+    Measure time-to-first-byte, total time, and the most file data held in
+    memory at once, when the API server sends a large chunked datastore file
+    (or a few ranges of it) to a client.  Compares fetching the data whole and
+    then sending it, with streaming it through a FileReader.  Runs against a
+    stand-in storage driver with a fixed per-request latency and bandwidth,
+    and a client that reads at a fixed bandwidth.
+
+    usage: python tools/benchmarks/file_stream.py [file_size_mb]
+"""
+
+import os
+import time
+import threading
+import itertools
+
+import harness
+harness.use_temp_config()
+
+import blockstack_client.data as data
+import blockstack_client.storage as storage
+
+from blockstack_client.chunking import chunk_data, make_chunk_list, parse_chunk_list, chunk_list_slice, get_chunk_hash
+
+REQUEST_LATENCY = 0.05              # seconds per request
+BANDWIDTH = 10 * 1024 * 1024        # bytes per second, per request
+CLIENT_BANDWIDTH = 20 * 1024 * 1024 # bytes per second
+NUM_RANGES = 4
+RANGE_SIZE = 64 * 1024
+
+
+class StandInDriver(object):
+    """
+    Serves immutable data after a fixed latency, plus transfer time.
+    Stands in for storage.get_immutable_data(), and counts how many fetched
+    bytes have not been sent to the client yet.
+    """
+    def __init__(self, chunks):
+        self.lock = threading.Lock()
+        self.data = dict((get_chunk_hash(c), c) for c in chunks)
+        self.held = 0
+        self.max_held = 0
+
+    def get_immutable_data(self, data_hash, **kw):
+        chunk = self.data[data_hash]
+        time.sleep(REQUEST_LATENCY + float(len(chunk)) / BANDWIDTH)
+        with self.lock:
+            self.held += len(chunk)
+            self.max_held = max(self.max_held, self.held)
+
+        return chunk
+
+    def sent(self, num_bytes):
+        with self.lock:
+            self.held -= num_bytes
+
+    def reset(self):
+        self.held = 0
+        self.max_held = 0
+
+
+class Client(object):
+    """
+    Reads a reply at a fixed bandwidth
+    """
+    def __init__(self, driver):
+        self.driver = driver
+        self.first_byte = None
+
+    def write(self, buf):
+        if self.first_byte is None:
+            self.first_byte = time.time()
+
+        time.sleep(float(len(buf)) / CLIENT_BANDWIDTH)
+
+
+def send_buffered(driver, client, chunk_list, ranges):
+    # fetch every chunk any range needs, then send
+    start = min(r[0] for r in ranges)
+    end = max(r[1] for r in ranges)
+    res = data.get_file_chunks(None, chunk_list, ['standin'], start, end)
+    assert 'error' not in res, res
+
+    for (range_start, range_end) in ranges:
+        client.write(res['data'][range_start - start:range_end + 1 - start])
+
+    driver.sent(driver.held)
+
+
+def send_streamed(driver, client, chunk_list, ranges):
+    reader = data.FileReader(chunk_list['size'], chunk_list=chunk_list, blockchain_id=None, drivers=['standin'])
+    for (range_start, range_end) in ranges:
+        # one block per chunk; the rest of the chunk is dropped once the block is sent
+        slices = chunk_list_slice(chunk_list, range_start, range_end)
+        for (block, (chunk_index, _)) in itertools.izip(reader.read_range(range_start, range_end), slices):
+            client.write(block)
+            driver.sent(chunk_list['chunks'][chunk_index]['size'])
+
+
+def run(label, driver, chunk_list, ranges, sender):
+    driver.reset()
+    client = Client(driver)
+
+    start = time.time()
+    elapsed, _ = harness.timed(sender, driver, client, chunk_list, ranges)
+
+    harness.report(label, "first byte {:8.1f}ms, done {:8.1f}ms, {:10} bytes held at most".format(
+                   1000 * (client.first_byte - start), 1000 * elapsed, driver.max_held))
+
+
+def benchmark(file_size_mb):
+    file_size = int(file_size_mb * 1024 * 1024)
+    file_data = os.urandom(file_size)
+    chunks = chunk_data(file_data)
+    chunk_list = parse_chunk_list(make_chunk_list(chunks))
+
+    driver = StandInDriver(chunks)
+    storage.get_immutable_data = driver.get_immutable_data
+
+    print "{} byte file in {} chunks; {}ms per request, {} bytes/s; client reads {} bytes/s".format(
+          file_size, len(chunks), int(REQUEST_LATENCY * 1000), BANDWIDTH, CLIENT_BANDWIDTH)
+
+    whole = [(0, file_size - 1)]
+    spread = [(i * file_size / NUM_RANGES, i * file_size / NUM_RANGES + RANGE_SIZE - 1) for i in xrange(NUM_RANGES)]
+
+    run('whole file, buffered', driver, chunk_list, whole, send_buffered)
+    run('whole file, streamed', driver, chunk_list, whole, send_streamed)
+    run('{} ranges, buffered'.format(NUM_RANGES), driver, chunk_list, spread, send_buffered)
+    run('{} ranges, streamed'.format(NUM_RANGES), driver, chunk_list, spread, send_streamed)
+
+
+if __name__ == '__main__':
+    harness.main(benchmark, [('file_size_mb', float, 32)])
@@ -0,0 +1,232 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2018 by Blockstack.org
+
+    This file is part of Blockstack.
+
+    Blockstack is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack. If not, see <http://www.gnu.org/licenses/>.
+
+
+    Shared harness for the benchmarks in this directory.
+
+    Each benchmark is a script that runs the code in this checkout against
+    stand-ins (local HTTP servers, storage drivers, Atlas peers) with fixed
+    latencies, so its numbers can be compared before and after a change.
+    Run them from anywhere:
+
+        python tools/benchmarks/<benchmark>.py [args]
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import resource
+import tempfile
+import threading
+import BaseHTTPServer
+import SocketServer
+import cPickle as pickle
+
+# benchmark the code in this checkout
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+def use_temp_config():
+    """
+    Point the client at a temporary config directory, so a benchmark's
+    state stays out of the real one.  Call this before importing
+    blockstack_client.  The directory is removed on exit.
+    Return the config directory
+    """
+    config_dir = tempfile.mkdtemp()
+    os.environ['BLOCKSTACK_CLIENT_CONFIG'] = os.path.join(config_dir, 'client.ini')
+    atexit.register(shutil.rmtree, config_dir, True)
+    return config_dir
+
+
+def main(benchmark, params, usage=None):
+    """
+    Run benchmark(*args), where args come from the command line.
+    @params is a list of (name, type, default) for each positional argument.
+    """
+    if usage is None:
+        usage = 'usage: python {} {}'.format(sys.argv[0], ' '.join('[{}]'.format(name) for (name, _, _) in params))
+
+    argv = sys.argv[1:]
+    if len(argv) > len(params) or '-h' in argv or '--help' in argv:
+        print >> sys.stderr, usage
+        sys.exit(1)
+
+    args = []
+    for (i, (name, argtype, default)) in enumerate(params):
+        if i < len(argv):
+            try:
+                args.append(argtype(argv[i]))
+            except ValueError:
+                print >> sys.stderr, usage
+                sys.exit(1)
+
+        else:
+            args.append(default)
+
+    benchmark(*args)
+
+
+def timed(func, *args, **kw):
+    """
+    Call func(*args, **kw).
+    Return (seconds elapsed, return value)
+    """
+    start = time.time()
+    ret = func(*args, **kw)
+    return (time.time() - start, ret)
+
+
+def percentile(values, p):
+    """
+    Get the @p-th percentile (0 <= p <= 1) of a sorted list
+    """
+    if len(values) == 0:
+        return 0.0
+
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def format_latencies(latencies):
+    """
+    Summarize a list of latencies (in seconds) as percentiles in milliseconds
+    """
+    latencies = sorted(latencies)
+    return "p50 {:8.1f}ms  p90 {:8.1f}ms  p99 {:8.1f}ms  max {:8.1f}ms".format(
+           *[1000 * percentile(latencies, p) for p in [0.5, 0.9, 0.99, 1.0]])
+
+
+def report(label, text, width=32):
+    """
+    Print one line of results
+    """
+    print "{} {}".format((label + ':').ljust(width), text)
+
+
+def cpu_time():
+    """
+    CPU time (user + system) this process has used so far, in seconds
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def current_rss():
+    """
+    Resident set size of this process right now, in bytes
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+
+    except (IOError, OSError):
+        # no procfs; fall back to the peak so far (in kilobytes on Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def run_in_child(func, *args, **kw):
+    """
+    Call func(*args, **kw) in a forked child process, so it starts from
+    this process's memory and its peak memory use can be measured.
+    The return value must be picklable.
+    Return (return value, peak resident set size growth in bytes)
+    """
+    rfd, wfd = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        os.close(rfd)
+        status = 0
+        try:
+            # the child's peak starts out at what it shares with this process
+            base_rss = current_rss()
+            ret = func(*args, **kw)
+            with os.fdopen(wfd, 'w') as f:
+                pickle.dump((ret, base_rss), f, pickle.HIGHEST_PROTOCOL)
+
+        except:
+            import traceback
+            traceback.print_exc()
+            status = 1
+
+        finally:
+            os._exit(status)
+
+    os.close(wfd)
+    with os.fdopen(rfd, 'r') as f:
+        buf = f.read()
+
+    _, status, usage = os.wait4(pid, 0)
+    if status != 0:
+        raise Exception("Benchmark child process failed")
+
+    ret, base_rss = pickle.loads(buf)
+
+    # ru_maxrss is in kilobytes on Linux
+    return (ret, max(0, usage.ru_maxrss * 1024 - base_rss))
+
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Base class for stand-in HTTP servers' request handlers
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, status, data, content_type='application/json'):
+        if content_type == 'application/json':
+            data = json.dumps(data)
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def start_server(handler_class, **attrs):
+    """
+    Start a stand-in HTTP server on a free localhost port, in a daemon thread.
+    Any keyword arguments are set as attributes on the server.
+    Return the server; its address is 'localhost:{}'.format(server.server_address[1])
+    """
+    server = StandInServer(('localhost', 0), handler_class)
+    for (name, value) in attrs.items():
+        setattr(server, name, value)
+
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+    return server
+
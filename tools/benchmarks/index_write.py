@@ -0,0 +1,207 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+
+    Measure how many uploads (and how long) it takes to write, and then
+    delete, a directory of files through an indexed storage driver, against
+    a stand-in provider with a fixed upload latency and a dynamic index
+    (i.e. every index page upload also updates the index manifest, like
+    with Dropbox or Google Drive).  Also measures writing the files to a
+    datastore on such a driver, the way the API server stores each one
+    (a file inode and its parent directory, each a header and a payload).
+
+    usage: python tools/benchmarks/index_write.py [num_files]
+"""
+
+import os
+import time
+import uuid
+import types
+import shutil
+import tempfile
+import threading
+
+import harness
+
+# keep the benchmark's inode versions out of the real config directory
+harness.use_temp_config()
+
+import keylib
+
+import blockstack_client.data as data
+import blockstack_client.storage as storage
+import blockstack_client.backend.drivers.common as common
+
+from blockstack_client.schemas import MUTABLE_DATUM_FILE_TYPE
+
+UPLOAD_LATENCY = 0.01       # seconds per chunk upload
+NUM_THREADS = 8
+
+
+class StandInProvider(object):
+    """
+    Chunks, by path, with upload counts
+    """
+    def __init__(self, name):
+        self.lock = threading.Lock()
+        self.name = name
+        self.chunks = {}
+        self.data_uploads = 0
+        self.index_uploads = 0
+
+    def get_chunk(self, dvconf, path):
+        with self.lock:
+            return self.chunks.get(path)
+
+    def put_chunk(self, dvconf, data, path):
+        time.sleep(UPLOAD_LATENCY)
+        with self.lock:
+            self.chunks[path] = data
+            if path.startswith('/index/'):
+                self.index_uploads += 1
+            else:
+                self.data_uploads += 1
+
+            return 'https://{}.standin/{}'.format(self.name, path.strip('/'))
+
+    def delete_chunk(self, dvconf, path):
+        time.sleep(UPLOAD_LATENCY)
+        with self.lock:
+            self.chunks.pop(path, None)
+            return True
+
+
+def run_sequential(dvconf, paths, func):
+    for path in paths:
+        assert func(path)
+
+
+def run_concurrent(dvconf, paths, func):
+    def _run(i):
+        run_sequential(dvconf, paths[i::NUM_THREADS], func)
+
+    threads = [threading.Thread(target=_run, args=(i,)) for i in xrange(NUM_THREADS)]
+    for t in threads:
+        t.start()
+
+    for t in threads:
+        t.join()
+
+
+def run_batched(dvconf, paths, func):
+    common.index_batch_begin()
+    try:
+        run_sequential(dvconf, paths, func)
+    finally:
+        assert common.index_batch_end()
+
+
+def make_driver(driver_name, tmpdir):
+    """
+    Set up an indexed driver on a stand-in provider
+    Return (provider, dvconf)
+    """
+    provider = StandInProvider(driver_name)
+    config_path = os.path.join(tmpdir, driver_name, 'client.ini')
+
+    dvconf = common.driver_config(driver_name, config_path, provider.get_chunk, provider.put_chunk, provider.delete_chunk,
+                                  driver_info={'dynamic_index': True})
+    assert common.index_setup(dvconf)
+    return provider, dvconf
+
+
+def make_driver_module(driver_name, dvconf):
+    """
+    Make a storage driver module that stores mutable data with the indexed driver
+    """
+    driver = types.ModuleType(driver_name)
+    driver.get_classes = lambda: ['read_private', 'write_private']
+    driver.handles_url = lambda url: False
+    driver.make_mutable_url = lambda data_id: None
+    driver.put_mutable_handler = lambda data_id, data_bin, **kw: common.index_put_mutable_handler(dvconf, data_id, data_bin, **kw)
+    for method in ['get_immutable_handler', 'get_mutable_handler', 'put_immutable_handler', 'delete_immutable_handler', 'delete_mutable_handler']:
+        setattr(driver, method, lambda *args, **kw: None)
+
+    return driver
+
+
+def run(label, num_files, runner, tmpdir):
+    provider, dvconf = make_driver('standin_{}'.format(runner.__name__), tmpdir)
+
+    paths = ['/files/{}'.format(i) for i in xrange(num_files)]
+
+    for (verb, func) in [('write', lambda path: common.put_indexed_data(dvconf, path, 'hello world', raw=True)),
+                         ('delete', lambda path: common.delete_indexed_data(dvconf, path))]:
+        provider.index_uploads = 0
+        elapsed, _ = harness.timed(runner, dvconf, paths, func)
+
+        harness.report(label, "{} {} files in {:6.2f}s ({:6.1f} files/s), {:5} index page uploads".format(
+                       verb, num_files, elapsed, num_files / elapsed, provider.index_uploads), width=28)
+
+
+def run_datastore(label, num_files, tmpdir):
+    """
+    Put num_files files into one directory of a datastore, one at a time
+    """
+    driver_name = 'standin_datastore'
+    provider, dvconf = make_driver(driver_name, tmpdir)
+    storage.register_storage(make_driver_module(driver_name, dvconf))
+
+    privkey = keylib.ECPrivateKey()
+    data_privkey = privkey.to_hex()
+    datastore_pubkey = privkey.public_key().to_hex()
+    datastore_id = data.datastore_get_id(datastore_pubkey)
+    dir_uuid = str(uuid.uuid4())
+    datastore = {'pubkey': datastore_pubkey, 'drivers': [driver_name], 'device_ids': ['benchmark'], 'root_uuid': dir_uuid}
+
+    children = {}
+
+    def putfile(i):
+        file_uuid = str(uuid.uuid4())
+        file_data = 'hello world {}'.format(i)
+        file_info = data.make_file_inode_data(datastore_id, datastore_id, file_uuid, storage.hash_data_payload(file_data), datastore['device_ids'])
+        children['f{}'.format(i)] = {'type': MUTABLE_DATUM_FILE_TYPE, 'uuid': file_uuid, 'version': 1}
+        dir_info = data.make_dir_inode_data(datastore_id, datastore_id, dir_uuid, children, datastore['device_ids'])
+
+        headers = [file_info['header'], dir_info['header']]
+        signatures = [data.sign_inode_header_blob(header, data_privkey) for header in headers]
+        res = data.datastore_do_inode_operation(datastore, headers, [file_data, dir_info['idata']], signatures, [], proxy=object())
+        assert 'error' not in res, res
+
+    elapsed, _ = harness.timed(lambda: [putfile(i) for i in xrange(num_files)])
+    harness.report(label, "put {} files in {:6.2f}s ({:6.1f} files/s), {:5} index page uploads, {:5} data uploads".format(
+                   num_files, elapsed, num_files / elapsed, provider.index_uploads, provider.data_uploads), width=28)
+
+
+def benchmark(num_files):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        run('sequential', num_files, run_sequential, tmpdir)
+        run('{} threads'.format(NUM_THREADS), num_files, run_concurrent, tmpdir)
+        run('sequential, one batch', num_files, run_batched, tmpdir)
+        run_datastore('datastore', num_files, tmpdir)
+
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    harness.main(benchmark, [('num_files', int, 1000)])
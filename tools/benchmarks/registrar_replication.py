@@ -0,0 +1,158 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+
+    Measure how long the registrar takes to replicate a batch of confirmed
+    zone files, against stand-in Atlas servers and storage drivers with
+    fixed write latencies (one of the Atlas servers fails now and then).
+
+    usage: python tools/benchmarks/registrar_replication.py [num_names]
+"""
+
+import os
+import time
+import types
+import random
+import shutil
+import tempfile
+import threading
+
+import harness
+
+import blockstack_client.storage as storage
+import blockstack_client.zonefile as zonefile
+import blockstack_client.backend.registrar as registrar
+
+from blockstack_client.backend.queue import queuedb_insert
+
+# (host, port, latency, failure rate)
+STAND_IN_ATLAS_SERVERS = [
+    ('atlas1.standin', 6264, 0.1, 0.0),
+    ('atlas2.standin', 6264, 0.2, 0.0),
+    ('atlas3.standin', 6264, 0.3, 0.2),
+]
+
+# (name, latency)
+STAND_IN_DRIVERS = [
+    ('standin_disk', 0.01),
+    ('standin_s3', 0.15),
+]
+
+
+class StandInDestinations(object):
+    """
+    Count concurrent writes to each destination
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = {}
+        self.max_active = {}
+        self.writes = 0
+
+    def write(self, destination, latency, failure_rate=0.0):
+        with self.lock:
+            self.active[destination] = self.active.get(destination, 0) + 1
+            self.max_active[destination] = max(self.max_active.get(destination, 0), self.active[destination])
+            self.writes += 1
+
+        try:
+            time.sleep(latency)
+            return random.random() >= failure_rate
+
+        finally:
+            with self.lock:
+                self.active[destination] -= 1
+
+
+def install_stand_ins(destinations):
+    """
+    Point zone file pushes and name lookups at the stand-ins,
+    and register the stand-in storage drivers
+    """
+    atlas = dict(((host, port), (latency, failure_rate)) for (host, port, latency, failure_rate) in STAND_IN_ATLAS_SERVERS)
+
+    def put_zonefiles(hostport, zonefile_data_list, **kw):
+        host, port = hostport.split(':')
+        latency, failure_rate = atlas[(host, int(port))]
+        if not destinations.write(hostport, latency, failure_rate):
+            return {'error': 'Failed to contact Blockstack node'}
+
+        return {'status': True, 'saved': [1] * len(zonefile_data_list)}
+
+    def get_name_record(name, **kw):
+        return {'name': name, 'value_hash': storage.get_zonefile_data_hash(zonefile_for(name))}
+
+    zonefile.put_zonefiles = put_zonefiles
+    registrar.get_name_record = get_name_record
+
+    for (name, latency) in STAND_IN_DRIVERS:
+        driver = types.ModuleType(name)
+        driver.get_classes = lambda: ['write_public']
+        driver.put_immutable_handler = lambda data_hash, data, txid, name=name, latency=latency: destinations.write(name, latency)
+        driver.put_mutable_handler = lambda data_id, data, name=name, latency=latency, **kw: destinations.write(name, latency)
+        storage.register_storage(driver)
+
+
+def zonefile_for(name):
+    return '$ORIGIN {}\n$TTL 3600\n_http._tcp URI 10 1 "http://example.com/{}"\n'.format(name, name)
+
+
+def run(label, queue_path, num_names, destinations):
+    updates = []
+    for i in xrange(num_names):
+        fqu = 'bench{}-{}.id'.format(i, int(time.time() * 1000))
+        tx_hash = '{:064x}'.format(random.getrandbits(256))
+        queuedb_insert('update', fqu, tx_hash, {'zonefile_b64': zonefile_for(fqu).encode('base64'), 'profile': None}, path=queue_path)
+        updates.append({'type': 'update', 'fqu': fqu, 'tx_hash': tx_hash, 'zonefile': zonefile_for(fqu), 'profile': None})
+
+    storage_drivers = [name for (name, latency) in STAND_IN_DRIVERS]
+    atlas_servers = [(host, port) for (host, port, latency, failure_rate) in STAND_IN_ATLAS_SERVERS]
+    registrar.RegistrarWorker.get_atlas_server_list = classmethod(lambda cls, config_path: atlas_servers)
+
+    destinations.max_active = {}
+    destinations.writes = 0
+
+    elapsed, res = harness.timed(registrar.RegistrarWorker.replicate_names_data, queue_path, updates, {}, storage_drivers, proxy=object())
+
+    harness.report(label, "{:3} names in {:6.2f}s ({:5.1f} names/s), {} writes, {} failed names".format(
+                   num_names, elapsed, num_names / elapsed, destinations.writes, len(res.get('names', []))), width=24)
+
+    print "{:24} max concurrent writes per destination: {}".format(
+          '', ', '.join('{}={}'.format(d, c) for (d, c) in sorted(destinations.max_active.items())))
+
+
+def benchmark(num_names):
+    destinations = StandInDestinations()
+    install_stand_ins(destinations)
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        queue_path = os.path.join(tmpdir, 'queues.db')
+        for num_workers in [1, 4, registrar.REGISTRAR_REPLICATION_WORKERS]:
+            registrar.REGISTRAR_REPLICATION_WORKERS = num_workers
+            run('{} worker(s)'.format(num_workers), queue_path, num_names, destinations)
+
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    harness.main(benchmark, [('num_names', int, 50)])
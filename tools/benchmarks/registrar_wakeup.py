@@ -0,0 +1,219 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2018 by Blockstack.org
+
+    This file is part of Blockstack
+
+    Blockstack is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack. If not, see <http://www.gnu.org/licenses/>.
+
+
+    Benchmark how quickly the registrar worker gets to a queue entry once
+    it is confirmed, and what the worker costs while it waits.
+
+    Runs a registrar worker against a stand-in bitcoind that mines a block
+    every block_interval seconds (on average).  The queue db holds num_pending entries
+    whose transactions never confirm, spread over the queues; one preorder
+    per block gets confirmed.  The worker's steps are replaced with ones
+    that only look for accepted entries in their queues, the way each real
+    step starts out, and record when they first see each confirmed preorder.
+
+    Reports the time from the block to the preorder step seeing the entry,
+    the steps run and bitcoind RPCs made per block, and the CPU time used.
+    To get the "before" numbers for a change, copy this directory into a
+    checkout of the older revision and run it there.
+
+    usage: python tools/benchmarks/registrar_wakeup.py [num_blocks] [num_pending] [block_interval] [tip_check_interval]
+"""
+
+import os
+import sys
+import time
+import random
+import hashlib
+import threading
+
+import harness
+config_dir = harness.use_temp_config()
+
+# must be set before the client reads its constants
+if len(sys.argv) > 4:
+    os.environ['BLOCKSTACK_REGISTRAR_TIP_CHECK_INTERVAL'] = sys.argv[4]
+
+import blockstack_client.backend.registrar as registrar
+import blockstack_client.backend.blockchain as blockchain
+
+from blockstack_client.backend.queue import queuedb_insert, queue_find_accepted, queue_removeall
+
+# what each of the worker's steps looks through
+STEP_QUEUES = [
+    ('register_preorders', ['preorder']),
+    ('set_zonefiles', ['register']),
+    ('replicate_register_data', ['register']),
+    ('replicate_update_data', ['update']),
+    ('replicate_renewal_data', ['renew']),
+    ('transfer_names', ['register', 'update']),
+    ('replicate_name_import_data', ['name_import']),
+    ('clear_confirmed', ['preorder', 'transfer', 'revoke', 'renew', 'name_import']),
+]
+
+PENDING_QUEUES = ['preorder', 'register', 'update', 'transfer', 'renew']
+
+
+class StandInBitcoind(object):
+    """
+    Just enough of bitcoind's RPC interface for the confirmation tracker.
+    Each call takes rpc_latency seconds.
+    """
+    def __init__(self, rpc_latency):
+        self.rpc_latency = rpc_latency
+        self.chain = []
+        self.blocks = {}
+        self.block_txs = {}
+        self.tx_blocks = {}
+        self.mempool = set()
+        self.num_calls = 0
+        self.lock = threading.Lock()
+        self.mine([])
+
+    def call(self):
+        with self.lock:
+            self.num_calls += 1
+
+        time.sleep(self.rpc_latency)
+
+    def mine(self, tx_hashes):
+        with self.lock:
+            block_hash = hashlib.sha256('block {}'.format(len(self.chain))).hexdigest()
+            self.blocks[block_hash] = len(self.chain)
+            self.block_txs[block_hash] = tx_hashes
+            self.chain.append(block_hash)
+            for tx_hash in tx_hashes:
+                self.mempool.discard(tx_hash)
+                self.tx_blocks[tx_hash] = block_hash
+
+    def getbestblockhash(self):
+        self.call()
+        return self.chain[-1]
+
+    def getblock(self, block_hash):
+        self.call()
+        height = self.blocks[block_hash]
+        block = {'hash': block_hash, 'height': height, 'confirmations': len(self.chain) - height, 'tx': self.block_txs[block_hash]}
+        if height > 0:
+            block['previousblockhash'] = self.chain[height - 1]
+
+        return block
+
+    def getrawtransaction(self, tx_hash, verbose):
+        self.call()
+        block_hash = self.tx_blocks.get(tx_hash, None)
+        if block_hash is None:
+            return {'txid': tx_hash}
+
+        return {'txid': tx_hash, 'blockhash': block_hash, 'confirmations': len(self.chain) - self.blocks[block_hash]}
+
+
+class StepRecorder(object):
+    """
+    Stand-in for the worker's steps: look for accepted entries in the
+    step's queues, and note when each confirmed preorder is first seen.
+    """
+    def __init__(self, queue_path, config_path):
+        self.queue_path = queue_path
+        self.config_path = config_path
+        self.num_steps = 0
+        self.seen = {}
+
+    def make_step(self, step_name, queue_ids):
+        def step(cls, *args, **kw):
+            self.num_steps += 1
+            for queue_id in queue_ids:
+                accepted = queue_find_accepted(queue_id, path=self.queue_path, config_path=self.config_path)
+                if step_name == 'register_preorders':
+                    for entry in accepted:
+                        self.seen.setdefault(entry['tx_hash'], time.time())
+
+                    queue_removeall(accepted, path=self.queue_path)
+
+            return {'status': True}
+
+        return classmethod(step)
+
+
+def benchmark(num_blocks, num_pending, block_interval, tip_check_interval):
+    queue_path = os.path.join(config_dir, 'queue.db')
+    config_path = os.environ['BLOCKSTACK_CLIENT_CONFIG']
+
+    bitcoind = StandInBitcoind(0.0005)
+    blockchain.CONFIRMATION_TRACKERS[config_path] = blockchain.ConfirmationTracker(config_path=config_path, bitcoind_client=bitcoind)
+
+    # transactions that never confirm
+    for i in xrange(0, num_pending):
+        tx_hash = hashlib.sha256('pending {}'.format(i)).hexdigest()
+        bitcoind.mempool.add(tx_hash)
+        queuedb_insert(PENDING_QUEUES[i % len(PENDING_QUEUES)], 'pending{}.id'.format(i), tx_hash, {'confirmations_needed': 1}, path=queue_path)
+
+    recorder = StepRecorder(queue_path, config_path)
+    for (step_name, queue_ids) in STEP_QUEUES:
+        setattr(registrar.RegistrarWorker, step_name, recorder.make_step(step_name, queue_ids))
+
+    registrar.get_wallet = lambda *args, **kw: {'owner_address': 'owner', 'payment_address': 'payment'}
+    registrar.get_default_proxy = lambda *args, **kw: None
+
+    worker = registrar.RegistrarWorker(config_path, queue_path=queue_path, poll_interval=300, api_port=0, storage_drivers='disk')
+    worker.start()
+    time.sleep(1.0)
+
+    rng = random.Random(0)
+    confirmed = {}
+    steps_start = recorder.num_steps
+    calls_start = bitcoind.num_calls
+    cpu_start = harness.cpu_time()
+    start = time.time()
+
+    for i in xrange(0, num_blocks):
+        tx_hash = hashlib.sha256('preorder {}'.format(i)).hexdigest()
+        queuedb_insert('preorder', 'name{}.id'.format(i), tx_hash, {'confirmations_needed': 1}, path=queue_path)
+        time.sleep(rng.uniform(0.5, 1.5) * block_interval)
+
+        bitcoind.mine([tx_hash])
+        confirmed[tx_hash] = time.time()
+
+    time.sleep(block_interval)
+
+    elapsed = time.time() - start
+    cpu = harness.cpu_time() - cpu_start
+    num_steps = recorder.num_steps - steps_start
+    num_calls = bitcoind.num_calls - calls_start
+
+    worker.request_stop()
+    worker.join()
+
+    latencies = [recorder.seen[tx_hash] - mined for (tx_hash, mined) in confirmed.items() if tx_hash in recorder.seen]
+
+    print "{} blocks, {:.1f}s apart; {} unconfirmed entries; tip checked every {}s".format(
+          num_blocks, block_interval, num_pending, registrar.REGISTRAR_TIP_CHECK_INTERVAL)
+
+    harness.report('block to preorder step', harness.format_latencies(latencies))
+    harness.report('preorders missed', '{}'.format(len(confirmed) - len(latencies)))
+    harness.report('steps run', '{:8.1f}/block'.format(float(num_steps) / num_blocks))
+    harness.report('bitcoind RPCs', '{:8.1f}/block'.format(float(num_calls) / num_blocks))
+    harness.report('CPU time', '{:8.1f}ms/block ({:.1f}% of one core)'.format(1000 * cpu / num_blocks, 100 * cpu / elapsed))
+
+
+if __name__ == "__main__":
+    harness.main(benchmark, [('num_blocks', int, 20), ('num_pending', int, 500), ('block_interval', float, 2.0), ('tip_check_interval', float, 5.0)])
@@ -0,0 +1,134 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Resolver
+    ~~~~~
+    :copyright: (c) 2014-2017 by Blockstack Inc.
+    :copyright: (c) 2017 blockstack.org
+    :license: MIT, see LICENSE for more details.
+
+    Measure /v1/users profile resolution latency against local HTTP
+    stand-ins for profile storage and for the social proof sites.
+
+    usage: python tools/benchmarks/resolver.py [num_requests] [num_names]
+"""
+
+import json
+import time
+import random
+import urllib2
+import importlib
+
+from multiprocessing.pool import ThreadPool
+
+import harness
+
+import blockstack_client.profile
+import blockstack_client.proxy
+
+# api/__init__.py shadows the module with its blueprint
+resolver = importlib.import_module('api.resolver')
+
+STORAGE_LATENCY = 0.05
+PROOF_LATENCY = 0.2
+PROOFS_PER_PROFILE = 3
+CONCURRENT_CLIENTS = 8
+
+
+class StandInHandler(harness.StandInHandler):
+    """ serves /profile/<name> as a profile, and /proof/<name>/<service> as a proof page
+    """
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+
+        if parts[0] == 'profile':
+            time.sleep(STORAGE_LATENCY)
+            name = parts[1]
+            self.reply(200, {
+                '@type': 'Person',
+                'name': name,
+                'account': [{'@type': 'Account', 'service': 'service{}'.format(i), 'identifier': name,
+                             'proofType': 'http',
+                             'proofUrl': 'http://{}/proof/{}/service{}'.format(self.headers['Host'], name, i)}
+                            for i in xrange(PROOFS_PER_PROFILE)]
+            })
+
+        else:
+            time.sleep(PROOF_LATENCY)
+            self.reply(200, 'Verifying my Blockstack ID is secured with the address {}'.format(parts[1]), content_type='text/plain')
+
+
+def install_stand_ins(host):
+    """ point name, profile and proof lookups at the stand-in server
+    """
+
+    def get_name_record(name, **kw):
+        return {'name': name, 'address': '1' + name, 'value_hash': '00' * 20}
+
+    def get_profile(name, **kw):
+        profile = json.loads(urllib2.urlopen('http://{}/profile/{}'.format(host, name)).read())
+        return {'status': True, 'profile': profile, 'zonefile': {'$origin': name},
+                'public_key': None, 'name_record': get_name_record(name)}
+
+    def check_proofs(profile, username, address = None):
+        proofs = []
+        for account in profile['account']:
+            page = urllib2.urlopen(account['proofUrl']).read()
+            proofs.append({'service': account['service'], 'identifier': account['identifier'],
+                           'proof_url': account['proofUrl'], 'valid': username in page})
+        return proofs
+
+    blockstack_client.proxy.get_name_record = get_name_record
+    blockstack_client.profile.get_profile = get_profile
+    resolver.profile_to_proofs = check_proofs
+    resolver.profile_v3_to_proofs = check_proofs
+
+
+def run(label, names, num_requests, resolve):
+    """ resolve random names from several concurrent clients, and report latency percentiles
+    """
+
+    rng = random.Random(0)
+    requests = [rng.choice(names) for i in xrange(num_requests)]
+
+    pool = ThreadPool(CONCURRENT_CLIENTS)
+    latencies = pool.map(lambda name: harness.timed(resolve, name)[0], requests)
+    pool.close()
+
+    harness.report(label, harness.format_latencies(latencies), width=28)
+
+
+def benchmark(num_requests, num_names):
+
+    server = harness.start_server(StandInHandler)
+
+    install_stand_ins('localhost:{}'.format(server.server_address[1]))
+    names = ['user{}.id'.format(i) for i in xrange(num_names)]
+
+    def uncached(name):
+        resolver.profile_cache.clear()
+        resolver.proof_cache.clear()
+        return resolver.get_profile(name)
+
+    class SerialPool(object):
+        def map(self, func, iterable):
+            return map(func, iterable)
+
+    # serial proof checks, no caching (the old behavior)
+    pool = resolver.proof_pool
+    resolver.proof_pool = SerialPool()
+    run('uncached, serial proofs', names, num_requests, uncached)
+    resolver.proof_pool = pool
+
+    run('uncached, concurrent proofs', names, num_requests, uncached)
+
+    resolver.profile_cache.clear()
+    resolver.proof_cache.clear()
+    run('cached', names, num_requests, resolver.get_profile)
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    harness.main(benchmark, [('num_requests', int, 200), ('num_names', int, 50)])
@@ -0,0 +1,132 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2018 by Blockstack.org
+
+    This file is part of Blockstack
+
+    Blockstack is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack. If not, see <http://www.gnu.org/licenses/>.
+
+
+    Benchmark the per-request route lookup of the client REST API.
+    Routes num_requests requests, drawn from a mix of API calls, with the
+    compiled route table, and the way it used to be done: building the
+    route table for every request and trying each route's regex in turn.
+    Checks that both pick the same handler for every request.
+
+    usage: python tools/benchmarks/route_dispatch.py [num_requests]
+"""
+
+import re
+import random
+
+import harness
+harness.use_temp_config()
+
+from blockstack_client.rpc import BlockstackAPIEndpointHandler
+
+NAME = 'muneeb.id'
+ADDRESS = '1EHgqHVpA1tjn6RhaVj8bx6y5NGvBwoMNS'
+ZONEFILE_HASH = '0123456789abcdef0123456789abcdef01234567'
+
+REQUESTS = [
+    ('GET', '/v1/ping'),
+    ('GET', '/v1/node/ping'),
+    ('GET', '/v1/names/{}'.format(NAME)),
+    ('GET', '/v1/names/{}/history'.format(NAME)),
+    ('GET', '/v1/names/{}/zonefile'.format(NAME)),
+    ('GET', '/v1/names/{}/zonefile/{}'.format(NAME, ZONEFILE_HASH)),
+    ('GET', '/v1/names'),
+    ('GET', '/v1/namespaces/id/names'),
+    ('GET', '/v1/addresses/bitcoin/{}'.format(ADDRESS)),
+    ('GET', '/v1/blockchains/bitcoin/consensus'),
+    ('GET', '/v1/blockchains/bitcoin/name_count'),
+    ('GET', '/v1/blockchains/bitcoin/{}/unspent'.format(ADDRESS)),
+    ('GET', '/v1/prices/names/{}'.format(NAME)),
+    ('GET', '/v1/users/{}'.format(NAME)),
+    ('GET', '/v1/wallet/balance'),
+    ('GET', '/v1/stores/{}/files'.format(ADDRESS)),
+    ('GET', '/v1/stores/{}/inodes'.format(ADDRESS)),
+    ('GET', '/v1/resources/{}/profile.json'.format(NAME)),
+    ('GET', '/v1/no/such/route'),
+    ('POST', '/v1/names'),
+    ('PUT', '/v1/names/{}/zonefile'.format(NAME)),
+    ('PUT', '/v1/wallet/keys/owner'),
+    ('POST', '/v1/stores/{}/files'.format(ADDRESS)),
+    ('DELETE', '/v1/stores/{}/files'.format(ADDRESS)),
+]
+
+
+class RouteLookupHandler(BlockstackAPIEndpointHandler):
+    """
+    A handler that is not attached to a connection, for calling _route_match()
+    """
+    def __init__(self):
+        pass
+
+
+def scan_routes(method_name, path):
+    """
+    The old lookup: build the route table, then try each route in turn
+    """
+    routes = BlockstackAPIEndpointHandler._make_routes()
+    for route_path, route_info in routes.items():
+        if method_name not in route_info['routes'].keys():
+            continue
+
+        grps = re.match(route_path, path)
+        if grps is None:
+            continue
+
+        return route_info['routes'][method_name]
+
+    return None
+
+
+def benchmark(num_requests):
+    rng = random.Random(0)
+    requests = [rng.choice(REQUESTS) for i in xrange(0, num_requests)]
+
+    handler = RouteLookupHandler()
+
+    build_time, route_table = harness.timed(BlockstackAPIEndpointHandler.get_route_table)
+
+    def route_compiled():
+        methods = []
+        for (method_name, path) in requests:
+            path_info = {'path': path, 'parts': path.strip('/').split('/')}
+            route_info = handler._route_match(method_name, path_info, route_table)
+            methods.append(route_info['method'] if route_info is not None else None)
+
+        return methods
+
+    def route_scan():
+        return [scan_routes(method_name, path) for (method_name, path) in requests]
+
+    compiled_time, compiled_methods = harness.timed(route_compiled)
+    scan_time, scan_methods = harness.timed(route_scan)
+
+    for (req, compiled_method, scan_method) in zip(requests, compiled_methods, scan_methods):
+        assert getattr(compiled_method, '__name__', None) == getattr(scan_method, '__name__', None), req
+
+    print "{} requests, {} distinct API calls".format(num_requests, len(REQUESTS))
+    harness.report('build compiled table (once)', "{:8.2f}ms".format(1000 * build_time))
+    harness.report('per-request table + scan', "{:8.1f}us/request".format(1e6 * scan_time / num_requests))
+    harness.report('compiled table', "{:8.1f}us/request".format(1e6 * compiled_time / num_requests))
+
+
+if __name__ == "__main__":
+    harness.main(benchmark, [('num_requests', int, 100000)])
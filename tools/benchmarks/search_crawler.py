@@ -0,0 +1,100 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Search
+    ~~~~~
+
+    copyright: (c) 2014-2017 by Blockstack Inc.
+    copyright: (c) 2017 by Blockstack.org
+
+This file is part of Search.
+
+    Search is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Search is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Search. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" measure search crawler throughput against local HTTP stand-ins for
+    profile storage, each of which takes a fixed time to serve a profile
+
+    usage: python tools/benchmarks/search_crawler.py [num_profiles]
+"""
+
+import os
+import json
+import time
+import shutil
+import urllib2
+import tempfile
+
+import harness
+
+from api.config import SEARCH_CRAWLER_WORKERS, SEARCH_CRAWLER_HOST_LIMIT
+from api.search.crawler import ProfileCrawler
+
+NUM_HOSTS = 4
+LATENCY = 0.05
+
+
+class StorageHandler(harness.StandInHandler):
+    """ serves /<name> as <name>'s profile
+    """
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        self.reply(200, {'name': self.path.strip('/')})
+
+
+def benchmark(num_profiles, num_workers=SEARCH_CRAWLER_WORKERS, host_limit=SEARCH_CRAWLER_HOST_LIMIT):
+    """ crawl serially, then concurrently, then again after 1% of the zone files change
+    """
+
+    servers = [harness.start_server(StorageHandler) for i in xrange(NUM_HOSTS)]
+    hosts = ['localhost:{}'.format(srv.server_address[1]) for srv in servers]
+    names = ['benchmark{}.id'.format(i) for i in xrange(num_profiles)]
+    zonefile_hashes = dict((name, '{:040x}'.format(i)) for (i, name) in enumerate(names))
+
+    def fetch_profile(name, zonefile_hash, storage_host_slot, name_record=None):
+        host = hosts[int(zonefile_hash, 16) % len(hosts)]
+        with storage_host_slot(host):
+            return json.loads(urllib2.urlopen('http://{}/{}'.format(host, name)).read())
+
+    working_dir = tempfile.mkdtemp()
+    try:
+        db_path = os.path.join(working_dir, 'crawl.db')
+
+        serial = ProfileCrawler(db_path=db_path + '.serial', num_workers=1, host_limit=1, seed_path=None, fetch_profile=fetch_profile)
+        crawler = ProfileCrawler(db_path=db_path, num_workers=num_workers, host_limit=host_limit, seed_path=None, fetch_profile=fetch_profile)
+
+        stats_serial = serial.crawl(names, zonefile_hashes)
+        stats_full = crawler.crawl(names, zonefile_hashes)
+
+        # change 1% of the zonefiles and crawl again
+        for name in names[::100]:
+            zonefile_hashes[name] = zonefile_hashes[name] + '00'
+
+        stats_incremental = crawler.crawl(names, zonefile_hashes)
+
+    finally:
+        shutil.rmtree(working_dir)
+        for srv in servers:
+            srv.shutdown()
+
+    for (label, stats) in [('serial crawl', stats_serial),
+                           ('concurrent crawl', stats_full),
+                           ('incremental crawl', stats_incremental)]:
+        harness.report(label, "{} fetched, {} skipped in {:.2f}s ({:.1f} names/s)".format(
+                       stats['fetched'], stats['skipped'], stats['time'], len(names) / max(stats['time'], 1e-6)), width=18)
+
+
+if __name__ == "__main__":
+    harness.main(benchmark, [('num_profiles', int, 1000)])
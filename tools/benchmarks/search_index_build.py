@@ -0,0 +1,171 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Search
+    ~~~~~
+
+    copyright: (c) 2014-2017 by Blockstack Inc.
+    copyright: (c) 2017 by Blockstack.org
+
+This file is part of Search.
+
+    Search is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Search is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Search. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" measure the build time and peak memory of the search index build:
+    loading the profile data file (fetch_profile_data_from_file) and
+    building the name/twitter/username index (create_search_index).
+
+    The mongo collections are replaced with stand-ins that generate the
+    namespace on the fly and count (but do not keep) what is written, so
+    only the memory used by the build itself is measured.  Each step runs
+    in a child process.  To get the "before" numbers for a change, copy
+    this directory into a checkout of the older revision and run it there.
+
+    usage: python tools/benchmarks/search_index_build.py [num_profiles]
+"""
+
+import os
+import json
+import random
+import tempfile
+
+import harness
+
+import api.search.basic_index as basic_index
+
+from search_prefix_index import make_random_names
+
+
+class StandInCollection(object):
+    """ stand-in for a mongo collection.  find() yields the given documents
+        (if any); writes are counted and dropped.
+    """
+
+    def __init__(self, make_documents=None):
+        self.make_documents = make_documents
+        self.num_written = 0
+
+    def find(self, *args, **kw):
+        return self.make_documents()
+
+    def save(self, doc):
+        self.num_written += 1
+
+    def insert(self, docs):
+        self.num_written += len(docs) if isinstance(docs, list) else 1
+
+    def ensure_index(self, *args, **kw):
+        pass
+
+
+def make_profile(rng, name, descriptions):
+    """ make a profile that looks like a typical crawled one
+    """
+
+    handle = name.replace(' ', '_')
+    return {
+        '@type': 'Person',
+        'name': {'formatted': name.title()},
+        'twitter': {'username': handle},
+        'description': rng.choice(descriptions),
+        'account': [
+            {'@type': 'Account', 'service': 'twitter', 'identifier': handle, 'proofType': 'http',
+             'proofUrl': 'https://twitter.com/{}/status/{}'.format(handle, rng.randint(0, 2**60))},
+            {'@type': 'Account', 'service': 'github', 'identifier': handle, 'proofType': 'http',
+             'proofUrl': 'https://gist.github.com/{}/{:x}'.format(handle, rng.randint(0, 2**128))},
+        ],
+        'image': [{'@type': 'ImageObject', 'name': 'avatar',
+                   'contentUrl': 'https://example.com/{}/avatar.png'.format(handle)}],
+    }
+
+
+def make_random_word(rng):
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for i in xrange(rng.randint(2, 10)))
+
+
+def iter_profiles(names):
+    """ generate the same profiles for the same names
+    """
+
+    rng = random.Random(0)
+    descriptions = [' '.join(make_random_word(rng) for i in xrange(rng.randint(5, 40))) for j in xrange(1000)]
+
+    for (i, name) in enumerate(names):
+        yield ('user{}.id'.format(i), make_profile(rng, name, descriptions))
+
+
+def write_profile_data_file(path, names):
+    """ write the profiles as a profile data file, one entry at a time
+    """
+
+    with open(path, 'w') as f:
+        f.write('[')
+        for (i, (fqu, profile)) in enumerate(iter_profiles(names)):
+            if i > 0:
+                f.write(',\n')
+
+            json.dump({'fqu': fqu, 'profile': profile}, f)
+
+        f.write(']')
+
+
+def load_profile_data(path):
+    basic_index.SEARCH_PROFILE_DATA_FILE = path
+    basic_index.SEARCH_CRAWLER_DB = path + '.nonexistent'
+    basic_index.profile_data = StandInCollection()
+
+    elapsed, _ = harness.timed(basic_index.fetch_profile_data_from_file)
+    return (elapsed, basic_index.profile_data.num_written)
+
+
+def build_search_index(names):
+    def make_namespace():
+        for (fqu, profile) in iter_profiles(names):
+            yield {'username': fqu[:-len('.id')], 'profile': profile}
+
+    basic_index.namespace = StandInCollection(make_namespace)
+    for collection in ['search_profiles', 'people_cache', 'twitter_cache', 'username_cache']:
+        setattr(basic_index, collection, StandInCollection())
+
+    elapsed, _ = harness.timed(basic_index.create_search_index)
+    return (elapsed, basic_index.search_profiles.num_written)
+
+
+def benchmark(num_profiles):
+
+    names = make_random_names(num_profiles)
+
+    fd, path = tempfile.mkstemp(prefix='blockstack-benchmark-profiles-', suffix='.json')
+    os.close(fd)
+
+    try:
+        write_profile_data_file(path, names)
+        print '{} profiles ({:.1f} MB profile data file)'.format(num_profiles, os.path.getsize(path) / 1e6)
+
+        (load_time, num_loaded), load_rss = harness.run_in_child(load_profile_data, path)
+        assert num_loaded == num_profiles
+
+        (build_time, num_indexed), build_rss = harness.run_in_child(build_search_index, names)
+        assert num_indexed == num_profiles
+
+    finally:
+        os.unlink(path)
+
+    harness.report('load profile data', '{:8.2f}s  peak RSS +{:8.1f} MB'.format(load_time, load_rss / 1e6))
+    harness.report('create search index', '{:8.2f}s  peak RSS +{:8.1f} MB'.format(build_time, build_rss / 1e6))
+
+
+if __name__ == "__main__":
+    harness.main(benchmark, [('num_profiles', int, 100000)])
@@ -0,0 +1,100 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Search
+    ~~~~~
+
+    copyright: (c) 2014-2017 by Blockstack Inc.
+    copyright: (c) 2017 by Blockstack.org
+
+This file is part of Search.
+
+    Search is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Search is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Search. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+""" compare search query latency of the linear scan with the prefix index
+
+    usage: python tools/benchmarks/search_prefix_index.py [num_names]
+"""
+
+import random
+
+import harness
+
+from api.search.prefix_index import PrefixIndex
+from api.search.substring_search import substring_search, order_search_results
+
+NUM_QUERIES = 100
+LIMIT_RESULTS = 50
+
+
+def make_random_names(num_names, seed=0):
+    """ generate random 'first last' names
+    """
+
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+
+    def rand_word():
+        return ''.join(rng.choice(letters) for i in xrange(rng.randint(3, 9)))
+
+    first_names = [rand_word() for i in xrange(5000)]
+    last_names = [rand_word() for i in xrange(20000)]
+
+    names = set()
+    while len(names) < num_names:
+        names.add('{} {}'.format(rng.choice(first_names), rng.choice(last_names)))
+
+    return list(names)
+
+
+def benchmark(num_names):
+    """ time the index build, then run the same random queries both ways
+        and check that they agree
+    """
+
+    names = make_random_names(num_names)
+    build_time, index = harness.timed(PrefixIndex, names)
+
+    rng = random.Random(1)
+    queries = []
+    for i in xrange(NUM_QUERIES):
+        words = rng.choice(names).split(' ')
+        query = words[0][:rng.randint(1, len(words[0]))]
+        if rng.randint(0, 1) == 1:
+            query += ' ' + words[1][:rng.randint(1, len(words[1]))]
+
+        queries.append(query)
+
+    linear_time = 0
+    index_time = 0
+
+    for query in queries:
+
+        elapsed, expected = harness.timed(lambda: order_search_results(query, substring_search(query, names, LIMIT_RESULTS)))
+        linear_time += elapsed
+
+        elapsed, results = harness.timed(lambda: order_search_results(query, index.search(query, LIMIT_RESULTS)))
+        index_time += elapsed
+
+        assert results == expected, "Mismatched results for '{}'".format(query)
+
+    harness.report('profiles', "{}".format(num_names), width=20)
+    harness.report('index build', "{:.2f}s".format(build_time), width=20)
+    harness.report('linear scan query', "{:.3f}ms".format(1000 * linear_time / NUM_QUERIES), width=20)
+    harness.report('prefix index query', "{:.3f}ms".format(1000 * index_time / NUM_QUERIES), width=20)
+
+
+if __name__ == "__main__":
+    harness.main(benchmark, [('num_names', int, 1000000)])
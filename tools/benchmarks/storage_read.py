@@ -0,0 +1,110 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+
+    Measure storage read latency with hedged reads, against stand-in
+    storage drivers that are dead, slow, serve corrupt data, or work.
+
+    usage: python tools/benchmarks/storage_read.py [num_reads]
+"""
+
+import time
+import types
+
+import harness
+
+import keylib
+
+import blockstack_client.storage as storage
+
+# (name, latency, behavior), in the order the drivers are tried
+STAND_IN_DRIVERS = [
+    ('standin_dead', 2.0, 'fail'),         # e.g. a gaia hub that times out
+    ('standin_slow', 1.0, 'ok'),           # e.g. a slow S3 region
+    ('standin_corrupt', 0.01, 'corrupt'),  # returns data that doesn't verify
+    ('standin_fast', 0.05, 'ok'),
+]
+
+
+def make_stand_in_driver(name, latency, behavior, immutable_data, mutable_data):
+    """
+    Make a storage driver module that serves the given data after @latency seconds
+    """
+    driver = types.ModuleType(name)
+
+    def serve(data):
+        time.sleep(latency)
+        if behavior == 'fail':
+            raise Exception("{}: connection timed out".format(name))
+
+        if behavior == 'corrupt':
+            return data[:-1] + chr((ord(data[-1]) + 1) % 256)
+
+        return data
+
+    driver.get_classes = lambda: ['read_public']
+    driver.handles_url = lambda url: url.startswith('{}://'.format(name))
+    driver.make_mutable_url = lambda data_id: '{}://{}'.format(name, data_id)
+    driver.get_immutable_handler = lambda key, **kw: serve(immutable_data)
+    driver.get_mutable_handler = lambda url, **kw: serve(mutable_data)
+    for method in ['put_immutable_handler', 'put_mutable_handler', 'delete_immutable_handler', 'delete_mutable_handler']:
+        setattr(driver, method, lambda *args, **kw: False)
+
+    return driver
+
+
+def run(label, num_reads, read):
+    latencies = []
+    for i in xrange(num_reads):
+        elapsed, res = harness.timed(read)
+        assert res is not None
+        latencies.append(elapsed)
+
+    harness.report(label, harness.format_latencies(latencies))
+
+
+def benchmark(num_reads):
+
+    privkey = keylib.ECPrivateKey()
+    data_privkey = privkey.to_hex()
+    data_pubkey = privkey.public_key().to_hex()
+
+    immutable_data = 'hello world ' * 100
+    immutable_hash = storage.get_data_hash(immutable_data)
+    mutable_data = storage.serialize_mutable_data('hello world ' * 100, data_privkey=data_privkey)
+
+    driver_names = []
+    for (name, latency, behavior) in STAND_IN_DRIVERS:
+        storage.register_storage(make_stand_in_driver(name, latency, behavior, immutable_data, mutable_data))
+        driver_names.append(name)
+
+    print "drivers: {}".format(', '.join('{} ({}s, {})'.format(*d) for d in STAND_IN_DRIVERS))
+
+    for hedge in [1, 2, 3]:
+        run('get_immutable_data, hedge={}'.format(hedge), num_reads,
+            lambda: storage.get_immutable_data(immutable_hash, drivers=driver_names, hedge=hedge))
+
+        run('get_mutable_data, hedge={}'.format(hedge), num_reads,
+            lambda: storage.get_mutable_data('benchmark', data_pubkey, drivers=driver_names, hedge=hedge))
+
+
+if __name__ == '__main__':
+    harness.main(benchmark, [('num_reads', int, 5)])
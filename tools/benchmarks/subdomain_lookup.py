@@ -0,0 +1,147 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2018 by Blockstack.org
+
+    This file is part of Blockstack
+
+    Blockstack is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack. If not, see <http://www.gnu.org/licenses/>.
+
+
+    Benchmark the subdomain lookups behind the node's RPC methods:
+    get_name_record on a subdomain (get_subdomain_info),
+    get_subdomains_owned_by_address, get_all_subdomains and
+    get_num_subdomains (get_subdomains_count).
+
+    Fills a subdomain DB with num_subdomains subdomains spread over
+    num_domains domains, each with two records (the second one transfers
+    it to a new owner), and times num_lookups calls of each lookup.
+    To get the "before" numbers for a change, copy this directory into
+    a checkout of the older revision and run it there.
+
+    usage: python tools/benchmarks/subdomain_lookup.py [num_subdomains] [num_domains] [num_lookups]
+"""
+
+import os
+import shutil
+import random
+import sqlite3
+import hashlib
+import tempfile
+
+import harness
+
+from blockstack.lib.atlas import ATLASDB_SQL
+from blockstack.lib.config import set_blockstack_opts
+from blockstack.lib.storage import get_zonefile_data_hash, store_atlas_zonefile_data
+from blockstack.lib.subdomains import SubdomainDB, get_subdomain_info, get_subdomains_owned_by_address, \
+        get_all_subdomains, get_subdomains_count
+
+SUBDOMAINS_PER_OWNER = 4
+PAGE_SIZE = 100
+
+
+def make_owner(i):
+    return 'owner-{}'.format(hashlib.sha256(str(i)).hexdigest()[:32])
+
+
+def make_subdomain_db(working_dir, num_subdomains, num_domains):
+    """
+    Fill a subdomain DB with num_subdomains subdomains, with two records each.
+    Returns the blockstack opts to look them up with
+    """
+    opts = {
+        'atlas': True,
+        'zonefiles': os.path.join(working_dir, 'zonefiles'),
+        'atlasdb_path': os.path.join(working_dir, 'atlas.db'),
+        'subdomaindb_path': os.path.join(working_dir, 'subdomains.db'),
+    }
+
+    con = sqlite3.connect(opts['atlasdb_path'], isolation_level=None)
+    con.executescript(ATLASDB_SQL)
+    con.close()
+
+    zonefile_txt = '$ORIGIN bench\n$TTL 3600\n_https._tcp URI 10 1 "https://example.com/profile.json"'
+    zonefile_hash = get_zonefile_data_hash(zonefile_txt)
+    store_atlas_zonefile_data(zonefile_txt, opts['zonefiles'])
+
+    rows = []
+    for i in xrange(0, num_subdomains):
+        domain = 'domain{}.id'.format(i % num_domains)
+        fqn = 's{}.{}'.format(i, domain)
+        for n in xrange(0, 2):
+            zonefile_index = 2 * (i / num_domains) + n
+            owner = make_owner(i / SUBDOMAINS_PER_OWNER + n * num_subdomains)
+            txid = hashlib.sha256('{}-{}'.format(fqn, n)).hexdigest()
+            rows.append((fqn, domain, n, owner, zonefile_hash, '', 1000 + zonefile_index, zonefile_hash, zonefile_index, txid, '', 1))
+
+    db = SubdomainDB(opts['subdomaindb_path'], opts['zonefiles'])
+    cur = db.conn.cursor()
+    cur.execute('BEGIN')
+    cur.executemany('INSERT INTO {} VALUES (?,?,?,?,?,?,?,?,?,?,?,?)'.format(db.subdomain_table), rows)
+    cur.execute('COMMIT')
+
+    # have the current-state table (if this revision has one) rebuilt from the records
+    cur.execute('DROP TABLE IF EXISTS subdomain_current')
+    db._create_tables()
+    db.close()
+
+    return opts
+
+
+def time_lookups(lookup, args_list):
+    """
+    Call lookup(*args) for each args in args_list.
+    Returns the list of latencies
+    """
+    latencies = []
+    for args in args_list:
+        elapsed, ret = harness.timed(lookup, *args)
+        assert ret
+        latencies.append(elapsed)
+
+    return latencies
+
+
+def benchmark(num_subdomains, num_domains, num_lookups):
+    working_dir = tempfile.mkdtemp(prefix='blockstack-benchmark-subdomains-')
+    try:
+        opts = make_subdomain_db(working_dir, num_subdomains, num_domains)
+        set_blockstack_opts(opts)
+
+        rand = random.Random(0)
+        subdomains = [rand.randrange(0, num_subdomains) for _ in xrange(0, num_lookups)]
+        fqns = [('s{}.domain{}.id'.format(i, i % num_domains),) for i in subdomains]
+        owners = [(make_owner(i / SUBDOMAINS_PER_OWNER + num_subdomains),) for i in subdomains]
+        pages = [(rand.randrange(0, max(1, num_subdomains - PAGE_SIZE)), PAGE_SIZE) for _ in xrange(0, num_lookups)]
+
+        lookups = [
+            ('get_name_record (subdomain)', lambda fqn: get_subdomain_info(fqn, check_pending=True), fqns),
+            ('get_subdomains_owned_by_address', get_subdomains_owned_by_address, owners),
+            ('get_all_subdomains', get_all_subdomains, pages),
+            ('get_num_subdomains', get_subdomains_count, [()] * num_lookups),
+        ]
+
+        print "{} subdomains in {} domains, {} lookups each".format(num_subdomains, num_domains, num_lookups)
+        for (label, lookup, args_list) in lookups:
+            harness.report(label, harness.format_latencies(time_lookups(lookup, args_list)))
+
+    finally:
+        shutil.rmtree(working_dir)
+
+
+if __name__ == "__main__":
+    harness.main(benchmark, [('num_subdomains', int, 100000), ('num_domains', int, 100), ('num_lookups', int, 1000)])
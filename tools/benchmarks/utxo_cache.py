@@ -0,0 +1,178 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+    copyright: (c) 2014-2015 by Halfmoon Labs, Inc.
+    copyright: (c) 2016-2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+
+    Measure how fast one payment address can send back-to-back transactions,
+    against a local stand-in Insight API UTXO provider.  Like the real ones,
+    the stand-in is slow to answer and slow to notice that an output was
+    spent or created, and it rejects transactions that spend the same output
+    twice.  It mines a block every BLOCK_INTERVAL seconds.
+
+    The address starts out with num_utxos confirmed UTXOs.  Each
+    "registration" fetches the address's UTXOs twice (once to estimate
+    fees, once to build the transaction), spends the biggest spendable one,
+    and broadcasts the transaction, which sends the change back to the
+    address.  If there is no spendable UTXO (e.g. with num_utxos 1, until
+    the change is confirmed), it waits.
+
+    usage: python tools/benchmarks/utxo_cache.py [num_registrations] [num_utxos]
+"""
+
+import json
+import time
+import threading
+
+import harness
+
+import virtualchain
+
+import blockstack_client.utxo as utxo
+
+from blockstack_client.tx import serialize_tx
+from blockstack_client.backend.blockchain import get_utxos, broadcast_tx, select_utxos
+from blockstack_client.backend.utxo.blockstack_utxo import BlockstackUTXOClient
+
+PROVIDER_LATENCY = 0.2      # seconds per request
+PROVIDER_INDEX_LAG = 2.0    # seconds until the provider notices a spent or created output
+BLOCK_INTERVAL = 1.0        # seconds per block (scaled down from ten minutes)
+UTXO_VALUE = 1000000
+TX_FEE = 5000
+
+
+class StandInProvider(object):
+    """
+    The stand-in's view of the blockchain
+    """
+    def __init__(self, address, num_utxos):
+        self.lock = threading.Lock()
+        self.address = address
+        self.script = virtualchain.make_payment_script(address)
+        self.utxos = {}         # (txid, vout) --> (satoshis, time the creating tx arrived)
+        self.spent = {}         # (txid, vout) --> time the spending tx arrived
+        self.requests = 0
+        self.rejected = 0
+
+        for i in xrange(num_utxos):
+            self.utxos[('{:064x}'.format(i + 1), 0)] = (UTXO_VALUE, time.time() - 10 * BLOCK_INTERVAL)
+
+    def get_utxos(self):
+        now = time.time()
+        with self.lock:
+            self.requests += 1
+            return [{'txid': txid, 'vout': vout, 'satoshis': value, 'scriptPubKey': self.script,
+                     'confirmations': int((now - created) / BLOCK_INTERVAL)}
+                    for ((txid, vout), (value, created)) in self.utxos.items()
+                    if created + PROVIDER_INDEX_LAG <= now and self.spent.get((txid, vout), now) + PROVIDER_INDEX_LAG > now]
+
+    def send(self, tx_hex):
+        txobj = virtualchain.btc_tx_deserialize(tx_hex)
+        outpoints = [(inp['outpoint']['hash'], inp['outpoint']['index']) for inp in txobj['ins']]
+        with self.lock:
+            self.requests += 1
+            if any(outpoint in self.spent or outpoint not in self.utxos for outpoint in outpoints):
+                self.rejected += 1
+                return None
+
+            now = time.time()
+            for outpoint in outpoints:
+                self.spent[outpoint] = now
+
+            txid = virtualchain.btc_tx_get_hash(tx_hex)
+            for (i, out) in enumerate(txobj['outs']):
+                if out['script'] == self.script:
+                    self.utxos[(txid, i)] = (out['value'], now)
+
+            return txid
+
+
+class StandInHandler(harness.StandInHandler):
+
+    def do_GET(self):
+        time.sleep(PROVIDER_LATENCY)
+        self.reply(200, self.server.provider.get_utxos())
+
+    def do_POST(self):
+        time.sleep(PROVIDER_LATENCY)
+        req = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        txid = self.server.provider.send(str(req['rawtx']))
+        if txid is None:
+            self.reply(400, {'error': 'txn-mempool-conflict'})
+        else:
+            self.reply(200, {'txid': txid})
+
+
+def register(address, client):
+    """
+    Send one transaction from address, waiting (like a user waiting
+    for confirmations) while it has no spendable UTXO, and retrying
+    if it double-spends.
+    Return (the number of broadcasts, the number of waits)
+    """
+    attempts = 0
+    waits = 0
+    while True:
+        # fee estimate, then build
+        get_utxos(address, utxo_client=client)
+        utxos = get_utxos(address, utxo_client=client)
+
+        inputs = select_utxos(utxos, 2 * TX_FEE)
+        if inputs is None:
+            waits += 1
+            time.sleep(0.5)
+            continue
+
+        outputs = [{'script': virtualchain.make_payment_script(address), 'value': inputs[0]['value'] - TX_FEE}]
+
+        attempts += 1
+        res = broadcast_tx(serialize_tx(inputs, outputs), tx_broadcaster=client)
+        if 'error' not in res:
+            return (attempts, waits)
+
+        time.sleep(0.5)
+
+
+def run(label, num_registrations, num_utxos, cache):
+    address = virtualchain.BitcoinPrivateKey().public_key().address()
+    server = harness.start_server(StandInHandler, provider=StandInProvider(address, num_utxos))
+
+    utxo.UTXO_CACHE = cache
+    client = BlockstackUTXOClient(url='http://localhost:{}'.format(server.server_address[1]), min_confirmations=6)
+
+    elapsed, results = harness.timed(lambda: [register(address, client) for i in xrange(num_registrations)])
+    attempts = sum(a for (a, w) in results)
+    waits = sum(w for (a, w) in results)
+
+    harness.report(label, "{} txs in {:6.2f}s ({:5.2f} tx/s), {} provider requests, {} double-spends, {} waits".format(
+                   num_registrations, elapsed, num_registrations / elapsed,
+                   server.provider.requests, attempts - num_registrations, waits), width=28)
+
+    server.shutdown()
+
+
+def benchmark(num_registrations, num_utxos):
+    print "{} confirmed UTXOs to start with; a block every {}s".format(num_utxos, BLOCK_INTERVAL)
+    run('no cache, no spend tracking', num_registrations, num_utxos, utxo.UTXOCache(ttl=0, spent_ttl=0))
+    run('spend tracking only', num_registrations, num_utxos, utxo.UTXOCache(ttl=0))
+    run('cache + spend tracking', num_registrations, num_utxos, utxo.UTXOCache(ttl=30))
+
+
+if __name__ == '__main__':
+    harness.main(benchmark, [('num_registrations', int, 20), ('num_utxos', int, 200)])
@@ -0,0 +1,156 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+
+    copyright: (c) 2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import unittest
+
+from blockstack_client.data import TTLCache, DataCache
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TTLCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_expiry(self):
+        cache = TTLCache(100, clock=self.clock)
+        cache.put('a', 1, 10)
+        cache.put('b', 2, 20)
+
+        self.assertEqual(cache.get('a'), (1, 1010.0))
+
+        self.clock.now += 15
+        self.assertEqual(cache.get('a'), (None, None))
+        self.assertEqual(cache.get('b'), (2, 1020.0))
+
+        # replacing a value resets its deadline
+        cache.put('b', 3, 20)
+        self.clock.now += 10
+        self.assertEqual(cache.get('b'), (3, 1035.0))
+
+        self.clock.now += 10
+        self.assertEqual(cache.get('b'), (None, None))
+        self.assertEqual(len(cache), 0)
+
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['expirations'], stats['evictions']), (3, 2, 2, 0))
+
+    def test_lru_eviction(self):
+        cache = TTLCache(3, clock=self.clock)
+        for key in ['a', 'b', 'c']:
+            cache.put(key, key, 60)
+
+        # 'a' is now the most recently used, so 'b' goes first
+        cache.get('a')
+        cache.put('d', 'd', 60)
+        cache.put('e', 'e', 60)
+
+        self.assertEqual(sorted(k for k in 'abcde' if cache.get(k)[0] is not None), ['a', 'd', 'e'])
+        self.assertEqual(cache.get_stats()['evictions'], 2)
+
+    def test_byte_limit(self):
+        cache = TTLCache(100, max_bytes=10, sizeof=len, clock=self.clock)
+        cache.put('a', 'xxxx', 60)
+        cache.put('b', 'xxxx', 60)
+        self.assertEqual(cache.get_stats()['bytes'], 8)
+
+        cache.put('c', 'xxxx', 60)
+        self.assertEqual(cache.get('a'), (None, None))
+        self.assertEqual(cache.get_stats()['bytes'], 8)
+
+        # replacing a value accounts for its new size
+        cache.put('b', 'x', 60)
+        self.assertEqual(cache.get_stats()['bytes'], 5)
+
+        cache.evict('c')
+        self.assertEqual(cache.get_stats()['bytes'], 1)
+
+    def test_replaced_keys_dont_pile_up(self):
+        cache = TTLCache(100, clock=self.clock)
+        for i in xrange(10000):
+            cache.put('a', i, 60)
+
+        self.assertEqual(len(cache), 1)
+        self.assertTrue(len(cache.deadlines) < 100)
+        self.assertEqual(cache.get('a'), (9999, 1060.0))
+
+    def test_on_remove(self):
+        removed = []
+        cache = TTLCache(2, clock=self.clock, on_remove=lambda key, value: removed.append(key))
+        cache.put('a', 1, 10)
+        cache.put('a', 2, 10)
+        cache.put('b', 3, 60)
+        cache.put('c', 4, 60)
+        self.assertEqual(removed, ['a'])
+
+        self.clock.now += 100
+        cache.get('b')
+        cache.evict('nonexistent')
+        self.assertEqual(sorted(removed), ['a', 'b', 'c'])
+
+
+def make_directory(dir_uuid, child_uuids):
+    children = dict(('f{}'.format(i), {'uuid': child_uuid, 'type': 1}) for (i, child_uuid) in enumerate(child_uuids))
+    return {'uuid': dir_uuid, 'type': 2, 'version': 1, 'idata': {'children': children}}
+
+
+class DataCacheTests(unittest.TestCase):
+    def test_directory_maps_follow_the_cache(self):
+        clock = FakeClock()
+        cache = DataCache(max_dirs=2)
+        cache.dir_cache.clock = clock
+
+        cache.put_inode_header('ds', {'uuid': 'd1', 'version': 1}, 60)
+        cache.put_inode_directory('ds', make_directory('d1', ['a', 'b']), 60)
+        cache.put_inode_directory('ds', make_directory('d2', ['c']), 10)
+        self.assertEqual(cache.dir_children, {'a': 'd1', 'b': 'd1', 'c': 'd2'})
+
+        # a new version of a directory replaces its children
+        cache.put_inode_directory('ds', make_directory('d1', ['b']), 60)
+        self.assertEqual(cache.dir_children, {'b': 'd1', 'c': 'd2'})
+
+        # expired
+        clock.now += 20
+        self.assertEqual(cache.get_inode_directory('ds', 'd2'), None)
+        self.assertEqual(cache.dir_children, {'b': 'd1'})
+        self.assertEqual(sorted(cache.dir_listings.keys()), ['d1'])
+
+        # evicted, along with its header
+        cache.put_inode_directory('ds', make_directory('d3', ['e']), 60)
+        cache.put_inode_directory('ds', make_directory('d4', ['f']), 60)
+        self.assertEqual(cache.dir_children, {'e': 'd3', 'f': 'd4'})
+        self.assertEqual(cache.get_inode_header('ds', 'd1'), None)
+
+        cache.evict_all()
+        self.assertEqual((cache.dir_children, cache.dir_listings), ({}, {}))
+
+
+if __name__ == '__main__':
+    unittest.main()
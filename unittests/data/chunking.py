@@ -0,0 +1,111 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+
+    copyright: (c) 2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from blockstack_client.chunking import chunk_data, make_chunk_list, parse_chunk_list, \
+        chunk_list_split, chunk_list_slice, get_chunk_hash, CHUNK_MIN_SIZE, CHUNK_MAX_SIZE
+from blockstack_client.data import chunk_refs_add, chunk_refs_release
+
+
+class ChunkingTests(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(4 * 1024 * 1024)
+
+    def test_chunk_sizes(self):
+        chunks = chunk_data(self.data)
+        self.assertEqual(''.join(chunks), self.data)
+        for chunk in chunks[:-1]:
+            self.assertTrue(CHUNK_MIN_SIZE < len(chunk) <= CHUNK_MAX_SIZE)
+
+        self.assertEqual(chunk_data(''), [])
+        self.assertEqual(chunk_data('hello'), ['hello'])
+
+    def test_edit_changes_few_chunks(self):
+        offset = len(self.data) / 2
+        edited = self.data[:offset] + 'hello world' + self.data[offset + 5:]
+
+        old_hashes = set(get_chunk_hash(c) for c in chunk_data(self.data))
+        new_hashes = [get_chunk_hash(c) for c in chunk_data(edited)]
+        self.assertTrue(len([h for h in new_hashes if h not in old_hashes]) <= 2)
+
+    def test_chunk_list(self):
+        chunks = chunk_data(self.data)
+        chunk_list = parse_chunk_list(make_chunk_list(chunks))
+        self.assertEqual(chunk_list['size'], len(self.data))
+        self.assertEqual(chunk_list_split(chunk_list, self.data), chunks)
+
+        # data must match
+        corrupt = self.data[:100] + chr(ord(self.data[100]) ^ 1) + self.data[101:]
+        self.assertIsNone(chunk_list_split(chunk_list, corrupt))
+        self.assertIsNone(chunk_list_split(chunk_list, self.data[:-1]))
+
+        # sizes must add up
+        chunk_list['size'] += 1
+        self.assertIsNone(parse_chunk_list(json.dumps(chunk_list)))
+        self.assertIsNone(parse_chunk_list('not json'))
+
+    def test_chunk_list_slice(self):
+        chunks = chunk_data(self.data)
+        chunk_list = parse_chunk_list(make_chunk_list(chunks))
+
+        for (start, end) in [(0, 0), (0, len(self.data) - 1), (CHUNK_MIN_SIZE, 3 * CHUNK_MAX_SIZE), (len(self.data) - 1, len(self.data) + 100)]:
+            slices = chunk_list_slice(chunk_list, start, end)
+            first_offset = slices[0][1]
+            buf = ''.join(chunks[i] for (i, _) in slices)
+            self.assertEqual(buf[start - first_offset:end + 1 - first_offset], self.data[start:end + 1])
+
+        self.assertEqual(chunk_list_slice(chunk_list, len(self.data), len(self.data) + 100), [])
+
+
+class ChunkRefsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'metadata', 'chunks.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_release(self):
+        self.assertEqual(chunk_refs_release(self.path, 'ds.a'), [])
+
+        chunk_refs_add(self.path, 'ds.a', ['disk', 's3'], ['c1', 'c2'])
+        chunk_refs_add(self.path, 'ds.b', ['disk'], ['c2', 'c3'])
+
+        # c2 is still on disk for b
+        self.assertEqual(sorted(chunk_refs_release(self.path, 'ds.a')), [('disk', 'c1'), ('s3', 'c1'), ('s3', 'c2')])
+        self.assertEqual(chunk_refs_release(self.path, 'ds.a'), [])
+
+        # b's new version keeps c3
+        chunk_refs_add(self.path, 'ds.b', ['disk'], ['c3', 'c4'])
+        self.assertEqual(chunk_refs_release(self.path, 'ds.b', keep_chunks=[('disk', 'c3'), ('disk', 'c4')]), [('disk', 'c2')])
+        self.assertEqual(sorted(chunk_refs_release(self.path, 'ds.b')), [('disk', 'c3'), ('disk', 'c4')])
+
+
+if __name__ == '__main__':
+    unittest.main()
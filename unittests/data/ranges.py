@@ -0,0 +1,108 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+
+    copyright: (c) 2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import unittest
+
+import blockstack_client.data as data
+from blockstack_client.data import parse_byte_ranges, FileReader
+from blockstack_client.chunking import chunk_data, make_chunk_list, parse_chunk_list, get_chunk_hash
+
+
+class ParseByteRangesTests(unittest.TestCase):
+    def test_single(self):
+        self.assertEqual(parse_byte_ranges('bytes=0-99', 1000), [(0, 99)])
+        self.assertEqual(parse_byte_ranges('bytes=900-2000', 1000), [(900, 999)])
+
+    def test_suffix(self):
+        self.assertEqual(parse_byte_ranges('bytes=-100', 1000), [(900, 999)])
+        self.assertEqual(parse_byte_ranges('bytes=-2000', 1000), [(0, 999)])
+
+    def test_open_ended(self):
+        self.assertEqual(parse_byte_ranges('bytes=100-', 1000), [(100, 999)])
+
+    def test_unsatisfiable(self):
+        self.assertEqual(parse_byte_ranges('bytes=1000-', 1000), [])
+        self.assertEqual(parse_byte_ranges('bytes=2000-3000,5000-', 1000), [])
+        self.assertEqual(parse_byte_ranges('bytes=-0', 1000), [])
+
+    def test_invalid(self):
+        self.assertIsNone(parse_byte_ranges(None, 1000))
+        self.assertIsNone(parse_byte_ranges('items=0-1', 1000))
+        self.assertIsNone(parse_byte_ranges('bytes=-', 1000))
+        self.assertIsNone(parse_byte_ranges('bytes=10-5', 1000))
+        self.assertIsNone(parse_byte_ranges('bytes=a-b', 1000))
+
+    def test_merge(self):
+        # overlapping, adjacent, and out of order
+        self.assertEqual(parse_byte_ranges('bytes=50-150,0-99,151-200,500-,-100', 1000), [(0, 200), (500, 999)])
+        self.assertEqual(parse_byte_ranges('bytes=0-0,0-0,0-0', 1000), [(0, 0)])
+
+    def test_too_many(self):
+        header = 'bytes=' + ','.join('{}-{}'.format(i * 10, i * 10) for i in xrange(0, 10))
+        self.assertEqual(len(parse_byte_ranges(header, 1000, max_ranges=10)), 10)
+        self.assertIsNone(parse_byte_ranges(header, 1000, max_ranges=9))
+
+
+class ReadRangesTests(unittest.TestCase):
+    def setUp(self):
+        self.data = os.urandom(2 * 1024 * 1024)
+        self.chunks = dict((get_chunk_hash(c), c) for c in chunk_data(self.data))
+        self.chunk_list = parse_chunk_list(make_chunk_list(chunk_data(self.data)))
+        self.fetched = []
+
+        self.get_immutable_data = data.storage.get_immutable_data
+        data.storage.get_immutable_data = self.get_chunk
+
+    def tearDown(self):
+        data.storage.get_immutable_data = self.get_immutable_data
+
+    def get_chunk(self, chunk_hash, **kw):
+        self.fetched.append(chunk_hash)
+        return self.chunks[chunk_hash]
+
+    def read(self, reader, ranges):
+        parts = [''] * len(ranges)
+        for (i, block) in reader.read_ranges(ranges):
+            parts[i] += block
+
+        return parts
+
+    def test_read_ranges(self):
+        first_chunk_size = self.chunk_list['chunks'][0]['size']
+        ranges = [(0, 9), (20, 29), (first_chunk_size - 5, first_chunk_size + 5), (len(self.data) - 10, len(self.data) - 1)]
+        expected = [self.data[start:end + 1] for (start, end) in ranges]
+
+        self.assertEqual(self.read(FileReader(len(self.data), data=self.data), ranges), expected)
+
+        reader = FileReader(len(self.data), chunk_list=self.chunk_list, drivers=['disk'])
+        self.assertEqual(self.read(reader, ranges), expected)
+
+        # each chunk is fetched once, even if it holds more than one range
+        needed = set([0, 1, len(self.chunk_list['chunks']) - 1])
+        self.assertEqual(sorted(self.fetched), sorted(self.chunk_list['chunks'][i]['hash'] for i in needed))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+
+    copyright: (c) 2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import unittest, binascii, random
+
+import virtualchain
+
+import blockstack_client.backend.nameops as nameops
+
+from blockstack_client.tx import serialize_tx, sign_tx
+
+# opcode --> payload length, as in the operations the fee estimators build
+OPCODE_PAYLOADS = {
+    'NAME_IMPORT': 39,
+    'NAMESPACE_PREORDER': 39,
+    'NAMESPACE_REVEAL': 59,
+    'NAMESPACE_READY': 22,
+    'ANNOUNCE': 23,
+}
+
+MAX_INPUTS = 3
+TRIALS = 5
+
+
+def make_keys():
+    """
+    One private key bundle of each type we can sign with
+    """
+    keys = {
+        'p2pkh (compressed)': virtualchain.BitcoinPrivateKey(compressed=True).to_hex(),
+        'p2pkh (uncompressed)': virtualchain.BitcoinPrivateKey(compressed=False).to_hex(),
+        'p2sh 2-of-3': virtualchain.make_multisig_wallet(2, 3),
+    }
+
+    if virtualchain.get_features('segwit'):
+        keys['p2sh-p2wpkh'] = virtualchain.make_segwit_info()
+        keys['p2sh-p2wsh 2-of-3'] = virtualchain.make_multisig_segwit_wallet(2, 3)
+
+    return keys
+
+
+def make_unsigned_tx(opcode, privkey_info, num_inputs):
+    """
+    Make an unsigned tx for @opcode that spends @num_inputs outputs owned by @privkey_info.
+    Return (unsigned tx, prev outputs)
+    """
+    address = virtualchain.get_privkey_address(privkey_info)
+    out_script = virtualchain.make_payment_script(address)
+
+    inputs = []
+    prev_outputs = []
+    for i in xrange(num_inputs):
+        inputs.append({
+            'outpoint': {'hash': '{:064x}'.format(random.getrandbits(256)), 'index': i},
+            'script': '',
+            'sequence': 2**32 - 1,
+        })
+        prev_outputs.append({'out_script': out_script, 'value': 100000})
+
+    payload = binascii.hexlify('id' + opcode[0] + 'x' * (OPCODE_PAYLOADS[opcode] - 3))
+    outputs = [
+        {'script': virtualchain.make_data_script(payload), 'value': 0},
+        {'script': out_script, 'value': 100000 * num_inputs - 10000},
+    ]
+
+    return serialize_tx(inputs, outputs), prev_outputs
+
+
+class SignedSizeModelTests(unittest.TestCase):
+    def setUp(self):
+        nameops.SIGNED_SIZE_MODEL.clear()
+        self.keys = make_keys()
+
+    def test_model_matches_signing(self):
+        num_learned = 0
+        for opcode in sorted(OPCODE_PAYLOADS.keys()):
+            for key_type, privkey_info in sorted(self.keys.items()):
+                for num_inputs in xrange(1, MAX_INPUTS + 1):
+
+                    # first one is signed for real
+                    unsigned_tx, prev_outputs = make_unsigned_tx(opcode, privkey_info, num_inputs)
+                    signed_tx = nameops.estimate_signed_tx(opcode, unsigned_tx, prev_outputs, privkey_info)
+                    self.assertNotEqual(signed_tx, unsigned_tx)
+                    self.assertFalse(signed_tx.startswith(unsigned_tx))
+
+                    num_learned += 1
+                    self.assertEqual(len(nameops.SIGNED_SIZE_MODEL), num_learned)
+
+                    # the rest come from the model, and must never be short
+                    slack = nameops.SIGNATURE_LEN_SLACK * num_inputs * (3 if '2-of-3' in key_type else 1)
+                    for i in xrange(TRIALS):
+                        unsigned_tx, prev_outputs = make_unsigned_tx(opcode, privkey_info, num_inputs)
+                        modeled_len = len(nameops.estimate_signed_tx(opcode, unsigned_tx, prev_outputs, privkey_info)) / 2
+                        real_len = len(sign_tx(unsigned_tx, prev_outputs, privkey_info)) / 2
+
+                        self.assertTrue(0 <= modeled_len - real_len <= 2 * slack,
+                            "{} with {} and {} inputs: modeled {} bytes, signed {} bytes".format(opcode, key_type, num_inputs, modeled_len, real_len))
+
+    def test_unknown_keys_are_signed(self):
+        privkey_info = self.keys['p2pkh (compressed)']
+        unsigned_tx, prev_outputs = make_unsigned_tx('ANNOUNCE', privkey_info, 1)
+
+        orig_get_signature_class = nameops.get_signature_class
+        nameops.get_signature_class = lambda privkey_info: None
+        try:
+            signed_tx = nameops.estimate_signed_tx('ANNOUNCE', unsigned_tx, prev_outputs, privkey_info)
+        finally:
+            nameops.get_signature_class = orig_get_signature_class
+
+        self.assertFalse(signed_tx.startswith(unsigned_tx))
+        self.assertEqual(nameops.SIGNED_SIZE_MODEL, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack-client
+    ~~~~~
+
+    copyright: (c) 2017 by Blockstack.org
+
+    This file is part of Blockstack-client.
+
+    Blockstack-client is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack-client is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Blockstack-client. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import unittest, hashlib
+
+from blockstack_client.backend.blockchain import ConfirmationTracker
+
+
+class StandInBitcoind(object):
+    """
+    Just enough of bitcoind's RPC interface to track confirmations,
+    over a chain we mine (and reorg) by hand, like in regtest.
+    """
+    def __init__(self):
+        self.chain = []         # block hashes, by height
+        self.blocks = {}        # block hash --> {'height': ..., 'txs': [...]}
+        self.mempool = set()
+        self.calls = {}
+        self.mine([])
+
+    def count(self, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+
+    def send(self, tx_hash):
+        self.mempool.add(tx_hash)
+
+    def mine(self, tx_hashes=None, fork_height=None):
+        """
+        Mine a block with the given txs (or the mempool), on top of the tip or at fork_height
+        """
+        if fork_height is not None:
+            for block_hash in self.chain[fork_height:]:
+                self.mempool.update(self.blocks[block_hash]['txs'])
+
+            self.chain = self.chain[:fork_height]
+
+        if tx_hashes is None:
+            tx_hashes = list(self.mempool)
+
+        self.mempool.difference_update(tx_hashes)
+
+        block_hash = hashlib.sha256('{}:{}:{}'.format(len(self.chain), len(self.blocks), tx_hashes)).hexdigest()
+        self.blocks[block_hash] = {'height': len(self.chain), 'txs': tx_hashes, 'prev': self.chain[-1] if len(self.chain) > 0 else None}
+        self.chain.append(block_hash)
+
+    def getbestblockhash(self):
+        self.count('getbestblockhash')
+        return self.chain[-1]
+
+    def getblock(self, block_hash):
+        self.count('getblock')
+        block = self.blocks[block_hash]
+        confirmations = -1
+        if block['height'] < len(self.chain) and self.chain[block['height']] == block_hash:
+            confirmations = len(self.chain) - block['height']
+
+        ret = {'hash': block_hash, 'height': block['height'], 'confirmations': confirmations, 'tx': block['txs']}
+        if block['height'] > 0:
+            ret['previousblockhash'] = block['prev']
+
+        return ret
+
+    def getrawtransaction(self, tx_hash, verbose):
+        self.count('getrawtransaction')
+        if tx_hash in self.mempool:
+            return {'txid': tx_hash}
+
+        for block_hash in self.chain:
+            block = self.blocks[block_hash]
+            if tx_hash in block['txs']:
+                return {'txid': tx_hash, 'blockhash': block_hash, 'confirmations': len(self.chain) - block['height']}
+
+        raise Exception("No such mempool or blockchain transaction")
+
+
+class ConfirmationTrackerTests(unittest.TestCase):
+    def setUp(self):
+        self.bitcoind = StandInBitcoind()
+        self.tracker = ConfirmationTracker(bitcoind_client=self.bitcoind)
+
+    def confirmations(self, tx_hashes):
+        self.tracker.refresh()
+        return [self.tracker.get_tx_confirmations(tx_hash) for tx_hash in tx_hashes]
+
+    def test_confirmations(self):
+        txs = ['tx{}'.format(i) for i in range(5)]
+        for tx in txs:
+            self.bitcoind.send(tx)
+
+        self.assertEqual(self.confirmations(txs), [0] * 5)
+
+        self.bitcoind.mine(txs[:3])
+        self.assertEqual(self.confirmations(txs), [1, 1, 1, 0, 0])
+
+        self.bitcoind.mine()
+        for i in range(3):
+            self.bitcoind.mine([])
+
+        self.assertEqual(self.confirmations(txs), [5, 5, 5, 4, 4])
+        self.assertEqual(self.confirmations(['missing']), [None])
+
+    def test_one_lookup_per_tx(self):
+        txs = ['tx{}'.format(i) for i in range(100)]
+        for tx in txs:
+            self.bitcoind.send(tx)
+
+        self.bitcoind.mine()
+        self.confirmations(txs)
+        self.assertEqual(self.bitcoind.calls['getrawtransaction'], 100)
+
+        # once included, a tx's confirmations are computed from the tip
+        for i in range(10):
+            self.bitcoind.mine([])
+            self.assertEqual(self.confirmations(txs), [i + 2] * 100)
+
+        self.assertEqual(self.bitcoind.calls['getrawtransaction'], 100)
+        self.assertEqual(self.bitcoind.calls['getbestblockhash'], 11)
+
+    def test_mined_txs_found_in_blocks(self):
+        txs = ['tx{}'.format(i) for i in range(100)]
+        for tx in txs:
+            self.bitcoind.send(tx)
+
+        self.assertEqual(self.confirmations(txs), [0] * 100)
+        self.assertEqual(self.bitcoind.calls['getrawtransaction'], 100)
+
+        # unconfirmed txs are not looked up again; the new blocks say which got mined
+        self.bitcoind.mine(txs[:50])
+        self.bitcoind.mine([])
+        self.assertEqual(self.confirmations(txs), [2] * 50 + [0] * 50)
+
+        self.bitcoind.mine(txs[50:])
+        self.assertEqual(self.confirmations(txs), [3] * 50 + [1] * 50)
+        self.assertEqual(self.bitcoind.calls['getrawtransaction'], 100)
+
+        # too many new blocks to walk:  look them up again
+        self.tracker.max_new_blocks = 2
+        self.bitcoind.send('tx100')
+        self.assertEqual(self.confirmations(['tx100']), [0])
+        for i in range(3):
+            self.bitcoind.mine()
+
+        self.assertEqual(self.confirmations(['tx100']), [3])
+        self.assertEqual(self.bitcoind.calls['getrawtransaction'], 102)
+
+    def test_reorg(self):
+        self.bitcoind.send('tx1')
+        self.bitcoind.send('tx2')
+        self.bitcoind.mine(['tx1'])
+        self.bitcoind.mine(['tx2'])
+        self.bitcoind.mine([])
+        self.assertEqual(self.confirmations(['tx1', 'tx2']), [3, 2])
+
+        # replace the last two blocks; tx2 goes back to the mempool
+        self.bitcoind.mine([], fork_height=2)
+        self.bitcoind.mine([])
+        self.assertEqual(self.confirmations(['tx1', 'tx2']), [3, 0])
+
+        self.bitcoind.mine(['tx2'])
+        self.assertEqual(self.confirmations(['tx1', 'tx2']), [4, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
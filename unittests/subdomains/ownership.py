@@ -0,0 +1,74 @@
+#!/usr/bin/env python2
+# -*- coding: utf-8 -*-
+"""
+    Blockstack
+    ~~~~~
+
+    copyright: (c) 2018 by Blockstack.org
+
+    This file is part of Blockstack.
+
+    Blockstack is free software: you can redistribute it and/or modify
+    it under the terms of the GNU General Public License as published by
+    the Free Software Foundation, either version 3 of the License, or
+    (at your option) any later version.
+
+    Blockstack is distributed in the hope that it will be useful,
+    but WITHOUT ANY WARRANTY; without even the implied warranty of
+    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+    GNU General Public License for more details.
+
+    You should have received a copy of the GNU General Public License
+    along with Blockstack. If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from blockstack.lib.subdomains import Subdomain, SubdomainDB
+
+ZONEFILE = '$ORIGIN bar.id\n$TTL 3600\n_https._tcp URI 10 1 "https://example.com/profile.json"'
+
+OWNER_A = '1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2'
+OWNER_B = '1CK6KHY6MHgYvmRQ4PAafKYDrg1ejbH1cE'
+OWNER_C = '1Ay8vMC7R1UbyCCZRVULMV7iQpHSAbguJP'
+
+
+class SubdomainOwnership(unittest.TestCase):
+    """
+    get_subdomains_owned_by_address() only returns the subdomains an
+    address owns now, according to each one's latest accepted record.
+    """
+
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp()
+        self.db = SubdomainDB(os.path.join(self.working_dir, 'subdomains.db'), os.path.join(self.working_dir, 'zonefiles'))
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.working_dir)
+
+    def add_record(self, name, n, owner, accepted):
+        subrec = Subdomain('{}.bar.id'.format(name), 'bar.id', owner, n, ZONEFILE, '', 1000 + n,
+                           '00' * 20, n, '{:064x}'.format(hash((name, n)) & (2**64 - 1)), accepted=accepted)
+        self.db.update_subdomain_entry(subrec)
+
+    def test_transferred_subdomain(self):
+        self.add_record('foo', 0, OWNER_A, True)
+        self.add_record('foo', 1, OWNER_B, True)
+
+        self.assertEqual(self.db.get_subdomains_owned_by_address(OWNER_A), [])
+        self.assertEqual(self.db.get_subdomains_owned_by_address(OWNER_B), ['foo.bar.id'])
+
+    def test_unaccepted_transfer(self):
+        self.add_record('baz', 0, OWNER_A, True)
+        self.add_record('baz', 1, OWNER_C, False)
+
+        self.assertEqual(self.db.get_subdomains_owned_by_address(OWNER_A), ['baz.bar.id'])
+        self.assertEqual(self.db.get_subdomains_owned_by_address(OWNER_C), [])
+
+
+if __name__ == '__main__':
+    unittest.main()